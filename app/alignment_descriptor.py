@@ -0,0 +1,210 @@
+import math
+from fractions import Fraction
+
+
+def make_alignment_descriptor(reference_path, captured_path, captured_start_time, frame_count,
+                              captured_fps, reference_fps, frame_offset=0):
+    """
+    Describe how the captured video lines up with the reference without writing aligned files
+
+    Args:
+        reference_path: Original reference video
+        captured_path: Original (or motion-compensated) capture
+        captured_start_time: Capture time in seconds of the frame matching the first reference frame
+        frame_count: Number of frames to compare
+        captured_fps: Frame rate of the capture
+        reference_fps: Frame rate of the reference; the capture is converted to it
+        frame_offset: Frame offset that was applied to the start time, recorded for reports
+
+    Returns:
+        Alignment descriptor dict
+    """
+    captured_start_time = max(0.0, captured_start_time)
+
+    # Like an output seek with frame rate conversion, start at the nearest frame; halfway ties
+    # (the bookend timing always produces them) go to the earlier frame
+    captured_start_frame = 0
+    if captured_fps:
+        captured_start_frame = int(math.ceil(captured_start_time * captured_fps - 0.5 - 1e-6))
+
+    return {
+        'mode': 'virtual',
+        'reference_path': reference_path,
+        'captured_path': captured_path,
+        'captured_start_time': captured_start_time,
+        'captured_start_frame': captured_start_frame,
+        'frame_count': int(frame_count),
+        'frame_offset': frame_offset,
+        'captured_fps': captured_fps,
+        'reference_fps': reference_fps
+    }
+
+
+def apply_frame_mapping(descriptor, reference_ranges, captured_ranges, pair_count, captured_shift=0):
+    """
+    Restrict an alignment descriptor to the frame pairs of a drop/duplicate mapping
+
+    Args:
+        descriptor: Alignment descriptor to update in place
+        reference_ranges: Inclusive [first, last] reference frame ranges that have a captured match
+        captured_ranges: Inclusive [first, last] ranges of the matching captured frames, counted
+            from the descriptor's captured start frame after frame rate conversion
+        pair_count: Number of matched pairs (the new frame count)
+        captured_shift: Captured frames to move the start frame by first (may be negative)
+
+    Returns:
+        The updated descriptor
+    """
+    if captured_shift:
+        descriptor['captured_start_frame'] = max(0, descriptor['captured_start_frame'] + captured_shift)
+        if descriptor.get('captured_fps'):
+            descriptor['captured_start_time'] = descriptor['captured_start_frame'] / descriptor['captured_fps']
+
+    descriptor['frame_count'] = int(pair_count)
+    descriptor['frame_mapping'] = {
+        'reference_ranges': reference_ranges,
+        'captured_ranges': captured_ranges
+    }
+    return descriptor
+
+
+def _select_ranges(ranges):
+    """select filter passing the frames of inclusive [first, last] ranges"""
+    terms = "+".join(f"between(n,{first},{last})" for first, last in ranges)
+    return f"select='{terms}'"
+
+
+def alignment_filter_chains(descriptor):
+    """
+    FFmpeg filter chains that apply an alignment descriptor to the original files
+
+    The capture is cut at its start frame, converted to the reference frame
+    rate and limited to the frame count; the reference is limited to the same
+    frame count. With a frame mapping, both sides instead select the matched
+    frame pairs, skipping reference frames the capture dropped and captured
+    frames it repeated. Both are then renumbered on one shared timebase, so the
+    metric filter pairs frame n with frame n even when the containers store
+    timestamps with different precision (Matroska rounds to milliseconds).
+
+    Returns:
+        (captured_chain, reference_chain) filter strings
+    """
+    frame_count = descriptor['frame_count']
+    captured_fps = descriptor.get('captured_fps')
+    reference_fps = descriptor.get('reference_fps')
+
+    renumber = "setpts=PTS-STARTPTS"
+    if reference_fps:
+        timebase = Fraction(1 / reference_fps).limit_denominator(1000000)
+        renumber = f"settb={timebase.numerator}/{timebase.denominator},setpts=N"
+
+    captured_filters = [
+        f"trim=start_frame={descriptor['captured_start_frame']}",
+        "setpts=PTS-STARTPTS"
+    ]
+    if reference_fps and captured_fps and abs(captured_fps - reference_fps) > 0.001:
+        captured_filters.append(f"fps=fps={reference_fps}")
+
+    reference_filters = []
+    frame_mapping = descriptor.get('frame_mapping')
+    if frame_mapping:
+        captured_filters.append(_select_ranges(frame_mapping['captured_ranges']))
+        reference_filters.append(_select_ranges(frame_mapping['reference_ranges']))
+
+    captured_filters.extend([f"trim=end_frame={frame_count}", renumber])
+    reference_filters.extend([f"trim=end_frame={frame_count}", renumber])
+
+    return ",".join(captured_filters), ",".join(reference_filters)
+
+
+def alignment_filtergraph(descriptor, metric_filter, distorted_input=0, reference_input=1):
+    """
+    Complete filtergraph feeding aligned inputs into a two-input metric filter
+
+    Args:
+        descriptor: Alignment descriptor, or None to compare the inputs as they are
+        metric_filter: Filter taking [distorted][reference], e.g. "libvmaf=..."
+        distorted_input, reference_input: FFmpeg input indices
+
+    Returns:
+        Filtergraph string for -lavfi
+    """
+    if not descriptor:
+        return metric_filter
+
+    captured_chain, reference_chain = alignment_filter_chains(descriptor)
+    return (f"[{distorted_input}:v]{captured_chain}[dist];"
+            f"[{reference_input}:v]{reference_chain}[ref];"
+            f"[dist][ref]{metric_filter}")
+
+
+def seeked_descriptor(descriptor):
+    """
+    Alignment descriptor for a capture input seeked to its start frame
+
+    Seeking the capture input (segment_vmaf.input_seek_args) lets FFmpeg skip
+    to the aligned content instead of decoding and trimming every frame before
+    it, which matters most when several loops are scored from one capture.
+
+    Returns:
+        (descriptor, captured_seek_frame): the descriptor rebased to start at
+        frame 0 of the seeked input, or the descriptor unchanged and 0 when
+        there is nothing to seek or the capture frame rate is unknown
+    """
+    if not descriptor or not descriptor.get('captured_fps') or descriptor.get('captured_start_frame', 0) <= 0:
+        return descriptor, 0
+    part = dict(descriptor, captured_start_frame=0, captured_start_time=0.0)
+    return part, descriptor['captured_start_frame']
+
+
+def _slice_ranges(ranges, first, count):
+    """
+    Frames first..first + count - 1 (counted along the ranges) of inclusive [first, last] ranges
+
+    Returns:
+        (ranges, first_frame): the sliced ranges rebased to start at frame 0, and the frame they start at
+    """
+    sliced = []
+    position = 0
+    for range_first, range_last in ranges:
+        length = range_last - range_first + 1
+        lo = max(first, position)
+        hi = min(first + count, position + length)
+        if lo < hi:
+            sliced.append([range_first + lo - position, range_first + hi - 1 - position])
+        position += length
+    if not sliced:
+        return [], 0
+    start = sliced[0][0]
+    return [[lo - start, hi - start] for lo, hi in sliced], start
+
+
+def segment_descriptor(descriptor, first_pair, pair_count):
+    """
+    Alignment descriptor for a range of the compared frame pairs, for inputs seeked to its start
+
+    Splits one comparison into independently runnable parts: each part seeks
+    both inputs to the source frames of its first pair and applies the
+    returned descriptor, which then starts at frame 0 of both. Only valid when
+    the capture is not frame rate converted.
+
+    Args:
+        descriptor: Alignment descriptor of the whole comparison
+        first_pair: First compared pair of the part
+        pair_count: Pairs in the part
+
+    Returns:
+        (descriptor, captured_seek_frame, reference_seek_frame)
+    """
+    pair_count = max(0, min(pair_count, descriptor['frame_count'] - first_pair))
+    part = dict(descriptor, captured_start_frame=0, captured_start_time=0.0, frame_count=pair_count)
+
+    frame_mapping = descriptor.get('frame_mapping')
+    if frame_mapping:
+        reference_ranges, reference_seek = _slice_ranges(frame_mapping['reference_ranges'], first_pair, pair_count)
+        captured_ranges, captured_first = _slice_ranges(frame_mapping['captured_ranges'], first_pair, pair_count)
+        part['frame_mapping'] = {'reference_ranges': reference_ranges, 'captured_ranges': captured_ranges}
+    else:
+        reference_seek = captured_first = first_pair
+
+    return part, descriptor['captured_start_frame'] + captured_first, reference_seek
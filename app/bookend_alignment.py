@@ -1,18 +1,49 @@
 import logging
+import math
 import os
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import cv2
 import numpy as np
 from PyQt5.QtCore import QObject, Qt, QThread, pyqtSignal
 
+from .alignment_descriptor import apply_frame_mapping, make_alignment_descriptor
+from .bookend_classifier import bookends_match_loops, classify_bookends, min_bookend_frames, white_frame_mask
+from .bookend_edges import BookendEdgeRefiner, FrameSeekIndex
+from .frame_mapping import map_frames, mapping_ranges, packet_hints, scan_thumbnails
+from .fingerprint_alignment import FingerprintIndex, locate_reference, reference_hashes, stream_perceptual_hashes
+from .intermediate_codecs import DEFAULT_INTERMEDIATE_PROFILE, intermediate_output_args, intermediate_path
+from .luma_cache import LumaProfileCache
+from .luma_profile import (FFMPEG_PROFILE_HEIGHT, FFMPEG_PROFILE_WIDTH, LIVE_PROFILE_SETTINGS, LUMA_WHITE_LEVEL,
+                           LumaProfile, plan_scan_chunks, scan_luma_profile, scan_luma_profile_ffmpeg,
+                           scan_luma_profile_parallel)
+from .offset_estimator import estimate_offset, scan_frame_signatures
+from .packet_index import candidate_windows, find_small_packet_runs, read_packet_table
+from .parallel_encode import encode_frames_parallel, run_ffmpeg_job
+from .reference_cache import ReferencePrepCache
+from .smart_cut import smart_cut_export
+
 logger = logging.getLogger(__name__)
 
 # Define MAX_REPAIR_ATTEMPTS constant
 MAX_REPAIR_ATTEMPTS = 3
 
+# Aligned content starts this long after the end of the first bookend
+CONTENT_START_PADDING = 0.2
+
+# Analysis alignment_method value selecting the content fingerprint aligner
+FINGERPRINT_ALIGNMENT_METHOD = "Content Fingerprint"
+
+# Motion compensation segments: extra frames interpolated either side of a segment and
+# thrown away, so every kept frame sees the same neighbours as in a single pass
+MOTION_SEGMENT_OVERLAP_FRAMES = 8
+MIN_MOTION_SEGMENT_FRAMES = 60
+
+# Loops shorter than this share of the reference are partial and not scored in multi-loop analysis
+MIN_LOOP_COVERAGE = 0.9
+
 def validate_video_file(file_path):
     """Validate if a video file is intact and can be read"""
     if not os.path.exists(file_path):
@@ -121,7 +152,29 @@ class BookendAligner(QObject):
         self.frame_sampling_rate = 5  # Frames to sample per second during detection
         self.adaptive_brightness = True  # Use adaptive brightness threshold
         self.motion_compensation = False  # Apply motion compensation
+        self.motion_workers = 0  # Parallel motion compensation segments (0 = one per CPU core)
         self.fallback_to_full_video = True  # Use full video if no bookends detected
+        self.stats_backend = "ffmpeg"  # Luma statistics backend: "ffmpeg" or "opencv"
+        self.packet_prefilter = True  # Only decode windows around small-packet runs
+        self.keyframe_coarse_scan = True  # Localise bookends on keyframes before frame-exact scanning
+        self.keyframe_scan_min_duration = 60  # Seconds; shorter captures are scanned in full
+        self.edge_refinement = True  # Seek to the GOPs around white keyframes instead of scanning windows
+        self.virtual_alignment = True  # Describe the alignment for VMAF instead of encoding aligned copies
+        self.intermediate_profile = DEFAULT_INTERMEDIATE_PROFILE  # Codec profile for aligned files that are written
+        self.offset_estimation = True  # Measure the frame offset by signature cross-correlation
+        self.offset_search_frames = 30  # Offsets searched either side of the bookend timing
+        self.offset_signature_frames = 300  # Reference frames compared when estimating the offset
+        self.offset_min_confidence = 0.3  # Below this the configured frame offset is kept
+        self.frame_mapping = True  # Match captured to reference frames, skipping drops and duplicates
+        self.frame_mapping_band = 30  # Largest drift in frames the frame mapping follows
+        self.multi_loop_analysis = False  # Align every complete loop so each can be scored
+        self.archive_aligned_capture = False  # Smart-cut the aligned capture into a clip kept with the test
+        self.profile_cache = True  # Reuse luma profiles stored in sidecars next to the video
+        self.luma_cache = LumaProfileCache()
+        self.reference_cache = ReferencePrepCache()  # Prepared references shared between tests
+        self.detection_workers = 0  # Parallel scan workers for the full scan (0 = one per CPU core)
+        self.encode_workers = 0  # Parallel chunk encoders per aligned file (0 = chosen by the CPU scheduler)
+
 
 
 
@@ -139,9 +192,21 @@ class BookendAligner(QObject):
 
 
 
+    def set_reference_cache(self, enabled=True, cache_dir="", max_size_gb=20):
+        """Configure the prepared reference cache; an empty directory uses the per-user cache directory"""
+        self.reference_cache = ReferencePrepCache(cache_dir or None, max_size_gb, enabled)
+        logger.info(f"Reference cache: enabled={enabled}, dir={self.reference_cache.cache_dir}, "
+                f"quota={max_size_gb} GB")
 
     def set_advanced_options(self, frame_sampling_rate=5, adaptive_brightness=True, 
-                        motion_compensation=True, fallback_to_full_video=True):
+                        motion_compensation=True, fallback_to_full_video=True,
+                        stats_backend="ffmpeg", packet_prefilter=True, keyframe_coarse_scan=True,
+                        profile_cache=True, profile_cache_max_mb=256, detection_workers=0,
+                        edge_refinement=True, virtual_alignment=True,
+                        intermediate_profile=DEFAULT_INTERMEDIATE_PROFILE,
+                        offset_estimation=True, offset_search_frames=30, frame_mapping=True,
+                        multi_loop_analysis=False, motion_workers=0, archive_aligned_capture=False,
+                        encode_workers=0):
         """Set advanced options for bookend alignment"""
         # Store the previous settings for logging
         prev_motion_comp = self.motion_compensation
@@ -151,6 +216,22 @@ class BookendAligner(QObject):
         self.adaptive_brightness = adaptive_brightness
         self.motion_compensation = motion_compensation
         self.fallback_to_full_video = fallback_to_full_video
+        self.stats_backend = stats_backend
+        self.packet_prefilter = packet_prefilter
+        self.keyframe_coarse_scan = keyframe_coarse_scan
+        self.profile_cache = profile_cache
+        self.luma_cache.max_size_mb = profile_cache_max_mb
+        self.detection_workers = detection_workers
+        self.edge_refinement = edge_refinement
+        self.virtual_alignment = virtual_alignment
+        self.intermediate_profile = intermediate_profile
+        self.offset_estimation = offset_estimation
+        self.offset_search_frames = offset_search_frames
+        self.frame_mapping = frame_mapping
+        self.multi_loop_analysis = multi_loop_analysis
+        self.motion_workers = motion_workers
+        self.archive_aligned_capture = archive_aligned_capture
+        self.encode_workers = encode_workers
         
         # Log the change in motion compensation setting
         if prev_motion_comp != motion_compensation:
@@ -158,8 +239,21 @@ class BookendAligner(QObject):
         
         logger.info(f"Set advanced bookend options: sampling_rate={frame_sampling_rate}, "
                 f"adaptive_brightness={adaptive_brightness}, "
-                f"motion_compensation={motion_compensation}, "
-                f"fallback_to_full_video={fallback_to_full_video}")
+                f"motion_compensation={motion_compensation} (workers={motion_workers}), "
+                f"fallback_to_full_video={fallback_to_full_video}, "
+                f"stats_backend={stats_backend}, "
+                f"packet_prefilter={packet_prefilter}, "
+                f"keyframe_coarse_scan={keyframe_coarse_scan}, "
+                f"profile_cache={profile_cache} ({profile_cache_max_mb} MB), "
+                f"detection_workers={detection_workers}, "
+                f"encode_workers={encode_workers}, "
+                f"edge_refinement={edge_refinement}, "
+                f"virtual_alignment={virtual_alignment}, "
+                f"intermediate_profile={intermediate_profile}, "
+                f"offset_estimation={offset_estimation} (+/-{offset_search_frames} frames), "
+                f"frame_mapping={frame_mapping}, "
+                f"multi_loop_analysis={multi_loop_analysis}, "
+                f"archive_aligned_capture={archive_aligned_capture}")
 
 
 
@@ -190,13 +284,23 @@ class BookendAligner(QObject):
             # Create output filename with _motion_comp suffix
             output_dir = os.path.dirname(video_path)
             base_name = os.path.splitext(os.path.basename(video_path))[0]
-            output_path = os.path.join(output_dir, f"{base_name}_motion_comp.mp4")
+            output_path = intermediate_path(output_dir, f"{base_name}_motion_comp", self.intermediate_profile)
             
             # Get input video frame rate
             video_info = self._get_video_info(video_path)
             original_fps = video_info.get('frame_rate', 30)
             
             logger.info(f"Applying motion compensation from {start_time:.3f}s for {duration:.3f}s with fps={original_fps}")
+
+            # Long sections are interpolated as concurrent segments. The single pass below
+            # rounds both -ss and -t to the nearest frame, and the segments cover the same frames
+            first_frame = int(math.floor(start_time * original_fps + 0.5))
+            frame_count = int(math.floor(duration * original_fps + 0.5))
+            segments = plan_scan_chunks(frame_count, self.motion_workers or os.cpu_count() or 1,
+                                        min_chunk_frames=MIN_MOTION_SEGMENT_FRAMES)
+            if len(segments) > 1:
+                return self._apply_motion_compensation_segments(video_path, original_fps, first_frame, segments,
+                                                                output_path)
             
             # Create FFmpeg command for motion compensation
             # First extract the section we want to process
@@ -206,7 +310,7 @@ class BookendAligner(QObject):
                 "-ss", str(start_time),
                 "-t", str(duration),
                 "-vf", f"minterpolate=fps={original_fps}:mi_mode=mci:mc_mode=aobmc:me_mode=bidir:vsbmc=1",
-                "-c:v", "libx264", "-crf", "23", "-preset", "fast",
+                *intermediate_output_args(self.intermediate_profile),
                 "-r", str(original_fps),  # Ensure output frame rate matches source
                 output_path
             ]
@@ -236,6 +340,96 @@ class BookendAligner(QObject):
 
 
 
+    def _apply_motion_compensation_segments(self, video_path, fps, first_frame, segments, output_path):
+        """
+        Motion-compensate a section as concurrent segments and join them frame-exactly
+
+        minterpolate is single-threaded, so one FFmpeg process per segment
+        keeps every core busy. Each segment is interpolated with
+        MOTION_SEGMENT_OVERLAP_FRAMES of context on both sides, which are then
+        trimmed off, so the kept frames match a single pass over the section.
+        The pieces are joined with the concat demuxer without re-encoding.
+
+        Args:
+            video_path: Path to the input video
+            fps: Frame rate of the input (kept in the output)
+            first_frame: Input frame at which the section starts
+            segments: (start, count) frame ranges relative to first_frame
+            output_path: Path of the joined output
+
+        Returns:
+            output_path, or None if any segment failed
+        """
+        start = time.time()
+        base_path, extension = os.path.splitext(output_path)
+        segment_paths = [f"{base_path}_part{i:03d}{extension}" for i in range(len(segments))]
+        list_path = f"{base_path}_parts.txt"
+        minterpolate = f"minterpolate=fps={fps}:mi_mode=mci:mc_mode=aobmc:me_mode=bidir:vsbmc=1"
+
+        def interpolate_segment(segment, segment_path):
+            segment_start, count = segment
+            lead = min(MOTION_SEGMENT_OVERLAP_FRAMES, first_frame + segment_start)
+            seek_frame = first_frame + segment_start - lead
+            cmd = [self._ffmpeg_path, "-hide_banner", "-y"]
+            if seek_frame > 0:
+                # Half a frame early so the seek lands on seek_frame itself
+                cmd.extend(["-ss", f"{(seek_frame - 0.5) / fps:.6f}"])
+            cmd.extend([
+                "-i", video_path,
+                # Timestamps restart on the frame grid so minterpolate keeps the source frame positions
+                "-vf", f"setpts=PTS-STARTPTS,{minterpolate},trim=start_frame={lead}:end_frame={lead + count}," +
+                       "setpts=PTS-STARTPTS",
+                "-frames:v", str(count),
+                *intermediate_output_args(self.intermediate_profile, audio=False),
+                "-r", str(fps),
+                segment_path
+            ])
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                logger.error(f"Motion compensation of frames {segment_start}-{segment_start + count} failed: " +
+                        f"{result.stderr}")
+                return False
+            return True
+
+        try:
+            logger.info(f"Motion compensating {sum(count for _, count in segments)} frames in {len(segments)} " +
+                    f"segments with {min(len(segments), self.motion_workers or os.cpu_count() or 1)} workers")
+            with ThreadPoolExecutor(max_workers=self.motion_workers or os.cpu_count() or 1) as executor:
+                results = list(executor.map(interpolate_segment, segments, segment_paths))
+            if not all(results):
+                return None
+
+            with open(list_path, 'w') as f:
+                for segment_path in segment_paths:
+                    escaped = os.path.abspath(segment_path).replace('\\', '/').replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+
+            cmd = [self._ffmpeg_path, "-hide_banner", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                   "-c", "copy", output_path]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                logger.error(f"Joining motion compensated segments failed: {result.stderr}")
+                return None
+
+            if not os.path.exists(output_path) or not validate_video_file(output_path):
+                logger.error("Motion compensation output file is invalid")
+                return None
+
+            logger.info(f"Motion compensation finished in {time.time() - start:.2f}s")
+            return output_path
+
+        except Exception as e:
+            logger.error(f"Error applying segmented motion compensation: {e}")
+            return None
+
+        finally:
+            for path in segment_paths + [list_path]:
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove motion compensation segment {path}: {e}")
+
     def align_bookend_videos(self, reference_path, captured_path):
         """
         Align videos based on white frame bookends that surround the content
@@ -298,28 +492,37 @@ class BookendAligner(QObject):
             self.status_update.emit("Detecting white bookend frames in captured video...")
             self.alignment_progress.emit(10)
 
-            bookend_frames = self._detect_white_bookends(captured_path)
+            bookend_frames = self._detect_white_bookends(captured_path, ref_info.get('duration'))
 
-            if not bookend_frames or len(bookend_frames) < 2:
-                error_msg = "Failed to detect at least two white bookend sections"
-                logger.error(error_msg)
-                self.error_occurred.emit(error_msg)
-                
-                # If fallback is enabled, use the entire video
-                if self.fallback_to_full_video:
-                    logger.info("Falling back to using entire captured video as content")
-                    self.status_update.emit("No bookends detected. Using entire video instead...")
-                    
-                    # Create fallback bookends
-                    content_start_time = 0.2  # Skip first 0.2 sec to avoid any initial issues
-                    content_duration = cap_info.get('duration', 0) - 0.4  # Leave 0.2 sec at the end
-                    
-                    if content_duration <= 0:
-                        error_msg = "Video duration too short for proper alignment"
-                        logger.error(error_msg)
-                        self.error_occurred.emit(error_msg)
-                        return None
-                else:
+            # With fallback enabled, the detector stands in bookends at the ends of the video when it finds none
+            detected_bookends = [bookend for bookend in bookend_frames or [] if not bookend.get('is_fallback')]
+
+            if len(detected_bookends) < 2:
+                if not self.fallback_to_full_video:
+                    error_msg = "Failed to detect at least two white bookend sections"
+                    logger.error(error_msg)
+                    self.error_occurred.emit(error_msg)
+                    return None
+
+                # Locate the reference by its content before falling back to the entire video
+                logger.info("No white bookends detected, trying content fingerprint alignment")
+                result = self.align_fingerprint_videos(reference_path, captured_path, quiet=True)
+                if result:
+                    return result
+
+                if not bookend_frames or len(bookend_frames) < 2:
+                    error_msg = "Failed to detect at least two white bookend sections"
+                    logger.error(error_msg)
+                    self.error_occurred.emit(error_msg)
+                    return None
+
+                logger.info("Falling back to using entire captured video as content")
+                self.status_update.emit("No bookends detected. Using entire video instead...")
+
+                if cap_info.get('duration', 0) - 0.4 <= 0:
+                    error_msg = "Video duration too short for proper alignment"
+                    logger.error(error_msg)
+                    self.error_occurred.emit(error_msg)
                     return None
 
             # We need at least 2 bookends
@@ -347,6 +550,8 @@ class BookendAligner(QObject):
 
             # Check if reference video duration is similar
             ref_duration = ref_info.get('duration', 0)
+            loop_windows = []  # (loop number, start, duration) of every complete loop
+            selected_loop = None
 
             # Handle multi-loop videos
             if content_duration > ref_duration * 1.5:
@@ -371,6 +576,9 @@ class BookendAligner(QObject):
 
                         logger.info(f"Loop {i+1}: {loop_start:.3f}s - {loop_end:.3f}s = {loop_duration:.3f}s (diff: {duration_diff:.3f}s)")
 
+                        if loop_duration >= ref_duration * MIN_LOOP_COVERAGE:
+                            loop_windows.append((i + 1, loop_start, loop_duration))
+
                         if duration_diff < best_duration_diff:
                             best_duration_diff = duration_diff
                             best_start_idx = i
@@ -383,6 +591,7 @@ class BookendAligner(QObject):
                     content_end_time = end_bookend['start_time'] - frame_buffer_time
                     content_duration = content_end_time - content_start_time
 
+                    selected_loop = best_start_idx + 1
                     logger.info(f"Selected loop {best_start_idx+1}: {content_start_time:.3f}s - {content_end_time:.3f}s = {content_duration:.3f}s")
                 else:
                     # Just use a single reference duration from the start
@@ -415,13 +624,33 @@ class BookendAligner(QObject):
                 # Explicitly log that we're skipping motion compensation
                 logger.info("Motion compensation is DISABLED in settings, skipping...")
             
-            # Create aligned videos without motion compensation
-            aligned_reference, aligned_captured = self._create_aligned_videos_by_bookends(
-                reference_path,
-                processed_captured_path,
-                content_start_time,
-                content_duration
-            )
+            # Measure the frame offset, keeping the configured one when the measurement is not trusted
+            offset_estimate = None
+            if self.offset_estimation:
+                self.status_update.emit("Estimating frame offset...")
+                offset_estimate = self._estimate_frame_offset(reference_path, processed_captured_path, content_start_time)
+            timing = self._content_start_timing(content_start_time, offset_estimate)
+
+            # Create aligned videos without motion compensation, or only describe the alignment
+            alignment = None
+            if self.virtual_alignment:
+                alignment = self._create_alignment_descriptor(
+                    reference_path,
+                    processed_captured_path,
+                    timing['start_time'],
+                    frame_offset=timing['frame_offset'],
+                    start_padding=timing['start_padding']
+                )
+                aligned_reference, aligned_captured = (reference_path, processed_captured_path) if alignment else (None, None)
+            else:
+                aligned_reference, aligned_captured = self._create_aligned_videos_by_bookends(
+                    reference_path,
+                    processed_captured_path,
+                    timing['start_time'],
+                    content_duration,
+                    frame_offset=timing['frame_offset'],
+                    start_padding=timing['start_padding']
+                )
 
             if not aligned_reference or not aligned_captured:
                 error_msg = "Failed to create aligned videos"
@@ -429,17 +658,46 @@ class BookendAligner(QObject):
                 self.error_occurred.emit(error_msg)
                 return None
 
+            # Pair frames individually so dropped and repeated frames do not shift the rest of the clip
+            capture_health = None
+            if self.frame_mapping:
+                self.status_update.emit("Mapping captured frames to reference frames...")
+                alignment, capture_health = self._map_aligned_frames(alignment, aligned_reference, aligned_captured)
+
+            # Align the remaining loops so every loop the capture paid for can be scored
+            loops = None
+            if self.multi_loop_analysis and len(loop_windows) > 1:
+                if not self.virtual_alignment or processed_captured_path != captured_path:
+                    logger.warning("Multi-loop analysis needs virtual alignment without motion compensation, " +
+                            "scoring the selected loop only")
+                else:
+                    self.status_update.emit(f"Aligning {len(loop_windows)} loops for multi-loop analysis...")
+                    loops = self._align_loops(reference_path, captured_path, loop_windows, selected_loop, alignment,
+                                              offset_estimate['confidence'] if offset_estimate else None)
+
+            archive = None
+            if self.archive_aligned_capture and alignment and alignment.get('mode') == 'virtual':
+                self.status_update.emit("Archiving aligned capture...")
+                archive = self._archive_aligned_capture(alignment)
+
             self.alignment_progress.emit(100)
             self.status_update.emit("White bookend alignment complete!")
 
-            # Prepare result object
+            # Prepare result object; without an estimate the start is unmeasured and has no confidence
+            captured_fps = cap_info.get('frame_rate', 30) or 30
             result = {
                 'alignment_method': 'bookend',
-                'offset_frames': 0,  # Not applicable for bookend method
-                'offset_seconds': 0, # Not applicable for bookend method
-                'confidence': 0.95,  # High confidence with bookend method
+                'offset_frames': timing['reported_offset'],
+                'offset_seconds': timing['reported_offset'] / captured_fps,
+                'offset_source': timing['source'],
+                'confidence': offset_estimate['confidence'] if offset_estimate else None,
+                'offset_estimate': offset_estimate,
                 'aligned_reference': aligned_reference,
                 'aligned_captured': aligned_captured,
+                'alignment': alignment,
+                'capture_health': capture_health,
+                'loops': loops,
+                'archive': archive,
                 'bookend_info': {
                     'first_bookend': first_bookend,
                     'last_bookend': last_bookend,
@@ -465,8 +723,547 @@ class BookendAligner(QObject):
 
 
 
-    def _create_aligned_videos_by_bookends(self, reference_path, captured_path, content_start_time, content_duration):
-        """Create aligned videos based on bookend content timing with improved naming"""
+    def align_fingerprint_videos(self, reference_path, captured_path, quiet=False):
+        """
+        Align videos by locating the reference content in the capture, without bookends
+
+        The reference frame hashes are cached by content. The capture is
+        hashed in one streaming pass at the reference frame rate, and only
+        until the start of the first complete loop is found and confirmed.
+
+        Args:
+            reference_path: Reference video
+            captured_path: Captured video
+            quiet: Only log failures instead of emitting error_occurred, for callers
+                that fall back to another alignment
+
+        Returns the same dictionary as align_bookend_videos, or None on failure
+        """
+        try:
+            self.status_update.emit("Starting content fingerprint alignment...")
+            logger.info("Starting content fingerprint alignment")
+
+            for path, label in ((reference_path, "Reference"), (captured_path, "Captured")):
+                if not os.path.exists(path):
+                    error_msg = f"{label} video file not found: {path}"
+                    self._report_error(error_msg, quiet)
+                    return None
+
+            ref_info = self._get_video_info(reference_path)
+            cap_info = self._get_video_info(captured_path)
+            if not ref_info or not cap_info:
+                error_msg = "Failed to get video information"
+                self._report_error(error_msg, quiet)
+                return None
+
+            ref_fps = ref_info.get('frame_rate', 30)
+            cap_fps = cap_info.get('frame_rate', 30)
+
+            self.status_update.emit("Indexing reference frames...")
+            self.alignment_progress.emit(10)
+            ref_hashes = reference_hashes(reference_path, ffmpeg_path=self._ffmpeg_path)
+            if ref_hashes is None or len(ref_hashes) == 0:
+                self._report_error("Failed to hash reference frames", quiet)
+                return None
+            index = FingerprintIndex(ref_hashes)
+
+            # Hash the capture at the reference frame rate, so positions are in reference frames
+            self.status_update.emit("Locating reference content in capture...")
+            self.alignment_progress.emit(30)
+            same_rate = abs(ref_fps - cap_fps) <= 0.001
+            match = locate_reference(index, stream_perceptual_hashes(
+                captured_path, fps=None if same_rate else ref_fps, ffmpeg_path=self._ffmpeg_path))
+            if match is None:
+                error_msg = "Reference content was not found in the captured video"
+                self._report_error(error_msg, quiet)
+                return None
+
+            content_start_time = match['start_frame'] / (cap_fps if same_rate else ref_fps)
+            content_duration = ref_info.get('duration', 0)
+            confidence = max(0.0, 1.0 - match['distance'] / 32)  # Unrelated frames differ in about 32 of 64 bits
+            logger.info(f"Reference starts at captured frame {match['start_frame']} ({content_start_time:.3f}s), " +
+                    f"mean hash distance {match['distance']:.2f} bits, {match['frames_hashed']} frames hashed")
+
+            self.alignment_progress.emit(50)
+            self.status_update.emit("Creating aligned videos...")
+
+            # The match is frame exact: no start padding and no frame offset
+            alignment = None
+            if self.virtual_alignment:
+                alignment = self._create_alignment_descriptor(
+                    reference_path, captured_path,
+                    content_start_time,
+                    frame_offset=0,
+                    start_padding=0
+                )
+                aligned_reference, aligned_captured = (reference_path, captured_path) if alignment else (None, None)
+            else:
+                aligned_reference, aligned_captured = self._create_aligned_videos_by_bookends(
+                    reference_path, captured_path,
+                    content_start_time,
+                    content_duration,
+                    frame_offset=0,
+                    start_padding=0
+                )
+
+            if not aligned_reference or not aligned_captured:
+                error_msg = "Failed to create aligned videos"
+                self._report_error(error_msg, quiet)
+                return None
+
+            capture_health = None
+            if self.frame_mapping:
+                self.status_update.emit("Mapping captured frames to reference frames...")
+                alignment, capture_health = self._map_aligned_frames(alignment, aligned_reference, aligned_captured)
+
+            archive = None
+            if self.archive_aligned_capture and alignment and alignment.get('mode') == 'virtual':
+                self.status_update.emit("Archiving aligned capture...")
+                archive = self._archive_aligned_capture(alignment)
+
+            self.alignment_progress.emit(100)
+            self.status_update.emit("Content fingerprint alignment complete!")
+
+            result = {
+                'alignment_method': 'fingerprint',
+                'offset_frames': match['start_frame'],
+                'offset_seconds': content_start_time,
+                'confidence': confidence,
+                'aligned_reference': aligned_reference,
+                'aligned_captured': aligned_captured,
+                'alignment': alignment,
+                'capture_health': capture_health,
+                'archive': archive,
+                'fingerprint_info': dict(match, content_duration=content_duration)
+            }
+
+            self.alignment_complete.emit(result)
+            return result
+
+        except Exception as e:
+            error_msg = f"Error in content fingerprint alignment: {str(e)}"
+            import traceback
+            logger.error(traceback.format_exc())
+            self._report_error(error_msg, quiet)
+            return None
+
+    def _report_error(self, error_msg, quiet=False):
+        """Log an alignment error and, unless quiet, pass it on to the UI"""
+        logger.error(error_msg)
+        if not quiet:
+            self.error_occurred.emit(error_msg)
+
+    def _archive_aligned_capture(self, alignment):
+        """
+        Export the captured frames of a virtual alignment as a clip kept with the test
+
+        Only the partial GOP before the first keyframe is re-encoded; the rest
+        is stream-copied, so the archive keeps the capture's quality and takes
+        I/O time rather than encode time. Frame 0 of the archive is the
+        descriptor's captured start frame.
+
+        Returns:
+            Dict with path, method, reencoded_frames, copied_frames and alignment
+            (the descriptor rewritten to read the archive), or None on error
+        """
+        try:
+            start = time.time()
+            captured_path = alignment['captured_path']
+            cap_info = self._get_video_info(captured_path)
+            if not cap_info:
+                logger.error("Could not read capture info for the archive")
+                return None
+
+            # Captured frames the descriptor reads, counted from its start frame
+            frame_mapping = alignment.get('frame_mapping')
+            if frame_mapping and frame_mapping['captured_ranges']:
+                frame_count = frame_mapping['captured_ranges'][-1][1] + 1
+            else:
+                frame_count = alignment['frame_count']
+            if abs(alignment['captured_fps'] - alignment['reference_fps']) > 0.001:
+                frame_count = int(math.ceil(frame_count * alignment['captured_fps'] / alignment['reference_fps'])) + 1
+
+            base_name, extension = os.path.splitext(os.path.basename(captured_path))
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = os.path.join(os.path.dirname(captured_path), f"{base_name}_{timestamp}_archive{extension}")
+
+            archive = smart_cut_export(
+                captured_path,
+                alignment['captured_start_frame'],
+                frame_count,
+                alignment['captured_fps'],
+                cap_info.get('codec_name'),
+                output_path,
+                ffmpeg_path=self._ffmpeg_path
+            )
+            if archive is None:
+                logger.warning("Archiving the aligned capture failed")
+                return None
+
+            archive['alignment'] = dict(alignment, captured_path=output_path, captured_start_frame=0,
+                                        captured_start_time=0.0)
+            logger.info(f"Archived aligned capture to {output_path} ({archive['method']}, " +
+                    f"{archive['reencoded_frames']} frames re-encoded) in {time.time() - start:.2f}s")
+            return archive
+
+        except Exception as e:
+            logger.error(f"Error archiving aligned capture: {str(e)}")
+            return None
+
+    def _map_aligned_frames(self, alignment, aligned_reference, aligned_captured):
+        """
+        Match captured frames to reference frames and compare only matched pairs
+
+        Works on the alignment descriptor when the alignment is virtual. For
+        encoded aligned files a descriptor over those files is created, but
+        only if the mapping found drops or duplicates to skip.
+
+        Returns:
+            (alignment, capture_health): the descriptor to analyze with (None
+            to compare the aligned files as they are) and the drop/duplicate
+            counts and events, or None if mapping failed
+        """
+        try:
+            start = time.time()
+            descriptor = alignment
+            if descriptor is None:
+                ref_info = self._get_video_info(aligned_reference)
+                if not ref_info or not ref_info.get('frame_count'):
+                    logger.warning("Could not read aligned reference info for frame mapping")
+                    return alignment, None
+                descriptor = make_alignment_descriptor(
+                    aligned_reference, aligned_captured, 0, ref_info['frame_count'],
+                    ref_info.get('frame_rate', 30), ref_info.get('frame_rate', 30))
+
+            ref_fps = descriptor['reference_fps']
+            cap_fps = descriptor['captured_fps']
+            frame_count = descriptor['frame_count']
+            start_frame = descriptor['captured_start_frame']
+            band = self.frame_mapping_band
+
+            # With matching frame rates, also look before the nominal start and use the packet timestamps
+            same_rate = abs(ref_fps - cap_fps) <= 0.001
+            lead = min(band, start_frame) if same_rate else 0
+            if same_rate:
+                seek_time = (start_frame - lead - 0.5) / cap_fps if start_frame > lead else 0.0
+            else:
+                seek_time = descriptor['captured_start_time']
+
+            reference = scan_thumbnails(descriptor['reference_path'], max_frames=frame_count,
+                                        ffmpeg_path=self._ffmpeg_path)
+            captured = scan_thumbnails(descriptor['captured_path'], start_time=seek_time,
+                                       max_frames=lead + frame_count + band,
+                                       fps=None if same_rate else ref_fps, ffmpeg_path=self._ffmpeg_path)
+            if reference is None or captured is None:
+                return alignment, None
+
+            drop_hint = duplicate_hint = None
+            if same_rate:
+                drop_hint, duplicate_hint = packet_hints(
+                    read_packet_table(descriptor['captured_path']), start_frame - lead, len(captured), cap_fps)
+
+            mapping = map_frames(reference, captured, lead=lead, band=band,
+                                 drop_hint=drop_hint, duplicate_hint=duplicate_hint)
+            if mapping is None:
+                logger.warning("Frame mapping failed, comparing frames in step")
+                return alignment, None
+
+            ranges = mapping_ranges(mapping, lead)
+            capture_health = {
+                'dropped_frames': mapping['dropped_frames'],
+                'duplicated_frames': mapping['duplicated_frames'],
+                'events': mapping['events'],
+                'compared_frames': ranges['pair_count'],
+                'start_shift': ranges['captured_offset'],
+                'mean_distance': mapping['mean_distance']
+            }
+            logger.info(f"Frame mapping: {mapping['dropped_frames']} dropped, {mapping['duplicated_frames']} " +
+                    f"duplicated, start shifted {ranges['captured_offset']} frames, " +
+                    f"{ranges['pair_count']} pairs in {time.time() - start:.2f}s")
+
+            if not mapping['events'] and ranges['captured_offset'] == 0 and alignment is None:
+                return None, capture_health
+
+            if same_rate:
+                captured_ranges = ranges['captured_ranges']
+                captured_shift = ranges['captured_offset']
+            else:
+                # The capture window started at the nominal start, so rows are counted from there
+                captured_ranges = [[first + ranges['captured_offset'], last + ranges['captured_offset']]
+                                   for first, last in ranges['captured_ranges']]
+                captured_shift = 0
+
+            apply_frame_mapping(descriptor, ranges['reference_ranges'], captured_ranges,
+                                ranges['pair_count'], captured_shift=captured_shift)
+            descriptor['capture_health'] = capture_health
+            return descriptor, capture_health
+
+        except Exception as e:
+            logger.error(f"Error mapping captured frames: {str(e)}")
+            return alignment, None
+
+    def _align_loop(self, reference_path, captured_path, content_start_time):
+        """
+        Describe the alignment of one loop, measuring its own frame offset and frame mapping
+
+        Returns:
+            (alignment, offset_estimate), alignment None on error
+        """
+        offset_estimate = None
+        if self.offset_estimation:
+            offset_estimate = self._estimate_frame_offset(reference_path, captured_path, content_start_time)
+        timing = self._content_start_timing(content_start_time, offset_estimate)
+
+        alignment = self._create_alignment_descriptor(reference_path, captured_path, timing['start_time'],
+                                                      frame_offset=timing['frame_offset'],
+                                                      start_padding=timing['start_padding'])
+        if alignment and self.frame_mapping:
+            alignment, _ = self._map_aligned_frames(alignment, reference_path, captured_path)
+        return alignment, offset_estimate
+
+    def _align_loops(self, reference_path, captured_path, loop_windows, selected_loop, selected_alignment,
+                     selected_confidence=None):
+        """
+        Align every complete loop between consecutive bookends
+
+        The selected loop keeps the alignment already made for it; the others
+        are aligned concurrently, each in its own FFmpeg scans.
+
+        Returns:
+            List of dicts with loop, start_time, duration, selected, confidence and
+            alignment, in capture order, or None if fewer than two loops aligned
+        """
+        start = time.time()
+        loops = []
+        pending = []
+        for loop_number, loop_start, loop_duration in loop_windows:
+            entry = {
+                'loop': loop_number,
+                'start_time': loop_start,
+                'duration': loop_duration,
+                'selected': loop_number == selected_loop,
+                'confidence': selected_confidence if loop_number == selected_loop else None,
+                'alignment': selected_alignment if loop_number == selected_loop else None
+            }
+            loops.append(entry)
+            if not entry['selected']:
+                pending.append(entry)
+
+        workers = min(len(pending), os.cpu_count() or 1)
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [(entry, executor.submit(self._align_loop, reference_path, captured_path,
+                                                   entry['start_time']))
+                           for entry in pending]
+                for entry, future in futures:
+                    try:
+                        entry['alignment'], estimate = future.result()
+                        entry['confidence'] = estimate['confidence'] if estimate else None
+                    except Exception as e:
+                        logger.error(f"Error aligning loop {entry['loop']}: {e}")
+
+        loops = [entry for entry in loops if entry['alignment']]
+        logger.info(f"Aligned {len(loops)} of {len(loop_windows)} loops in {time.time() - start:.2f}s")
+        return loops if len(loops) > 1 else None
+
+    def _configured_frame_offset(self):
+        """Frame offset applied to the captured start time, from the options manager when available"""
+        frame_offset = 6  # Default value if not configured
+        
+        # Check if options_manager is directly available
+        if hasattr(self, 'options_manager') and self.options_manager:
+            try:
+                frame_offset = self.options_manager.get_setting("bookend", "frame_offset")
+                logger.info(f"Using frame offset from options_manager: {frame_offset}")
+            except Exception as e:
+                logger.warning(f"Error getting frame_offset from options_manager: {e}")
+
+        return frame_offset
+
+    def _content_start_timing(self, content_start_time, offset_estimate):
+        """
+        Where the aligned capture starts, from the offset estimate or the configured fallback
+
+        A trusted estimate gives the exact captured start, which replaces both
+        the start padding and the configured frame offset. Otherwise the
+        bookend timing is used as before: the padding past the first bookend
+        and then the configured frame offset.
+
+        Returns:
+            Dict with start_time, start_padding and frame_offset for the aligned-file
+            creators, reported_offset (frames relative to the padded bookend timing)
+            and source ("estimated" or "configured")
+        """
+        if offset_estimate and offset_estimate['confidence'] >= self.offset_min_confidence:
+            logger.info(f"Aligned capture starts at the estimated {offset_estimate['start_time']:.3f}s " +
+                    f"(confidence {offset_estimate['confidence']:.2f})")
+            return {
+                'start_time': offset_estimate['start_time'],
+                'start_padding': 0,
+                'frame_offset': 0,
+                'reported_offset': offset_estimate['frame_offset'],
+                'source': 'estimated'
+            }
+
+        frame_offset = self._configured_frame_offset()
+        if offset_estimate:
+            logger.warning(f"Offset estimate has low confidence ({offset_estimate['confidence']:.2f}), " +
+                    f"using the configured frame offset {frame_offset}")
+        else:
+            logger.warning(f"No frame offset estimate, using the configured frame offset {frame_offset} and " +
+                    f"{CONTENT_START_PADDING}s start padding; the start is not measured")
+        return {
+            'start_time': content_start_time,
+            'start_padding': CONTENT_START_PADDING,
+            'frame_offset': frame_offset,
+            'reported_offset': frame_offset,
+            'source': 'configured'
+        }
+
+    def _estimate_frame_offset(self, reference_path, captured_path, content_start_time):
+        """
+        Measure the frame offset by cross-correlating per-frame signatures
+
+        The start of the reference is compared with the capture around the
+        position the bookend timing predicts, searching offset_search_frames
+        either way. The result replaces the configured frame offset and the
+        fixed start padding as the source of the exact start frame.
+
+        Returns:
+            Dict with frame_offset (captured frames, same sign as the bookend
+            frame_offset setting, relative to the padded bookend timing),
+            offset_seconds, start_time (capture time of the frame matching the
+            first reference frame), confidence, correlation, margin and the
+            searched correlation curve, or None on error
+        """
+        try:
+            start = time.time()
+            ref_info = self._get_video_info(reference_path)
+            cap_info = self._get_video_info(captured_path)
+            if not ref_info or not cap_info:
+                logger.error("Could not read video info for offset estimation")
+                return None
+
+            ref_fps = ref_info.get('frame_rate', 30)
+            cap_fps = cap_info.get('frame_rate', 30)
+            window_frames = min(ref_info.get('frame_count', 0) or self.offset_signature_frames,
+                                self.offset_signature_frames)
+            search_frames = self.offset_search_frames
+
+            reference_signature = scan_frame_signatures(
+                reference_path, max_frames=window_frames, ffmpeg_path=self._ffmpeg_path)
+            if reference_signature is None:
+                return None
+
+            # Nominal first captured frame, rounded like the alignment itself (ties go earlier)
+            nominal_start = content_start_time + CONTENT_START_PADDING
+            same_rate = abs(ref_fps - cap_fps) <= 0.001
+            if same_rate:
+                nominal_frame = int(math.ceil(nominal_start * cap_fps - 0.5 - 1e-6))
+                lead_frames = min(search_frames, nominal_frame)
+                seek_time = (nominal_frame - lead_frames - 0.5) / cap_fps if nominal_frame > lead_frames else 0.0
+            else:
+                lead_frames = min(search_frames, int(nominal_start * ref_fps))
+                seek_time = nominal_start - lead_frames / ref_fps
+
+            captured_signature = scan_frame_signatures(
+                captured_path,
+                start_time=seek_time,
+                max_frames=lead_frames + len(reference_signature) + search_frames,
+                fps=None if same_rate else ref_fps,
+                ffmpeg_path=self._ffmpeg_path
+            )
+            if captured_signature is None:
+                return None
+
+            estimate = estimate_offset(reference_signature, captured_signature, lead_frames)
+            if estimate is None:
+                logger.warning("Reference signature is flat, cannot estimate the frame offset")
+                return None
+
+            # A match later in the capture means a negative frame offset (the offset moves the start earlier)
+            frame_offset = -estimate['offset_frames']
+            if same_rate:
+                estimate['start_time'] = (nominal_frame + estimate['offset_frames']) / cap_fps
+            else:
+                frame_offset = frame_offset * cap_fps / ref_fps
+                estimate['start_time'] = max(0.0, nominal_start + estimate['offset_frames'] / ref_fps)
+            estimate['frame_offset'] = frame_offset
+            estimate['offset_seconds'] = frame_offset / cap_fps
+
+            logger.info(f"Estimated frame offset: {frame_offset} frames ({estimate['offset_seconds']:.3f}s), " +
+                    f"correlation {estimate['correlation']:.3f}, margin {estimate['margin']:.3f}, " +
+                    f"confidence {estimate['confidence']:.2f} in {time.time() - start:.2f}s")
+            return estimate
+
+        except Exception as e:
+            logger.error(f"Error estimating frame offset: {str(e)}")
+            return None
+
+    def _create_alignment_descriptor(self, reference_path, captured_path, content_start_time, frame_offset=None,
+                                     start_padding=CONTENT_START_PADDING):
+        """
+        Describe the bookend alignment instead of writing aligned copies
+
+        Uses the same start time, frame offset and reference frame count as
+        _create_aligned_videos_by_bookends, but leaves both files untouched;
+        the VMAF analyzer applies the descriptor as trim/setpts/fps filters
+        while reading the originals.
+
+        Args:
+            content_start_time: End of the first bookend, or the exact content start with start_padding=0
+            frame_offset: Captured frames to move the start earlier by (None = configured offset)
+            start_padding: Seconds skipped past content_start_time before the offset is applied
+
+        Returns:
+            Alignment descriptor dict, or None on error
+        """
+        try:
+            ref_info = self._get_video_info(reference_path)
+            cap_info = self._get_video_info(captured_path)
+            if not ref_info or not cap_info:
+                logger.error("Could not read video info for the alignment descriptor")
+                return None
+
+            ref_fps = ref_info.get('frame_rate', 30)
+            cap_fps = cap_info.get('frame_rate', 30)
+            ref_frame_count = ref_info.get('frame_count', 0)
+            if not ref_frame_count:
+                logger.error("Reference frame count is unknown, cannot describe the alignment")
+                return None
+
+            if frame_offset is None:
+                frame_offset = self._configured_frame_offset()
+            offset_time = frame_offset / cap_fps
+
+            # Same timing as the encoded path: skip the padding past the bookend, then apply the offset
+            adjusted_start = content_start_time + start_padding
+            descriptor = make_alignment_descriptor(
+                reference_path, captured_path,
+                captured_start_time=adjusted_start - offset_time,
+                frame_count=ref_frame_count,
+                captured_fps=cap_fps,
+                reference_fps=ref_fps,
+                frame_offset=frame_offset
+            )
+
+            logger.info(f"Virtual alignment: captured frames from {descriptor['captured_start_frame']} " +
+                    f"({descriptor['captured_start_time']:.3f}s), {ref_frame_count} frames, " +
+                    f"{cap_fps}fps -> {ref_fps}fps")
+            return descriptor
+
+        except Exception as e:
+            logger.error(f"Error creating alignment descriptor: {str(e)}")
+            return None
+
+    def _create_aligned_videos_by_bookends(self, reference_path, captured_path, content_start_time, content_duration,
+                                           frame_offset=None, start_padding=CONTENT_START_PADDING):
+        """
+        Create aligned videos based on bookend content timing with improved naming
+
+        start_padding is skipped past content_start_time before the frame offset
+        is applied; 0 when content_start_time is already the exact content start.
+        """
         try:
             # Get frame rates and counts to ensure we preserve them
             ref_info = self._get_video_info(reference_path)
@@ -522,132 +1319,78 @@ class BookendAligner(QObject):
             if "_motion_comp" in cap_base:
                 cap_base = cap_base.replace("_motion_comp", "")
 
-            # Create output paths
-            aligned_reference = os.path.join(output_dir, f"{ref_base}_{timestamp}_aligned.mp4")
-            aligned_captured = os.path.join(output_dir, f"{cap_base}_{timestamp}_aligned.mp4")
-
-            # Trim reference video - use the whole reference with high quality settings
-            ref_cmd = [
-                "ffmpeg", "-y", "-i", reference_path,
-                "-r", str(ref_fps),  # Preserve original frame rate
-                "-c:v", "libx264", "-crf", "23", 
-                "-preset", "fast", "-c:a", "copy",
-                aligned_reference
-            ]
-
-            logger.info(f"Creating aligned reference video: {aligned_reference}")
-            subprocess.run(ref_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # Create output paths; the container follows the intermediate profile
+            aligned_reference = intermediate_path(output_dir, f"{ref_base}_{timestamp}_aligned", self.intermediate_profile)
+            aligned_captured = intermediate_path(output_dir, f"{cap_base}_{timestamp}_aligned", self.intermediate_profile)
+            codec_args = intermediate_output_args(self.intermediate_profile)
+            logger.info(f"Writing aligned videos with intermediate profile: {self.intermediate_profile}")
 
-            # Ensure exact reference frame count for perfect alignment
-            ref_aligned_info = self._get_video_info(aligned_reference)
-            exact_ref_frames = ref_aligned_info.get('frame_count', ref_frame_count)
-            logger.info(f"Exact reference frame count: {exact_ref_frames}")
-            
             # Calculate exact duration for frame matching
-            frame_duration = exact_ref_frames / ref_fps if ref_fps > 0 else content_duration
+            frame_duration = ref_frame_count / ref_fps if ref_fps > 0 else content_duration
             
-            # Get frame offset from options manager
-            frame_offset = 6  # Default value if not configured
-            
-            # Check if options_manager is directly available
-            if hasattr(self, 'options_manager') and self.options_manager:
-                try:
-                    frame_offset = self.options_manager.get_setting("bookend", "frame_offset")
-                    logger.info(f"Using frame offset from options_manager: {frame_offset}")
-                except Exception as e:
-                    logger.warning(f"Error getting frame_offset from options_manager: {e}")
+            if frame_offset is None:
+                frame_offset = self._configured_frame_offset()
             
             # Calculate the offset time based on frame rate
             offset_time = frame_offset / cap_fps
             logger.info(f"Applied frame offset: {frame_offset} frames ({offset_time:.6f}s) at {cap_fps} fps")
             
             # Adjust start time to skip white frames at the beginning
-            # The 0.2 second adjustment is to ensure we start after any white frames
-            adjusted_start = content_start_time + 0.2
+            # The padding is to ensure we start after any white frames
+            adjusted_start = content_start_time + start_padding
             
             logger.info(f"Adjusting content timing: original={content_start_time:.3f}s, adjusted={adjusted_start:.3f}s")
             logger.info(f"Content duration: {content_duration:.3f}s, frame-based duration: {frame_duration:.3f}s")
 
-            # Trim captured video with precise frame count control
-            if adjusted_start > 0 or "motion_comp" not in captured_path:
-                cap_cmd = [
-                    "ffmpeg", "-y",
-                    "-itsoffset", str(offset_time),  # Offset to align with reference
-                    "-i", captured_path,
-                    "-ss", str(adjusted_start),
-                    "-c:v", "libx264", "-crf", "23",
-                    "-preset", "fast", 
-                    "-r", str(ref_fps),  # Use reference frame rate instead of capture frame rate
-                    "-frames:v", str(exact_ref_frames),  # Force exact frame count match
-                    aligned_captured
-                ]
-                
-                logger.info(f"Creating aligned captured video from {adjusted_start:.3f}s with exact {exact_ref_frames} frames")
-                logger.info(f"Aligning captured video to reference frame rate: {ref_fps}fps")
-            else:
-                # Motion compensated clip needs different handling
-                cap_cmd = [
-                    "ffmpeg", "-y", 
-                    "-i", captured_path,
-                    "-c:v", "libx264", "-crf", "23",
-                    "-preset", "fast",
-                    "-r", str(ref_fps),  # Use reference frame rate
-                    "-frames:v", str(exact_ref_frames),  # Force exact frame count match
-                    aligned_captured
-                ]
-                
-                logger.info(f"Using motion-compensated clip with forced {exact_ref_frames} frames")
-            
-            # Run the alignment command
-            subprocess.run(cap_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # Encode the reference and the capture concurrently; the capture is cut to the reference's
+            # frame count from the container, checked against the encoded reference afterwards
+            target_frames = ref_frame_count
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                reference_job = executor.submit(self._prepare_reference, reference_path, ref_info,
+                                                aligned_reference, codec_args)
+                capture_job = executor.submit(self._encode_aligned_capture, captured_path, cap_fps, ref_fps,
+                                              adjusted_start - offset_time, target_frames, codec_args,
+                                              aligned_captured)
+                aligned_reference, exact_ref_frames, _ = reference_job.result()
+                cap_frames = capture_job.result()
+            logger.info(f"Exact reference frame count: {exact_ref_frames}")
 
             # Verify aligned videos
-            if not os.path.exists(aligned_reference) or not os.path.exists(aligned_captured):
+            if cap_frames is None or not os.path.exists(aligned_reference) or not os.path.exists(aligned_captured):
                 logger.error("Failed to create aligned videos")
                 return None, None
 
-            # Verify frame counts match exactly
-            ref_aligned_info = self._get_video_info(aligned_reference)
-            cap_aligned_info = self._get_video_info(aligned_captured)
+            # Verify frame counts match exactly; both counts come from the encoders' progress output
+            ref_frames = exact_ref_frames
+            logger.info(f"Final frame counts: reference={ref_frames}, captured={cap_frames}")
 
-            if ref_aligned_info and cap_aligned_info:
-                ref_frames = ref_aligned_info.get('frame_count', 0)
-                cap_frames = cap_aligned_info.get('frame_count', 0)
-                
-                logger.info(f"Final frame counts: reference={ref_frames}, captured={cap_frames}")
-                
-                if ref_frames != cap_frames:
-                    logger.warning(f"Frame count mismatch: reference={ref_frames}, captured={cap_frames}")
-                    
-                    # If still mismatched, try one more fix to ensure exact frame count
-                    if cap_frames != ref_frames:
-                        logger.info("Attempting final frame count correction...")
-                        
-                        # One more try with direct frame extraction
-                        final_fix_cmd = [
-                            "ffmpeg", "-y",
-                            "-i", aligned_captured,
-                            "-vf", f"select=1:n={ref_frames}",  # Select exact number of frames
-                            "-vsync", "0",  # Do not duplicate/drop frames
-                            "-c:v", "libx264", "-crf", "23",
-                            "-preset", "fast",
-                            f"{aligned_captured}.fixed.mp4"
-                        ]
-                        
-                        try:
-                            subprocess.run(final_fix_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                            
-                            # If successful, replace the original
-                            if os.path.exists(f"{aligned_captured}.fixed.mp4"):
-                                os.replace(f"{aligned_captured}.fixed.mp4", aligned_captured)
-                                logger.info("Frame count correction applied successfully")
-                        except Exception as e:
-                            logger.warning(f"Final frame count correction failed: {e}")
-            else:
-                logger.warning("Could not verify aligned video info")
+            if ref_frames != cap_frames:
+                logger.warning(f"Frame count mismatch: reference={ref_frames}, captured={cap_frames}")
+
+                # If still mismatched, try one more fix to ensure exact frame count
+                logger.info("Attempting final frame count correction...")
+
+                # One more try with direct frame extraction
+                aligned_base, aligned_ext = os.path.splitext(aligned_captured)
+                fixed_path = f"{aligned_base}.fixed{aligned_ext}"
+                final_fix_cmd = [
+                    "ffmpeg", "-y",
+                    "-i", aligned_captured,
+                    "-vf", f"select=1:n={ref_frames}",  # Select exact number of frames
+                    "-vsync", "0",  # Do not duplicate/drop frames
+                    *codec_args,
+                    fixed_path
+                ]
+
+                if run_ffmpeg_job(final_fix_cmd) is not None and os.path.exists(fixed_path):
+                    # If successful, replace the original
+                    os.replace(fixed_path, aligned_captured)
+                    logger.info("Frame count correction applied successfully")
+                else:
+                    logger.warning("Final frame count correction failed")
 
             # Delete temporary motion-compensated file if it exists
-            if "_motion_comp.mp4" in captured_path and os.path.exists(captured_path):
+            if "_motion_comp" in os.path.basename(captured_path) and os.path.exists(captured_path):
                 try:
                     os.remove(captured_path)
                     logger.info(f"Deleted temporary motion-compensated file: {captured_path}")
@@ -677,6 +1420,93 @@ class BookendAligner(QObject):
 
 
 
+    def _prepare_reference(self, reference_path, ref_info, output_path, codec_args):
+        """
+        Re-encode the reference at its own frame rate with the intermediate profile
+
+        Prepared references are kept in the reference cache, keyed by the
+        reference content, frame rate, pixel format and intermediate profile.
+        A repeat reference is served from the cache without encoding or probing,
+        as a link at output_path that the cache's eviction leaves alone.
+
+        Returns:
+            (prepared_path, exact_frame_count, prepared_video_info)
+        """
+        ref_fps = ref_info.get('frame_rate', 30)
+        cache_key = None
+        try:
+            cache_key = self.reference_cache.make_key(
+                reference_path, ref_fps, ref_info.get('pix_fmt'), self.intermediate_profile)
+        except OSError as e:
+            logger.warning(f"Could not fingerprint reference for the cache: {e}")
+
+        if cache_key and self.reference_cache.enabled:
+            cached = self.reference_cache.lookup(cache_key, link_path=output_path)
+            if cached:
+                logger.info(f"Using cached prepared reference for: {output_path}")
+                return cached['path'], cached['frame_count'], cached['video_info']
+
+        # The whole reference at its own frame rate, encoded as parallel chunks
+        logger.info(f"Creating aligned reference video: {output_path}")
+        exact_frames = encode_frames_parallel(
+            reference_path, 0, ref_info.get('frame_count', 0), ref_fps, codec_args, output_path,
+            workers=self.encode_workers or None, keyframes=self._keyframe_indices(reference_path),
+            ffmpeg_path=self._ffmpeg_path, to_end=True)
+        if exact_frames is None:
+            raise RuntimeError(f"Encoding the reference failed: {reference_path}")
+
+        # The encoder counted the frames, so the prepared reference is described without probing it
+        prepared_info = dict(ref_info, path=output_path, frame_count=exact_frames, total_frames=exact_frames,
+                             duration=exact_frames / ref_fps if ref_fps else ref_info.get('duration', 0))
+        prepared_info.pop('codec_name', None)
+
+        if cache_key and self.reference_cache.enabled:
+            cached_path = self.reference_cache.store(
+                cache_key, output_path, exact_frames, prepared_info, source_path=reference_path)
+            if cached_path:
+                logger.info(f"Stored prepared reference in cache: {cached_path}")
+
+        return output_path, exact_frames, prepared_info
+
+    def _encode_aligned_capture(self, captured_path, cap_fps, ref_fps, start_time, frame_count, codec_args,
+                                output_path):
+        """
+        Encode the aligned section of the capture at the reference frame rate
+
+        At matching frame rates the section is cut at its start frame and
+        encoded as parallel chunks split at the capture's keyframes; otherwise
+        one FFmpeg process converts the frame rate.
+
+        Returns:
+            Number of frames written, or None on error
+        """
+        if abs(cap_fps - ref_fps) <= 0.001:
+            # Same rounding as the virtual alignment: nearest frame, halfway ties go earlier
+            start_frame = max(0, int(math.ceil(start_time * cap_fps - 0.5 - 1e-6)))
+            logger.info(f"Creating aligned captured video from frame {start_frame} with exact {frame_count} frames")
+            return encode_frames_parallel(
+                captured_path, start_frame, frame_count, cap_fps, codec_args, output_path,
+                workers=self.encode_workers or None, keyframes=self._keyframe_indices(captured_path),
+                ffmpeg_path=self._ffmpeg_path)
+
+        cap_cmd = [
+            "ffmpeg", "-y",
+            "-i", captured_path,
+            "-ss", str(max(0.0, start_time)),
+            *codec_args,
+            "-r", str(ref_fps),  # Use reference frame rate instead of capture frame rate
+            "-frames:v", str(frame_count),  # Force exact frame count match
+            output_path
+        ]
+        logger.info(f"Creating aligned captured video from {start_time:.3f}s with exact {frame_count} frames")
+        logger.info(f"Aligning captured video to reference frame rate: {ref_fps}fps")
+        return run_ffmpeg_job(cap_cmd)
+
+    def _keyframe_indices(self, video_path):
+        """Keyframe frame indices from the packet table, or None if it cannot be read"""
+        packet_table = read_packet_table(video_path)
+        return packet_table.keyframe_indices if packet_table is not None else None
+
     def _get_video_info(self, video_path):
         """Get detailed information about a video file using FFprobe"""
         try:
@@ -745,6 +1575,7 @@ class BookendAligner(QObject):
                 'height': height,
                 'frame_count': frame_count,
                 'pix_fmt': pix_fmt,
+                'codec_name': video_stream.get('codec_name'),
                 'total_frames': frame_count
             }
 
@@ -752,346 +1583,429 @@ class BookendAligner(QObject):
             logger.error(f"Error getting video info for {video_path}: {str(e)}")
             return None 
 
-    def _detect_white_bookends(self, video_path):
+    def _profile_settings(self):
+        """Decoder settings that determine the luma profile, used as part of the cache key"""
+        return {
+            "backend": self.stats_backend,
+            "white_level": LUMA_WHITE_LEVEL,
+            "width": FFMPEG_PROFILE_WIDTH,
+            "height": FFMPEG_PROFILE_HEIGHT
+        }
+
+    def _load_cached_profile(self, video_path, kind, settings=None):
+        """Return the cached luma profile of the given kind, or None"""
+        if not self.profile_cache:
+            return None
+
+        profile = self.luma_cache.load(video_path, kind, settings or self._profile_settings())
+        if profile is not None:
+            logger.info(f"Using cached {kind} luma profile for {os.path.basename(video_path)}")
+        return profile
+
+    def _load_live_profile(self, video_path, frame_count):
         """
-        Performance-optimized white bookend detection that maintains accuracy
-        while significantly reducing processing time
+        Return the luma profile recorded from the capture's side stream, or None
+
+        The side stream is taken before encoding, so it is only trusted when its
+        frame count matches the capture file.
         """
-        try:
-            bookends = []
-            cap = cv2.VideoCapture(video_path)
+        profile = self._load_cached_profile(video_path, "live", LIVE_PROFILE_SETTINGS)
+        if profile is None:
+            return None
+
+        if frame_count and abs(profile.frame_count - frame_count) > 1:
+            logger.info(f"Live luma profile has {profile.frame_count} frames but the capture has {frame_count}, ignoring it")
+            return None
+        return profile
+
+    def _cached_profile(self, video_path, kind, scan):
+        """Return the cached luma profile of the given kind, running scan() and caching its result on a miss"""
+        profile = self._load_cached_profile(video_path, kind)
+        if profile is not None:
+            return profile
+
+        profile = scan()
+        if profile is not None and self.profile_cache:
+            self.luma_cache.store(video_path, kind, profile, self._profile_settings())
+        return profile
+
+    def _scan_full_profile(self, video_path, fps, frame_count):
+        """Scan every frame, splitting the capture into keyframe-aligned chunks when several workers are allowed"""
+        workers = self.detection_workers or os.cpu_count() or 1
+        if self.stats_backend == "ffmpeg" and fps and frame_count and workers > 1:
+            packet_table = read_packet_table(video_path)
+            keyframes = packet_table.keyframe_indices if packet_table is not None else None
+
+            profile = scan_luma_profile_parallel(
+                video_path, fps, frame_count,
+                workers=workers,
+                ffmpeg_path=self._ffmpeg_path,
+                keyframes=keyframes
+            )
+            if profile is not None:
+                return profile
+            logger.warning("Parallel luma scan failed, falling back to a single scan")
+
+        return scan_luma_profile(
+            video_path,
+            fps=fps,
+            backend=self.stats_backend,
+            ffmpeg_path=self._ffmpeg_path
+        )
+
+    def _min_bookend_frames(self, fps):
+        """Minimum number of consecutive white frames that make a bookend"""
+        return min_bookend_frames(fps)
+
+    def _scan_prefiltered_profile(self, video_path, fps):
+        """
+        Decode only short windows around bookend candidates found in the packet table
+
+        Returns a sparse LumaProfile, or None when the prefilter finds nothing plausible
+        """
+        packet_table = read_packet_table(video_path)
+        if packet_table is None:
+            return None
+
+        frame_count = len(packet_table)
+        min_white_frames = self._min_bookend_frames(fps)
 
-            if not cap.isOpened():
-                logger.error(f"Could not open video: {video_path}")
+        # The first white frame after content can still be a large packet, so allow a shorter run
+        runs = find_small_packet_runs(packet_table, min_run=max(2, min_white_frames // 2))
+        if len(runs) < 2:
+            logger.info(f"Packet prefilter found {len(runs)} bookend candidates, using full scan")
+            return None
+
+        # Pad each candidate by one GOP so the whole bookend falls inside its window
+        windows = candidate_windows(runs, frame_count, padding=int(math.ceil(fps)))
+        window_frames = sum(end - start + 1 for start, end in windows)
+        if window_frames > frame_count * 0.5:
+            logger.info(f"Packet prefilter candidates cover {window_frames}/{frame_count} frames, using full scan")
+            return None
+
+        logger.info(f"Packet prefilter: {len(runs)} candidates, decoding {window_frames}/{frame_count} frames " +
+                f"in {len(windows)} windows")
+
+        return self._scan_profile_windows(video_path, fps, windows, frame_count)
+
+    def _scan_keyframe_profile(self, video_path, fps, frame_count):
+        """
+        Locate bookends on a keyframe-only timeline, then scan the bracketing GOPs frame by frame
+
+        Returns a sparse LumaProfile, or None when the keyframes show no plausible bookends
+        """
+        coarse = self._keyframe_profile(video_path, fps)
+        if coarse is None or len(coarse) < 3:
+            return None
+
+        keyframes = coarse.frame_indices
+        if not frame_count:
+            frame_count = int(keyframes[-1]) + int(math.ceil(fps))
+
+        # Captures use fixed one-second GOPs, so only bookends that happen to cover
+        # a keyframe show up here; the caller's spacing check catches the rest
+        thresholds, std_dev_threshold = self._bookend_thresholds(coarse, sample=coarse)
+        white_keyframes = np.flatnonzero(white_frame_mask(coarse.stats, min(thresholds), std_dev_threshold))
+        if len(white_keyframes) < 2:
+            logger.info(f"Keyframe coarse scan found {len(white_keyframes)} white keyframes, using full scan")
+            return None
+
+        # A bookend can only start after the previous keyframe and must end before the next one
+        runs = []
+        for i in white_keyframes:
+            start = int(keyframes[i - 1]) if i > 0 else 0
+            end = int(keyframes[i + 1]) if i + 1 < len(keyframes) else frame_count - 1
+            runs.append((start, end))
+
+        windows = candidate_windows(runs, frame_count, padding=0)
+        window_frames = sum(end - start + 1 for start, end in windows)
+        if window_frames > frame_count * 0.5:
+            logger.info(f"Keyframe coarse scan candidates cover {window_frames}/{frame_count} frames, using full scan")
+            return None
+
+        logger.info(f"Keyframe coarse scan: {len(white_keyframes)} of {len(keyframes)} keyframes white, " +
+                f"decoding {window_frames}/{frame_count} frames in {len(windows)} windows")
+
+        return self._scan_profile_windows(video_path, fps, windows, frame_count)
+
+    def _keyframe_profile(self, video_path, fps):
+        """Luma profile of the keyframes only, cached as its own kind"""
+        return self._cached_profile(video_path, "keyframes", lambda: scan_luma_profile_ffmpeg(
+            video_path, fps, ffmpeg_path=self._ffmpeg_path, keyframes_only=True))
+
+    def _refine_bookend_edges(self, video_path, fps, frame_count):
+        """
+        Locate bookends on the keyframe timeline and decode the GOPs around them for the exact edges
+
+        Bookends that cover no keyframe are not found.
+
+        Returns:
+            (profile, bookends): the keyframe profile, spanning the whole video, and the
+            refined bookends; (None, []) when the keyframes show no usable bookends
+        """
+        coarse = self._keyframe_profile(video_path, fps)
+        if coarse is None or len(coarse) < 3:
+            return None, []
+
+        if not frame_count:
+            frame_count = int(coarse.frame_indices[-1]) + int(math.ceil(fps))
+        coarse = LumaProfile(coarse.frame_indices, coarse.stats, fps, frame_count)
+
+        # Seek on real packet timestamps when the packet table matches the stream
+        packet_table = read_packet_table(video_path)
+        if packet_table is not None and abs(len(packet_table) - frame_count) <= 1:
+            seek_index = FrameSeekIndex.from_packet_table(packet_table)
+        else:
+            seek_index = FrameSeekIndex.constant_rate(fps, frame_count, coarse.frame_indices)
+
+        # Regions found by every threshold are judged by the most lenient one in the detailed pass
+        thresholds, std_dev_threshold = self._bookend_thresholds(coarse, sample=coarse)
+        refiner = BookendEdgeRefiner(
+            video_path, fps, seek_index,
+            threshold=min(thresholds),
+            std_dev_threshold=std_dev_threshold,
+            ffmpeg_path=self._ffmpeg_path
+        )
+
+        bookends = refiner.refine(coarse, self._min_bookend_frames(fps))
+        if bookends is None:
+            return None, []
+        return coarse, bookends
+
+    def _scan_profile_windows(self, video_path, fps, windows, frame_count):
+        """Scan each (start_frame, end_frame) window frame-exactly and join them into one sparse profile"""
+        profiles = []
+        for start, end in windows:
+            window_profile = scan_luma_profile_ffmpeg(
+                video_path, fps,
+                ffmpeg_path=self._ffmpeg_path,
+                start_frame=start,
+                max_frames=end - start + 1
+            )
+            if window_profile is None:
+                logger.warning(f"Could not scan window {start}-{end}, using full scan")
                 return None
+            profiles.append(window_profile)
 
-            # Get video properties
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            duration = frame_count / fps if fps > 0 else 0
+        return LumaProfile.concatenate(profiles, fps, frame_count)
 
-            logger.info(f"Video details: duration={duration:.2f}s, frames={frame_count}, fps={fps:.2f}")
+    def _sparse_bookends_plausible(self, bookends, frame_count, loop_frames, source):
+        """Whether bookends found on sampled frames can stand in for a full scan"""
+        if len(bookends) < 2:
+            logger.info(f"{source} found fewer than two bookends")
+            return False
+
+        if not bookends_match_loops(bookends, frame_count, loop_frames):
+            logger.warning(f"{source} found {len(bookends)} bookends with a gap longer than one loop, " +
+                    "a bookend was probably missed between the sampled frames; using full scan")
+            return False
+        return True
+
+    def _find_bookends_in_profile(self, profile, threshold_sample=None):
+        """
+        Locate white bookend sections in a luma profile
+
+        Args:
+            profile: Luma profile to search
+            threshold_sample: Luma profile spread over the whole video that the adaptive
+                thresholds are computed from; required for sparse profiles, whose
+                windows around candidates would bias them
+        """
+        # Get video properties
+        fps = profile.fps
+        frame_count = profile.frame_count
+        duration = frame_count / fps if fps > 0 else 0
+
+        logger.info(f"Video details: duration={duration:.2f}s, frames={frame_count}, fps={fps:.2f}")
+        logger.info(f"Luma profile: {len(profile)} frames, {profile.nbytes / 1024:.1f} KB")
 
-            # Sample brightness values across the video
-            brightness_samples = []
+        stats = profile.dense_stats()
+        thresholds, std_dev_threshold = self._bookend_thresholds(profile, sample=threshold_sample)
+        
+        # Define minimum white frame sequence based on frame rate
+        min_white_frames = self._min_bookend_frames(fps)
             
+        logger.info(f"Using minimum bookend size of {min_white_frames} frames ({min_white_frames/fps:.3f}s)")
+        
+        # Use a larger sampling interval for initial scan
+        initial_sample_rate = max(3, int(fps // 8))
+        
+        bookends = classify_bookends(
+            stats, fps, thresholds,
+            std_dev_threshold=std_dev_threshold,
+            min_white_frames=min_white_frames,
+            initial_sample_rate=initial_sample_rate
+        )
+        logger.info(f"Found {len(bookends)} bookends in luma profile")
+
+        return bookends
+
+    def _bookend_thresholds(self, profile, sample=None):
+        """
+        Brightness thresholds (strictest first) and the uniformity std-dev threshold for a luma profile
+
+        The statistics come from every frame of sample when given, otherwise from
+        the profile at the configured sampling rate.
+        """
+        if sample is not None:
+            logger.info(f"Using {len(sample)} representative frames for the brightness statistics")
+            all_brightness = sample.mean
+            all_std_devs = sample.std
+        else:
             # Use frame_sampling_rate to determine sample interval
             # Higher frame_sampling_rate = more precise detection
-            sample_interval = int(fps / self.frame_sampling_rate)
+            sample_interval = int(profile.fps / self.frame_sampling_rate)
             if sample_interval < 1:
                 sample_interval = 1
-                
+
             logger.info(f"Using frame sampling interval of {sample_interval} frames " +
                     f"({self.frame_sampling_rate} samples per second)")
+
+            all_brightness = profile.mean[::sample_interval]
+            all_std_devs = profile.std[::sample_interval]
+        avg_brightness = float(np.mean(all_brightness))
+        std_brightness = float(np.std(all_brightness))
+        max_brightness = float(np.max(all_brightness))
+        avg_std_dev = float(np.mean(all_std_devs))
+
+        logger.info(f"Video brightness stats: avg={avg_brightness:.1f}, std={std_brightness:.1f}, " +
+                f"max={max_brightness:.1f}, avg_std_dev={avg_std_dev:.1f}")
+
+
+        # Dynamic threshold calculation based on adaptive brightness
+        if self.adaptive_brightness:
+            # Smarter threshold calculation for varying lighting conditions
+            dynamic_threshold = max(
+                avg_brightness + 2.0 * std_brightness,  # Statistical outlier detection
+                max_brightness * 0.85,  # Percentage of maximum
+                180  # Minimum acceptable value for white
+            )
             
-            # Sample frames throughout the video for brightness analysis
-            sample_frames = []
-            for i in range(0, frame_count, sample_interval):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-                ret, frame = cap.read()
-                if ret:
-                    sample_frames.append((i, frame))
-            
-            # Calculate brightness statistics
-            for i, frame in sample_frames:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                brightness = np.mean(gray)
-                std_dev = np.std(gray)
-                brightness_samples.append((i, brightness, std_dev))
-                
-            if not brightness_samples:
-                logger.error("Could not sample brightness levels from video")
-                return None
+            # Adjust for very bright or dim videos
+            if max_brightness > 240:  # Very bright video
+                dynamic_threshold = max(dynamic_threshold, 220)
+            elif max_brightness < 200:  # Dim video
+                dynamic_threshold = max(avg_brightness + 1.5 * std_brightness, 160)
                 
-            # Calculate stats for adaptive thresholds
-            all_brightness = [b for _, b, _ in brightness_samples]
-            all_std_devs = [s for _, _, s in brightness_samples]
-            avg_brightness = np.mean(all_brightness)
-            std_brightness = np.std(all_brightness)
-            max_brightness = np.max(all_brightness)
-            avg_std_dev = np.mean(all_std_devs)
-
-            logger.info(f"Video brightness stats: avg={avg_brightness:.1f}, std={std_brightness:.1f}, " +
-                    f"max={max_brightness:.1f}, avg_std_dev={avg_std_dev:.1f}")
-
-    
-            # Dynamic threshold calculation based on adaptive brightness
-            if self.adaptive_brightness:
-                # Smarter threshold calculation for varying lighting conditions
-                dynamic_threshold = max(
-                    avg_brightness + 2.0 * std_brightness,  # Statistical outlier detection
-                    max_brightness * 0.85,  # Percentage of maximum
-                    180  # Minimum acceptable value for white
-                )
-                
-                # Adjust for very bright or dim videos
-                if max_brightness > 240:  # Very bright video
-                    dynamic_threshold = max(dynamic_threshold, 220)
-                elif max_brightness < 200:  # Dim video
-                    dynamic_threshold = max(avg_brightness + 1.5 * std_brightness, 160)
-                    
-                thresholds = [
-                    dynamic_threshold,
-                    dynamic_threshold * 0.9,  # First fallback
-                    max(avg_brightness + 20, 160)  # Second fallback
-                ]
-            else:
-                # Use white threshold value from settings
-                white_threshold = 230  # Default value if not set
-                
-                # If options_manager is available, get the configured white threshold
-                if hasattr(self, 'options_manager') and self.options_manager:
-                    try:
-                        white_threshold = self.options_manager.get_setting("bookend", "white_threshold")
-                        logger.info(f"Using configured white threshold: {white_threshold}")
-                    except Exception as e:
-                        logger.warning(f"Error getting white threshold from options: {e}")
-                
-                # Use the white threshold as fixed threshold with fallbacks
-                fixed_threshold = white_threshold
-                thresholds = [fixed_threshold, fixed_threshold * 0.9, fixed_threshold * 0.8]
-
+            thresholds = [
+                dynamic_threshold,
+                dynamic_threshold * 0.9,  # First fallback
+                max(avg_brightness + 20, 160)  # Second fallback
+            ]
+        else:
+            # Use white threshold value from settings
+            white_threshold = 230  # Default value if not set
+            
+            # If options_manager is available, get the configured white threshold
+            if hasattr(self, 'options_manager') and self.options_manager:
+                try:
+                    white_threshold = self.options_manager.get_setting("bookend", "white_threshold")
+                    logger.info(f"Using configured white threshold: {white_threshold}")
+                except Exception as e:
+                    logger.warning(f"Error getting white threshold from options: {e}")
+            
+            # Use the white threshold as fixed threshold with fallbacks
+            fixed_threshold = white_threshold
+            thresholds = [fixed_threshold, fixed_threshold * 0.9, fixed_threshold * 0.8]
+        
+        logger.info(f"Using brightness thresholds: {[round(t, 1) for t in thresholds]}")
 
+        # Std dev threshold based on video characteristics
+        std_dev_threshold = min(45, avg_std_dev * 1.8)
 
+        return thresholds, std_dev_threshold
 
+    def _detect_white_bookends(self, video_path, loop_duration=None):
+        """
+        Streaming white bookend detection
+
+        The capture is decoded once, in order, into a compact per-frame luma
+        profile. Threshold selection, the quick scans and the detailed region
+        analysis all run on that profile, so detection time grows linearly with
+        frame count and memory stays at a few bytes per frame.
+
+        Long captures are first localised on a keyframe-only timeline, and with
+        the packet prefilter enabled runs of unusually small packets mark
+        candidates too. With edge refinement, only the GOP before and after each
+        white keyframe is decoded by seeking; otherwise short windows around the
+        candidates are decoded. A sparse result is only
+        accepted when its bookends are spaced like the capture's loops, as a
+        bookend that falls between the sampled frames is otherwise lost without
+        trace; the full scan is used when none of them passes.
 
+        Args:
+            video_path: Captured video
+            loop_duration: Expected content seconds between two bookends (the reference
+                duration), used to check sparse results; without it their own spacing is used
+        """
+        try:
+            bookends = []
 
+            video_info = self._get_video_info(video_path) or {}
+            video_fps = video_info.get('frame_rate')
+
+            sparse_backend = self.stats_backend == "ffmpeg" and video_fps
+            loop_frames = loop_duration * video_fps if loop_duration and video_fps else None
+            keyframe_scan = (sparse_backend and self.keyframe_coarse_scan and
+                             video_info.get('duration', 0) >= self.keyframe_scan_min_duration)
+
+            sparse_scans = []
+            if keyframe_scan:
+                sparse_scans.append(("keyframe_windows", lambda: self._scan_keyframe_profile(
+                    video_path, video_fps, video_info.get('frame_count'))))
+            if sparse_backend and self.packet_prefilter:
+                sparse_scans.append(("packet_windows", lambda: self._scan_prefiltered_profile(
+                    video_path, video_fps)))
+
+            # A cached full profile or one recorded live during capture covers every
+            # frame, so the sparse scans are only needed without one
+            profile = self._load_cached_profile(video_path, "full")
+            if profile is None:
+                profile = self._load_live_profile(video_path, video_info.get('frame_count'))
+            if profile is not None:
+                bookends = self._find_bookends_in_profile(profile)
+                if len(bookends) < 2:
+                    logger.info("Stored luma profile held fewer than two bookends")
+                    profile = None
+
+            if profile is None and keyframe_scan and self.edge_refinement:
+                profile, bookends = self._refine_bookend_edges(video_path, video_fps, video_info.get('frame_count'))
+                if profile is not None and not self._sparse_bookends_plausible(
+                        bookends, profile.frame_count, loop_frames, "Edge refinement"):
+                    profile = None
+
+            if profile is None and sparse_scans:
+                # Thresholds come from the keyframes, which sample the whole video evenly,
+                # rather than from windows chosen for looking like bookends
+                threshold_sample = self._keyframe_profile(video_path, video_fps)
+                if threshold_sample is None or len(threshold_sample) < 3:
+                    logger.info("No keyframe sample for the brightness thresholds, skipping sparse scans")
+                    sparse_scans = []
+
+                for kind, scan in sparse_scans:
+                    profile = self._cached_profile(video_path, kind, scan)
+                    if profile is None:
+                        continue
+
+                    bookends = self._find_bookends_in_profile(profile, threshold_sample=threshold_sample)
+                    if self._sparse_bookends_plausible(bookends, profile.frame_count, loop_frames,
+                                                       f"Sparse scan ({kind})"):
+                        break
+                    profile = None
 
+            if profile is None:
+                profile = self._cached_profile(video_path, "full", lambda: self._scan_full_profile(
+                    video_path, video_fps, video_info.get('frame_count')))
+                if profile is None or len(profile) == 0:
+                    logger.error("Could not sample brightness levels from video")
+                    return None
 
+                bookends = self._find_bookends_in_profile(profile)
 
+            fps = profile.fps
+            frame_count = profile.frame_count
+            duration = frame_count / fps if fps > 0 else 0
 
-            
-            logger.info(f"Using brightness thresholds: {[round(t, 1) for t in thresholds]}")
-            
-            # Quick scan to identify potential bookend regions
-            regions_of_interest = []
-            
-            # Define minimum white frame sequence based on frame rate
-            if fps > 25:
-                min_white_frames = max(3, int(0.1 * fps))
-            else:
-                min_white_frames = 3
-                
-            logger.info(f"Using minimum bookend size of {min_white_frames} frames ({min_white_frames/fps:.3f}s)")
-            
-            # Use a larger sampling interval for initial scan
-            initial_sample_rate = max(3, int(fps // 8))
-            
-            # Std dev threshold based on video characteristics
-            std_dev_threshold = min(45, avg_std_dev * 1.8)
-            
-            # First pass: Quick scan to find potential bookend regions
-            for threshold_idx, whiteness_threshold in enumerate(thresholds):
-                logger.info(f"Quick scan with threshold: {whiteness_threshold:.1f}")
-                
-                # Reset video position
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                
-                potential_regions = []
-                current_region = None
-                
-                # Process frames at the initial sampling rate
-                for frame_idx in range(0, frame_count, initial_sample_rate):
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                    ret, frame = cap.read()
-                    
-                    if not ret:
-                        break
-                    
-                    # Calculate brightness
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    avg_brightness = np.mean(gray)
-                    std_dev = np.std(gray)
-                    
-                    # Determine if this is a candidate white frame
-                    is_white_frame = False
-                    
-                    # Adaptive criteria for white frame detection
-                    if threshold_idx < 2:
-                        is_white_frame = avg_brightness > whiteness_threshold
-                    else:
-                        is_white_frame = (avg_brightness > whiteness_threshold and std_dev < std_dev_threshold)
-                    
-                    if is_white_frame:
-                        if current_region is None:
-                            current_region = {
-                                'start_frame': max(0, frame_idx - initial_sample_rate),
-                                'brightness': avg_brightness
-                            }
-                    else:
-                        if current_region is not None:
-                            current_region['end_frame'] = min(frame_count - 1, frame_idx + initial_sample_rate)
-                            potential_regions.append(current_region)
-                            current_region = None
-                
-                # Handle last region if exists
-                if current_region is not None:
-                    current_region['end_frame'] = min(frame_count - 1, frame_idx + initial_sample_rate)
-                    potential_regions.append(current_region)
-                
-                # If we found potential regions, add them to our analysis list
-                if potential_regions:
-                    logger.info(f"Found {len(potential_regions)} potential bookend regions with threshold {whiteness_threshold:.1f}")
-                    for region in potential_regions:
-                        # Expand region slightly to ensure we don't miss any frames
-                        padding = initial_sample_rate
-                        start = max(0, region['start_frame'] - padding)
-                        end = min(frame_count - 1, region['end_frame'] + padding)
-                        regions_of_interest.append((start, end, whiteness_threshold))
-            
-            # If no regions found, scan the entire video with the most lenient threshold
-            if not regions_of_interest:
-                logger.info("No potential regions found in quick scan, will scan entire video")
-                regions_of_interest = [(0, frame_count - 1, thresholds[-1])]
-            
-            # Merge overlapping regions to avoid duplicate processing
-            if len(regions_of_interest) > 1:
-                regions_of_interest.sort()  # Sort by start frame
-                merged_regions = []
-                current_start, current_end, current_threshold = regions_of_interest[0]
-                
-                for start, end, threshold in regions_of_interest[1:]:
-                    if start <= current_end:  # Regions overlap
-                        current_end = max(current_end, end)
-                        current_threshold = min(current_threshold, threshold)  # Use the more lenient threshold
-                    else:
-                        merged_regions.append((current_start, current_end, current_threshold))
-                        current_start, current_end, current_threshold = start, end, threshold
-                
-                merged_regions.append((current_start, current_end, current_threshold))
-                regions_of_interest = merged_regions
-                
-                logger.info(f"Merged into {len(regions_of_interest)} regions for detailed analysis")
-            
-            # Second pass: Detailed analysis of potential regions
-            logger.info("Starting detailed analysis of potential bookend regions")
-            
-            all_bookends = []
-            
-            for region_idx, (start_frame, end_frame, threshold) in enumerate(regions_of_interest):
-                logger.info(f"Analyzing region {region_idx+1}/{len(regions_of_interest)}: frames {start_frame}-{end_frame}")
-                
-                # Skip too small regions
-                if end_frame - start_frame < min_white_frames:
-                    logger.info(f"Region too small, skipping")
-                    continue
-                    
-                consecutive_white_frames = 0
-                current_bookend = None
-                region_bookends = []
-                
-                # Process each frame in this region
-                cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-                
-                for frame_idx in range(start_frame, end_frame + 1):
-                    if frame_idx > start_frame:
-                        ret, frame = cap.read()
-                    else:
-                        ret = cap.isOpened()
-                        if ret:
-                            ret, frame = cap.read()
-                    
-                    if not ret:
-                        break
-                    
-                    # Calculate brightness
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    avg_brightness = np.mean(gray)
-                    std_dev = np.std(gray)
-                    
-                    # Enhanced white frame detection logic for fast-moving content
-                    is_white_frame = False
-                    
-                    # For high-speed content, we need to be more flexible with white detection
-                    if std_dev < std_dev_threshold * 1.2:
-                        # Low std dev means more uniform frame - good for white detection
-                        if avg_brightness > threshold * 0.95:
-                            is_white_frame = True
-                    else:
-                        # Higher std dev might mean partial white frame or motion blur
-                        # Check if a significant portion is white
-                        if avg_brightness > threshold:
-                            is_white_frame = True
-                        elif avg_brightness > threshold * 0.9:
-                            # Check for large white areas (could be partial white frame)
-                            white_pixels = np.sum(gray > threshold)
-                            white_ratio = white_pixels / gray.size
-                            if white_ratio > 0.7:  # If >70% of pixels are above threshold
-                                is_white_frame = True
-                    
-                    if is_white_frame:
-                        consecutive_white_frames += 1
-                        
-                        # Start a new bookend if needed
-                        if current_bookend is None:
-                            frame_time = frame_idx / fps
-                            current_bookend = {
-                                'start_frame': frame_idx,
-                                'start_time': frame_time,
-                                'frame_count': 1,
-                                'brightness': avg_brightness,
-                                'std_dev': std_dev
-                            }
-                    else:
-                        # Check if we just finished a bookend
-                        if current_bookend is not None:
-                            # Update end time
-                            current_bookend['end_frame'] = frame_idx - 1
-                            current_bookend['end_time'] = current_bookend['end_frame'] / fps
-                            current_bookend['frame_count'] = consecutive_white_frames
-                            
-                            # Add to bookends if long enough
-                            if consecutive_white_frames >= min_white_frames:
-                                region_bookends.append(current_bookend)
-                                logger.info(f"Detected white bookend: {current_bookend['start_time']:.3f}s - {current_bookend['end_time']:.3f}s " +
-                                        f"(brightness: {current_bookend.get('brightness', 0):.1f}, frames: {consecutive_white_frames})")
-                            
-                            # Reset for next bookend
-                            current_bookend = None
-                            consecutive_white_frames = 0
-                
-                # Check for unfinished bookend
-                if current_bookend is not None and consecutive_white_frames >= min_white_frames:
-                    current_bookend['end_frame'] = end_frame
-                    current_bookend['end_time'] = end_frame / fps
-                    current_bookend['frame_count'] = consecutive_white_frames
-                    region_bookends.append(current_bookend)
-                    logger.info(f"Detected white bookend at region end: {current_bookend['start_time']:.3f}s - {current_bookend['end_time']:.3f}s " +
-                            f"(brightness: {current_bookend.get('brightness', 0):.1f}, frames: {consecutive_white_frames})")
-                
-                # Add all bookends from this region
-                all_bookends.extend(region_bookends)
-            
-            # Remove duplicate bookends (can happen with overlapping regions)
-            if all_bookends:
-                unique_bookends = []
-                for bookend in all_bookends:                            
-                    
-                    
-                    
-                    # Check if this bookend overlaps with any existing ones
-                    is_duplicate = False
-                    for existing in unique_bookends:
-                        # If frames overlap significantly, consider it a duplicate
-                        if (bookend['start_frame'] <= existing['end_frame'] and 
-                            bookend['end_frame'] >= existing['start_frame']):
-                            # Keep the larger/brighter one
-                            if bookend['frame_count'] > existing['frame_count'] or bookend['brightness'] > existing['brightness']:
-                                # Replace existing with this one
-                                unique_bookends.remove(existing)
-                                unique_bookends.append(bookend)
-                            is_duplicate = True
-                            break
-                    
-                    if not is_duplicate:
-                        unique_bookends.append(bookend)
-                
-                # Sort bookends by start time
-                bookends = sorted(unique_bookends, key=lambda x: x['start_frame'])
-                logger.info(f"Found {len(bookends)} unique bookends after deduplication")
-            
-            cap.release()
-            
             # Final check and summary
             if len(bookends) < 2:
                 logger.warning(f"Failed to detect at least two white bookends")
@@ -1149,6 +2063,7 @@ class BookendAlignmentThread(QThread):
         self.delete_primary = delete_primary  # Default to True to delete original capture file
         self.options_manager = options_manager
         self.aligner = BookendAligner()
+        self.alignment_method = "Bookend Detection"
         self._running = True
         
         # Log the delete_primary setting
@@ -1177,15 +2092,59 @@ class BookendAlignmentThread(QThread):
                     logger.info(f"Motion compensation setting from options_manager: {motion_comp_setting}")
                     
                     fallback_to_full_video = bookend_settings.get('fallback_to_full_video', True)
+                    stats_backend = bookend_settings.get('stats_backend', 'ffmpeg')
+                    packet_prefilter = bookend_settings.get('packet_prefilter', True)
+                    keyframe_coarse_scan = bookend_settings.get('keyframe_coarse_scan', True)
+                    profile_cache = bookend_settings.get('profile_cache', True)
+                    profile_cache_max_mb = bookend_settings.get('profile_cache_max_mb', 256)
+                    detection_workers = bookend_settings.get('detection_workers', 0)
+                    edge_refinement = bookend_settings.get('edge_refinement', True)
+                    virtual_alignment = bookend_settings.get('virtual_alignment', True)
+                    intermediate_profile = bookend_settings.get('intermediate_profile', DEFAULT_INTERMEDIATE_PROFILE)
+                    offset_estimation = bookend_settings.get('offset_estimation', True)
+                    offset_search_frames = bookend_settings.get('offset_search_frames', 30)
+                    frame_mapping = bookend_settings.get('frame_mapping', True)
+                    multi_loop_analysis = bookend_settings.get('multi_loop_analysis', False)
+                    motion_workers = bookend_settings.get('motion_workers', 0)
+                    archive_aligned_capture = bookend_settings.get('archive_aligned_capture', False)
+                    encode_workers = bookend_settings.get('encode_workers', 0)
                     
                     # Apply the settings to the aligner
                     self.aligner.set_advanced_options(
                         frame_sampling_rate=frame_sampling_rate,
                         adaptive_brightness=adaptive_brightness,
                         motion_compensation=motion_comp_setting,  # Use the explicit variable
-                        fallback_to_full_video=fallback_to_full_video
+                        fallback_to_full_video=fallback_to_full_video,
+                        stats_backend=stats_backend,
+                        packet_prefilter=packet_prefilter,
+                        keyframe_coarse_scan=keyframe_coarse_scan,
+                        profile_cache=profile_cache,
+                        profile_cache_max_mb=profile_cache_max_mb,
+                        detection_workers=detection_workers,
+                        edge_refinement=edge_refinement,
+                        virtual_alignment=virtual_alignment,
+                        intermediate_profile=intermediate_profile,
+                        offset_estimation=offset_estimation,
+                        offset_search_frames=offset_search_frames,
+                        frame_mapping=frame_mapping,
+                        multi_loop_analysis=multi_loop_analysis,
+                        motion_workers=motion_workers,
+                        archive_aligned_capture=archive_aligned_capture,
+                        encode_workers=encode_workers
                     )
                     
+                    analysis_settings = options_manager.get_setting('analysis')
+                    if isinstance(analysis_settings, dict):
+                        self.alignment_method = analysis_settings.get('alignment_method', "Bookend Detection")
+
+                    paths_settings = options_manager.get_setting('paths')
+                    if isinstance(paths_settings, dict):
+                        self.aligner.set_reference_cache(
+                            enabled=paths_settings.get('reference_cache_enabled', True),
+                            cache_dir=paths_settings.get('reference_cache_dir', ''),
+                            max_size_gb=paths_settings.get('reference_cache_max_gb', 20)
+                        )
+
                     # Double-check that settings were applied correctly
                     logger.info(f"Aligner motion_compensation after setting: {self.aligner.motion_compensation}")
                     
@@ -1253,11 +2212,17 @@ class BookendAlignmentThread(QThread):
             # Store the original capture path before alignment
             original_capture_path = self.captured_path
             
-            # Run alignment
-            result = self.aligner.align_bookend_videos(
-                self.reference_path,
-                self.captured_path
-            )
+            # Run alignment with the configured method
+            if self.alignment_method == FINGERPRINT_ALIGNMENT_METHOD:
+                result = self.aligner.align_fingerprint_videos(
+                    self.reference_path,
+                    self.captured_path
+                )
+            else:
+                result = self.aligner.align_bookend_videos(
+                    self.reference_path,
+                    self.captured_path
+                )
 
             # Check if thread is still running before emitting signals
             if not self._running:
@@ -1266,7 +2231,10 @@ class BookendAlignmentThread(QThread):
             if result:
                 # After successful alignment, delete the primary capture file
                 # Use the stored original path to ensure we're deleting the right file
-                if self.delete_primary and os.path.exists(original_capture_path):
+                if result.get('alignment') and result['alignment'].get('captured_path') == original_capture_path:
+                    # Virtual alignment reads the original capture during analysis
+                    logger.info(f"Keeping capture file for virtual alignment: {original_capture_path}")
+                elif self.delete_primary and os.path.exists(original_capture_path):
                     try:
                         # Add a small delay to ensure file is not still in use
                         time.sleep(1)
@@ -1291,7 +2259,10 @@ class BookendAlignmentThread(QThread):
                 # Ensure progress is set to 100% at completion
                 self.alignment_progress.emit(100)
                 
-                self.status_update.emit("Bookend alignment complete! Original capture file deleted.")
+                if result.get('alignment') and result['alignment'].get('captured_path') == original_capture_path:
+                    self.status_update.emit("Bookend alignment complete!")
+                else:
+                    self.status_update.emit("Bookend alignment complete! Original capture file deleted.")
             else:
                 self.error_occurred.emit("Bookend alignment failed")
         except Exception as e:
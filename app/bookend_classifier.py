@@ -0,0 +1,301 @@
+import logging
+
+import numpy as np
+
+from .luma_profile import STAT_MEAN, STAT_STD, STAT_WHITE_RATIO
+
+logger = logging.getLogger(__name__)
+
+# Content between bookends may exceed the expected loop length by this share before a bookend counts as missed
+LOOP_SPACING_TOLERANCE = 0.5
+
+
+def min_bookend_frames(fps):
+    """Minimum number of consecutive white frames that make a bookend"""
+    if fps > 25:
+        return max(3, int(0.1 * fps))
+    return 3
+
+
+def find_runs(mask):
+    """
+    Run-length encode a boolean mask
+
+    Args:
+        mask: 1-D boolean array, or 2-D to encode each row independently
+
+    Returns:
+        (rows, starts, ends) arrays for every run of True values; ends are inclusive
+    """
+    mask = np.atleast_2d(np.asarray(mask, dtype=bool))
+    rows, width = mask.shape
+
+    # Pad every row with False on both sides so runs never continue into the next row
+    padded = np.zeros((rows, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded.ravel())
+
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return starts // (width + 2), starts % (width + 2), ends % (width + 2)
+
+
+def merge_intervals(starts, ends, values):
+    """
+    Merge overlapping inclusive intervals
+
+    Intervals are sorted by start and an interval joins the previous group when
+    it starts at or before the group's end. Each merged interval keeps the
+    smallest value of its members.
+
+    Returns:
+        (starts, ends, values) arrays of the merged intervals
+    """
+    order = np.lexsort((values, ends, starts))
+    starts, ends, values = starts[order], ends[order], values[order]
+    if len(starts) == 0:
+        return starts, ends, values
+
+    running_end = np.maximum.accumulate(ends)
+    group_starts = np.flatnonzero(np.concatenate(([True], starts[1:] > running_end[:-1])))
+    return (starts[group_starts],
+            np.maximum.reduceat(ends, group_starts),
+            np.minimum.reduceat(values, group_starts))
+
+
+def white_frame_mask(stats, threshold, std_dev_threshold):
+    """
+    Per-frame white test of the detailed pass
+
+    Uniform frames only need to come close to the threshold; textured frames
+    must exceed it, or come close with mostly white pixels. The white ratio is
+    taken from the profile, which counts pixels above LUMA_WHITE_LEVEL rather
+    than above the threshold.
+
+    Args:
+        stats: (frames, 3) array of per-frame mean, std-dev and white ratio
+        threshold: Brightness threshold, scalar or one value per frame
+        std_dev_threshold: Std-dev below which a frame counts as uniform
+
+    Returns:
+        Boolean array, True for white frames
+    """
+    mean = stats[:, STAT_MEAN].astype(np.float64)
+    std = stats[:, STAT_STD].astype(np.float64)
+    white_ratio = stats[:, STAT_WHITE_RATIO].astype(np.float64)
+
+    uniform = std < std_dev_threshold * 1.2
+    return np.where(
+        uniform,
+        mean > threshold * 0.95,
+        (mean > threshold) | ((mean > threshold * 0.9) & (white_ratio > 0.7))
+    )
+
+
+def classify_bookends(stats, fps, thresholds, std_dev_threshold, min_white_frames, initial_sample_rate):
+    """
+    Find white bookend sections in per-frame luma statistics
+
+    A coarse pass samples every initial_sample_rate-th frame and marks candidate
+    regions for all thresholds at once; the last threshold also requires a low
+    std-dev. Candidate regions are padded, merged, and then classified frame by
+    frame with the region's most lenient threshold.
+
+    Args:
+        stats: (frame_count, 3) array of per-frame mean, std-dev and white ratio
+        fps: Frame rate, used for bookend times
+        thresholds: Brightness thresholds, strictest first
+        std_dev_threshold: Std-dev below which a frame counts as uniform
+        min_white_frames: Minimum consecutive white frames for a bookend
+        initial_sample_rate: Frame step of the coarse pass
+
+    Returns:
+        List of bookend dicts sorted by start frame
+    """
+    frame_count = len(stats)
+    if frame_count == 0:
+        return []
+
+    # Compare in double precision, as the per-frame scalar comparisons always did
+    mean = stats[:, STAT_MEAN].astype(np.float64)
+    std = stats[:, STAT_STD].astype(np.float64)
+    step = initial_sample_rate
+
+    # Coarse pass: one row of candidate samples per threshold
+    sampled = np.arange(0, frame_count, step)
+    threshold_column = np.asarray(thresholds, dtype=np.float64)[:, None]
+    sample_mask = mean[sampled][None, :] > threshold_column
+    if len(thresholds) > 2:
+        sample_mask[2:] &= std[sampled][None, :] < std_dev_threshold
+
+    rows, run_starts, run_ends = find_runs(sample_mask)
+
+    # A region spans one sample before the run to the first non-white sample after it,
+    # plus one sample of padding on both sides
+    last_sample = len(sampled) - 1
+    region_starts = np.maximum(0, sampled[run_starts] - 2 * step)
+    end_sample = np.where(run_ends < last_sample, run_ends + 1, run_ends)
+    region_ends = np.minimum(frame_count - 1, np.minimum(frame_count - 1, sampled[end_sample] + step) + step)
+    region_thresholds = threshold_column[rows, 0]
+
+    for row, threshold in enumerate(thresholds):
+        region_count = int(np.count_nonzero(rows == row))
+        if region_count:
+            logger.info(f"Found {region_count} potential bookend regions with threshold {threshold:.1f}")
+
+    if len(region_starts) == 0:
+        logger.info("No potential regions found in quick scan, will scan entire video")
+        region_starts = np.array([0])
+        region_ends = np.array([frame_count - 1])
+        region_thresholds = np.array([thresholds[-1]], dtype=np.float64)
+    elif len(region_starts) > 1:
+        region_starts, region_ends, region_thresholds = merge_intervals(region_starts, region_ends, region_thresholds)
+        logger.info(f"Merged into {len(region_starts)} regions for detailed analysis")
+
+    # Skip too small regions
+    keep = (region_ends - region_starts) >= min_white_frames
+    region_starts, region_ends, region_thresholds = region_starts[keep], region_ends[keep], region_thresholds[keep]
+
+    # Detailed pass: each frame is judged against the threshold of the region it belongs to
+    region_id = np.full(frame_count, -1, dtype=np.int64)
+    frame_threshold = np.zeros(frame_count, dtype=np.float64)
+    for i, (start, end, threshold) in enumerate(zip(region_starts, region_ends, region_thresholds)):
+        region_id[start:end + 1] = i
+        frame_threshold[start:end + 1] = threshold
+
+    is_white = white_frame_mask(stats, frame_threshold, std_dev_threshold)
+    labels = np.where(is_white & (region_id >= 0), region_id, -1)
+
+    # Runs of white frames end at non-white frames and at region boundaries
+    padded = np.concatenate(([-1], labels, [-1]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    starts, ends = changes[:-1], changes[1:] - 1
+    valid = (labels[starts] >= 0) & ((ends - starts + 1) >= min_white_frames)
+
+    bookends = []
+    for start, end in zip(starts[valid].tolist(), ends[valid].tolist()):
+        bookend = {
+            'start_frame': start,
+            'start_time': start / fps,
+            'frame_count': end - start + 1,
+            'brightness': float(mean[start]),
+            'std_dev': float(std[start]),
+            'end_frame': end,
+            'end_time': end / fps
+        }
+        logger.info(f"Detected white bookend: {bookend['start_time']:.3f}s - {bookend['end_time']:.3f}s " +
+                f"(brightness: {bookend['brightness']:.1f}, frames: {bookend['frame_count']})")
+        bookends.append(bookend)
+
+    return bookends
+
+
+def bookends_match_loops(bookends, frame_count, loop_frames=None, tolerance=LOOP_SPACING_TOLERANCE):
+    """
+    Whether bookends are spaced the way a looped capture places them
+
+    Consecutive bookends enclose one loop of content, and a capture holds at
+    most one loop before the first bookend and after the last. A longer
+    stretch without a bookend means one was missed, as happens when a sparse
+    scan samples no frame of it.
+
+    Args:
+        bookends: Bookend dicts sorted by start frame
+        frame_count: Frames in the video
+        loop_frames: Expected content frames between two bookends; without it the
+            shortest gap between the bookends found is used, as a missed bookend
+            only ever lengthens gaps
+        tolerance: Share by which a stretch may exceed loop_frames
+
+    Returns:
+        True when no bookend appears to be missing
+    """
+    if len(bookends) < 2:
+        return False
+
+    starts = np.array([bookend['start_frame'] for bookend in bookends])
+    ends = np.array([bookend['end_frame'] for bookend in bookends])
+    gaps = starts[1:] - ends[:-1] - 1
+    if not loop_frames or loop_frames <= 0:
+        loop_frames = int(gaps.min())
+
+    limit = loop_frames * (1 + tolerance)
+    lead = starts[0]
+    tail = frame_count - 1 - ends[-1]
+    return bool(gaps.max() <= limit and lead <= limit and tail <= limit)
+
+
+class LiveBookendTracker:
+    """
+    Track white bookends incrementally as frames arrive during a capture
+
+    There is no whole-video brightness distribution to adapt to while recording,
+    so a frame counts as white when its mean is above the configured white
+    threshold and it is either uniform or mostly white pixels.
+    """
+
+    def __init__(self, fps, white_threshold, min_white_frames, max_std_dev=45.0):
+        self.fps = fps
+        self.white_threshold = white_threshold
+        self.min_white_frames = min_white_frames
+        self.max_std_dev = max_std_dev
+
+        self.frames_seen = 0
+        self.bookends = []
+        self._run_start = None
+
+    @property
+    def open_run_start(self):
+        """Start frame of the white run still in progress, or None"""
+        return self._run_start
+
+    def update(self, stats):
+        """
+        Feed the next batch of per-frame statistics
+
+        Args:
+            stats: (frames, 3) array of profile rows following the previous batch
+
+        Returns:
+            List of bookends completed within this batch
+        """
+        if len(stats) == 0:
+            return []
+
+        white = (stats[:, STAT_MEAN] > self.white_threshold) & (
+            (stats[:, STAT_STD] < self.max_std_dev) | (stats[:, STAT_WHITE_RATIO] > 0.7))
+
+        # Rising and falling edges relative to the last frame of the previous batch
+        previous = np.concatenate(([self._run_start is not None], white[:-1]))
+        starts = (np.flatnonzero(white & ~previous) + self.frames_seen).tolist()
+        ends = (np.flatnonzero(~white & previous) + self.frames_seen - 1).tolist()
+        self.frames_seen += len(stats)
+
+        completed = []
+        if self._run_start is not None and ends:
+            completed.append(self._close_run(self._run_start, ends.pop(0)))
+            self._run_start = None
+
+        for start in starts:
+            if ends:
+                completed.append(self._close_run(start, ends.pop(0)))
+            else:
+                self._run_start = start
+
+        completed = [bookend for bookend in completed if bookend is not None]
+        self.bookends.extend(completed)
+        return completed
+
+    def _close_run(self, start, end):
+        """Turn a finished run of white frames into a bookend, or None if it is too short"""
+        frame_count = end - start + 1
+        if frame_count < self.min_white_frames:
+            return None
+
+        return {
+            'start_frame': start,
+            'start_time': start / self.fps,
+            'frame_count': frame_count,
+            'end_frame': end,
+            'end_time': end / self.fps
+        }
@@ -0,0 +1,233 @@
+import logging
+
+import numpy as np
+
+from .bookend_classifier import find_runs, white_frame_mask
+from .luma_profile import STAT_MEAN, STAT_STD, scan_luma_profile_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSeekIndex:
+    """
+    Frame-accurate seek positions of a video stream
+
+    Holds the presentation time of every frame relative to the first one and
+    the keyframe positions, so a single frame can be decoded by seeking to its
+    own timestamp, and the cost of reaching it (the frames decoded from the
+    preceding keyframe) is known before the decoder is started.
+    """
+
+    def __init__(self, frame_times, keyframes):
+        self.frame_times = np.asarray(frame_times, dtype=np.float64)
+        self.keyframes = np.unique(np.asarray(keyframes, dtype=np.int64))
+        if len(self.keyframes) == 0 or self.keyframes[0] != 0:
+            self.keyframes = np.concatenate(([0], self.keyframes))
+
+    @classmethod
+    def from_packet_table(cls, packet_table):
+        """Build the index from the packet timestamps and keyframe flags"""
+        return cls(packet_table.pts_time - packet_table.pts_time[0], packet_table.keyframe_indices)
+
+    @classmethod
+    def constant_rate(cls, fps, frame_count, keyframes):
+        """Build the index for a constant frame rate stream with known keyframes"""
+        return cls(np.arange(frame_count) / fps, keyframes)
+
+    def __len__(self):
+        return len(self.frame_times)
+
+    def seek_time(self, frame):
+        """Seek position halfway between a frame and its predecessor"""
+        if frame <= 0:
+            return 0.0
+        frame = min(frame, len(self.frame_times) - 1)
+        return float(self.frame_times[frame - 1] + self.frame_times[frame]) / 2
+
+    def keyframe_before(self, frame):
+        """Index of the keyframe decoding has to start from to reach frame"""
+        return int(self.keyframes[np.searchsorted(self.keyframes, frame, side='right') - 1])
+
+    def decode_cost(self, start_frame, end_frame):
+        """Frames decoded to deliver start_frame..end_frame after a seek"""
+        return end_frame - self.keyframe_before(start_frame) + 1
+
+
+class BookendEdgeRefiner:
+    """
+    Locate bookend edges frame-exactly from coarse luma samples
+
+    Coarse samples bracket every bookend edge between a white and a non-white
+    sample, and the frames inside a bracket are decoded through the seek index
+    to find the edge. Only bookends that cover at least one sample are seen:
+    with the keyframe timeline as samples, a bookend shorter than the GOP that
+    falls between two keyframes leaves no trace, so callers must check the
+    result for missing bookends.
+
+    Consecutive keyframes bracket exactly one GOP, and decoding any frame of a
+    GOP decodes the frames before it, so each edge is found with one
+    sequential decode of at most one GOP. Single-frame probes only pay off for
+    brackets spanning several GOPs, where they halve the bracket a GOP at a
+    time until the rest hangs off one keyframe.
+
+    Every edge also gets a confidence margin: the number of luma levels by
+    which the frames either side of it clear the white threshold. A small or
+    negative margin means the edge rests on a borderline frame.
+    """
+
+    def __init__(self, video_path, fps, seek_index, threshold, std_dev_threshold, ffmpeg_path="ffmpeg"):
+        self.video_path = video_path
+        self.fps = fps
+        self.seek_index = seek_index
+        self.threshold = threshold
+        self.std_dev_threshold = std_dev_threshold
+        self._ffmpeg_path = ffmpeg_path
+
+        self.frames = {}  # Frame index -> stats row of every frame seen so far
+        self.probes = 0
+        self.decoded_frames = 0
+
+    def add_samples(self, profile):
+        """Seed the refiner with already decoded frames"""
+        for frame, row in zip(profile.frame_indices.tolist(), profile.stats):
+            self.frames[frame] = row
+
+    def is_white(self, frame):
+        row = self.frames[frame]
+        return bool(white_frame_mask(row[None, :], self.threshold, self.std_dev_threshold)[0])
+
+    def edge_margin(self, dark_frame, white_frame):
+        """Luma levels by which the frames either side of an edge clear the threshold"""
+        if dark_frame not in self.frames:
+            return None
+        white_mean = float(self.frames[white_frame][STAT_MEAN])
+        dark_mean = float(self.frames[dark_frame][STAT_MEAN])
+        return min(white_mean - self.threshold, self.threshold - dark_mean)
+
+    def find_edge(self, lo, hi):
+        """
+        Find the first frame in (lo, hi] whose whiteness differs from frame lo
+
+        Both lo and hi must already be decoded and differ in whiteness. A
+        bracket inside one GOP is decoded in one pass; wider brackets are first
+        narrowed with single-frame probes.
+
+        Returns:
+            Frame index of the edge, or None if a decode failed
+        """
+        lo_white = self.is_white(lo)
+        while hi - lo > 1:
+            if self.seek_index.keyframe_before(lo + 1) == self.seek_index.keyframe_before(hi - 1):
+                if not self._decode(lo + 1, hi - 1):
+                    return None
+                for frame in range(lo + 1, hi):
+                    if self.is_white(frame) != lo_white:
+                        return frame
+                return hi
+
+            mid = (lo + hi) // 2
+            if not self._decode(mid, mid):
+                return None
+            if self.is_white(mid) == lo_white:
+                lo = mid
+            else:
+                hi = mid
+
+        return hi
+
+    def refine(self, samples, min_white_frames):
+        """
+        Find every bookend bracketed by the coarse samples
+
+        Args:
+            samples: Sparse LumaProfile of coarse samples, its frame_count set to the video's
+            min_white_frames: Minimum consecutive white frames for a bookend
+
+        Returns:
+            List of bookend dicts sorted by start frame, or None if a decode failed
+        """
+        self.add_samples(samples)
+        sample_frames = samples.frame_indices.tolist()
+        last_frame = samples.frame_count - 1
+
+        white = white_frame_mask(samples.stats, self.threshold, self.std_dev_threshold)
+        _, run_starts, run_ends = find_runs(white)
+
+        bookends = []
+        for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+            first_white = sample_frames[run_start]
+            last_white = sample_frames[run_end]
+
+            # Start edge: between the last non-white sample and the first white one
+            start = first_white
+            if run_start > 0:
+                start = self.find_edge(sample_frames[run_start - 1], first_white)
+
+            # End edge: between the last white sample and the next non-white one, or the end of the video
+            after = None
+            if run_end + 1 < len(sample_frames):
+                after = sample_frames[run_end + 1]
+            elif last_white < last_frame:
+                if not self._decode(last_frame, last_frame):
+                    return None
+                if not self.is_white(last_frame):
+                    after = last_frame
+
+            end = last_frame if after is None else self.find_edge(last_white, after)
+            if start is None or end is None:
+                return None
+            if after is not None:
+                end -= 1
+
+            frame_count = end - start + 1
+            if frame_count < min_white_frames:
+                continue
+
+            bookend = {
+                'start_frame': start,
+                'start_time': start / self.fps,
+                'frame_count': frame_count,
+                'brightness': float(self.frames[start][STAT_MEAN]),
+                'std_dev': float(self.frames[start][STAT_STD]),
+                'end_frame': end,
+                'end_time': end / self.fps,
+                'start_margin': self.edge_margin(start - 1, start),
+                'end_margin': self.edge_margin(end + 1, end)
+            }
+            logger.info(f"Refined white bookend: {bookend['start_time']:.3f}s - {bookend['end_time']:.3f}s " +
+                    f"(frames: {frame_count}, edge margins: {self._format_margin(bookend['start_margin'])} / " +
+                    f"{self._format_margin(bookend['end_margin'])})")
+            bookends.append(bookend)
+
+        logger.info(f"Edge refinement used {self.probes} decodes and {self.decoded_frames} decoded frames " +
+                f"for {len(bookends)} bookends")
+        return bookends
+
+    def _decode(self, start_frame, end_frame):
+        """Decode start_frame..end_frame into the frame table, skipping frames already seen"""
+        while start_frame <= end_frame and start_frame in self.frames:
+            start_frame += 1
+        while end_frame >= start_frame and end_frame in self.frames:
+            end_frame -= 1
+        if start_frame > end_frame:
+            return True
+
+        profile = scan_luma_profile_ffmpeg(
+            self.video_path, self.fps,
+            ffmpeg_path=self._ffmpeg_path,
+            start_frame=start_frame,
+            max_frames=end_frame - start_frame + 1,
+            seek_time=self.seek_index.seek_time(start_frame)
+        )
+        if profile is None or len(profile) != end_frame - start_frame + 1:
+            logger.warning(f"Could not decode frames {start_frame}-{end_frame} for edge refinement")
+            return False
+
+        self.probes += 1
+        self.decoded_frames += self.seek_index.decode_cost(start_frame, end_frame)
+        self.add_samples(profile)
+        return True
+
+    @staticmethod
+    def _format_margin(margin):
+        return "n/a" if margin is None else f"{margin:.1f}"
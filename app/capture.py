@@ -2,7 +2,6 @@ import logging
 import math
 import os
 import platform
-import re
 import subprocess
 import time
 from enum import Enum
@@ -12,10 +11,19 @@ import numpy as np
 import psutil
 from PyQt5.QtCore import QMutex, QObject, QThread, QTimer, pyqtSignal
 
+from .bookend_classifier import LiveBookendTracker, min_bookend_frames
+from .cpu_scheduler import get_scheduler
+from .ffmpeg_progress import ProgressReader, is_progress_line, progress_args
+from .luma_cache import LumaProfileCache
+from .luma_profile import (LIVE_PROFILE_HEIGHT, LIVE_PROFILE_SETTINGS, LIVE_PROFILE_WIDTH, LumaProfile,
+                           luma_gray_filter, luma_plane_stats)
+from .ring_capture import SegmentRing
+
 logger = logging.getLogger(__name__)
 
 # Constants
 MAX_REPAIR_ATTEMPTS = 3  # Maximum number of attempts to repair a video file
+CAPTURE_RESERVED_CORES = 4  # Cores kept free for the real-time capture encode while it runs
 
 # Define capture states for better management
 class CaptureState(Enum):
@@ -45,6 +53,9 @@ class CaptureMonitor(QThread):
         self.total_frames = total_frames  # Use predefined total frames if provided
         self.last_progress_time = time.time()  # Throttle progress updates
         self.last_progress_value = 0
+        self._finish_requested = False  # Set when live detection has seen enough loops
+        self.progress_reader = ProgressReader(total_frames, interval=0.25)
+        self.dropped_frames = 0
 
     def run(self):
         """Monitor process output and emit signals"""
@@ -56,8 +67,10 @@ class CaptureMonitor(QThread):
         while self._running:
             # Check for process completion
             if self.process.poll() is not None:
-                if self.process.returncode == 0:
+                # FFmpeg exits non-zero when stopped by a signal, which is expected after an early finish
+                if self.process.returncode == 0 or self._finish_requested:
                     logger.info("Capture completed successfully")
+                    logger.info(f"Capture throughput: {self.progress_reader.summary()}")
                     # Set progress to 99% - we'll set to 100% after post-processing
                     self.progress_updated.emit(99)
                     self.capture_complete.emit()
@@ -93,83 +106,25 @@ class CaptureMonitor(QThread):
                         if isinstance(line, bytes):
                             line = line.decode('utf-8', errors='replace')
                             
+                        # Progress blocks (-progress pipe:2) arrive between the log lines
+                        if is_progress_line(line):
+                            event = self.progress_reader.feed(line)
+                            if event:
+                                self._report_progress(event)
+                            continue
+
                         self.error_output += line
                         logger.debug(f"FFmpeg output: {line.strip()}")
 
-                        # Parse progress (frame number)
-                        if "frame=" in line:
-                            try:
-                                match = re.search(r'frame=\s*(\d+)', line)
-                                if match:
-                                    frame_num = int(match.group(1))
-                                    self.last_frame_count = frame_num
-
-                                    # Try to estimate total frames from fps and duration
-                                    fps = 30  # Default fps assumption
-                                    fps_match = re.search(r'fps=\s*([\d.]+)', line)
-                                    if fps_match:
-                                        try:
-                                            fps = float(fps_match.group(1))
-                                        except:
-                                            pass  # Keep the default
-
-                                    # Always update total_frames when we have fps info, even if it was set before
-                                    if self.duration and fps > 0:
-                                        self.total_frames = int(self.duration * fps)
-                                        logger.debug(f"Estimated total frames: {self.total_frames} (fps={fps}, duration={self.duration}s)")
-
-                                    # Try to find time encoding information as fallback for progress
-                                    time_elapsed = None
-                                    time_match = re.search(r'time=(\d+):(\d+):(\d+\.\d+)', line)
-                                    if time_match:
-                                        hours = int(time_match.group(1))
-                                        minutes = int(time_match.group(2))
-                                        seconds = float(time_match.group(3))
-                                        time_elapsed = hours * 3600 + minutes * 60 + seconds
-
-                                    # Calculate progress percentage
-                                    current_time = time.time()
-                                    # Only update every 0.25 seconds to avoid too many updates
-                                    if current_time - self.last_progress_time >= 0.25:
-                                        progress = 0
-
-                                        if self.duration and self.total_frames > 0:
-                                            # If we have both duration and total frames (most accurate)
-                                            progress = min(int((frame_num / self.total_frames) * 95), 95)
-                                        elif time_elapsed is not None and self.duration:
-                                            # If we have elapsed time from output and expected duration
-                                            progress = min(int((time_elapsed / self.duration) * 95), 95)
-                                        elif self.duration:
-                                            # If we only have process duration, use elapsed time
-                                            elapsed = current_time - self.start_time
-                                            progress = min(int((elapsed / self.duration) * 95), 95)
-                                        else:
-                                            # Fallback - increment in small steps based on frames
-                                            # Ensure we never report 0% after starting
-                                            progress = max(5, min(int((frame_num % 1000) / 10), 95))
-
-                                        # Only emit if progress changed to avoid flooding UI
-                                        if progress != self.last_progress_value:
-                                            self.progress_updated.emit(progress)
-                                            self.last_progress_value = progress
-
-                                        # Update timestamp
-                                        self.last_progress_time = current_time
-
-                                    # Always emit frame count updates for UI display
-                                    self.frame_count_updated.emit(frame_num, self.total_frames)
-                            except (ValueError, AttributeError) as e:
-                                logger.warning(f"Error parsing frame number: {e}")
-
                         # Check for common error patterns
                         if "Error" in line or "Invalid" in line:
                             logger.warning(f"Potential error in FFmpeg output: {line.strip()}")
+                    else:
+                        # Don't burn CPU with polling
+                        time.sleep(0.1)
                 except Exception as e:
                     logger.warning(f"Error reading FFmpeg output: {e}")
 
-            # Don't burn CPU with polling
-            time.sleep(0.1)
-
             # Update progress based on elapsed time for smoother appearance
             # Only if no recent frame-based updates
             current_time = time.time()
@@ -186,28 +141,79 @@ class CaptureMonitor(QThread):
                     # Do nothing if progress didn't increase
                     logger.debug("Skipping progress update as value didn't increase")
 
+    def _report_progress(self, event):
+        """Turn a progress event of the capture into progress and frame count updates"""
+        self.last_frame_count = event.frame
+
+        # The encoder's frame rate and the expected duration give the frames to expect
+        if self.duration and event.fps:
+            self.total_frames = int(self.duration * event.fps)
+
+        if event.dropped > self.dropped_frames:
+            logger.warning(f"Capture has dropped {event.dropped} frames so far (duplicated {event.duplicated})")
+            self.dropped_frames = event.dropped
+
+        current_time = time.time()
+        if self.duration and self.total_frames > 0:
+            progress = min(int((event.frame / self.total_frames) * 95), 95)
+        elif event.out_time is not None and self.duration:
+            progress = min(int((event.out_time / self.duration) * 95), 95)
+        elif self.duration:
+            progress = min(int(((current_time - self.start_time) / self.duration) * 95), 95)
+        else:
+            # Ensure we never report 0% after starting
+            progress = max(5, min(int((event.frame % 1000) / 10), 95))
+
+        # Only emit if progress changed to avoid flooding UI
+        if progress != self.last_progress_value:
+            self.progress_updated.emit(progress)
+            self.last_progress_value = progress
+        self.last_progress_time = current_time
+
+        self.frame_count_updated.emit(event.frame, self.total_frames)
+
+    def request_finish(self):
+        """Stop the capture gracefully and report it as complete once FFmpeg has finalized the file"""
+        if self._finish_requested:
+            return
+        self._finish_requested = True
+        if self.process and self.process.poll() is None:
+            logger.info("Requested early finish of capture")
+            self._send_stop_signal()
+
+    def _send_stop_signal(self):
+        """Ask FFmpeg to stop and finalize its output without waiting for it"""
+        try:
+            if platform.system() == 'Windows':
+                # Send 'q' key to stdin which signals FFmpeg to stop gracefully
+                try:
+                    if hasattr(self.process.stdin, 'write'):
+                        if hasattr(self.process.stdin, 'buffer'):
+                            # Handle text mode
+                            self.process.stdin.write('q\n')
+                        else:
+                            # Handle binary mode
+                            self.process.stdin.write(b'q\n')
+                        self.process.stdin.flush()
+                        logger.info("Sent 'q' command to FFmpeg")
+                except Exception as e:
+                    logger.warning(f"Could not send 'q' command: {e}")
+            else:
+                # Unix-like systems
+                import signal
+                self.process.send_signal(signal.SIGINT)
+        except Exception as e:
+            logger.error(f"Error sending stop signal to FFmpeg: {e}")
+
     def _terminate_process(self):
         """Safely terminate the FFmpeg process with proper signal to finalize file"""
         if self.process and self.process.poll() is None:
             try:
                 logger.info("Sending graceful termination signal to FFmpeg process")
+                self._send_stop_signal()
 
                 # For Windows, use a more reliable approach to gracefully terminate FFmpeg
                 if platform.system() == 'Windows':
-                    # Send 'q' key to stdin which signals FFmpeg to stop gracefully
-                    try:
-                        if hasattr(self.process.stdin, 'write'):
-                            if hasattr(self.process.stdin, 'buffer'):
-                                # Handle text mode
-                                self.process.stdin.write('q\n')
-                            else:
-                                # Handle binary mode
-                                self.process.stdin.write(b'q\n')
-                            self.process.stdin.flush()
-                            logger.info("Sent 'q' command to FFmpeg")
-                    except Exception as e:
-                        logger.warning(f"Could not send 'q' command: {e}")
-
                     # Give FFmpeg time to finalize the output
                     logger.info("Waiting for FFmpeg to finalize output file...")
                     for _ in range(50):  # 5 second timeout
@@ -227,10 +233,6 @@ class CaptureMonitor(QThread):
                                 break
                             time.sleep(0.1)
                 else:
-                    # Unix-like systems
-                    import signal
-                    self.process.send_signal(signal.SIGINT)
-
                     # Wait for process to terminate
                     logger.info("Waiting for FFmpeg to finalize output file...")
                     for _ in range(100):  # 10 second timeout
@@ -261,6 +263,68 @@ class CaptureMonitor(QThread):
         self._terminate_process()
 
 
+class LiveBookendDetector(QThread):
+    """Thread that tracks white bookends from the luma side stream of a running capture"""
+    bookend_detected = pyqtSignal(int, int)  # bookends seen, bookends required
+    loops_complete = pyqtSignal()
+
+    def __init__(self, stream, fps, white_threshold, required_bookends,
+                 width=LIVE_PROFILE_WIDTH, height=LIVE_PROFILE_HEIGHT):
+        super().__init__()
+        self.stream = stream
+        self.fps = fps
+        self.required_bookends = required_bookends
+        self.width = width
+        self.height = height
+        self.tracker = LiveBookendTracker(fps, white_threshold, min_bookend_frames(fps))
+        self._batches = []
+        self._running = True
+
+    def run(self):
+        """Read gray frames until the capture ends, tracking bookends as they complete"""
+        frame_size = self.width * self.height
+        # Roughly 100 ms of frames per read keeps the stop decision responsive
+        batch_frames = max(1, int(round(self.fps / 10)))
+        loops_reported = False
+
+        try:
+            while self._running:
+                data = self.stream.read(frame_size * batch_frames)
+                if not data:
+                    break
+
+                usable = len(data) - (len(data) % frame_size)
+                if usable == 0:
+                    break
+
+                planes = np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, frame_size)
+                stats = luma_plane_stats(planes)
+                self._batches.append(stats)
+
+                for bookend in self.tracker.update(stats):
+                    logger.info(f"Live bookend {len(self.tracker.bookends)}/{self.required_bookends}: " +
+                            f"frames {bookend['start_frame']}-{bookend['end_frame']}")
+                    self.bookend_detected.emit(len(self.tracker.bookends), self.required_bookends)
+
+                # Keep reading afterwards so FFmpeg never blocks on the pipe while finalizing
+                if not loops_reported and len(self.tracker.bookends) >= self.required_bookends:
+                    loops_reported = True
+                    self.loops_complete.emit()
+        except Exception as e:
+            logger.warning(f"Live bookend detection stopped: {e}")
+
+    def profile(self):
+        """Luma profile of every frame received so far"""
+        if not self._batches:
+            return None
+        stats = np.concatenate(self._batches)
+        return LumaProfile(np.arange(len(stats)), stats, self.fps, len(stats))
+
+    def stop(self):
+        """Stop reading the side stream"""
+        self._running = False
+
+
 class CaptureManager(QObject):
     """Main manager for video capture process using bookend method"""
     # Status signals
@@ -284,6 +348,12 @@ class CaptureManager(QObject):
         self.state = CaptureState.IDLE
         self.ffmpeg_process = None
         self.capture_monitor = None
+        self.live_detector = None
+        self.live_bookends = []
+        self.segment_ring = None
+        self._cpu_lease = None  # CPU scheduler lease held while recording
+        self.ring_timer = QTimer()
+        self.ring_timer.timeout.connect(self._prune_segment_ring)
 
         # Video info
         self.reference_info = None
@@ -643,7 +713,9 @@ class CaptureManager(QObject):
             "force_format": False,
             "retry_attempts": 3,
             "retry_delay": 3,
-            "recovery_timeout": 10
+            "recovery_timeout": 10,
+            "input_source": "decklink",
+            "input_spec": ""
         }
         
         # Override with options from options_manager if available
@@ -692,7 +764,15 @@ class CaptureManager(QObject):
             "frame_offset": 3,
             "adaptive_brightness": True,
             "motion_compensation": False,
-            "fallback_to_full_video": True
+            "fallback_to_full_video": True,
+            "stats_backend": "ffmpeg",
+            "packet_prefilter": True,
+            "keyframe_coarse_scan": True,
+            "profile_cache": True,
+            "profile_cache_max_mb": 256,
+            "detection_workers": 0,
+            "live_detection": True,
+            "ring_capture": False
         }
         
         # Override with options from options_manager if available
@@ -705,9 +785,16 @@ class CaptureManager(QObject):
         
         return options
 
+    def _release_cpu_lease(self):
+        """Return the cores reserved for the capture encode"""
+        if self._cpu_lease is not None:
+            get_scheduler().release(self._cpu_lease)
+            self._cpu_lease = None
+
     def _on_capture_failed(self, error_msg):
         """Handle capture failure"""
         logger.error(f"Capture failed: {error_msg}")
+        self._release_cpu_lease()
 
         # Update state
         self.state = CaptureState.ERROR
@@ -729,6 +816,7 @@ class CaptureManager(QObject):
 
         # Reset capture monitor
         self.capture_monitor = None
+        self._finish_live_detection()
         
         # Stop preview
         self.stop_preview()
@@ -737,10 +825,16 @@ class CaptureManager(QObject):
         """Handle completion of bookend capture"""
         output_path = self.current_output_path
         logger.info(f"Bookend capture completed: {output_path}")
+        self._release_cpu_lease()
 
         # Ensure progress shows 100% when complete to fix stuck progress issue
         self.progress_update.emit(100)
 
+        # In pre-roll mode the output file is assembled from the segments worth keeping
+        frame_offset = 0
+        if self.segment_ring:
+            frame_offset = self._assemble_segment_ring(output_path)
+
         # Verify the output file
         if not os.path.exists(output_path):
             logger.error(f"Output file doesn't exist: {output_path}")
@@ -758,6 +852,8 @@ class CaptureManager(QObject):
             self.capture_finished.emit(False, error_msg)
             return
 
+        self._finish_live_detection(output_path, frame_offset)
+
         # Move to completed state
         self.state = CaptureState.COMPLETED
         self.state_changed.emit(self.state)
@@ -767,6 +863,148 @@ class CaptureManager(QObject):
         # Stop preview
         self.stop_preview()
 
+    def _on_live_bookend_detected(self, seen, required):
+        """Report live bookend progress"""
+        self.status_update.emit(f"Detected bookend {seen} of {required}")
+
+    def _on_live_loops_complete(self):
+        """Stop the capture as soon as every required loop has been recorded"""
+        logger.info("All required loops captured, finishing capture early")
+        self.status_update.emit("All required loops captured, finishing capture...")
+        if self.capture_monitor:
+            self.capture_monitor.request_finish()
+
+    def _build_input_args(self, device_name, capture_options, decklink_format=None):
+        """
+        FFmpeg input options for the capture source
+
+        Besides the DeckLink device, the capture can read a looping file or a
+        lavfi graph in real time, which stands in for the device when testing.
+        """
+        input_source = capture_options.get('input_source', 'decklink')
+        input_spec = capture_options.get('input_spec', '')
+
+        if input_source == "file":
+            return ["-re", "-stream_loop", "-1", "-i", input_spec]
+        if input_source == "lavfi":
+            return ["-re", "-f", "lavfi", "-i", input_spec]
+
+        args = ["-f", "decklink"]  # Force format
+
+        # Add format code BEFORE the input device - this is critical for decklink
+        if decklink_format:
+            args.extend(["-format_code", decklink_format])
+
+        # Add video input selection
+        args.extend(["-video_input", capture_options.get('video_input', 'hdmi')])
+
+        # Add audio input if not disabled
+        if not capture_options.get('disable_audio', False):
+            args.extend(["-audio_input", capture_options.get('audio_input', 'embedded')])
+
+        # Add input device
+        args.extend(["-i", device_name])
+        return args
+
+    def _ring_keep_from_frame(self, fps):
+        """First capture frame worth keeping: one GOP before the first bookend, or the pre-roll window"""
+        gop_frames = int(fps)
+        tracker = self.live_detector.tracker if self.live_detector else None
+        if tracker is None:
+            return 0
+
+        if tracker.bookends:
+            return max(0, tracker.bookends[0]['start_frame'] - gop_frames)
+
+        # Still waiting: keep a few GOPs, plus any white run that may be the start of a bookend
+        keep_from = tracker.frames_seen - 3 * gop_frames
+        if tracker.open_run_start is not None:
+            keep_from = min(keep_from, tracker.open_run_start - gop_frames)
+        return max(0, keep_from)
+
+    def _prune_segment_ring(self):
+        """Drop ring segments that can no longer hold the start of the first loop"""
+        if not self.segment_ring:
+            self.ring_timer.stop()
+            return
+        self.segment_ring.refresh()
+        self.segment_ring.prune(self._ring_keep_from_frame(self.segment_ring.fps))
+
+    def _assemble_segment_ring(self, output_path):
+        """
+        Build the capture file from the kept ring segments
+
+        Returns:
+            Capture frame index of the first frame in the output file
+        """
+        self.ring_timer.stop()
+        ring = self.segment_ring
+        self.segment_ring = None
+
+        # The side stream is at EOF once FFmpeg exits, so the tracker has seen every frame
+        if self.live_detector:
+            self.live_detector.wait(5000)
+
+        keep_from = self._ring_keep_from_frame(ring.fps)
+        first_frame = ring.assemble(keep_from, output_path, self._ffmpeg_path)
+        ring.cleanup()
+        if first_frame is None:
+            return 0
+
+        # Segment times carry the encoder's pts delay, so refine the offset from frame counts:
+        # the side stream and the assembled file end on the same frame
+        if self.live_detector:
+            cap = cv2.VideoCapture(output_path)
+            file_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            counted_offset = self.live_detector.tracker.frames_seen - file_frames
+            if file_frames > 0 and abs(counted_offset - first_frame) <= int(ring.fps):
+                first_frame = counted_offset
+
+        return max(0, first_frame)
+
+    def _finish_live_detection(self, output_path=None, frame_offset=0):
+        """
+        Stop the live detector and hand its luma profile to alignment
+
+        The profile is stored in the luma profile cache under the "live" kind,
+        keyed to the finished capture file, so bookend detection can classify it
+        instead of decoding the capture again. frame_offset is the capture frame
+        the file starts at when pre-roll segments were dropped.
+        """
+        detector = self.live_detector
+        self.live_detector = None
+        if detector is None:
+            return
+
+        # FFmpeg has exited, so the side stream is at EOF and the thread finishes promptly
+        detector.wait(5000)
+        detector.stop()
+        self.live_bookends = list(detector.tracker.bookends)
+
+        if not output_path:
+            return
+
+        bookend_options = self._get_bookend_options()
+        if not bookend_options.get('profile_cache', True):
+            return
+
+        profile = detector.profile()
+        if profile is not None and frame_offset:
+            profile = LumaProfile(np.arange(len(profile) - frame_offset), profile.stats[frame_offset:],
+                                  profile.fps, len(profile) - frame_offset)
+            for bookend in self.live_bookends:
+                bookend['start_frame'] -= frame_offset
+                bookend['end_frame'] -= frame_offset
+                bookend['start_time'] = bookend['start_frame'] / profile.fps
+                bookend['end_time'] = bookend['end_frame'] / profile.fps
+
+        if profile is not None and len(profile):
+            cache = LumaProfileCache(max_size_mb=bookend_options.get('profile_cache_max_mb', 256))
+            if cache.store(output_path, "live", profile, LIVE_PROFILE_SETTINGS):
+                logger.info(f"Stored live luma profile ({len(profile)} frames, " +
+                        f"{len(self.live_bookends)} bookends) for {output_path}")
+
     def stop_capture(self, cleanup_temp=False):
         """Stop any active capture process"""
         if not self.is_capturing:
@@ -779,6 +1017,8 @@ class CaptureManager(QObject):
         if hasattr(self, 'capture_monitor') and self.capture_monitor:
             self.capture_monitor.stop()
 
+        self._finish_live_detection()
+
         # Force kill any lingering FFmpeg processes
         if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
             try:
@@ -798,6 +1038,8 @@ class CaptureManager(QObject):
             except Exception as e:
                 logger.error(f"Error killing FFmpeg process: {e}")
 
+        self._release_cpu_lease()
+
         # Reset state
         self.state = CaptureState.IDLE
         self.state_changed.emit(self.state)
@@ -880,6 +1122,16 @@ class CaptureManager(QObject):
 
         # Round up to nearest second for clean timing
         capture_duration = math.ceil(capture_duration)
+
+        # With live detection the capture stops itself once enough loops are seen,
+        # so only the maximum duration bounds the recording
+        ring_capture = bookend_options.get('ring_capture', False)
+        live_detection = bookend_options.get('live_detection', True) or ring_capture
+        output_duration = max(capture_duration, math.ceil(max_loop_duration)) if live_detection else capture_duration
+
+        # Pre-roll mode may wait up to one loop for the first bookend before recording starts to count
+        if ring_capture:
+            output_duration += math.ceil(loop_duration)
         
         logger.info(f"Reference duration: {ref_duration:.2f}s")
         logger.info(f"Single loop duration (with bookends): {loop_duration:.2f}s")
@@ -919,22 +1171,10 @@ class CaptureManager(QObject):
                 self._ffmpeg_path,
                 "-y",                     # Overwrite output
                 "-v", "info",             # Use info verbosity to show more feedback
-                "-f", "decklink",         # Force format
+                # Progress goes to stderr, as stdout may carry the live detection stream
+                *progress_args(pipe=2),
             ]
-                
-            # Add format code BEFORE the input device - this is critical for decklink
-            if decklink_format:
-                cmd.extend(["-format_code", decklink_format])
-                
-            # Add video input selection
-            cmd.extend(["-video_input", capture_options.get('video_input', 'hdmi')])
-            
-            # Add audio input if not disabled
-            if not capture_options.get('disable_audio', False):
-                cmd.extend(["-audio_input", capture_options.get('audio_input', 'embedded')])
-            
-            # Add input device
-            cmd.extend(["-i", device_name])
+            cmd.extend(self._build_input_args(device_name, capture_options, decklink_format))
             
             # Add video codec settings
             cmd.extend([
@@ -943,10 +1183,13 @@ class CaptureManager(QObject):
                 "-crf", str(capture_options.get('crf', 18)),
                 "-g", str(int(frame_rate)),    # Fix keyframe interval to match frame rate
                 "-keyint_min", str(int(frame_rate)), # Minimum keyframe interval
-                "-movflags", "+faststart", # Optimize for web streaming
+            ])
+            if not ring_capture:
+                cmd.extend(["-movflags", "+faststart"]) # Optimize for web streaming
+            cmd.extend([
                 "-fflags", "+genpts+igndts", # More resilient timestamp handling
                 "-avoid_negative_ts", "1", # Handle negative timestamps
-                "-t", str(capture_duration) # Use calculated capture duration
+                "-t", str(output_duration) # Use calculated capture duration
             ])
             
             # Add audio codec settings if audio not disabled
@@ -956,9 +1199,24 @@ class CaptureManager(QObject):
                     "-b:a", "192k"
                 ])
 
-            # Use forward slashes for FFmpeg
-            ffmpeg_output_path = self.current_output_path.replace('\\', '/')
-            cmd.append(ffmpeg_output_path)
+            if ring_capture:
+                # Write one-GOP segments into a ring that is pruned until the first bookend arrives
+                self.segment_ring = SegmentRing(self.current_output_path + ".ring", frame_rate)
+                cmd.extend(self.segment_ring.output_args(segment_seconds=1))
+            else:
+                # Use forward slashes for FFmpeg
+                ffmpeg_output_path = self.current_output_path.replace('\\', '/')
+                cmd.append(ffmpeg_output_path)
+
+            # Second output: tiny gray side stream on stdout for live bookend detection
+            if live_detection:
+                cmd.extend([
+                    "-map", "0:v:0", "-an",
+                    "-vf", luma_gray_filter(LIVE_PROFILE_WIDTH, LIVE_PROFILE_HEIGHT),
+                    "-f", "rawvideo", "-pix_fmt", "gray",
+                    "-t", str(output_duration),
+                    "pipe:1"
+                ])
 
             # Log command
             logger.info(f"FFmpeg bookend capture command: {' '.join(cmd)}")
@@ -997,6 +1255,10 @@ class CaptureManager(QObject):
                     stdin=subprocess.PIPE
                 )
 
+            # Keep cores free for the capture encode while analysis work may run alongside it
+            self._release_cpu_lease()
+            self._cpu_lease = get_scheduler().acquire("capture", CAPTURE_RESERVED_CORES)
+
             # Create a more reliable monitor with proper frame estimation based on capture_duration
             total_frames = int(capture_duration * frame_rate)
             logger.info(f"Estimated total frames: {total_frames} based on capture_duration={capture_duration}s and fps={frame_rate}")
@@ -1012,6 +1274,22 @@ class CaptureManager(QObject):
             # Start monitor thread
             self.capture_monitor.start()
 
+            # Track bookends from the side stream and stop once min_loops complete loops are recorded
+            self.live_bookends = []
+            if live_detection:
+                self.live_detector = LiveBookendDetector(
+                    self.ffmpeg_process.stdout,
+                    frame_rate,
+                    bookend_options.get('white_threshold', 200),
+                    required_bookends=min_loops + 1
+                )
+                self.live_detector.bookend_detected.connect(self._on_live_bookend_detected)
+                self.live_detector.loops_complete.connect(self._on_live_loops_complete)
+                self.live_detector.start()
+
+            if ring_capture:
+                self.ring_timer.start(1000)
+
             # Set capture start time
             self.capture_start_time = time.time()
             
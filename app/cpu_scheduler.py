@@ -0,0 +1,160 @@
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Threads per process beyond which a kind of job is assumed to scale poorly
+# until its own measurements say otherwise
+DEFAULT_THREAD_CAPS = {"vmaf": 8, "encode": 16}
+FALLBACK_THREAD_CAP = 8
+
+# A thread count stays in use while its throughput per thread is within this
+# fraction of the best measured for the same kind of job
+EFFICIENCY_FLOOR = 0.75
+
+# Weight of the newest measurement in the running throughput average
+THROUGHPUT_SMOOTHING = 0.5
+
+
+class CpuScheduler:
+    """
+    Shares the machine's cores between the FFmpeg jobs the application runs
+
+    Running work leases the threads it uses, so a capture, the alignment
+    encodes and VMAF processes are planned around each other; load from other
+    programs is measured with psutil. Finished runs report their frame rate,
+    and once extra threads per process stop paying off for a kind of job, the
+    cores go to more parallel processes instead.
+    """
+
+    def __init__(self, cores=None):
+        self.cores = cores or psutil.cpu_count(logical=True) or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._leases = {}
+        self._next_lease = 0
+        self._throughput = {}  # kind -> {threads per process: frames per second per process}
+
+    def leased_threads(self):
+        """Threads currently leased by running jobs"""
+        with self._lock:
+            return sum(threads for _, threads in self._leases.values())
+
+    def busy_cores(self):
+        """Cores busy right now, from the system-wide CPU load"""
+        try:
+            return self.cores * psutil.cpu_percent(interval=0.1) / 100.0
+        except Exception as e:
+            logger.debug(f"Could not measure CPU load: {e}")
+            return 0.0
+
+    def available_cores(self):
+        """Cores free for new work"""
+        # Leased jobs show up in the measured load as well, so count whichever is larger
+        return max(1, int(round(self.cores - max(self.leased_threads(), self.busy_cores()))))
+
+    def thread_cap(self, kind):
+        """Most threads worth giving one process of this kind"""
+        cap = DEFAULT_THREAD_CAPS.get(kind, FALLBACK_THREAD_CAP)
+        with self._lock:
+            measured = dict(self._throughput.get(kind, {}))
+        if not measured:
+            return cap
+
+        best = max(fps / threads for threads, fps in measured.items())
+        efficient = max(threads for threads, fps in measured.items() if fps / threads >= EFFICIENCY_FLOOR * best)
+        if efficient == max(measured):
+            # Still scaling at the largest count tried
+            return max(cap, efficient)
+        return efficient
+
+    def plan(self, kind, max_jobs=1, threads=0, jobs=0):
+        """
+        Choose the parallel processes and threads per process for a piece of work
+
+        Args:
+            kind: Kind of job ("vmaf", "encode", ...), for the measured scaling
+            max_jobs: Parts the work can be split into
+            threads: Total threads configured by the user (0 = decide from the free cores)
+            jobs: Processes configured by the user (0 = decide)
+
+        Returns:
+            Dict with kind, jobs, threads_per_job, available, cores, leased,
+            load (percent) and thread_cap, also meant to be stored with results
+        """
+        leased = self.leased_threads()
+        busy = self.busy_cores()
+        available = threads or max(1, int(round(self.cores - max(leased, busy))))
+        cap = self.thread_cap(kind)
+
+        if not jobs:
+            jobs = math.ceil(available / cap)
+        jobs = max(1, min(jobs, max_jobs))
+
+        schedule = {
+            'kind': kind,
+            'jobs': jobs,
+            'threads_per_job': max(1, available // jobs),
+            'available': available,
+            'cores': self.cores,
+            'leased': leased,
+            'load': round(100.0 * busy / self.cores, 1),
+            'thread_cap': cap
+        }
+        logger.info(f"CPU plan for {kind}: {jobs} x {schedule['threads_per_job']} threads " +
+                f"({available} of {self.cores} cores free, {leased} leased, {schedule['load']}% load)")
+        return schedule
+
+    def acquire(self, kind, threads):
+        """Lease threads for running work; returns the lease id for release()"""
+        with self._lock:
+            self._next_lease += 1
+            self._leases[self._next_lease] = (kind, threads)
+            return self._next_lease
+
+    def release(self, lease_id):
+        """End a lease from acquire()"""
+        with self._lock:
+            self._leases.pop(lease_id, None)
+
+    @contextmanager
+    def lease(self, kind, threads):
+        """Hold a lease of threads for the duration of a with block"""
+        lease_id = self.acquire(kind, threads)
+        try:
+            yield
+        finally:
+            self.release(lease_id)
+
+    def record(self, kind, threads_per_job, frames, seconds, jobs=1):
+        """
+        Report the throughput of a finished run, used to tune later plans
+
+        Returns:
+            Frames per second per process, or None without a usable measurement
+        """
+        if frames <= 0 or seconds <= 0 or jobs <= 0:
+            return None
+        fps = frames / seconds / jobs
+        with self._lock:
+            measured = self._throughput.setdefault(kind, {})
+            previous = measured.get(threads_per_job)
+            measured[threads_per_job] = fps if previous is None else previous + THROUGHPUT_SMOOTHING * (fps - previous)
+        return fps
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The scheduler shared by everything running in this process"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CpuScheduler()
+        return _scheduler
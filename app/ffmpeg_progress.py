@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress events passed on to the UI
+PROGRESS_INTERVAL = 0.5
+
+# Weight of the newest rate in the frames per second the ETA is based on
+ETA_SMOOTHING = 0.3
+
+# Keys of the -progress output read from a stream shared with log lines
+PROGRESS_KEYS = {"frame", "fps", "bitrate", "total_size", "out_time_us", "out_time_ms", "out_time", "dup_frames",
+                 "drop_frames", "speed", "progress"}
+
+
+def progress_args(pipe=1):
+    """
+    FFmpeg options writing machine-readable progress to a pipe instead of the stats line
+
+    FFmpeg then writes a block of key=value lines about twice a second, ending
+    with progress=continue (or progress=end after the last frame).
+
+    Args:
+        pipe: File descriptor of the progress pipe (1 = stdout, 2 = stderr when
+            stdout carries other output)
+    """
+    return ["-nostats", "-progress", f"pipe:{pipe}"]
+
+
+def with_progress(cmd, pipe=1):
+    """Insert progress_args() after the FFmpeg executable of a command"""
+    return [cmd[0], *progress_args(pipe), *cmd[1:]]
+
+
+def _parse_number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_progress_line(line):
+    """Whether an output line belongs to a -progress block"""
+    key, separator, _ = line.strip().partition("=")
+    return bool(separator) and key in PROGRESS_KEYS
+
+
+class ProgressEvent:
+    """
+    One progress report of a running FFmpeg process
+
+    Attributes:
+        frame: Frames written so far
+        fps: Frames per second FFmpeg reports
+        speed: Processing speed relative to real time (None when FFmpeg reports N/A)
+        out_time: Seconds of output written (None when FFmpeg reports N/A)
+        dropped, duplicated: Frames dropped and duplicated for the output frame rate
+        total_frames: Frames expected in all (0 = unknown)
+        elapsed: Seconds since the process started
+        eta: Estimated seconds left (None while unknown)
+        finished: True for the report after the last frame
+    """
+
+    def __init__(self, frame=0, fps=None, speed=None, out_time=None, dropped=0, duplicated=0, total_frames=0,
+                 elapsed=0.0, eta=None, finished=False):
+        self.frame = frame
+        self.fps = fps
+        self.speed = speed
+        self.out_time = out_time
+        self.dropped = dropped
+        self.duplicated = duplicated
+        self.total_frames = total_frames
+        self.elapsed = elapsed
+        self.eta = eta
+        self.finished = finished
+
+    @property
+    def percent(self):
+        """Share of total_frames done, 0-100 (None when the total is unknown)"""
+        if self.total_frames <= 0:
+            return None
+        return min(100.0, 100.0 * self.frame / self.total_frames)
+
+    def as_dict(self):
+        return {
+            'frame': self.frame,
+            'fps': self.fps,
+            'speed': self.speed,
+            'out_time': self.out_time,
+            'dropped': self.dropped,
+            'duplicated': self.duplicated,
+            'total_frames': self.total_frames,
+            'elapsed': round(self.elapsed, 3),
+            'eta': round(self.eta, 1) if self.eta is not None else None,
+            'finished': self.finished
+        }
+
+    def describe(self):
+        """Short status text, e.g. "frame 300/1486 (20%), 45.1 fps, 1.50x, ETA 26s" """
+        text = f"frame {self.frame}/{self.total_frames}" if self.total_frames > 0 else f"frame {self.frame}"
+        if self.percent is not None:
+            text += f" ({self.percent:.0f}%)"
+        if self.fps:
+            text += f", {self.fps:.1f} fps"
+        if self.speed:
+            text += f", {self.speed:.2f}x"
+        if self.eta is not None and not self.finished:
+            text += f", ETA {self.eta:.0f}s"
+        return text
+
+
+class ProgressReader:
+    """
+    Parses the -progress output of an FFmpeg process into ProgressEvents
+
+    Lines are fed one at a time, so the same reader serves a dedicated
+    progress pipe and stderr with the progress blocks interleaved with log
+    lines (anything that is not a progress key is ignored). The ETA comes
+    from a smoothed frame rate measured between blocks, and events are
+    throttled to one per interval for the UI; the final event is always
+    delivered.
+    """
+
+    def __init__(self, total_frames=0, callback=None, interval=PROGRESS_INTERVAL):
+        """
+        Args:
+            total_frames: Frames expected in all, for the percentage and ETA (0 = unknown)
+            callback: Called with each delivered ProgressEvent
+            interval: Minimum seconds between delivered events (0 = every block)
+        """
+        self.total_frames = total_frames or 0
+        self.callback = callback
+        self.interval = interval
+        self.latest = None  # Newest event, delivered or not
+        self._block = {}
+        self._start = time.time()
+        self._last_delivery = 0.0
+        self._last_sample = None  # (time, frame) of the previous block
+        self._rate = None
+
+    def feed(self, line):
+        """
+        Parse one output line
+
+        Returns:
+            The ProgressEvent delivered for a completed block, or None
+        """
+        key, separator, value = line.strip().partition("=")
+        if not separator or key not in PROGRESS_KEYS:
+            return None
+        self._block[key] = value.strip()
+        if key != "progress":
+            return None
+
+        event = self._make_event(self._block)
+        self._block = {}
+        self.latest = event
+
+        now = time.time()
+        if not event.finished and now - self._last_delivery < self.interval:
+            return None
+        self._last_delivery = now
+        if self.callback:
+            self.callback(event)
+        return event
+
+    def read(self, stream):
+        """Feed every line of a text stream until it closes; returns the latest event"""
+        for line in stream:
+            self.feed(line)
+        return self.latest
+
+    def start(self, stream):
+        """Read a stream on a dedicated daemon thread; returns the thread"""
+        thread = threading.Thread(target=self.read, args=(stream,), daemon=True)
+        thread.start()
+        return thread
+
+    def summary(self):
+        """Throughput of the process so far, for logs and results"""
+        event = self.latest
+        if event is None:
+            return None
+        return {
+            'frames': event.frame,
+            'seconds': round(event.elapsed, 2),
+            'fps': round(event.frame / event.elapsed, 2) if event.elapsed > 0 else None,
+            'speed': event.speed,
+            'dropped': event.dropped,
+            'duplicated': event.duplicated
+        }
+
+    def _make_event(self, block):
+        now = time.time()
+        frame = _parse_number(block.get("frame"), int) or 0
+
+        out_time = None
+        out_time_us = _parse_number(block.get("out_time_us"), int)
+        if out_time_us is not None and out_time_us >= 0:
+            out_time = out_time_us / 1000000.0
+
+        speed = block.get("speed", "")
+        speed = _parse_number(speed[:-1] if speed.endswith("x") else speed)
+
+        # Frames per second between blocks, smoothed so a slow block does not make the ETA jump
+        if self._last_sample is not None:
+            last_time, last_frame = self._last_sample
+            if now > last_time and frame >= last_frame:
+                rate = (frame - last_frame) / (now - last_time)
+                self._rate = rate if self._rate is None else self._rate + ETA_SMOOTHING * (rate - self._rate)
+        self._last_sample = (now, frame)
+
+        finished = block.get("progress") == "end"
+        eta = None
+        if finished:
+            eta = 0.0
+        elif self.total_frames > 0 and self._rate:
+            eta = max(0.0, (self.total_frames - frame) / self._rate)
+
+        return ProgressEvent(
+            frame=frame,
+            fps=_parse_number(block.get("fps")),
+            speed=speed,
+            out_time=out_time,
+            dropped=_parse_number(block.get("drop_frames"), int) or 0,
+            duplicated=_parse_number(block.get("dup_frames"), int) or 0,
+            total_frames=self.total_frames,
+            elapsed=now - self._start,
+            eta=eta,
+            finished=finished
+        )
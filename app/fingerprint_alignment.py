@@ -0,0 +1,278 @@
+import logging
+import os
+import subprocess
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from .reference_cache import content_fingerprint
+from .utils import get_subprocess_startupinfo, user_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Difference hash: a 9x8 luma thumbnail gives 8x8 horizontal gradient bits
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+
+# The 64-bit hash is indexed as four 16-bit bands; hashes within 3 bits of
+# each other always share at least one band exactly
+HASH_BANDS = 4
+BAND_BITS = 16
+
+# Bump when the hash definition changes so cached reference hashes are rebuilt
+HASH_VERSION = 1
+
+# Bits set in every byte value, for Hamming distances on numpy < 2
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def default_cache_dir():
+    """Location of cached reference hashes in the per-user cache directory"""
+    return user_cache_dir("fingerprint_cache")
+
+
+def difference_hashes(planes):
+    """
+    Reduce a batch of flattened 9x8 gray thumbnails to 64-bit difference hashes
+
+    Each bit records whether a pixel is brighter than its left neighbour, so
+    the hash survives scaling, gain changes and mild compression.
+    """
+    thumbnails = planes.reshape(-1, HASH_HEIGHT, HASH_WIDTH)
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return np.packbits(bits.reshape(len(planes), 64), axis=1).view('>u8').astype(np.uint64).ravel()
+
+
+def hamming_distances(hashes_a, hashes_b):
+    """Bitwise Hamming distance between two equally long hash arrays"""
+    xor = np.bitwise_xor(np.asarray(hashes_a, dtype=np.uint64), np.asarray(hashes_b, dtype=np.uint64))
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def stream_perceptual_hashes(video_path, fps=None, ffmpeg_path="ffmpeg", batch_frames=256):
+    """
+    Decode a video once and yield its frame hashes batch by batch
+
+    Args:
+        video_path: Path to the video file
+        fps: Resample to this frame rate first (None = keep the video's frames)
+        ffmpeg_path: FFmpeg executable
+        batch_frames: Frames per yielded batch
+
+    Yields:
+        uint64 arrays of frame hashes, in frame order
+    """
+    video_filter = f"scale={HASH_WIDTH}:{HASH_HEIGHT}:flags=area,format=gray"
+    if fps:
+        video_filter = f"fps=fps={fps}," + video_filter
+
+    cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin",
+           "-i", video_path, "-map", "0:v:0", "-an", "-sn",
+           "-vf", video_filter, "-vsync", "0",
+           "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"]
+
+    startupinfo, creationflags, env = get_subprocess_startupinfo()
+    frame_size = HASH_WIDTH * HASH_HEIGHT
+
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        startupinfo=startupinfo,
+        creationflags=creationflags,
+        env=env
+    )
+
+    # Drain stderr on a thread so a chatty log can never block the frame pipe
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    try:
+        while True:
+            data = process.stdout.read(frame_size * batch_frames)
+            usable = len(data) - (len(data) % frame_size)
+            if usable == 0:
+                break
+            yield difference_hashes(np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, frame_size))
+
+        returncode = process.wait()
+        stderr_thread.join()
+        if returncode != 0:
+            stderr = b"".join(stderr_lines).decode('utf-8', errors='replace')
+            raise RuntimeError(f"FFmpeg hash scan failed ({returncode}): {stderr.strip()}")
+    finally:
+        # Stopping early (the reference was found) ends the decode
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def reference_hashes(video_path, ffmpeg_path="ffmpeg", cache_dir=None):
+    """
+    Frame hashes of a reference, cached by the reference content
+
+    Returns:
+        uint64 array with one hash per frame, or None on error
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    try:
+        cache_path = os.path.join(cache_dir, f"{content_fingerprint(video_path)}_v{HASH_VERSION}.npy")
+        if os.path.exists(cache_path):
+            return np.load(cache_path)
+
+        hashes = np.concatenate(list(stream_perceptual_hashes(video_path, ffmpeg_path=ffmpeg_path)))
+
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, hashes)
+        os.replace(temp_path, cache_path)
+        return hashes
+
+    except Exception as e:
+        logger.error(f"Could not hash reference {video_path}: {e}")
+        return None
+
+
+class FingerprintIndex:
+    """
+    Lookup from frame hashes to reference frame positions
+
+    Every hash is split into bands and each band value maps to the reference
+    frames carrying it. Looking up a captured hash returns the reference
+    frames sharing any band, which includes every frame within three bits.
+    Band values shared by many frames (black, white or static shots) say
+    nothing about position and are dropped from the index.
+    """
+
+    def __init__(self, hashes, max_bucket=16):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.bands = []
+        for band in range(HASH_BANDS):
+            values = self._band_values(self.hashes, band)
+            buckets = defaultdict(list)
+            for position, value in enumerate(values.tolist()):
+                buckets[value].append(position)
+            self.bands.append({value: positions for value, positions in buckets.items()
+                               if len(positions) <= max_bucket})
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @staticmethod
+    def _band_values(hashes, band):
+        return (hashes >> np.uint64(band * BAND_BITS)) & np.uint64((1 << BAND_BITS) - 1)
+
+    def candidates(self, hashes):
+        """
+        Reference positions for a batch of captured hashes
+
+        Returns:
+            List with one set of candidate reference frames per hash
+        """
+        band_values = [self._band_values(hashes, band).tolist() for band in range(HASH_BANDS)]
+        results = []
+        for i in range(len(hashes)):
+            positions = set()
+            for band in range(HASH_BANDS):
+                positions.update(self.bands[band].get(band_values[band][i], ()))
+            results.append(positions)
+        return results
+
+    def confirmation_length(self, min_frames, min_distinct=8):
+        """
+        Frames from the reference start needed to confirm a match
+
+        At least min_frames, extended until the run holds min_distinct
+        different hashes, so a start on static content is not confirmed by a
+        run any static stretch of the capture would match.
+        """
+        seen = set()
+        for length, value in enumerate(self.hashes.tolist(), start=1):
+            seen.add(value)
+            if length >= min_frames and len(seen) >= min_distinct:
+                return length
+        return len(self.hashes)
+
+    def sequence_distance(self, captured, start, length):
+        """Mean Hamming distance of captured[start:start + length] against the reference start"""
+        return float(hamming_distances(captured[start:start + length], self.hashes[:length]).mean())
+
+
+def locate_reference(index, hash_batches, confirm_frames=30, max_distance=10.0, min_votes=4, refine_frames=15):
+    """
+    Find where the reference starts in a stream of captured hashes
+
+    Every captured frame votes for the capture positions at which the
+    reference would start if that frame matched one of its index candidates.
+    Once a start has enough votes it is confirmed by comparing a short run of
+    frames against the start of the reference. Slowly changing content also
+    matches a few frames either side, so the confirmed start is refined to the
+    closest run within refine_frames. The stream is consumed only until then,
+    so the cost grows with the capture length up to the match, whatever the
+    phase of the capture.
+
+    Args:
+        index: FingerprintIndex of the reference
+        hash_batches: Iterable of captured hash arrays, in frame order
+        confirm_frames: Minimum frames compared to confirm a start
+        max_distance: Largest mean Hamming distance (bits) accepted for the confirmation run
+        min_votes: Votes a start needs before it is confirmed
+        refine_frames: Starts either side of the confirmed one compared during refinement
+
+    Returns:
+        Dict with start_frame, distance, votes and frames_hashed, or None if no start was confirmed
+    """
+    confirm_frames = index.confirmation_length(confirm_frames)
+    captured = np.empty(0, dtype=np.uint64)
+    votes = defaultdict(int)
+    pending = set()
+    rejected = set()
+    confirmed = None
+
+    for batch in hash_batches:
+        offset = len(captured)
+        captured = np.concatenate([captured, batch])
+
+        if confirmed is None:
+            for i, positions in enumerate(index.candidates(batch)):
+                for position in positions:
+                    start = offset + i - position
+                    if start < 0 or start in rejected:
+                        continue
+                    votes[start] += 1
+                    if votes[start] == min_votes:
+                        pending.add(start)
+
+            # Confirm the earliest candidate start whose confirmation run has been hashed
+            for start in sorted(s for s in pending if s + confirm_frames <= len(captured)):
+                pending.discard(start)
+                if index.sequence_distance(captured, start, confirm_frames) <= max_distance:
+                    confirmed = start
+                    break
+                rejected.add(start)
+
+        # Keep hashing until every start in the refinement range can be compared
+        if confirmed is not None and confirmed + refine_frames + confirm_frames <= len(captured):
+            break
+
+    if confirmed is None:
+        return None
+
+    best_start, best_distance = confirmed, None
+    for start in range(max(0, confirmed - refine_frames), confirmed + refine_frames + 1):
+        length = min(confirm_frames, len(captured) - start)
+        if length < confirm_frames // 2:
+            break
+        distance = index.sequence_distance(captured, start, length)
+        if best_distance is None or distance < best_distance:
+            best_start, best_distance = start, distance
+
+    return {
+        'start_frame': best_start,
+        'distance': best_distance,
+        'votes': votes.get(best_start, 0),
+        'frames_hashed': len(captured)
+    }
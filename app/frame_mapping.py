@@ -0,0 +1,262 @@
+import logging
+import subprocess
+import threading
+
+import numpy as np
+
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+# Size of the gray thumbnail each frame is matched by
+THUMBNAIL_WIDTH = 16
+THUMBNAIL_HEIGHT = 9
+
+# Path costs, in units of the reference's typical frame-to-frame distance: a
+# drop or duplicate is only reported when staying in step would cost more
+# than this many frames of ordinary motion
+DROP_PENALTY = 2.0
+DUPLICATE_PENALTY = 2.0
+
+# Smallest motion unit, so static references still penalise events
+MIN_MOTION_DISTANCE = 0.001
+
+# Penalty factor where the packet table already shows a timestamp gap or a repeated frame
+HINTED_PENALTY_FACTOR = 0.2
+
+
+def scan_thumbnails(video_path, start_time=0.0, max_frames=None, fps=None, ffmpeg_path="ffmpeg"):
+    """
+    Decode part of a video into normalised gray thumbnails with one FFmpeg process
+
+    Each thumbnail is scaled to zero mean and unit variance, so the capture
+    chain's gain and black level do not count as differences.
+
+    Returns:
+        (frames, pixels) float32 array, or None on error
+    """
+    video_filter = f"scale={THUMBNAIL_WIDTH}:{THUMBNAIL_HEIGHT}:flags=area,format=gray"
+    if fps:
+        video_filter = f"fps=fps={fps}," + video_filter
+
+    cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if start_time > 0:
+        cmd.extend(["-ss", f"{start_time:.6f}"])
+    cmd.extend(["-i", video_path, "-map", "0:v:0", "-an", "-sn", "-vf", video_filter, "-vsync", "0"])
+    if max_frames:
+        cmd.extend(["-frames:v", str(max_frames)])
+    cmd.extend(["-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"])
+
+    startupinfo, creationflags, env = get_subprocess_startupinfo()
+    frame_size = THUMBNAIL_WIDTH * THUMBNAIL_HEIGHT
+
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            startupinfo=startupinfo,
+            creationflags=creationflags,
+            env=env
+        )
+    except Exception as e:
+        logger.error(f"Could not start FFmpeg thumbnail scan: {e}")
+        return None
+
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    try:
+        data = process.stdout.read()
+        returncode = process.wait()
+        stderr_thread.join()
+    except Exception as e:
+        logger.error(f"Error reading thumbnails for {video_path}: {e}")
+        process.kill()
+        process.wait()
+        return None
+
+    if returncode != 0:
+        stderr = b"".join(stderr_lines).decode('utf-8', errors='replace')
+        logger.error(f"FFmpeg thumbnail scan failed ({returncode}): {stderr.strip()}")
+        return None
+
+    usable = len(data) - (len(data) % frame_size)
+    if usable == 0:
+        logger.error(f"FFmpeg thumbnail scan returned no frames for: {video_path}")
+        return None
+
+    thumbnails = np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, frame_size).astype(np.float32)
+    thumbnails -= thumbnails.mean(axis=1, keepdims=True)
+    spread = thumbnails.std(axis=1, keepdims=True)
+    np.divide(thumbnails, spread, out=thumbnails, where=spread > 1e-3)
+    thumbnails[spread[:, 0] <= 1e-3] = 0.0
+    return thumbnails
+
+
+def packet_hints(packet_table, start_frame, frame_count, fps):
+    """
+    Drop and duplicate hints for captured frames from the packet table
+
+    A timestamp gap before a frame means frames were lost in front of it;
+    a packet far smaller than its neighbours is usually an encoded repeat.
+
+    Returns:
+        (drop_hint, duplicate_hint) boolean arrays over the captured window
+    """
+    drop_hint = np.zeros(frame_count, dtype=bool)
+    duplicate_hint = np.zeros(frame_count, dtype=bool)
+    if packet_table is None or not fps:
+        return drop_hint, duplicate_hint
+
+    end_frame = min(len(packet_table), start_frame + frame_count)
+    if end_frame - start_frame < 2:
+        return drop_hint, duplicate_hint
+
+    pts = packet_table.pts_time[start_frame:end_frame]
+    gaps = np.diff(pts) * fps
+    drop_hint[1:len(pts)] = gaps > 1.5
+
+    sizes = packet_table.size[start_frame:end_frame]
+    duplicate_hint[:len(sizes)] = sizes < 0.1 * max(float(np.median(sizes)), 1.0)
+    return drop_hint, duplicate_hint
+
+
+def map_frames(reference, captured, lead=0, band=30, drop_hint=None, duplicate_hint=None):
+    """
+    Match every reference frame to a captured frame, allowing drops and duplicates
+
+    A banded dynamic programme over (reference frame, captured frame) pairs.
+    Between consecutive reference frames the captured position advances by one
+    (a clean frame), zero (the capture dropped this reference frame) or two or
+    three (the capture repeated a frame once or twice). Each step costs the
+    thumbnail distance of the pair it lands on plus a penalty for drops and
+    duplicates, scaled to how much the reference moves from frame to frame, so
+    isolated look-alike frames do not cause spurious events.
+
+    Args:
+        reference: Normalised reference thumbnails
+        captured: Normalised captured thumbnails; captured row lead is the nominal match of reference row 0
+        lead: Captured rows before the nominal start
+        band: Largest drift (frames) between the nominal and the mapped position
+        drop_hint, duplicate_hint: Optional boolean arrays over captured rows that lower the penalties there
+
+    Returns:
+        Dict with mapping (captured row per reference frame), matched (True where the
+        reference frame has its own captured frame), events, dropped_frames,
+        duplicated_frames and mean_distance, or None if nothing could be mapped
+    """
+    n = len(reference)
+    m = len(captured)
+    if n == 0 or m == 0:
+        return None
+
+    pixels = reference.shape[1]
+    width = 2 * band + 1
+    offsets = np.arange(width) - band
+
+    motion = MIN_MOTION_DISTANCE
+    if n > 1:
+        motion = max(motion, float(np.median(2.0 - 2.0 * np.sum(reference[1:] * reference[:-1], axis=1) / pixels)))
+
+    drop_penalty = np.full(m, DROP_PENALTY * motion, dtype=np.float32)
+    duplicate_penalty = np.full(m, DUPLICATE_PENALTY * motion, dtype=np.float32)
+    if drop_hint is not None:
+        drop_penalty[np.asarray(drop_hint[:m], dtype=bool)] *= HINTED_PENALTY_FACTOR
+    if duplicate_hint is not None:
+        duplicate_penalty[np.asarray(duplicate_hint[:m], dtype=bool)] *= HINTED_PENALTY_FACTOR
+
+    # cost[i][k]: best path ending with reference frame i on captured row i + lead + offsets[k]
+    back = np.zeros((n, width), dtype=np.int8)
+    distances = np.empty((n, width), dtype=np.float32)
+    previous = None
+
+    for i in range(n):
+        rows = i + lead + offsets
+        valid = (rows >= 0) & (rows < m)
+        clipped = np.clip(rows, 0, m - 1)
+
+        distance = 2.0 - 2.0 * (captured[clipped] @ reference[i]) / pixels
+        distance[~valid] = np.inf
+        distances[i] = distance
+
+        if previous is None:
+            # Captured frames skipped before the first match count as repeats
+            cost = distance + DUPLICATE_PENALTY * motion * np.abs(offsets)
+        else:
+            # Step of 1: same band slot; 0 (drop): slot k + 1; 2 or 3 (repeats): slots k - 1, k - 2
+            candidates = np.full((4, width), np.inf, dtype=np.float32)
+            candidates[0] = previous
+            candidates[1, :-1] = previous[1:] + drop_penalty[clipped[:-1]]
+            candidates[2, 1:] = previous[:-1] + duplicate_penalty[clipped[1:]]
+            candidates[3, 2:] = previous[:-2] + 2 * duplicate_penalty[clipped[2:]]
+            choice = np.argmin(candidates, axis=0)
+            back[i] = choice
+            cost = distance + candidates[choice, np.arange(width)]
+        previous = cost
+
+    if not np.isfinite(previous).any():
+        return None
+
+    # Trace the cheapest path back from the last reference frame
+    slots = np.empty(n, dtype=np.int64)
+    slots[-1] = int(np.argmin(previous))
+    slot_shift = np.array([0, 1, -1, -2])
+    for i in range(n - 1, 0, -1):
+        slots[i - 1] = slots[i] + slot_shift[back[i, slots[i]]]
+
+    mapping = np.arange(n) + lead + offsets[slots]
+    steps = np.diff(mapping, prepend=mapping[0] - 1)
+    matched = steps > 0
+
+    events = []
+    for i in np.flatnonzero(steps != 1).tolist():
+        step = int(steps[i])
+        if step == 0:
+            events.append({'type': 'drop', 'reference_frame': i, 'captured_frame': int(mapping[i]), 'frames': 1})
+        else:
+            events.append({'type': 'duplicate', 'reference_frame': i, 'captured_frame': int(mapping[i]),
+                           'frames': step - 1})
+
+    pair_distances = distances[np.arange(n), slots]
+    return {
+        'mapping': mapping,
+        'matched': matched,
+        'events': events,
+        'dropped_frames': int(np.count_nonzero(steps == 0)),
+        'duplicated_frames': int(np.sum(steps[steps > 1] - 1)),
+        'mean_distance': float(pair_distances[matched].mean()) if matched.any() else None
+    }
+
+
+def frame_ranges(frames):
+    """Collapse sorted frame numbers into inclusive [first, last] ranges"""
+    frames = np.asarray(frames, dtype=np.int64)
+    if len(frames) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(frames) != 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(frames) - 1]))
+    return [[int(frames[s]), int(frames[e])] for s, e in zip(starts, ends)]
+
+
+def mapping_ranges(result, lead=0):
+    """
+    Frame ranges selecting the matched pairs of a frame mapping
+
+    Returns:
+        Dict with reference_ranges, captured_ranges (counted from the first matched
+        captured row), captured_offset (first matched captured row relative to the
+        nominal start) and pair_count
+    """
+    matched = result['matched']
+    reference_frames = np.flatnonzero(matched)
+    captured_frames = result['mapping'][matched]
+    first = int(captured_frames[0]) if len(captured_frames) else lead
+    return {
+        'reference_ranges': frame_ranges(reference_frames),
+        'captured_ranges': frame_ranges(captured_frames - first),
+        'captured_offset': first - lead,
+        'pair_count': int(len(reference_frames))
+    }
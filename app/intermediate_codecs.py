@@ -0,0 +1,68 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Codec profiles for the aligned intermediates written before VMAF analysis.
+# The lossless profiles keep the decoded pixels (and pixel format) bit-exact,
+# so the score only measures the distortion of the capture chain.
+INTERMEDIATE_PROFILES = {
+    "x264_crf23": {
+        "label": "H.264 CRF 23 (lossy)",
+        "extension": ".mp4",
+        "video_args": ["-c:v", "libx264", "-crf", "23", "-preset", "fast"],
+        "audio_args": ["-c:a", "copy"],
+        "lossless": False
+    },
+    "x264_lossless": {
+        "label": "H.264 lossless (QP 0, ultrafast)",
+        "extension": ".mp4",
+        "video_args": ["-c:v", "libx264", "-qp", "0", "-preset", "ultrafast"],
+        "audio_args": ["-c:a", "copy"],
+        "lossless": True
+    },
+    "ffv1": {
+        "label": "FFV1 (lossless, multi-slice)",
+        "extension": ".mkv",
+        # Intra-only with 16 slices, so both encoding and decoding spread across cores
+        "video_args": ["-c:v", "ffv1", "-level", "3", "-slices", "16", "-slicecrc", "0", "-g", "1"],
+        "audio_args": ["-c:a", "copy"],
+        "lossless": True
+    },
+    "utvideo": {
+        "label": "Ut Video (lossless)",
+        "extension": ".mkv",
+        "video_args": ["-c:v", "utvideo"],
+        "audio_args": ["-c:a", "copy"],
+        "lossless": True
+    },
+    "raw_nut": {
+        "label": "Raw YUV (NUT)",
+        "extension": ".nut",
+        "video_args": ["-c:v", "rawvideo"],
+        "audio_args": ["-an"],
+        "lossless": True
+    }
+}
+
+DEFAULT_INTERMEDIATE_PROFILE = "x264_lossless"
+
+
+def intermediate_profile(name):
+    """Return the named intermediate profile, falling back to the default for unknown names"""
+    profile = INTERMEDIATE_PROFILES.get(name)
+    if profile is None:
+        logger.warning(f"Unknown intermediate profile '{name}', using {DEFAULT_INTERMEDIATE_PROFILE}")
+        profile = INTERMEDIATE_PROFILES[DEFAULT_INTERMEDIATE_PROFILE]
+    return profile
+
+
+def intermediate_output_args(name, audio=True):
+    """FFmpeg output codec options for an intermediate profile"""
+    profile = intermediate_profile(name)
+    return profile["video_args"] + (profile["audio_args"] if audio else ["-an"])
+
+
+def intermediate_path(directory, base_name, name):
+    """Output path of an intermediate with the container extension of its profile"""
+    return os.path.join(directory, base_name + intermediate_profile(name)["extension"])
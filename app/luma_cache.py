@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from .luma_profile import LumaProfile
+from .utils import user_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Sidecar written next to each video: "<video file name>.luma.npz"
+SIDECAR_SUFFIX = ".luma.npz"
+
+# Bump when the profile layout or statistics change so old sidecars are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Serialises index updates between the alignment and reference analysis threads
+_index_lock = threading.Lock()
+
+
+def default_index_path():
+    """Location of the cache index in the per-user cache directory"""
+    return user_cache_dir("luma_cache_index.json")
+
+
+def sidecar_path(video_path):
+    """Path of the luma profile sidecar for a video"""
+    return os.path.abspath(video_path) + SIDECAR_SUFFIX
+
+
+class LumaProfileCache:
+    """
+    Persistent per-file luma profile cache
+
+    Profiles are stored in a compressed sidecar next to the video, one entry per
+    profile kind ("full", "keyframe_windows", ...). Each entry is keyed by the
+    video's absolute path, size and modification time plus the decoder settings
+    that produced it, so a rewritten video or a different backend simply misses.
+
+    A JSON index in the per-user cache directory records every sidecar the cache has
+    written. When their total size exceeds max_size_mb, the least recently used
+    sidecars are deleted.
+    """
+
+    def __init__(self, max_size_mb=256, index_path=None, enabled=True):
+        self.max_size_mb = max_size_mb
+        self.index_path = index_path or default_index_path()
+        self.enabled = enabled
+
+    def make_key(self, video_path, kind, settings):
+        """Cache key for a profile of the given kind and decoder settings"""
+        stat = os.stat(video_path)
+        key_data = {
+            "version": CACHE_FORMAT_VERSION,
+            "path": os.path.abspath(video_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "kind": kind,
+            "settings": settings or {}
+        }
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load(self, video_path, kind, settings=None):
+        """
+        Load a cached profile
+
+        Returns:
+            LumaProfile, or None if there is no valid entry
+        """
+        if not self.enabled:
+            return None
+
+        path = sidecar_path(video_path)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            key = self.make_key(video_path, kind, settings)
+            entries = self._read_sidecar(path)
+            entry = entries.get(kind)
+            if entry is None or entry["key"] != key:
+                return None
+
+            profile = LumaProfile(entry["frame_indices"], entry["stats"], entry["fps"], entry["frame_count"])
+            self._touch(path)
+            return profile
+
+        except Exception as e:
+            logger.warning(f"Could not read luma profile cache {path}: {e}")
+            return None
+
+    def store(self, video_path, kind, profile, settings=None):
+        """
+        Store a profile in the video's sidecar, replacing stale entries
+
+        Returns:
+            True if the profile was written
+        """
+        if not self.enabled or profile is None:
+            return False
+
+        path = sidecar_path(video_path)
+        try:
+            key = self.make_key(video_path, kind, settings)
+
+            # Keep other kinds only if they still belong to this version of the video
+            entries = self._read_sidecar(path) if os.path.exists(path) else {}
+            stat = os.stat(video_path)
+            entries = {k: e for k, e in entries.items()
+                       if e["size"] == stat.st_size and e["mtime_ns"] == stat.st_mtime_ns}
+
+            entries[kind] = {
+                "key": key,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "fps": float(profile.fps or 0),
+                "frame_count": int(profile.frame_count),
+                "frame_indices": profile.frame_indices,
+                "stats": profile.stats
+            }
+            self._write_sidecar(path, entries)
+            self._touch(path)
+            self._evict(keep=path)
+            return True
+
+        except Exception as e:
+            logger.warning(f"Could not write luma profile cache {path}: {e}")
+            return False
+
+    def invalidate(self, video_path):
+        """Delete the cached profiles for a video"""
+        path = sidecar_path(video_path)
+        with _index_lock:
+            index = self._read_index()
+            index.pop(path, None)
+            self._write_index(index)
+        self._remove(path)
+
+    def _read_sidecar(self, path):
+        entries = {}
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            for kind, entry in meta.items():
+                entry["frame_indices"] = data[f"{kind}_indices"]
+                entry["stats"] = data[f"{kind}_stats"]
+                entries[kind] = entry
+        return entries
+
+    def _write_sidecar(self, path, entries):
+        arrays = {}
+        meta = {}
+        for kind, entry in entries.items():
+            arrays[f"{kind}_indices"] = np.asarray(entry["frame_indices"], dtype=np.int64)
+            arrays[f"{kind}_stats"] = np.asarray(entry["stats"], dtype=np.float32)
+            meta[kind] = {k: v for k, v in entry.items() if k not in ("frame_indices", "stats")}
+
+        # Write to a temporary file first so a crash never leaves a truncated sidecar
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(temp_path, path)
+
+    def _touch(self, path):
+        """Record a sidecar's size and last use in the index"""
+        with _index_lock:
+            index = self._read_index()
+            index[path] = {"size": os.path.getsize(path), "last_used": time.time()}
+            self._write_index(index)
+
+    def _evict(self, keep=None):
+        """Delete least recently used sidecars until the cache fits its size limit"""
+        max_bytes = self.max_size_mb * 1024 * 1024
+        with _index_lock:
+            index = self._read_index()
+
+            # Forget sidecars that were deleted along with their video
+            index = {p: e for p, e in index.items() if os.path.exists(p)}
+
+            total = sum(e["size"] for e in index.values())
+            for path, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+                if total <= max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._remove(path)
+                total -= entry["size"]
+                del index[path]
+                logger.info(f"Evicted luma profile cache {path}")
+
+            self._write_index(index)
+
+    def _remove(self, path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove luma profile cache {path}: {e}")
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(self.index_path, 'w') as f:
+                json.dump(index, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write luma profile cache index: {e}")
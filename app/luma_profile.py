@@ -0,0 +1,413 @@
+import logging
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+# Luma level above which a pixel counts towards the white-pixel ratio
+LUMA_WHITE_LEVEL = 200
+
+# Column layout of LumaProfile.stats
+STAT_MEAN = 0
+STAT_STD = 1
+STAT_WHITE_RATIO = 2
+
+# Size of the downscaled luma plane streamed by the FFmpeg backend
+FFMPEG_PROFILE_WIDTH = 160
+FFMPEG_PROFILE_HEIGHT = 90
+
+# Size of the luma side stream emitted by a running capture
+LIVE_PROFILE_WIDTH = 64
+LIVE_PROFILE_HEIGHT = 36
+
+# Cache settings identifying a profile recorded from the capture side stream
+LIVE_PROFILE_SETTINGS = {
+    "backend": "live",
+    "white_level": LUMA_WHITE_LEVEL,
+    "width": LIVE_PROFILE_WIDTH,
+    "height": LIVE_PROFILE_HEIGHT
+}
+
+
+class LumaProfile:
+    """
+    Compact per-frame luma statistics for a video
+
+    Each decoded frame is reduced to one float32 row of
+    (mean brightness, brightness std-dev, white-pixel ratio), so a profile
+    costs 12 bytes per frame regardless of the video resolution.
+    """
+
+    def __init__(self, frame_indices, stats, fps, frame_count=None):
+        self.frame_indices = np.asarray(frame_indices, dtype=np.int64)
+        self.stats = np.asarray(stats, dtype=np.float32).reshape(-1, 3)
+        self.fps = fps
+
+        if frame_count is None:
+            frame_count = int(self.frame_indices[-1]) + 1 if len(self.frame_indices) else 0
+        self.frame_count = frame_count
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    @property
+    def mean(self):
+        return self.stats[:, STAT_MEAN]
+
+    @property
+    def std(self):
+        return self.stats[:, STAT_STD]
+
+    @property
+    def white_ratio(self):
+        return self.stats[:, STAT_WHITE_RATIO]
+
+    @property
+    def nbytes(self):
+        """Memory used by the profile arrays"""
+        return self.frame_indices.nbytes + self.stats.nbytes
+
+    @property
+    def is_sparse(self):
+        """True if only some of the video's frames were scanned"""
+        return len(self.frame_indices) < self.frame_count
+
+    def dense_stats(self):
+        """
+        Statistics for every frame of the video
+
+        Frames that were not scanned are filled with zeros, which no white
+        frame rule accepts, so they simply break any run of white frames.
+        """
+        if not self.is_sparse:
+            return self.stats
+
+        dense = np.zeros((self.frame_count, 3), dtype=np.float32)
+        dense[self.frame_indices] = self.stats
+        return dense
+
+    @classmethod
+    def concatenate(cls, profiles, fps, frame_count):
+        """Join profiles of separate frame ranges into one profile"""
+        profiles = [p for p in profiles if p is not None and len(p)]
+        if not profiles:
+            return None
+
+        frame_indices = np.concatenate([p.frame_indices for p in profiles])
+        stats = np.concatenate([p.stats for p in profiles])
+
+        # Keep the first row for any frame that was scanned twice
+        frame_indices, first = np.unique(frame_indices, return_index=True)
+        return cls(frame_indices, stats[first], fps, frame_count)
+
+
+def luma_gray_filter(width, height):
+    """FFmpeg filter producing a downscaled full-range luma plane"""
+    # Convert straight to full-range gray so levels match OpenCV's BGR->gray output
+    return f"scale={width}:{height}:flags=area:out_range=pc,format=gray"
+
+
+def luma_plane_stats(planes, white_level=LUMA_WHITE_LEVEL):
+    """
+    Reduce a batch of flattened gray planes to profile rows
+
+    Args:
+        planes: (frames, pixels) uint8 array
+        white_level: Luma level above which a pixel counts as white
+
+    Returns:
+        (frames, 3) float32 array of mean, std-dev and white ratio
+    """
+    batch = np.empty((len(planes), 3), dtype=np.float32)
+    batch[:, STAT_MEAN] = planes.mean(axis=1)
+    batch[:, STAT_STD] = planes.std(axis=1)
+    batch[:, STAT_WHITE_RATIO] = np.count_nonzero(planes > white_level, axis=1) / planes.shape[1]
+    return batch
+
+
+def scan_luma_profile_opencv(video_path, white_level=LUMA_WHITE_LEVEL, max_frames=None):
+    """
+    Decode a video once, in order, and collect per-frame luma statistics
+
+    Only the statistics are kept; decoded frames are discarded immediately,
+    so memory stays bounded no matter how long the video is.
+
+    Args:
+        video_path: Path to the video file
+        white_level: Luma level above which a pixel counts as white
+        max_frames: Stop after this many frames (None for the whole video)
+
+    Returns:
+        LumaProfile or None on error
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Could not open video: {video_path}")
+        return None
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        expected_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if max_frames is not None:
+            expected_frames = min(expected_frames, max_frames)
+
+        # Preallocate from the container's frame count and grow if it was an underestimate
+        stats = np.empty((max(expected_frames, 1), 3), dtype=np.float32)
+        decoded = 0
+
+        while max_frames is None or decoded < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            if decoded >= len(stats):
+                stats = np.concatenate([stats, np.empty_like(stats)])
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            mean, std_dev = cv2.meanStdDev(gray)
+            white_pixels = cv2.countNonZero(cv2.threshold(gray, white_level, 255, cv2.THRESH_BINARY)[1])
+
+            stats[decoded] = (mean[0, 0], std_dev[0, 0], white_pixels / gray.size)
+            decoded += 1
+
+        if decoded == 0:
+            logger.error(f"Could not decode any frames from: {video_path}")
+            return None
+
+        if expected_frames and decoded != expected_frames:
+            logger.info(f"Decoded {decoded} frames (container reported {expected_frames})")
+
+        return LumaProfile(np.arange(decoded), stats[:decoded], fps, decoded)
+
+    except Exception as e:
+        logger.error(f"Error scanning luma profile for {video_path}: {e}")
+        return None
+    finally:
+        cap.release()
+
+
+def scan_luma_profile_ffmpeg(video_path, fps, ffmpeg_path="ffmpeg", start_frame=0, max_frames=None,
+                             white_level=LUMA_WHITE_LEVEL, width=FFMPEG_PROFILE_WIDTH,
+                             height=FFMPEG_PROFILE_HEIGHT, keyframes_only=False, threads=None, seek_time=None):
+    """
+    Collect per-frame luma statistics with a single FFmpeg process
+
+    FFmpeg decodes the video with its own threads, reduces each frame to a
+    downscaled full-range luma plane and streams that over a pipe, so Python only handles
+    a small gray plane per frame and reduces whole batches of frames at once.
+
+    Args:
+        video_path: Path to the video file
+        fps: Frame rate of the video (used for seeking and frame timing)
+        ffmpeg_path: FFmpeg executable
+        start_frame: First frame to scan
+        max_frames: Maximum number of frames to scan (None = to the end)
+        white_level: Luma level above which a pixel counts as white
+        width, height: Size of the downscaled luma plane
+        keyframes_only: Decode keyframes only (-skip_frame nokey); the profile
+            then holds one row per keyframe, indexed by its frame number
+        threads: Decoder threads for this FFmpeg process (None = FFmpeg default)
+        seek_time: Seek position in seconds that lands on start_frame
+            (None = half a frame before start_frame at the nominal fps)
+
+    Returns:
+        LumaProfile or None on error
+    """
+    video_filter = luma_gray_filter(width, height)
+
+    # showinfo logs at info level and reports the timestamp of each keyframe
+    cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "info" if keyframes_only else "error", "-nostdin"]
+    if threads:
+        cmd.extend(["-threads", str(threads)])
+    if keyframes_only:
+        cmd.extend(["-skip_frame", "nokey"])
+        video_filter += ",showinfo"
+    if seek_time is None and start_frame > 0 and fps:
+        # Seek half a frame early so rounding can never skip the first wanted frame
+        seek_time = (start_frame - 0.5) / fps
+    if seek_time:
+        cmd.extend(["-ss", f"{seek_time:.6f}"])
+    cmd.extend([
+        "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", video_filter,
+        "-vsync", "0"
+    ])
+    if max_frames:
+        cmd.extend(["-frames:v", str(max_frames)])
+    cmd.extend(["-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"])
+
+    startupinfo, creationflags, env = get_subprocess_startupinfo()
+    frame_size = width * height
+    batch_frames = 256
+    batches = []
+
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            startupinfo=startupinfo,
+            creationflags=creationflags,
+            env=env
+        )
+    except Exception as e:
+        logger.error(f"Could not start FFmpeg luma scan: {e}")
+        return None
+
+    # Drain stderr on a thread so a chatty log can never block the frame pipe
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    try:
+        while True:
+            data = process.stdout.read(frame_size * batch_frames)
+            if not data:
+                break
+
+            usable = len(data) - (len(data) % frame_size)
+            if usable == 0:
+                break
+
+            planes = np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, frame_size)
+            batches.append(luma_plane_stats(planes, white_level))
+
+        returncode = process.wait()
+        stderr_thread.join()
+    except Exception as e:
+        logger.error(f"Error reading FFmpeg luma statistics for {video_path}: {e}")
+        process.kill()
+        process.wait()
+        return None
+
+    stderr = b"".join(stderr_lines).decode('utf-8', errors='replace')
+    if returncode != 0:
+        logger.error(f"FFmpeg luma scan failed ({returncode}): {stderr.strip()}")
+        return None
+
+    if not batches:
+        logger.error(f"FFmpeg luma scan returned no frames for: {video_path}")
+        return None
+
+    stats = np.concatenate(batches)
+    decoded = len(stats)
+
+    if keyframes_only:
+        pts_times = [float(t) for t in re.findall(r"\bpts_time:\s*([-\d.]+)", stderr)]
+        if len(pts_times) != decoded:
+            logger.error(f"FFmpeg keyframe scan reported {len(pts_times)} timestamps for {decoded} frames")
+            return None
+
+        # The first decodable frame is always a keyframe, so timestamps are relative to it
+        pts_times = np.asarray(pts_times)
+        frame_indices = start_frame + np.rint((pts_times - pts_times[0]) * fps).astype(np.int64)
+        return LumaProfile(frame_indices, stats, fps)
+
+    return LumaProfile(np.arange(start_frame, start_frame + decoded), stats, fps, start_frame + decoded)
+
+
+def plan_scan_chunks(frame_count, chunk_count, keyframes=None, min_chunk_frames=0):
+    """
+    Split a video into contiguous frame ranges for parallel scanning
+
+    Chunk starts are snapped to the nearest keyframe when keyframe positions are
+    known, so no worker decodes frames it then throws away.
+
+    Returns:
+        List of (start_frame, frame_count) tuples covering every frame once
+    """
+    if min_chunk_frames:
+        chunk_count = min(chunk_count, frame_count // min_chunk_frames)
+    chunk_count = max(1, chunk_count)
+
+    starts = np.linspace(0, frame_count, chunk_count, endpoint=False).astype(np.int64)
+    if keyframes is not None and len(keyframes):
+        keyframes = np.asarray(keyframes, dtype=np.int64)
+        nearest = np.abs(keyframes[None, :] - starts[:, None]).argmin(axis=1)
+        starts = keyframes[nearest]
+
+    starts = np.unique(np.concatenate(([0], starts[(starts > 0) & (starts < frame_count)])))
+    ends = np.append(starts[1:], frame_count)
+    return [(int(start), int(end - start)) for start, end in zip(starts, ends)]
+
+
+def scan_luma_profile_parallel(video_path, fps, frame_count, workers=None, ffmpeg_path="ffmpeg",
+                               keyframes=None, min_chunk_frames=300):
+    """
+    Scan a whole video as parallel chunks and stitch them into one profile
+
+    Each chunk runs in its own FFmpeg process, which does the decoding, so plain
+    threads are enough to keep every core busy. Profiles are per-frame, so the
+    stitched result is identical to a single sequential scan and runs of white
+    frames that cross a chunk boundary stay intact.
+
+    Args:
+        video_path: Path to the video file
+        fps: Frame rate of the video
+        frame_count: Number of frames in the video
+        workers: Parallel FFmpeg processes (None = one per CPU core)
+        ffmpeg_path: FFmpeg executable
+        keyframes: Optional keyframe frame indices used to align chunk starts
+        min_chunk_frames: Smallest chunk worth a separate process
+
+    Returns:
+        LumaProfile or None if any chunk failed
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    chunks = plan_scan_chunks(frame_count, workers, keyframes, min_chunk_frames)
+
+    if len(chunks) == 1:
+        return scan_luma_profile_ffmpeg(video_path, fps, ffmpeg_path=ffmpeg_path)
+
+    # Share the cores between the FFmpeg processes instead of oversubscribing them
+    threads_per_worker = max(1, cpu_count // len(chunks))
+    logger.info(f"Scanning {frame_count} frames in {len(chunks)} chunks with {min(workers, len(chunks))} workers")
+
+    def scan_chunk(chunk):
+        start, count = chunk
+        # Let the last chunk run to the end in case the container underestimated the frame count
+        max_frames = count if start + count < frame_count else None
+        return scan_luma_profile_ffmpeg(video_path, fps, ffmpeg_path=ffmpeg_path, start_frame=start,
+                                        max_frames=max_frames, threads=threads_per_worker)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        profiles = list(executor.map(scan_chunk, chunks))
+
+    for (start, count), profile in zip(chunks, profiles):
+        if profile is None:
+            logger.warning(f"Chunk starting at frame {start} failed")
+            return None
+        if start + count < frame_count and len(profile) != count:
+            logger.warning(f"Chunk starting at frame {start} returned {len(profile)} of {count} frames")
+            return None
+
+    stitched = LumaProfile.concatenate(profiles, fps, profiles[-1].frame_count)
+    if stitched.is_sparse:
+        logger.warning("Parallel scan left gaps between chunks")
+        return None
+    return stitched
+
+
+def scan_luma_profile(video_path, fps=None, backend="ffmpeg", ffmpeg_path="ffmpeg"):
+    """
+    Scan a whole video with the requested statistics backend
+
+    The FFmpeg backend falls back to OpenCV if FFmpeg is unavailable or fails.
+    """
+    if backend == "ffmpeg" and fps:
+        profile = scan_luma_profile_ffmpeg(video_path, fps, ffmpeg_path=ffmpeg_path)
+        if profile is not None:
+            return profile
+        logger.warning("FFmpeg luma statistics failed, falling back to OpenCV")
+
+    return scan_luma_profile_opencv(video_path)
@@ -0,0 +1,153 @@
+import logging
+import math
+import re
+
+from .alignment_descriptor import alignment_filter_chains, alignment_filtergraph
+from .vmaf_log import read_vmaf_log
+
+logger = logging.getLogger(__name__)
+
+# Metrics the engine can compute in one decode of both inputs.
+#   libvmaf: the libvmaf filter itself
+#   filter:  a separate two-input FFmpeg filter, fed its own split of the decoded
+#            frames and writing a per-frame stats file (stats_key is the column pooled)
+#   feature: an extra libvmaf feature extractor, computed inside the libvmaf filter
+#            and written to its per-frame log (pooled_key is the metric name there)
+METRICS = {
+    "vmaf": {"label": "VMAF", "kind": "libvmaf", "pooled_key": "vmaf"},
+    "psnr": {"label": "PSNR", "kind": "filter", "filter": "psnr", "stats_key": "psnr_avg"},
+    "ssim": {"label": "SSIM", "kind": "filter", "filter": "ssim", "stats_key": "All"},
+    "ms_ssim": {"label": "MS-SSIM", "kind": "feature", "feature": "float_ms_ssim", "pooled_key": "float_ms_ssim",
+                "description": "Multi-scale SSIM, computed by libvmaf alongside VMAF"},
+    "cambi": {"label": "CAMBI", "kind": "feature", "feature": "cambi", "pooled_key": "cambi",
+              "description": "Banding visibility (0 = no banding), computed by libvmaf alongside VMAF"},
+    "vmaf_psnr": {"label": "PSNR-Y (libvmaf)", "kind": "feature", "feature": "psnr", "pooled_key": "psnr_y",
+                  "description": "Luma PSNR from libvmaf's own feature extractor"},
+    "float_ssim": {"label": "SSIM (libvmaf)", "kind": "feature", "feature": "float_ssim", "pooled_key": "float_ssim",
+                   "description": "SSIM from libvmaf's own feature extractor"}
+}
+
+# Metrics that can be switched on in the VMAF settings besides PSNR and SSIM
+OPTIONAL_METRICS = [name for name, metric in METRICS.items() if metric["kind"] == "feature"]
+
+
+def libvmaf_feature_option(metrics):
+    """
+    libvmaf option enabling the feature metrics among metrics
+
+    libvmaf takes a single feature option, so every extractor goes into one
+    '|'-separated list.
+
+    Returns:
+        Option string such as "feature='name=cambi|name=float_ssim'", or None
+    """
+    names = [METRICS[name]["feature"] for name in metrics
+             if name in METRICS and METRICS[name]["kind"] == "feature"]
+    if not names:
+        return None
+    return "feature='" + "|".join(f"name={name}" for name in names) + "'"
+
+
+def stats_filter(name, stats_path):
+    """Two-input filter computing a filter metric and writing its per-frame stats"""
+    return f"{METRICS[name]['filter']}=stats_file={stats_path}"
+
+
+def metric_filtergraph(alignment, libvmaf_filter, stats_filters=(), distorted_input=0, reference_input=1):
+    """
+    Filtergraph computing libvmaf and further metric filters from one decode
+
+    Each input is decoded and aligned once, then fanned out with split so
+    every metric filter receives the same frames. The metric outputs are left
+    unlabelled, so FFmpeg maps them all to the null output.
+
+    Args:
+        alignment: Alignment descriptor, or None to compare the inputs as they are
+        libvmaf_filter: The libvmaf filter, e.g. "libvmaf=log_path=..."
+        stats_filters: Further two-input metric filters, e.g. from stats_filter()
+        distorted_input, reference_input: FFmpeg input indices
+
+    Returns:
+        Filtergraph string for -lavfi
+    """
+    if not stats_filters:
+        return alignment_filtergraph(alignment, libvmaf_filter, distorted_input, reference_input)
+
+    filters = [libvmaf_filter, *stats_filters]
+    branches = len(filters)
+    distorted_labels = "".join(f"[dist{i}]" for i in range(branches))
+    reference_labels = "".join(f"[ref{i}]" for i in range(branches))
+
+    distorted_chain = reference_chain = ""
+    if alignment:
+        captured_chain, aligned_reference_chain = alignment_filter_chains(alignment)
+        distorted_chain = captured_chain + ","
+        reference_chain = aligned_reference_chain + ","
+
+    graph = [
+        f"[{distorted_input}:v]{distorted_chain}split={branches}{distorted_labels}",
+        f"[{reference_input}:v]{reference_chain}split={branches}{reference_labels}"
+    ]
+    graph.extend(f"[dist{i}][ref{i}]{metric_filter}" for i, metric_filter in enumerate(filters))
+    return ";".join(graph)
+
+
+def read_stats_file(stats_path, key):
+    """
+    Per-frame values of one column of a psnr/ssim stats file
+
+    Lines look like "n:1 mse_avg:0.52 ... psnr_avg:50.97 ..." (psnr) or
+    "n:1 Y:0.99 U:0.99 V:0.99 All:0.99 (20.5)" (ssim).
+
+    Returns:
+        List of floats, one per frame (inf where the frames were identical)
+    """
+    pattern = re.compile(rf"(?:^|\s){re.escape(key)}:(\S+)")
+    values = []
+    with open(stats_path, 'r') as f:
+        for line in f:
+            match = pattern.search(line)
+            if match:
+                values.append(float(match.group(1)))
+    return values
+
+
+def _mean(values):
+    """Mean of the finite values; identical frames give inf PSNR and would swamp it"""
+    finite = [value for value in values if math.isfinite(value)]
+    if finite:
+        return sum(finite) / len(finite)
+    return values[0] if values else None
+
+
+def metric_scores(vmaf_json_path, stats_paths=None, metrics=(), vmaf_log=None):
+    """
+    Pooled scores of every metric computed in one engine run
+
+    Args:
+        vmaf_json_path: libvmaf JSON log (VMAF and the feature metrics)
+        stats_paths: Dict of filter metric name -> stats file
+        metrics: Feature metrics that were requested
+        vmaf_log: The log already read with read_vmaf_log, to avoid reading it again
+
+    Returns:
+        Dict of metric name -> mean score (None where a metric has no values)
+    """
+    scores = {}
+    try:
+        vmaf_log = vmaf_log or read_vmaf_log(vmaf_json_path)
+        for name in ["vmaf", *metrics]:
+            key = METRICS.get(name, {}).get("pooled_key")
+            if key:
+                scores[name] = vmaf_log.mean(key)
+    except Exception as e:
+        logger.warning(f"Could not read metric scores from {vmaf_json_path}: {e}")
+
+    for name, stats_path in (stats_paths or {}).items():
+        try:
+            scores[name] = _mean(read_stats_file(stats_path, METRICS[name]["stats_key"]))
+        except Exception as e:
+            logger.warning(f"Could not read {METRICS[name]['label']} stats from {stats_path}: {e}")
+            scores[name] = None
+
+    return scores
@@ -0,0 +1,199 @@
+import logging
+import subprocess
+import threading
+
+import numpy as np
+
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+# Size of the luma plane each frame is reduced to for its signature
+SIGNATURE_WIDTH = 64
+SIGNATURE_HEIGHT = 36
+
+# Column layout of a signature array
+SIG_MEAN = 0
+SIG_GRADIENT = 1
+
+# Lags closer than this to the peak belong to the peak itself when measuring its margin
+PEAK_EXCLUSION_FRAMES = 2
+
+# Margin of the peak over the runner-up at which a match counts as unambiguous
+UNAMBIGUOUS_MARGIN = 0.1
+
+
+def signature_rows(planes, width=SIGNATURE_WIDTH, height=SIGNATURE_HEIGHT):
+    """
+    Reduce a batch of flattened gray planes to signature rows
+
+    Returns:
+        (frames, 2) float32 array of luma mean and gradient energy
+    """
+    frames = planes.reshape(-1, height, width).astype(np.float32)
+    rows = np.empty((len(frames), 2), dtype=np.float32)
+    rows[:, SIG_MEAN] = frames.mean(axis=(1, 2))
+    rows[:, SIG_GRADIENT] = (np.square(np.diff(frames, axis=2)).mean(axis=(1, 2)) +
+                             np.square(np.diff(frames, axis=1)).mean(axis=(1, 2)))
+    return rows
+
+
+def scan_frame_signatures(video_path, start_time=0.0, max_frames=None, fps=None, ffmpeg_path="ffmpeg"):
+    """
+    Decode part of a video into per-frame signatures with one FFmpeg process
+
+    Args:
+        video_path: Path to the video file
+        start_time: Seek position in seconds
+        max_frames: Maximum number of frames to decode (None = to the end)
+        fps: Resample to this frame rate first (None = keep the video's frames)
+        ffmpeg_path: FFmpeg executable
+
+    Returns:
+        (frames, 2) float32 signature array, or None on error
+    """
+    video_filter = f"scale={SIGNATURE_WIDTH}:{SIGNATURE_HEIGHT}:flags=area:out_range=pc,format=gray"
+    if fps:
+        video_filter = f"fps=fps={fps}," + video_filter
+
+    cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if start_time > 0:
+        cmd.extend(["-ss", f"{start_time:.6f}"])
+    cmd.extend(["-i", video_path, "-map", "0:v:0", "-an", "-sn", "-vf", video_filter, "-vsync", "0"])
+    if max_frames:
+        cmd.extend(["-frames:v", str(max_frames)])
+    cmd.extend(["-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"])
+
+    startupinfo, creationflags, env = get_subprocess_startupinfo()
+    frame_size = SIGNATURE_WIDTH * SIGNATURE_HEIGHT
+
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            startupinfo=startupinfo,
+            creationflags=creationflags,
+            env=env
+        )
+    except Exception as e:
+        logger.error(f"Could not start FFmpeg signature scan: {e}")
+        return None
+
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    try:
+        data = process.stdout.read()
+        returncode = process.wait()
+        stderr_thread.join()
+    except Exception as e:
+        logger.error(f"Error reading frame signatures for {video_path}: {e}")
+        process.kill()
+        process.wait()
+        return None
+
+    if returncode != 0:
+        stderr = b"".join(stderr_lines).decode('utf-8', errors='replace')
+        logger.error(f"FFmpeg signature scan failed ({returncode}): {stderr.strip()}")
+        return None
+
+    usable = len(data) - (len(data) % frame_size)
+    if usable == 0:
+        logger.error(f"FFmpeg signature scan returned no frames for: {video_path}")
+        return None
+
+    return signature_rows(np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, frame_size))
+
+
+def normalized_cross_correlation(reference, captured):
+    """
+    Pearson correlation of reference against every window of captured
+
+    Computed with one FFT for all lags, plus running sums for the mean and
+    spread of each captured window.
+
+    Args:
+        reference: 1-D array of length n
+        captured: 1-D array of length m >= n
+
+    Returns:
+        Array of m - n + 1 correlations; lag j compares reference with captured[j:j + n]
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    captured = np.asarray(captured, dtype=np.float64)
+    n = len(reference)
+    lags = len(captured) - n + 1
+
+    ref_centered = reference - reference.mean()
+    ref_norm = np.sqrt(np.dot(ref_centered, ref_centered))
+
+    size = 1 << int(np.ceil(np.log2(len(captured) + n)))
+    products = np.fft.irfft(np.fft.rfft(captured, size) * np.conj(np.fft.rfft(ref_centered, size)), size)[:lags]
+
+    # Spread of every captured window from running sums
+    sums = np.concatenate(([0.0], np.cumsum(captured)))
+    squares = np.concatenate(([0.0], np.cumsum(captured * captured)))
+    window_sums = sums[n:n + lags] - sums[:lags]
+    window_squares = squares[n:n + lags] - squares[:lags]
+    window_norms = np.sqrt(np.maximum(window_squares - window_sums * window_sums / n, 0.0))
+
+    denominator = ref_norm * window_norms
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.where(denominator > 1e-9, products / denominator, 0.0)
+    return correlation
+
+
+def estimate_offset(reference_signature, captured_signature, search_frames):
+    """
+    Find the lag at which the captured signature best matches the reference
+
+    The captured signature must cover the reference window plus search_frames
+    on either side: captured row search_frames is the nominal match of
+    reference row 0. The frame-to-frame changes of the luma mean and gradient
+    energy are correlated separately and their correlations averaged. Changes
+    rather than levels give a sharp peak even on slowly varying content;
+    features that are flat in the reference carry no timing information and
+    are left out.
+
+    Returns:
+        Dict with offset_frames (lag of the best match relative to the nominal
+        position, positive = later in the capture), correlation (at the best
+        lag), margin (over the best lag outside the peak), correlation_at
+        (lag -> correlation) and confidence, or None if nothing could be matched
+    """
+    if len(reference_signature) < 3 or len(captured_signature) < len(reference_signature):
+        return None
+
+    reference_changes = np.diff(np.asarray(reference_signature, dtype=np.float64), axis=0)
+    captured_changes = np.diff(np.asarray(captured_signature, dtype=np.float64), axis=0)
+
+    correlations = []
+    for column in (SIG_MEAN, SIG_GRADIENT):
+        if np.std(reference_changes[:, column]) < 1e-3:
+            continue
+        correlations.append(normalized_cross_correlation(reference_changes[:, column],
+                                                         captured_changes[:, column]))
+    if not correlations:
+        return None
+
+    combined = np.mean(correlations, axis=0)
+    lags = np.arange(len(combined)) - search_frames
+    best = int(np.argmax(combined))
+    peak = float(combined[best])
+
+    outside = np.abs(lags - lags[best]) > PEAK_EXCLUSION_FRAMES
+    runner_up = float(combined[outside].max()) if outside.any() else -1.0
+    margin = peak - runner_up
+
+    # A strong but not unique peak (periodic or static content) is not trusted more than its margin allows
+    confidence = float(np.clip(peak, 0.0, 1.0) * np.clip(margin / UNAMBIGUOUS_MARGIN, 0.0, 1.0))
+
+    return {
+        'offset_frames': int(lags[best]),
+        'correlation': peak,
+        'margin': margin,
+        'confidence': confidence,
+        'correlation_at': {int(lag): float(value) for lag, value in zip(lags, combined)}
+    }
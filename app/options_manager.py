@@ -48,9 +48,27 @@ class OptionsManager(QObject):
                 "min_frame_sampling_rate": 1,  # Added minimum frame sampling rate
                 "max_frame_sampling_rate": 30,  # Added maximum frame sampling rate
                 "frame_offset": 3,  # Default frame offset (negative means go back)
+                "offset_estimation": True,  # Measure the frame offset by signature cross-correlation
+                "offset_search_frames": 30,  # Offsets searched either side of the bookend timing
+                "frame_mapping": True,  # Pair frames individually, skipping captured drops and duplicates
+                "multi_loop_analysis": False,  # Align and score every complete loop, reporting mean/min/spread
                 "adaptive_brightness": True,
                 "motion_compensation": False,
-                "fallback_to_full_video": True
+                "motion_workers": 0,  # Parallel motion compensation segments (0 = one per CPU core)
+                "fallback_to_full_video": True,
+                "stats_backend": "ffmpeg",  # Luma statistics backend: ffmpeg or opencv
+                "packet_prefilter": True,  # Only decode windows around small-packet runs
+                "keyframe_coarse_scan": True,  # Localise bookends on keyframes in long captures
+                "edge_refinement": True,  # Seek to the GOPs around white keyframes for the exact bookend edges
+                "virtual_alignment": True,  # Pass the alignment to VMAF as filters instead of encoding aligned copies
+                "archive_aligned_capture": False,  # Smart-cut the aligned capture into an archive clip (virtual alignment)
+                "intermediate_profile": "x264_lossless",  # Codec for aligned files that are written (see intermediate_codecs)
+                "profile_cache": True,  # Cache luma profiles in sidecars next to the video
+                "profile_cache_max_mb": 256,  # Total size of cached luma profiles before eviction
+                "detection_workers": 0,  # Parallel bookend scan workers (0 = one per CPU core)
+                "encode_workers": 0,  # Parallel chunk encoders per aligned file (0 = chosen by the CPU scheduler)
+                "live_detection": True,  # Track bookends during capture and stop after min_loops
+                "ring_capture": False  # Keep a pre-roll ring and start recording at the first bookend
             },
             # VMAF settings
             "vmaf": {
@@ -67,6 +85,9 @@ class OptionsManager(QObject):
                 "enable_temporal_features": False,
                 "psnr_enabled": True,
                 "ssim_enabled": True,
+                "extra_metrics": [],  # Further metric_engine metrics, e.g. ["ms_ssim", "cambi"]
+                "segment_parallel": False,  # Score long comparisons as concurrent frame ranges
+                "segment_count": 0,  # Segments in segment-parallel mode (0 = chosen by the CPU scheduler)
                 "tester_name": "",
                 "test_location": ""
             },
@@ -93,7 +114,9 @@ class OptionsManager(QObject):
                 "is_interlaced": False,
                 "retry_attempts": 3,  # Number of device connection retry attempts
                 "retry_delay": 3,  # Seconds between retry attempts
-                "recovery_timeout": 10  # Seconds to wait for device recovery
+                "recovery_timeout": 10,  # Seconds to wait for device recovery
+                "input_source": "decklink",  # decklink, file (looped in real time) or lavfi (test stand-ins)
+                "input_spec": ""  # File path or lavfi graph for the file and lavfi sources
             },
             # Analysis settings
             "analysis": {
@@ -114,7 +137,10 @@ class OptionsManager(QObject):
                 "results_dir": "",
                 "temp_dir": "",
                 "models_dir": "",
-                "ffmpeg_path": ""
+                "ffmpeg_path": "",
+                "reference_cache_enabled": True,
+                "reference_cache_dir": "",
+                "reference_cache_max_gb": 20
             },
             # Debug settings
             "debug": {
@@ -0,0 +1,156 @@
+import logging
+import subprocess
+
+import numpy as np
+
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+
+class PacketTable:
+    """
+    Compressed-domain index of a video stream
+
+    Holds the presentation timestamp, size in bytes and keyframe flag of every
+    video packet, sorted into presentation order so that row i corresponds to
+    decoded frame i of a constant frame rate stream.
+    """
+
+    def __init__(self, pts_time, size, keyframe):
+        order = np.argsort(pts_time, kind='stable')
+        self.pts_time = np.asarray(pts_time, dtype=np.float64)[order]
+        self.size = np.asarray(size, dtype=np.int64)[order]
+        self.keyframe = np.asarray(keyframe, dtype=bool)[order]
+
+    def __len__(self):
+        return len(self.pts_time)
+
+    @property
+    def keyframe_indices(self):
+        """Frame indices of all keyframes"""
+        return np.flatnonzero(self.keyframe)
+
+    @property
+    def keyframe_times(self):
+        """Presentation times of all keyframes"""
+        return self.pts_time[self.keyframe]
+
+
+def read_packet_table(video_path, ffprobe_path="ffprobe"):
+    """
+    Read the packet table of the first video stream without decoding it
+
+    Args:
+        video_path: Path to the video file
+        ffprobe_path: FFprobe executable
+
+    Returns:
+        PacketTable or None on error
+    """
+    cmd = [
+        ffprobe_path,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,dts_time,size,flags",
+        "-of", "compact=p=0",
+        video_path
+    ]
+
+    try:
+        startupinfo, creationflags, env = get_subprocess_startupinfo()
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            startupinfo=startupinfo,
+            creationflags=creationflags,
+            env=env
+        )
+
+        if result.returncode != 0:
+            logger.error(f"FFprobe packet scan failed: {result.stderr}")
+            return None
+
+        pts_times = []
+        sizes = []
+        keyframes = []
+
+        for line in result.stdout.splitlines():
+            fields = dict(item.split('=', 1) for item in line.strip().split('|') if '=' in item)
+            if 'size' not in fields:
+                continue
+
+            # Fall back to the decode timestamp when the packet has no pts
+            pts = fields.get('pts_time', 'N/A')
+            if pts == 'N/A':
+                pts = fields.get('dts_time', 'N/A')
+            if pts == 'N/A':
+                continue
+
+            pts_times.append(float(pts))
+            sizes.append(int(fields['size']))
+            keyframes.append('K' in fields.get('flags', ''))
+
+        if not pts_times:
+            logger.error(f"No video packets found in {video_path}")
+            return None
+
+        return PacketTable(pts_times, sizes, keyframes)
+
+    except Exception as e:
+        logger.error(f"Error reading packet table for {video_path}: {e}")
+        return None
+
+
+def find_small_packet_runs(packet_table, min_run=3, size_ratio=0.1):
+    """
+    Find runs of unusually small packets
+
+    Flat white frames compress to a few bytes compared with real content, so
+    bookends show up as runs of packets far below the median packet size.
+
+    Args:
+        packet_table: PacketTable to search
+        min_run: Minimum number of consecutive small packets in a run
+        size_ratio: Packets smaller than this fraction of the median size count as small
+
+    Returns:
+        List of (start_frame, end_frame) tuples, inclusive
+    """
+    if len(packet_table) == 0:
+        return []
+
+    size_limit = np.median(packet_table.size) * size_ratio
+    small = packet_table.size < size_limit
+
+    # Run-length encode the mask: starts are rising edges, ends are falling edges
+    edges = np.diff(np.concatenate(([0], small.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+
+    keep = (ends - starts + 1) >= min_run
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def candidate_windows(runs, frame_count, padding):
+    """
+    Expand candidate runs into merged decode windows
+
+    Args:
+        runs: List of (start_frame, end_frame) candidate runs
+        frame_count: Total number of frames in the video
+        padding: Frames to add on both sides of each run
+
+    Returns:
+        Sorted list of non-overlapping (start_frame, end_frame) windows, inclusive
+    """
+    windows = []
+    for start, end in sorted(runs):
+        start = max(0, start - padding)
+        end = min(frame_count - 1, end + padding)
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
@@ -0,0 +1,202 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .cpu_scheduler import get_scheduler
+from .ffmpeg_progress import ProgressReader, with_progress
+from .luma_profile import plan_scan_chunks
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+# Shortest chunk worth its own encoder process
+MIN_ENCODE_CHUNK_FRAMES = 300
+
+
+def run_ffmpeg_job(cmd):
+    """
+    Run an FFmpeg job and count the frames it wrote from its progress output
+
+    The command gets -progress on stdout, so the frame count comes from the
+    encoder itself and the output does not have to be probed afterwards.
+
+    Returns:
+        Number of video frames written, or None if FFmpeg failed
+    """
+    cmd = with_progress(cmd)
+    startupinfo, creationflags, env = get_subprocess_startupinfo()
+
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            startupinfo=startupinfo,
+            creationflags=creationflags,
+            env=env
+        )
+    except Exception as e:
+        logger.error(f"Could not start FFmpeg: {e}")
+        return None
+
+    stderr_lines = []
+    with process:
+        stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+        stderr_thread.start()
+
+        progress = ProgressReader().read(process.stdout)
+
+        returncode = process.wait()
+        stderr_thread.join()
+    if returncode != 0:
+        logger.error(f"FFmpeg failed ({returncode}): {' '.join(cmd)}\n{''.join(stderr_lines[-20:])}")
+        return None
+    return progress.frame if progress else 0
+
+
+def encode_frames(video_path, start_frame, frame_count, fps, codec_args, output_path, ffmpeg_path="ffmpeg",
+                  threads=None):
+    """
+    Encode frame_count frames from start_frame of a constant frame rate video
+
+    Args:
+        frame_count: Frames to encode (None = to the end of the video)
+        threads: Encoder threads (None = FFmpeg's default)
+
+    Returns:
+        Number of frames written, or None on error
+    """
+    cmd = [ffmpeg_path, "-hide_banner", "-y"]
+    if start_frame > 0:
+        # Half a frame early so the accurate seek lands on start_frame itself
+        cmd.extend(["-ss", f"{(start_frame - 0.5) / fps:.6f}"])
+    cmd.extend(["-i", video_path, "-map", "0:v:0", "-an", "-sn"])
+    if frame_count:
+        cmd.extend(["-frames:v", str(frame_count)])
+    if threads:
+        cmd.extend(["-threads", str(threads)])
+    cmd.extend([*codec_args, "-r", str(fps), output_path])
+    return run_ffmpeg_job(cmd)
+
+
+def concat_files(paths, output_path, ffmpeg_path="ffmpeg", durations=None):
+    """
+    Join encoded pieces with the concat demuxer without re-encoding
+
+    Args:
+        durations: Seconds of each piece. Given, each piece starts right after
+            the frames of the one before; otherwise the demuxer uses the
+            container durations, which Matroska rounds to milliseconds
+
+    Returns:
+        False on error
+    """
+    list_path = os.path.splitext(output_path)[0] + "_chunks.txt"
+    try:
+        with open(list_path, 'w') as f:
+            for i, path in enumerate(paths):
+                escaped = os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if durations is not None:
+                    f.write(f"duration {durations[i]:.6f}\n")
+        return run_ffmpeg_job([ffmpeg_path, "-hide_banner", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                               "-map", "0:v:0", "-c", "copy", output_path]) is not None
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+def encode_frames_parallel(video_path, start_frame, frame_count, fps, codec_args, output_path, workers=None,
+                           keyframes=None, ffmpeg_path="ffmpeg", to_end=False,
+                           min_chunk_frames=MIN_ENCODE_CHUNK_FRAMES):
+    """
+    Encode a frame range as parallel chunks split at keyframes and join them
+
+    Chunk starts snap to source keyframes, so no encoder decodes a GOP it
+    then throws away. Each chunk seeks frame-exactly and encodes its frames
+    in its own FFmpeg process; the chunks are joined with the concat demuxer.
+    The wall-clock time is that of the slowest chunk rather than the sum. The
+    CPU scheduler picks the chunk count and encoder threads around other
+    running work.
+
+    Args:
+        video_path: Source video (constant frame rate)
+        start_frame: First source frame to encode
+        frame_count: Frames to encode
+        fps: Frame rate of the source, kept in the output
+        codec_args: Output codec options
+        output_path: Joined output
+        workers: Parallel encoders (None = chosen by the CPU scheduler)
+        keyframes: Optional source keyframe indices
+        ffmpeg_path: FFmpeg executable
+        to_end: Let the last chunk run to the end of the video, in case frame_count
+            is an estimate from the container
+        min_chunk_frames: Smallest chunk worth a separate process
+
+    Returns:
+        Number of frames written, or None if any chunk failed
+    """
+    scheduler = get_scheduler()
+    schedule = scheduler.plan("encode", max_jobs=max(1, frame_count // max(1, min_chunk_frames)), jobs=workers or 0)
+
+    relative_keyframes = None
+    if keyframes is not None and len(keyframes):
+        keyframes = np.asarray(keyframes, dtype=np.int64) - start_frame
+        relative_keyframes = keyframes[(keyframes >= 0) & (keyframes < frame_count)]
+    chunks = plan_scan_chunks(frame_count, schedule['jobs'], relative_keyframes, min_chunk_frames)
+    threads_per_chunk = max(1, schedule['available'] // len(chunks))
+    start = time.time()
+
+    if len(chunks) == 1:
+        with scheduler.lease("encode", threads_per_chunk):
+            frames = encode_frames(video_path, start_frame, None if to_end else frame_count, fps, codec_args,
+                                   output_path, ffmpeg_path, threads=threads_per_chunk)
+        if frames is not None:
+            scheduler.record("encode", threads_per_chunk, frames, time.time() - start)
+        return frames
+
+    base_path, extension = os.path.splitext(output_path)
+    chunk_paths = [f"{base_path}_chunk{i:03d}{extension}" for i in range(len(chunks))]
+    logger.info(f"Encoding {frame_count} frames of {os.path.basename(video_path)} in {len(chunks)} chunks " +
+            f"with {threads_per_chunk} threads each")
+
+    def encode_chunk(chunk, chunk_path):
+        chunk_start, count = chunk
+        last = chunk_start + count >= frame_count
+        return encode_frames(video_path, start_frame + chunk_start, None if last and to_end else count, fps,
+                             codec_args, chunk_path, ffmpeg_path, threads=threads_per_chunk)
+
+    try:
+        with scheduler.lease("encode", threads_per_chunk * len(chunks)):
+            with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                chunk_frames = list(executor.map(encode_chunk, chunks, chunk_paths))
+
+        for (chunk_start, count), frames in zip(chunks, chunk_frames):
+            if frames is None:
+                logger.warning(f"Encoding the chunk starting at frame {start_frame + chunk_start} failed")
+                return None
+            if chunk_start + count < frame_count and frames != count:
+                logger.warning(f"Chunk starting at frame {start_frame + chunk_start} wrote {frames} of {count} frames")
+                return None
+
+        scheduler.record("encode", threads_per_chunk, sum(chunk_frames), time.time() - start, len(chunks))
+
+        # A stream copy reports no encoded frames, so the total comes from the chunk encoders
+        if not concat_files(chunk_paths, output_path, ffmpeg_path,
+                            durations=[frames / fps for frames in chunk_frames]):
+            return None
+        return sum(chunk_frames)
+
+    finally:
+        for path in chunk_paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove encode chunk {path}: {e}")
@@ -3,9 +3,13 @@ import logging
 import os
 import subprocess
 
-import cv2
+import numpy as np
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
 
+from .luma_cache import LumaProfileCache
+from .luma_profile import (FFMPEG_PROFILE_HEIGHT, FFMPEG_PROFILE_WIDTH, LUMA_WHITE_LEVEL, scan_luma_profile_ffmpeg,
+                           scan_luma_profile_opencv)
+
 logger = logging.getLogger(__name__)
 
 class ReferenceAnalyzer(QObject):
@@ -14,8 +18,21 @@ class ReferenceAnalyzer(QObject):
     progress_update = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, options_manager=None):
         super().__init__()
+        self.stats_backend = "ffmpeg"  # Luma statistics backend: "ffmpeg" or "opencv"
+        self.luma_cache = LumaProfileCache()
+        self._ffmpeg_path = "ffmpeg"  # Assume ffmpeg is in PATH
+
+        # Use the same FFmpeg and luma statistics backend as bookend alignment
+        if options_manager:
+            try:
+                self._ffmpeg_path = options_manager.get_ffmpeg_path() or "ffmpeg"
+                bookend_settings = options_manager.get_setting('bookend')
+                if isinstance(bookend_settings, dict):
+                    self.stats_backend = bookend_settings.get('stats_backend', 'ffmpeg')
+            except Exception as e:
+                logger.warning(f"Could not load reference analysis settings: {e}")
         
     def get_video_info(self, video_path):
         """Extract metadata from video file using FFprobe"""
@@ -73,7 +90,7 @@ class ReferenceAnalyzer(QObject):
             codec = video_stream.get('codec_name', 'unknown')
             
             # Check for white frames at beginning (potential bookends)
-            has_bookends = self._check_for_bookends(video_path)
+            has_bookends = self._check_for_bookends(video_path, frame_rate)
             
             video_info = {
                 'path': video_path,
@@ -109,46 +126,47 @@ class ReferenceAnalyzer(QObject):
         except (ValueError, ZeroDivisionError):
             return 0
             
-    def _check_for_bookends(self, video_path):
+    def _check_for_bookends(self, video_path, frame_rate=None):
         """Check if video begins with a white frame (bookend)"""
-        try:
-            # Open video
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                logger.warning(f"Could not open video for bookend check: {video_path}")
+        # Check first 30 frames (or first second) for white frames
+        max_frames = 30
+
+        profile = None
+        if self.stats_backend == "ffmpeg":
+            profile = self._cached_head_profile(video_path, "ffmpeg", max_frames, lambda: scan_luma_profile_ffmpeg(
+                video_path, frame_rate, ffmpeg_path=self._ffmpeg_path, max_frames=max_frames))
+            if profile is None:
+                logger.warning("FFmpeg luma statistics failed, falling back to OpenCV bookend check")
+
+        if profile is None:
+            profile = self._cached_head_profile(video_path, "opencv", max_frames, lambda: scan_luma_profile_opencv(
+                video_path, max_frames=max_frames))
+            if profile is None:
+                logger.warning(f"Could not read video for bookend check: {video_path}")
                 return False
-                
-            # Sample first few frames
-            white_frame_detected = False
-            
-            # Check first 30 frames (or first second) for white frames
-            max_frames = 30
-            
-            for i in range(max_frames):
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                # Convert to grayscale
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                
-                # Check if predominantly white
-                white_pixel_count = cv2.countNonZero(cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)[1])
-                total_pixels = gray.shape[0] * gray.shape[1]
-                white_percentage = white_pixel_count / total_pixels
-                
-                # If at least 85% white, consider it a bookend frame
-                if white_percentage > 0.85:
-                    white_frame_detected = True
-                    logger.info(f"White bookend frame detected at frame {i}")
-                    break
-                    
-            cap.release()
-            return white_frame_detected
-            
-        except Exception as e:
-            logger.error(f"Error checking for bookend frames: {e}")
-            return False
+
+        # If at least 85% white, consider it a bookend frame
+        white_frames = np.flatnonzero(profile.white_ratio > 0.85)
+        if len(white_frames):
+            logger.info(f"White bookend frame detected at frame {white_frames[0]}")
+            return True
+        return False
+
+    def _cached_head_profile(self, video_path, backend, max_frames, scan):
+        """Return the cached luma profile of the first frames, running scan() and caching its result on a miss"""
+        cache_settings = {
+            "backend": backend,
+            "white_level": LUMA_WHITE_LEVEL,
+            "max_frames": max_frames
+        }
+        if backend == "ffmpeg":
+            cache_settings.update(width=FFMPEG_PROFILE_WIDTH, height=FFMPEG_PROFILE_HEIGHT)
+
+        profile = self.luma_cache.load(video_path, "head", cache_settings)
+        if profile is None:
+            profile = scan()
+            self.luma_cache.store(video_path, "head", profile, cache_settings)
+        return profile
 
 
 class ReferenceAnalysisThread(QThread):
@@ -157,10 +175,10 @@ class ReferenceAnalysisThread(QThread):
     progress_update = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
     
-    def __init__(self, video_path):
+    def __init__(self, video_path, options_manager=None):
         super().__init__()
         self.video_path = video_path
-        self.analyzer = ReferenceAnalyzer()
+        self.analyzer = ReferenceAnalyzer(options_manager)
         
         # Connect signals
         self.analyzer.analysis_complete.connect(self.analysis_complete)
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from .utils import user_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Bump when the preparation command or the stored metadata change so old entries are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Bytes read at a time while hashing a reference
+FINGERPRINT_BLOCK = 4 * 1024 * 1024
+
+INDEX_NAME = "index.json"
+
+# Serialises index updates between alignment threads
+_index_lock = threading.Lock()
+
+# (path, size, mtime_ns) -> fingerprint of every file hashed in this process
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def default_cache_dir():
+    """Location of the cache in the per-user cache directory"""
+    return user_cache_dir("reference_cache")
+
+
+def content_fingerprint(video_path):
+    """
+    Fingerprint of a file's content, independent of its name and location
+
+    The whole file is hashed, streamed in blocks, so files differing in any
+    byte never share a prepared reference. The result is remembered by path,
+    size and modification time, so a reference is only read once per run
+    unless it changes.
+    """
+    stat = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(memo_key)
+    if fingerprint:
+        return fingerprint
+
+    start = time.time()
+    digest = hashlib.sha1()
+    with open(video_path, 'rb') as f:
+        for block in iter(lambda: f.read(FINGERPRINT_BLOCK), b""):
+            digest.update(block)
+    fingerprint = digest.hexdigest()
+    logger.info(f"Fingerprinted {os.path.basename(video_path)} ({stat.st_size / 1024 / 1024:.1f} MB) " +
+            f"in {time.time() - start:.2f}s")
+
+    with _fingerprints_lock:
+        _fingerprints[memo_key] = fingerprint
+    return fingerprint
+
+
+def _link_or_copy(source, destination):
+    """Hard-link source to destination, copying when the file system cannot link"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        logger.info(f"Could not hard-link {source}, copying it to {destination}")
+        shutil.copy2(source, destination)
+
+
+class ReferencePrepCache:
+    """
+    Content-addressed cache of prepared reference videos
+
+    A prepared reference is the reference re-encoded at the target frame rate
+    with an intermediate profile. Entries are keyed by the content fingerprint
+    of the source reference plus the frame rate, pixel format and profile, so
+    the same clip copied or renamed between tests still hits. Each entry keeps
+    the prepared file together with its exact frame count and probed video
+    info, so a hit needs neither an encode nor a probe.
+
+    The index lives in the cache directory. When the prepared files exceed
+    max_size_gb, the least recently used entries are deleted. Tests never
+    read the cached files themselves but their own hard links (or copies),
+    so an eviction cannot pull a file from under a running or finished test.
+    """
+
+    def __init__(self, cache_dir=None, max_size_gb=20, enabled=True):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_size_gb = max_size_gb
+        self.enabled = enabled
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, INDEX_NAME)
+
+    def make_key(self, reference_path, fps, pix_fmt, profile_name):
+        """Cache key for a reference prepared with the given settings"""
+        key_data = {
+            "version": CACHE_FORMAT_VERSION,
+            "fingerprint": content_fingerprint(reference_path),
+            "fps": round(float(fps or 0), 6),
+            "pix_fmt": pix_fmt,
+            "profile": profile_name
+        }
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def lookup(self, key, link_path=None):
+        """
+        Find a prepared reference
+
+        Args:
+            key: Cache key from make_key
+            link_path: Where to place the caller's own link to the cached file
+
+        Returns:
+            Dict with path (link_path when given), frame_count and video_info, or
+            None if there is no valid entry
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            with _index_lock:
+                index = self._read_index()
+                entry = index.get(key)
+                if entry is None:
+                    return None
+
+                path = os.path.join(self.cache_dir, entry["file"])
+                if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+                    # Deleted or replaced behind our back
+                    del index[key]
+                    self._write_index(index)
+                    return None
+
+                entry["last_used"] = time.time()
+                self._write_index(index)
+
+                # Linked while the index is locked, so no eviction runs in between
+                if link_path:
+                    _link_or_copy(path, link_path)
+                    path = link_path
+
+            return {
+                'path': path,
+                'frame_count': entry["frame_count"],
+                'video_info': dict(entry["video_info"], path=path)
+            }
+
+        except Exception as e:
+            logger.warning(f"Could not read reference cache entry {key}: {e}")
+            return None
+
+    def store(self, key, prepared_path, frame_count, video_info, source_path=None):
+        """
+        Add a freshly prepared reference to the cache
+
+        The cache gets a hard link (or a copy) of the file and the prepared
+        file stays where it is, for the test that prepared it.
+
+        Returns:
+            Path of the cached file, or None if it could not be stored
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            file_name = key + os.path.splitext(prepared_path)[1]
+            path = os.path.join(self.cache_dir, file_name)
+
+            # Link under a temporary name first so a crash never leaves a truncated entry
+            temp_path = path + ".tmp"
+            _link_or_copy(prepared_path, temp_path)
+            os.replace(temp_path, path)
+
+            with _index_lock:
+                index = self._read_index()
+                index[key] = {
+                    "file": file_name,
+                    "size": os.path.getsize(path),
+                    "last_used": time.time(),
+                    "source": os.path.abspath(source_path) if source_path else None,
+                    "frame_count": int(frame_count),
+                    "video_info": {k: v for k, v in (video_info or {}).items() if k != 'path'}
+                }
+                self._write_index(index)
+
+            self._evict(keep=key)
+            return path
+
+        except Exception as e:
+            logger.warning(f"Could not store prepared reference {prepared_path}: {e}")
+            return None
+
+    def clear(self):
+        """Delete every cached reference"""
+        with _index_lock:
+            for entry in self._read_index().values():
+                self._remove(os.path.join(self.cache_dir, entry["file"]))
+            self._write_index({})
+
+    def _evict(self, keep=None):
+        """Delete least recently used entries until the cache fits its size limit"""
+        max_bytes = self.max_size_gb * 1024 * 1024 * 1024
+        with _index_lock:
+            index = self._read_index()
+            index = {k: e for k, e in index.items() if os.path.exists(os.path.join(self.cache_dir, e["file"]))}
+
+            total = sum(e["size"] for e in index.values())
+            for key, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+                if total <= max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self._remove(os.path.join(self.cache_dir, entry["file"]))
+                total -= entry["size"]
+                del index[key]
+                logger.info(f"Evicted prepared reference {entry['file']} ({entry.get('source')})")
+
+            self._write_index(index)
+
+    def _remove(self, path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove prepared reference {path}: {e}")
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.index_path, 'w') as f:
+                json.dump(index, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write reference cache index: {e}")
@@ -301,14 +301,29 @@ class ReportGenerator(QObject):
             psnr_scores = []
             ssim_scores = []
             
-            for frame in frames:
-                frame_num = frame.get('frameNum', len(frame_nums))
-                metrics = frame.get('metrics', {})
-                
-                frame_nums.append(frame_num)
-                vmaf_scores.append(metrics.get('vmaf', None))
-                psnr_scores.append(metrics.get('psnr', metrics.get('psnr_y', None)))
-                ssim_scores.append(metrics.get('ssim', metrics.get('ssim_y', None)))
+            columns = raw_data.get('columns')
+            if columns is not None:
+                # Metric columns from read_vmaf_log: no dict per frame needed
+                frame_nums = raw_data['frame_numbers'].tolist()
+
+                def column(*names):
+                    for name in names:
+                        if name in columns:
+                            return columns[name].tolist()
+                    return [None] * len(frame_nums)
+
+                vmaf_scores = column('vmaf')
+                psnr_scores = column('psnr', 'psnr_y')
+                ssim_scores = column('ssim', 'ssim_y')
+            else:
+                for frame in frames:
+                    frame_num = frame.get('frameNum', len(frame_nums))
+                    metrics = frame.get('metrics', {})
+
+                    frame_nums.append(frame_num)
+                    vmaf_scores.append(metrics.get('vmaf', None))
+                    psnr_scores.append(metrics.get('psnr', metrics.get('psnr_y', None)))
+                    ssim_scores.append(metrics.get('ssim', metrics.get('ssim_y', None)))
             
             # Generate VMAF chart
             if vmaf_scores and any(v is not None for v in vmaf_scores):
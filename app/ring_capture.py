@@ -0,0 +1,128 @@
+import csv
+import logging
+import os
+import shutil
+import subprocess
+
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentRing:
+    """
+    Rolling on-disk ring of short capture segments
+
+    FFmpeg's segment muxer writes the capture as one-GOP Matroska segments and
+    appends each finished segment to a CSV list. While the capture waits for
+    its first bookend, segments that fall out of the pre-roll window are
+    deleted; once the start is known, the remaining segments are joined into
+    the final capture file with the concat demuxer, without re-encoding.
+    """
+
+    LIST_NAME = "segments.csv"
+    SEGMENT_PATTERN = "segment_%06d.mkv"
+
+    def __init__(self, directory, fps):
+        self.directory = directory
+        self.fps = fps
+        self.segments = []  # Dicts of path, first_frame, frame_count, deleted
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def list_path(self):
+        return os.path.join(self.directory, self.LIST_NAME)
+
+    def output_args(self, segment_seconds):
+        """FFmpeg output options that write the capture into this ring"""
+        return [
+            "-f", "segment",
+            "-segment_time", str(segment_seconds),
+            "-segment_format", "matroska",
+            "-segment_list", self.list_path.replace('\\', '/'),
+            "-segment_list_type", "csv",
+            "-reset_timestamps", "0",
+            os.path.join(self.directory, self.SEGMENT_PATTERN).replace('\\', '/')
+        ]
+
+    def refresh(self):
+        """Pick up segments FFmpeg has finished since the last call"""
+        if not os.path.exists(self.list_path):
+            return
+
+        try:
+            with open(self.list_path, newline='') as f:
+                rows = [row for row in csv.reader(f) if len(row) >= 3]
+        except OSError as e:
+            logger.warning(f"Could not read segment list: {e}")
+            return
+
+        if not rows:
+            return
+
+        # Segment times are in the capture's timeline; frame positions are relative to the first segment
+        origin = float(rows[0][1])
+        for row in rows[len(self.segments):]:
+            start_time, end_time = float(row[1]), float(row[2])
+            first_frame = int(round((start_time - origin) * self.fps))
+            self.segments.append({
+                'path': os.path.join(self.directory, os.path.basename(row[0])),
+                'first_frame': first_frame,
+                'frame_count': int(round((end_time - origin) * self.fps)) - first_frame,
+                'deleted': False
+            })
+
+    def prune(self, keep_from_frame):
+        """Delete finished segments that end before keep_from_frame"""
+        for segment in self.segments:
+            if segment['deleted'] or segment['first_frame'] + segment['frame_count'] > keep_from_frame:
+                continue
+            try:
+                os.remove(segment['path'])
+            except OSError as e:
+                logger.warning(f"Could not delete ring segment {segment['path']}: {e}")
+            segment['deleted'] = True
+
+    def assemble(self, keep_from_frame, output_path, ffmpeg_path="ffmpeg"):
+        """
+        Join the segments from the one containing keep_from_frame onwards into output_path
+
+        Returns:
+            Capture frame index of the first frame in output_path, or None on error
+        """
+        self.refresh()
+        self.prune(keep_from_frame)
+
+        kept = [s for s in self.segments if not s['deleted'] and os.path.exists(s['path'])]
+        if not kept:
+            logger.error("No ring segments left to assemble")
+            return None
+
+        concat_list = os.path.join(self.directory, "concat.txt")
+        with open(concat_list, 'w') as f:
+            for segment in kept:
+                f.write(f"file '{segment['path'].replace(os.sep, '/')}'\n")
+
+        cmd = [
+            ffmpeg_path, "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", concat_list,
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            "-movflags", "+faststart",
+            output_path.replace('\\', '/')
+        ]
+
+        startupinfo, creationflags, env = get_subprocess_startupinfo()
+        result = subprocess.run(cmd, capture_output=True, text=True,
+                                startupinfo=startupinfo, creationflags=creationflags, env=env)
+        if result.returncode != 0:
+            logger.error(f"Failed to assemble ring segments: {result.stderr}")
+            return None
+
+        first_frame = kept[0]['first_frame']
+        logger.info(f"Assembled {len(kept)} ring segments from frame {first_frame} into {output_path}")
+        return first_frame
+
+    def cleanup(self):
+        """Delete the ring directory"""
+        shutil.rmtree(self.directory, ignore_errors=True)
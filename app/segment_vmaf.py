@@ -0,0 +1,126 @@
+import json
+import logging
+import math
+import re
+from array import array
+
+import numpy as np
+
+from .vmaf_log import iter_vmaf_frames, pool_values
+
+logger = logging.getLogger(__name__)
+
+# Shortest segment worth its own libvmaf process
+MIN_VMAF_SEGMENT_FRAMES = 120
+
+# Extra frames each segment decodes on either side: VMAF's motion2 for a frame
+# is the smaller of its motion to the frame before and from the frame after
+SEGMENT_OVERLAP_FRAMES = 1
+
+
+def plan_vmaf_segments(frame_count, segment_count, min_segment_frames=MIN_VMAF_SEGMENT_FRAMES,
+                       overlap=SEGMENT_OVERLAP_FRAMES):
+    """
+    Split frame_count compared frames into ranges scored by separate processes
+
+    Returns:
+        List of dicts with start and end (the frames the segment reports) and
+        run_start and run_end (the frames it compares, including the overlap)
+    """
+    segment_count = max(1, min(segment_count, frame_count // max(1, min_segment_frames)))
+    bounds = [round(i * frame_count / segment_count) for i in range(segment_count + 1)]
+    return [{
+        'start': start,
+        'end': end,
+        'run_start': max(0, start - overlap),
+        'run_end': min(frame_count, end + overlap)
+    } for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def merge_vmaf_logs(segment_logs, segments, output_path):
+    """
+    Merge the JSON logs of segment runs into one log like a single run writes
+
+    The overlap frames at each segment's edges are dropped, frames are
+    renumbered from 0 across the segments and the pooled metrics are
+    recomputed over the merged frames. Frames are streamed from the segment
+    logs to the merged one, and only the metric values are kept for pooling.
+    Those are the values as logged, which libvmaf rounds to six decimals, so
+    the pooled means can differ from a single run's in the last decimal.
+
+    Args:
+        segment_logs: libvmaf JSON log of each segment, in order
+        segments: The segments from plan_vmaf_segments
+        output_path: Merged JSON log
+
+    Returns:
+        Number of frames in the merged log
+    """
+    info = {}
+    values = {}  # metric name -> array('d') of its values, in frame order
+    written = 0
+    version = _log_version(segment_logs[0]) if segment_logs else None
+
+    with open(output_path, 'w') as out:
+        out.write('{\n    "version": ' + json.dumps(version) + ',\n    "frames": [')
+        for log_path, segment in zip(segment_logs, segments):
+            segment_info = {}
+            lead = segment['start'] - segment['run_start']
+            frame_count = segment['end'] - segment['start']
+            kept = 0
+            for index, frame in enumerate(iter_vmaf_frames(log_path, segment_info)):
+                if index < lead or kept == frame_count:
+                    continue
+                out.write(',\n' if written else '\n')
+                out.write('        ' + json.dumps(dict(frame, frameNum=written)))
+                metrics = frame.get('metrics', {})
+                for name in metrics.keys() - values.keys():
+                    values[name] = array('d', [math.nan]) * written
+                for name, metric_values in values.items():
+                    metric_values.append(metrics.get(name, math.nan))
+                written += 1
+                kept += 1
+            if kept != frame_count:
+                raise ValueError(f"{log_path} has {kept} of the {frame_count} " +
+                                 f"frames of segment {segment['start']}-{segment['end']}")
+            info = info or segment_info
+
+        pooled = {}
+        for name, metric_values in values.items():
+            metric_pool = pool_values(np.frombuffer(metric_values, dtype=np.float64))
+            if metric_pool:
+                pooled[name] = metric_pool
+        out.write('\n    ],\n    "pooled_metrics": ' + json.dumps(pooled) +
+                  ',\n    "aggregate_metrics": ' + json.dumps(info.get('aggregate_metrics', {})) + '\n}\n')
+    return written
+
+
+def _log_version(json_path):
+    """libvmaf version a log records ahead of its frames, or None"""
+    info = {}
+    for _ in iter_vmaf_frames(json_path, info):
+        break
+    return info.get('version')
+
+
+def merge_stats_files(segment_stats, segments, output_path):
+    """Merge per-segment psnr/ssim stats files, dropping overlap frames and renumbering n:"""
+    frame_number = re.compile(r"^n:\d+")
+    written = 0
+    with open(output_path, 'w') as out:
+        for stats_path, segment in zip(segment_stats, segments):
+            with open(stats_path, 'r') as f:
+                lines = [line for line in f if frame_number.match(line)]
+            lead = segment['start'] - segment['run_start']
+            for line in lines[lead:lead + segment['end'] - segment['start']]:
+                written += 1
+                out.write(frame_number.sub(f"n:{written}", line))
+    return written
+
+
+def input_seek_args(frame, fps):
+    """Input options seeking a constant frame rate input so its first decoded frame is frame"""
+    if frame <= 0:
+        return []
+    # Half a frame early so the accurate seek lands on the frame itself
+    return ["-ss", f"{(frame - 0.5) / fps:.6f}"]
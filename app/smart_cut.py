@@ -0,0 +1,183 @@
+import logging
+import os
+import subprocess
+
+from .packet_index import read_packet_table
+from .utils import get_subprocess_startupinfo
+
+logger = logging.getLogger(__name__)
+
+# Encoders for the re-encoded head, per source codec. The head is at most one
+# GOP, so it is encoded at a higher quality than the capture itself.
+SMART_CUT_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "fast", "-crf", "12"],
+    "hevc": ["-c:v", "libx265", "-preset", "fast", "-crf", "14"],
+    "mpeg2video": ["-c:v", "mpeg2video", "-q:v", "2"]
+}
+
+# Pieces are written as Matroska; the concat demuxer converts H.264/HEVC to
+# Annex B with the parameter sets in band, so a head from a different encoder
+# instance can be joined with the copied tail
+PIECE_EXTENSION = ".mkv"
+
+
+def plan_smart_cut(packet_table, start_frame, end_frame):
+    """
+    Split a frame range into a re-encoded head and a stream-copied body
+
+    Args:
+        packet_table: PacketTable of the source
+        start_frame: First frame to export
+        end_frame: Frame after the last one to export
+
+    Returns:
+        Dict with head (start, end) frames to re-encode, copy (start, end)
+        frames to stream-copy (end at the next keyframe, or None to run to the
+        end of the file) and copy_start_time / copy_end_time, or None when the
+        range holds no keyframe and has to be re-encoded whole
+    """
+    keyframes = packet_table.keyframe_indices
+    inside = keyframes[(keyframes >= start_frame) & (keyframes < end_frame)]
+    if len(inside) == 0:
+        return None
+
+    copy_start = int(inside[0])
+    # A stream copy can only stop at a keyframe: run to the first one at or after the end
+    following = keyframes[keyframes >= end_frame]
+    copy_end = int(following[0]) if len(following) else None
+
+    return {
+        'head': (start_frame, copy_start),
+        'copy': (copy_start, copy_end),
+        'copy_start_time': float(packet_table.pts_time[copy_start]),
+        'copy_end_time': float(packet_table.pts_time[copy_end]) if copy_end is not None else None
+    }
+
+
+def _run_ffmpeg(cmd):
+    startupinfo, creationflags, env = get_subprocess_startupinfo()
+    result = subprocess.run(cmd, capture_output=True, text=True, startupinfo=startupinfo,
+                            creationflags=creationflags, env=env)
+    if result.returncode != 0:
+        logger.error(f"FFmpeg failed ({result.returncode}): {' '.join(cmd)}\n{result.stderr}")
+        return False
+    return True
+
+
+def _encode_frames(video_path, start_frame, frame_count, fps, encoder_args, output_path, ffmpeg_path):
+    """Re-encode frame_count frames from start_frame, seeking frame-exactly"""
+    cmd = [ffmpeg_path, "-hide_banner", "-y"]
+    if start_frame > 0:
+        # Half a frame early so the accurate seek lands on start_frame itself
+        cmd.extend(["-ss", f"{(start_frame - 0.5) / fps:.6f}"])
+    cmd.extend(["-i", video_path, "-map", "0:v:0", "-an", "-sn", "-frames:v", str(frame_count),
+                *encoder_args, output_path])
+    return _run_ffmpeg(cmd)
+
+
+def smart_cut_export(video_path, start_frame, frame_count, fps, codec_name, output_path,
+                     ffmpeg_path="ffmpeg", ffprobe_path="ffprobe", packet_table=None):
+    """
+    Export a frame range of a capture, re-encoding only up to its first keyframe
+
+    The partial GOP before the first keyframe at or after start_frame is
+    re-encoded; everything from that keyframe on is stream-copied at the
+    capture's own quality. The pieces are joined with the concat demuxer, so
+    frame 0 of the export is start_frame of the source. The copied part runs
+    on to the next keyframe after the range, so the export may carry a few
+    frames past frame_count. Video only.
+
+    Args:
+        video_path: Source capture
+        start_frame: First frame to export
+        frame_count: Frames to export
+        fps: Frame rate of the source
+        codec_name: Codec of the source video stream (selects the head encoder)
+        output_path: Exported file
+        ffmpeg_path, ffprobe_path: FFmpeg executables
+        packet_table: PacketTable of the source, read when not given
+
+    Returns:
+        Dict with path, method ('smart_cut' or 'reencode'), reencoded_frames and
+        copied_frames, or None on error
+    """
+    encoder_args = SMART_CUT_ENCODERS.get(codec_name)
+    if encoder_args is None:
+        logger.warning(f"No smart-cut encoder for {codec_name}, re-encoding the whole clip with libx264")
+        encoder_args = SMART_CUT_ENCODERS["h264"]
+
+    end_frame = start_frame + frame_count
+    if packet_table is None:
+        packet_table = read_packet_table(video_path, ffprobe_path)
+
+    plan = None
+    if packet_table is not None and codec_name in SMART_CUT_ENCODERS:
+        plan = plan_smart_cut(packet_table, start_frame, end_frame)
+
+    if plan is None:
+        logger.info(f"Re-encoding frames {start_frame}-{end_frame} of {video_path} for export")
+        if not _encode_frames(video_path, start_frame, frame_count, fps, encoder_args, output_path, ffmpeg_path):
+            return None
+        return {'path': output_path, 'method': 'reencode', 'reencoded_frames': frame_count, 'copied_frames': 0}
+
+    head_start, head_end = plan['head']
+    copy_start, copy_end = plan['copy']
+    copied_frames = (copy_end if copy_end is not None else len(packet_table)) - copy_start
+
+    base_path = os.path.splitext(output_path)[0]
+    head_path = f"{base_path}_head{PIECE_EXTENSION}"
+    body_path = f"{base_path}_body{PIECE_EXTENSION}"
+    list_path = f"{base_path}_pieces.txt"
+    pieces = []
+
+    try:
+        if head_end > head_start:
+            if not _encode_frames(video_path, head_start, head_end - head_start, fps, encoder_args, head_path,
+                                  ffmpeg_path):
+                return None
+            pieces.append((head_path, head_end - head_start))
+
+        # Seeking a stream copy to a keyframe timestamp starts exactly on that keyframe. The
+        # copy stops by packet count: with reordered frames, a time limit also lets the next
+        # keyframe and frames decoded from it through, while the closed GOPs up to the next
+        # keyframe hold exactly copied_frames packets
+        cmd = [ffmpeg_path, "-hide_banner", "-y", "-ss", f"{plan['copy_start_time']:.6f}", "-i", video_path]
+        if copy_end is not None:
+            cmd.extend(["-frames:v", str(copied_frames)])
+        cmd.extend(["-map", "0:v:0", "-an", "-sn", "-c", "copy", body_path])
+        if not _run_ffmpeg(cmd):
+            return None
+        pieces.append((body_path, copied_frames))
+
+        # Explicit durations place each piece right after the frames of the one before; an
+        # encoder's B-frame delay would otherwise leave a gap after the head
+        with open(list_path, 'w') as f:
+            for piece, piece_frames in pieces:
+                escaped = os.path.abspath(piece).replace('\\', '/').replace("'", "'\\''")
+                f.write(f"file '{escaped}'\nduration {piece_frames / fps:.6f}\n")
+
+        cmd = [ffmpeg_path, "-hide_banner", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+               "-c", "copy", output_path]
+        if not _run_ffmpeg(cmd):
+            return None
+
+        logger.info(f"Smart-cut export of {video_path}: re-encoded {head_end - head_start} frames, " +
+                f"copied {copied_frames} frames from keyframe {copy_start}")
+        return {
+            'path': output_path,
+            'method': 'smart_cut',
+            'reencoded_frames': head_end - head_start,
+            'copied_frames': int(copied_frames)
+        }
+
+    except Exception as e:
+        logger.error(f"Error in smart-cut export of {video_path}: {e}")
+        return None
+
+    finally:
+        for path in (head_path, body_path, list_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove smart-cut piece {path}: {e}")
@@ -298,8 +298,9 @@ class AnalysisTab(QWidget):
         from app.options_manager import OptionsManager
         temp_options_manager = OptionsManager()
 
-        # Set bookend parameters in the options manager
-        bookend_settings = {
+        # Set bookend parameters in the options manager, keeping any other saved bookend options
+        bookend_settings = dict(temp_options_manager.get_setting('bookend') or {})
+        bookend_settings.update({
             'frame_sampling_rate': frame_sampling_rate,
             'adaptive_brightness': True,
             'motion_compensation': False,
@@ -307,7 +308,7 @@ class AnalysisTab(QWidget):
             'bookend_duration': bookend_duration,
             'min_loops': min_loops,
             'white_threshold': white_threshold
-        }
+        })
         temp_options_manager.set_setting('bookend', bookend_settings)
 
         # Create new thread with options manager containing bookend parameters
@@ -400,7 +401,9 @@ class AnalysisTab(QWidget):
         from pathlib import Path
         self.parent.aligned_paths = {
             'reference': str(Path(aligned_reference).resolve()),
-            'captured': str(Path(aligned_captured).resolve())
+            'captured': str(Path(aligned_captured).resolve()),
+            'alignment': results.get('alignment'),  # Set when the alignment is applied inside the VMAF filtergraph
+            'loops': results.get('loops')  # One alignment per captured loop in multi-loop analysis
         }
 
         # Print debug info
@@ -409,8 +412,9 @@ class AnalysisTab(QWidget):
         print(f"Proceeding to VMAF analysis...")
 
         # Update UI
+        confidence_text = f"{confidence:.2f}" if confidence is not None else "n/a, configured offset"
         self.lbl_alignment_status.setText(
-            f"Aligned using bookend method (conf: {confidence:.2f})"
+            f"Aligned using {results.get('alignment_method', 'bookend')} method (conf: {confidence_text})"
         )
         self.log_to_analysis(f"Alignment complete!")
         self.log_to_analysis(f"Aligned reference: {os.path.basename(aligned_reference)}")
@@ -583,13 +587,15 @@ class AnalysisTab(QWidget):
         # Define the class and make it global to the module
         global VMAFAnalysisThread
         class VMAFAnalysisThread(QThread):
-            def __init__(self, reference_path, distorted_path, model, duration):
+            def __init__(self, reference_path, distorted_path, model, duration, alignment=None, loops=None):
                 super().__init__()
                 self.vmaf_analyzer = VMAFAnalyzer()
                 self.reference_path = reference_path
                 self.distorted_path = distorted_path
                 self.model = model
                 self.duration = duration
+                self.alignment = alignment
+                self.loops = loops
 
                 # Forward signals
                 self.analysis_progress = self.vmaf_analyzer.analysis_progress
@@ -608,7 +614,9 @@ class AnalysisTab(QWidget):
                     self.reference_path, 
                     self.distorted_path, 
                     self.model, 
-                    self.duration
+                    self.duration,
+                    alignment=self.alignment,
+                    loops=self.loops
                 )
 
             @staticmethod
@@ -621,7 +629,9 @@ class AnalysisTab(QWidget):
             self.parent.aligned_paths['reference'],
             self.parent.aligned_paths['captured'],
             self.selected_model,
-            self.selected_duration
+            self.selected_duration,
+            alignment=self.parent.aligned_paths.get('alignment'),
+            loops=self.parent.aligned_paths.get('loops')
         )
 
         # Set output directory and test name if available
@@ -742,7 +752,8 @@ class AnalysisTab(QWidget):
                             'enable_motion_score': self.vmaf_analyzer.enable_motion_score,
                             'enable_temporal_features': self.vmaf_analyzer.enable_temporal_features,
                             'psnr_enabled': self.vmaf_analyzer.psnr_enabled,
-                            'ssim_enabled': self.vmaf_analyzer.ssim_enabled
+                            'ssim_enabled': self.vmaf_analyzer.ssim_enabled,
+                            'extra_metrics': self.vmaf_analyzer.extra_metrics
                         }
                     # Fallback to metadata if available
                     elif 'metadata' in results and 'vmaf_options' in results['metadata']:
@@ -765,6 +776,9 @@ class AnalysisTab(QWidget):
                     metadata.update({
                         # Test Results
                         "vmaf_score": vmaf_score,
+                        "loop_scores": results.get('loop_scores'),
+                        "metric_scores": results.get('metric_scores'),
+                        "scheduling": results.get('scheduling'),
 
                         # File Information
                         "reference_video": reference_file,
@@ -834,6 +848,16 @@ class AnalysisTab(QWidget):
                 self.lbl_vmaf_status.setText(f"VMAF Score: {vmaf_score}")
                 self.log_to_analysis(f"VMAF analysis complete! Score: {vmaf_score}")
 
+            # Per-loop scores from multi-loop analysis
+            loop_scores = results.get('loop_scores')
+            if loop_scores:
+                for loop in loop_scores['loops']:
+                    marker = " (selected)" if loop['selected'] else ""
+                    self.log_to_analysis(f"Loop {loop['loop']}: VMAF {loop['vmaf']:.2f}{marker}")
+                aggregate = loop_scores['aggregate']
+                self.log_to_analysis(f"VMAF over {aggregate['count']} loops: mean {aggregate['mean']:.2f}, " +
+                                     f"min {aggregate['min']:.2f}, spread {aggregate['spread']:.2f}")
+
             # Add PSNR/SSIM metrics to log
             if isinstance(psnr_score, (int, float)):
                 self.log_to_analysis(f"PSNR: {psnr_score:.2f} dB")
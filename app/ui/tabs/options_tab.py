@@ -9,6 +9,9 @@ from PyQt5.QtWidgets import (QCheckBox, QComboBox, QDoubleSpinBox, QFileDialog,
                              QSpinBox, QTabWidget, QVBoxLayout, QWidget,
                              QApplication, QScrollArea)
 
+from app.intermediate_codecs import DEFAULT_INTERMEDIATE_PROFILE, INTERMEDIATE_PROFILES
+from app.metric_engine import METRICS, OPTIONAL_METRICS
+
 logger = logging.getLogger(__name__)
 
 class OptionsTab(QWidget):
@@ -142,10 +145,40 @@ class OptionsTab(QWidget):
         vmaf_dir_layout.addWidget(self.txt_vmaf_dir)
         vmaf_dir_layout.addWidget(self.btn_browse_vmaf_dir)
 
+        # Prepared reference cache directory
+        ref_cache_dir_widget = QWidget()
+        ref_cache_dir_layout = QHBoxLayout(ref_cache_dir_widget)
+        ref_cache_dir_layout.setContentsMargins(0, 0, 0, 0)
+        ref_cache_dir_layout.setSpacing(10)
+
+        self.txt_ref_cache_dir = QLineEdit()
+        self.txt_ref_cache_dir.setReadOnly(True)
+        self.txt_ref_cache_dir.setMinimumWidth(400)
+        self.txt_ref_cache_dir.setPlaceholderText("Default (per-user cache directory)")
+
+        self.btn_browse_ref_cache_dir = QPushButton("Browse...")
+        self.btn_browse_ref_cache_dir.clicked.connect(self.browse_ref_cache_directory)
+        self.btn_browse_ref_cache_dir.setFixedWidth(100)
+
+        ref_cache_dir_layout.addWidget(self.txt_ref_cache_dir)
+        ref_cache_dir_layout.addWidget(self.btn_browse_ref_cache_dir)
+
+        # Reuse references prepared for earlier tests
+        self.chk_ref_cache = QCheckBox("Reuse prepared references across tests")
+        self.chk_ref_cache.setChecked(True)
+
+        self.spin_ref_cache_size = QSpinBox()
+        self.spin_ref_cache_size.setRange(1, 2000)
+        self.spin_ref_cache_size.setValue(20)
+        self.spin_ref_cache_size.setSuffix(" GB")
+
         # Add to form layout
         directories_form.addRow("Reference Videos Directory:", ref_dir_widget)
         directories_form.addRow("Output Directory:", output_dir_widget)
         directories_form.addRow("VMAF Models Directory:", vmaf_dir_widget)
+        directories_form.addRow("Reference Cache:", self.chk_ref_cache)
+        directories_form.addRow("Reference Cache Directory:", ref_cache_dir_widget)
+        directories_form.addRow("Reference Cache Quota:", self.spin_ref_cache_size)
 
         # Add form to directories layout
         directories_layout.addLayout(directories_form)
@@ -320,6 +353,15 @@ class OptionsTab(QWidget):
         self.chk_force_format.setToolTip("Force format even if device reports it's not supported")
         advanced_layout.addRow("Force Format:", self.chk_force_format)
 
+        self.combo_input_source = QComboBox()
+        self.combo_input_source.addItems(["decklink", "file", "lavfi"])
+        self.combo_input_source.setToolTip("Capture from the device, or from a looping file or lavfi graph for testing without hardware")
+        advanced_layout.addRow("Input Source:", self.combo_input_source)
+
+        self.txt_input_spec = QLineEdit()
+        self.txt_input_spec.setPlaceholderText("File path or lavfi graph (file and lavfi sources only)")
+        advanced_layout.addRow("Test Input:", self.txt_input_spec)
+
         advanced_group.setLayout(advanced_layout)
         format_layout.addWidget(advanced_group)
 
@@ -380,19 +422,20 @@ class OptionsTab(QWidget):
         vmaf_layout.addRow("Auto-Align Videos:", self.check_auto_alignment)
 
         self.combo_alignment_method = QComboBox()
-        self.combo_alignment_method.addItems(["SSIM", "Bookend Detection", "Combined"])
-        self.combo_alignment_method.setToolTip("Choose method for aligning videos. Bookend Detection works best with white frames at start/end.")
+        self.combo_alignment_method.addItems(["SSIM", "Bookend Detection", "Content Fingerprint", "Combined"])
+        self.combo_alignment_method.setToolTip("Choose method for aligning videos. Bookend Detection works best with white frames at start/end; Content Fingerprint finds the reference by its frames and needs no bookends.")
         alignment_label = QLabel("Alignment Method:")
-        alignment_label.setToolTip("Choose method for aligning videos. Bookend Detection works best with white frames at start/end.")
+        alignment_label.setToolTip("Choose method for aligning videos. Bookend Detection works best with white frames at start/end; Content Fingerprint finds the reference by its frames and needs no bookends.")
         vmaf_layout.addRow(alignment_label, self.combo_alignment_method)
 
         # Number of threads for VMAF with tooltip
         self.spin_vmaf_threads = QSpinBox()
         self.spin_vmaf_threads.setRange(0, 32)
-        self.spin_vmaf_threads.setValue(4)
-        self.spin_vmaf_threads.setToolTip("Number of CPU threads for VMAF calculation. 0 = Auto (use all available cores)")
+        self.spin_vmaf_threads.setValue(0)
+        self.spin_vmaf_threads.setSpecialValueText("Auto")
+        self.spin_vmaf_threads.setToolTip("Number of CPU threads for VMAF calculation. Auto = chosen from the free cores, the current load and other running jobs")
         threads_label = QLabel("VMAF Threads:")
-        threads_label.setToolTip("Number of CPU threads for VMAF calculation. 0 = Auto (use all available cores)")
+        threads_label.setToolTip("Number of CPU threads for VMAF calculation. Auto = chosen from the free cores, the current load and other running jobs")
         vmaf_layout.addRow(threads_label, self.spin_vmaf_threads)
 
         # Add VMAF model selection with tooltip
@@ -460,6 +503,34 @@ class OptionsTab(QWidget):
         ssim_label.setToolTip("Calculate SSIM (Structural Similarity) metric in addition to VMAF")
         advanced_vmaf_layout.addRow(ssim_label, self.check_ssim_enabled)
 
+        # Extra metrics computed by libvmaf in the same pass as VMAF
+        self.check_extra_metrics = {}
+        for name in OPTIONAL_METRICS:
+            metric = METRICS[name]
+            check = QCheckBox()
+            check.setChecked(False)
+            check.setToolTip(metric["description"])
+            metric_label = QLabel(f"Enable {metric['label']}:")
+            metric_label.setToolTip(metric["description"])
+            advanced_vmaf_layout.addRow(metric_label, check)
+            self.check_extra_metrics[name] = check
+
+        self.check_segment_parallel = QCheckBox()
+        self.check_segment_parallel.setChecked(False)
+        self.check_segment_parallel.setToolTip("Split long comparisons into frame ranges scored by concurrent VMAF processes and merge their per-frame logs")
+        segment_parallel_label = QLabel("Segment-Parallel VMAF:")
+        segment_parallel_label.setToolTip("Split long comparisons into frame ranges scored by concurrent VMAF processes and merge their per-frame logs")
+        advanced_vmaf_layout.addRow(segment_parallel_label, self.check_segment_parallel)
+
+        self.spin_segment_count = QSpinBox()
+        self.spin_segment_count.setRange(0, 64)
+        self.spin_segment_count.setValue(0)
+        self.spin_segment_count.setSpecialValueText("Auto")
+        self.spin_segment_count.setToolTip("Number of frame ranges scored at once in segment-parallel mode (Auto = chosen from the free cores and the current load)")
+        segment_count_label = QLabel("VMAF Segments:")
+        segment_count_label.setToolTip("Number of frame ranges scored at once in segment-parallel mode (Auto = chosen from the free cores and the current load)")
+        advanced_vmaf_layout.addRow(segment_count_label, self.spin_segment_count)
+
         vmaf_advanced_group.setLayout(advanced_vmaf_layout)
 
         vmaf_group.setLayout(vmaf_layout)
@@ -576,6 +647,37 @@ class OptionsTab(QWidget):
         offset_label.setToolTip("Frame offset adjustment for alignment. Negative values start earlier.")
         bookend_layout.addRow(offset_label, self.spin_frame_offset)
 
+        self.check_offset_estimation = QCheckBox()
+        self.check_offset_estimation.setChecked(True)
+        self.check_offset_estimation.setToolTip("Measure the frame offset by correlating reference and capture frame signatures; the frame offset above is used when the match is not confident")
+        offset_estimation_label = QLabel("Estimate Frame Offset:")
+        offset_estimation_label.setToolTip("Measure the frame offset by correlating reference and capture frame signatures; the frame offset above is used when the match is not confident")
+        bookend_layout.addRow(offset_estimation_label, self.check_offset_estimation)
+
+        self.spin_offset_search = QSpinBox()
+        self.spin_offset_search.setRange(1, 300)
+        self.spin_offset_search.setValue(30)
+        self.spin_offset_search.setSuffix(" frames")
+        self.spin_offset_search.setToolTip("How far either side of the bookend timing the offset estimate searches")
+        offset_search_label = QLabel("Offset Search Range:")
+        offset_search_label.setToolTip("How far either side of the bookend timing the offset estimate searches")
+        bookend_layout.addRow(offset_search_label, self.spin_offset_search)
+
+        self.check_frame_mapping = QCheckBox()
+        self.check_frame_mapping.setChecked(True)
+        self.check_frame_mapping.setToolTip("Match every captured frame to its reference frame so dropped or repeated frames do not shift the rest of the comparison; drop and duplicate counts are reported")
+        frame_mapping_label = QLabel("Map Dropped/Repeated Frames:")
+        frame_mapping_label.setToolTip("Match every captured frame to its reference frame so dropped or repeated frames do not shift the rest of the comparison; drop and duplicate counts are reported")
+        bookend_layout.addRow(frame_mapping_label, self.check_frame_mapping)
+
+        # Multi-loop analysis
+        self.check_multi_loop = QCheckBox()
+        self.check_multi_loop.setChecked(False)
+        self.check_multi_loop.setToolTip("Align every complete loop between bookends and score the loops in parallel; results show each loop's VMAF plus the mean, minimum and spread (needs virtual alignment)")
+        multi_loop_label = QLabel("Score All Loops:")
+        multi_loop_label.setToolTip("Align every complete loop between bookends and score the loops in parallel; results show each loop's VMAF plus the mean, minimum and spread (needs virtual alignment)")
+        bookend_layout.addRow(multi_loop_label, self.check_multi_loop)
+
         # Option checkboxes for bookend settings
         self.check_adaptive_brightness = QCheckBox()
         self.check_adaptive_brightness.setChecked(True)
@@ -591,6 +693,15 @@ class OptionsTab(QWidget):
         motion_label.setToolTip("Use motion compensation when aligning distorted content (experimental)")
         bookend_layout.addRow(motion_label, self.check_motion_compensation)
 
+        self.spin_motion_workers = QSpinBox()
+        self.spin_motion_workers.setRange(0, 64)
+        self.spin_motion_workers.setValue(0)
+        self.spin_motion_workers.setSpecialValueText("Auto")
+        self.spin_motion_workers.setToolTip("Number of segments motion-compensated in parallel; each runs its own FFmpeg process (Auto = one per CPU core)")
+        motion_workers_label = QLabel("Motion Compensation Workers:")
+        motion_workers_label.setToolTip("Number of segments motion-compensated in parallel; each runs its own FFmpeg process (Auto = one per CPU core)")
+        bookend_layout.addRow(motion_workers_label, self.spin_motion_workers)
+
         self.check_fallback_full_video = QCheckBox()
         self.check_fallback_full_video.setChecked(True)
         self.check_fallback_full_video.setToolTip("Use full video if bookend detection fails")
@@ -598,6 +709,105 @@ class OptionsTab(QWidget):
         fallback_label.setToolTip("Use full video if bookend detection fails")
         bookend_layout.addRow(fallback_label, self.check_fallback_full_video)
 
+        self.combo_stats_backend = QComboBox()
+        self.combo_stats_backend.addItems(["ffmpeg", "opencv"])
+        self.combo_stats_backend.setToolTip("Decoder used to measure frame brightness. FFmpeg streams downscaled luma and is faster; OpenCV decodes full frames.")
+        stats_backend_label = QLabel("Detection Backend:")
+        stats_backend_label.setToolTip("Decoder used to measure frame brightness. FFmpeg streams downscaled luma and is faster; OpenCV decodes full frames.")
+        bookend_layout.addRow(stats_backend_label, self.combo_stats_backend)
+
+        self.check_packet_prefilter = QCheckBox()
+        self.check_packet_prefilter.setChecked(True)
+        self.check_packet_prefilter.setToolTip("Use packet sizes to find likely bookends and only decode those parts of the capture")
+        packet_prefilter_label = QLabel("Packet-Size Prefilter:")
+        packet_prefilter_label.setToolTip("Use packet sizes to find likely bookends and only decode those parts of the capture")
+        bookend_layout.addRow(packet_prefilter_label, self.check_packet_prefilter)
+
+        self.check_keyframe_coarse_scan = QCheckBox()
+        self.check_keyframe_coarse_scan.setChecked(True)
+        self.check_keyframe_coarse_scan.setToolTip("On long captures, find bookends on keyframes first and only decode the surrounding GOPs")
+        keyframe_scan_label = QLabel("Keyframe Coarse Scan:")
+        keyframe_scan_label.setToolTip("On long captures, find bookends on keyframes first and only decode the surrounding GOPs")
+        bookend_layout.addRow(keyframe_scan_label, self.check_keyframe_coarse_scan)
+
+        self.check_edge_refinement = QCheckBox()
+        self.check_edge_refinement.setChecked(True)
+        self.check_edge_refinement.setToolTip("After the keyframe scan, seek to the GOP on either side of each white keyframe to find the exact bookend edges")
+        edge_refinement_label = QLabel("Refine Bookend Edges:")
+        edge_refinement_label.setToolTip("After the keyframe scan, seek to the GOP on either side of each white keyframe to find the exact bookend edges")
+        bookend_layout.addRow(edge_refinement_label, self.check_edge_refinement)
+
+        self.check_virtual_alignment = QCheckBox()
+        self.check_virtual_alignment.setChecked(True)
+        self.check_virtual_alignment.setToolTip("Trim the original files inside the VMAF filtergraph instead of encoding aligned copies (keeps the capture file)")
+        virtual_alignment_label = QLabel("Virtual Alignment:")
+        virtual_alignment_label.setToolTip("Trim the original files inside the VMAF filtergraph instead of encoding aligned copies (keeps the capture file)")
+        bookend_layout.addRow(virtual_alignment_label, self.check_virtual_alignment)
+
+        self.check_archive_capture = QCheckBox()
+        self.check_archive_capture.setChecked(False)
+        self.check_archive_capture.setToolTip("With virtual alignment, also export the aligned capture as an archive clip: only the frames before the first keyframe are re-encoded, the rest is copied at capture quality")
+        archive_capture_label = QLabel("Archive Aligned Capture:")
+        archive_capture_label.setToolTip("With virtual alignment, also export the aligned capture as an archive clip: only the frames before the first keyframe are re-encoded, the rest is copied at capture quality")
+        bookend_layout.addRow(archive_capture_label, self.check_archive_capture)
+
+        self.combo_intermediate_profile = QComboBox()
+        for profile_name, profile in INTERMEDIATE_PROFILES.items():
+            self.combo_intermediate_profile.addItem(profile["label"], profile_name)
+        self.combo_intermediate_profile.setCurrentIndex(self.combo_intermediate_profile.findData(DEFAULT_INTERMEDIATE_PROFILE))
+        self.combo_intermediate_profile.setToolTip("Codec for aligned files when they are written (virtual alignment off, motion compensation). Lossless profiles keep the decoded pixels bit-exact.")
+        intermediate_profile_label = QLabel("Intermediate Codec:")
+        intermediate_profile_label.setToolTip("Codec for aligned files when they are written (virtual alignment off, motion compensation). Lossless profiles keep the decoded pixels bit-exact.")
+        bookend_layout.addRow(intermediate_profile_label, self.combo_intermediate_profile)
+
+        self.check_profile_cache = QCheckBox()
+        self.check_profile_cache.setChecked(True)
+        self.check_profile_cache.setToolTip("Store brightness profiles next to each video so re-running detection skips decoding")
+        profile_cache_label = QLabel("Cache Brightness Profiles:")
+        profile_cache_label.setToolTip("Store brightness profiles next to each video so re-running detection skips decoding")
+        bookend_layout.addRow(profile_cache_label, self.check_profile_cache)
+
+        self.spin_profile_cache_size = QSpinBox()
+        self.spin_profile_cache_size.setRange(16, 4096)
+        self.spin_profile_cache_size.setValue(256)
+        self.spin_profile_cache_size.setSuffix(" MB")
+        self.spin_profile_cache_size.setToolTip("Least recently used profiles are deleted once the cache grows past this size")
+        profile_cache_size_label = QLabel("Profile Cache Size:")
+        profile_cache_size_label.setToolTip("Least recently used profiles are deleted once the cache grows past this size")
+        bookend_layout.addRow(profile_cache_size_label, self.spin_profile_cache_size)
+
+        self.spin_detection_workers = QSpinBox()
+        self.spin_detection_workers.setRange(0, 64)
+        self.spin_detection_workers.setValue(0)
+        self.spin_detection_workers.setSpecialValueText("Auto")
+        self.spin_detection_workers.setToolTip("Number of parallel decoders used to scan a capture for bookends (Auto = one per CPU core)")
+        detection_workers_label = QLabel("Detection Workers:")
+        detection_workers_label.setToolTip("Number of parallel decoders used to scan a capture for bookends (Auto = one per CPU core)")
+        bookend_layout.addRow(detection_workers_label, self.spin_detection_workers)
+
+        self.spin_encode_workers = QSpinBox()
+        self.spin_encode_workers.setRange(0, 64)
+        self.spin_encode_workers.setValue(0)
+        self.spin_encode_workers.setSpecialValueText("Auto")
+        self.spin_encode_workers.setToolTip("Number of keyframe-aligned chunks each aligned file is encoded in at once; each runs its own FFmpeg process (Auto = chosen from the free cores and the current load)")
+        encode_workers_label = QLabel("Encode Workers:")
+        encode_workers_label.setToolTip("Number of keyframe-aligned chunks each aligned file is encoded in at once; each runs its own FFmpeg process (Auto = chosen from the free cores and the current load)")
+        bookend_layout.addRow(encode_workers_label, self.spin_encode_workers)
+
+        self.check_live_detection = QCheckBox()
+        self.check_live_detection.setChecked(True)
+        self.check_live_detection.setToolTip("Detect bookends while recording and stop as soon as the minimum number of loops is captured")
+        live_detection_label = QLabel("Live Bookend Detection:")
+        live_detection_label.setToolTip("Detect bookends while recording and stop as soon as the minimum number of loops is captured")
+        bookend_layout.addRow(live_detection_label, self.check_live_detection)
+
+        self.check_ring_capture = QCheckBox()
+        self.check_ring_capture.setChecked(False)
+        self.check_ring_capture.setToolTip("Keep a short rolling pre-roll and only save the capture from one GOP before the first bookend")
+        ring_capture_label = QLabel("Start at First Bookend:")
+        ring_capture_label.setToolTip("Keep a short rolling pre-roll and only save the capture from one GOP before the first bookend")
+        bookend_layout.addRow(ring_capture_label, self.check_ring_capture)
+
         bookend_group.setLayout(bookend_layout)
         advanced_layout.addWidget(bookend_group)
         
@@ -1002,6 +1212,9 @@ class OptionsTab(QWidget):
                 'default_output_dir': self.txt_output_dir.text(),
                 'models_dir': self.txt_vmaf_dir.text(),
                 'ffmpeg_path': self.txt_ffmpeg_path.text(),
+                'reference_cache_enabled': self.chk_ref_cache.isChecked(),
+                'reference_cache_dir': self.txt_ref_cache_dir.text(),
+                'reference_cache_max_gb': self.spin_ref_cache_size.value(),
             }
             self.options_manager.update_category("paths", paths_settings)
             
@@ -1053,6 +1266,8 @@ class OptionsTab(QWidget):
                 "disable_audio": self.chk_disable_audio.isChecked(),
                 "low_latency": self.chk_low_latency.isChecked(),
                 "force_format": self.chk_force_format.isChecked(),
+                "input_source": self.combo_input_source.currentText(),
+                "input_spec": self.txt_input_spec.text(),
                 
                 # Add these essential fields with defaults if not available
                 "resolution": "1920x1080",
@@ -1143,6 +1358,9 @@ class OptionsTab(QWidget):
                 'enable_temporal_features': self.check_temporal_features.isChecked(),
                 'psnr_enabled': self.check_psnr_enabled.isChecked(),
                 'ssim_enabled': self.check_ssim_enabled.isChecked(),
+                'extra_metrics': [name for name, check in self.check_extra_metrics.items() if check.isChecked()],
+                'segment_parallel': self.check_segment_parallel.isChecked(),
+                'segment_count': self.spin_segment_count.value(),
             }
             self.options_manager.update_category("vmaf", vmaf_settings)
             
@@ -1186,9 +1404,27 @@ class OptionsTab(QWidget):
                 "white_threshold": self.spin_white_threshold.value(),
                 "frame_sampling_rate": self.spin_frame_sampling.value(),
                 "frame_offset": self.spin_frame_offset.value(),
+                "offset_estimation": self.check_offset_estimation.isChecked(),
+                "offset_search_frames": self.spin_offset_search.value(),
+                "frame_mapping": self.check_frame_mapping.isChecked(),
+                "multi_loop_analysis": self.check_multi_loop.isChecked(),
                 "adaptive_brightness": self.check_adaptive_brightness.isChecked(),
                 "motion_compensation": self.check_motion_compensation.isChecked(),
-                "fallback_to_full_video": self.check_fallback_full_video.isChecked()
+                "motion_workers": self.spin_motion_workers.value(),
+                "fallback_to_full_video": self.check_fallback_full_video.isChecked(),
+                "stats_backend": self.combo_stats_backend.currentText(),
+                "packet_prefilter": self.check_packet_prefilter.isChecked(),
+                "keyframe_coarse_scan": self.check_keyframe_coarse_scan.isChecked(),
+                "edge_refinement": self.check_edge_refinement.isChecked(),
+                "virtual_alignment": self.check_virtual_alignment.isChecked(),
+                "archive_aligned_capture": self.check_archive_capture.isChecked(),
+                "intermediate_profile": self.combo_intermediate_profile.currentData(),
+                "profile_cache": self.check_profile_cache.isChecked(),
+                "profile_cache_max_mb": self.spin_profile_cache_size.value(),
+                "detection_workers": self.spin_detection_workers.value(),
+                "encode_workers": self.spin_encode_workers.value(),
+                "live_detection": self.check_live_detection.isChecked(),
+                "ring_capture": self.check_ring_capture.isChecked()
             }
 
             # Update bookend settings
@@ -1398,6 +1634,17 @@ class OptionsTab(QWidget):
             # Update VMAF models dropdown after changing directory
             self._populate_vmaf_models()
 
+    def browse_ref_cache_directory(self):
+        """Browse for the prepared reference cache directory"""
+        directory = QFileDialog.getExistingDirectory(
+            self, 
+            "Select Reference Cache Directory",
+            self.txt_ref_cache_dir.text() or os.path.expanduser("~")
+        )
+
+        if directory:
+            self.txt_ref_cache_dir.setText(directory)
+
     def browse_ffmpeg_path(self):
         """Browse for FFmpeg executable"""
         file_filter = "Executable Files (*.exe);;All Files (*.*)" if os.name == "nt" else "All Files (*.*)"
@@ -1477,6 +1724,9 @@ class OptionsTab(QWidget):
             self.txt_output_dir.setText(paths.get('default_output_dir', ''))
             self.txt_vmaf_dir.setText(paths.get('models_dir', ''))
             self.txt_ffmpeg_path.setText(paths.get('ffmpeg_path', ''))
+            self.chk_ref_cache.setChecked(paths.get('reference_cache_enabled', True))
+            self.txt_ref_cache_dir.setText(paths.get('reference_cache_dir', ''))
+            self.spin_ref_cache_size.setValue(int(paths.get('reference_cache_max_gb', 20)))
 
             # Populate encoder settings
             encoder = settings.get('encoder', {})
@@ -1506,7 +1756,7 @@ class OptionsTab(QWidget):
             self.txt_test_location.setText(vmaf.get('test_location', ''))
 
             # Load thread count
-            self.spin_vmaf_threads.setValue(vmaf.get('threads', 4))
+            self.spin_vmaf_threads.setValue(vmaf.get('threads', 0))
 
             # Populate VMAF models and set default
             self._populate_vmaf_models()
@@ -1522,6 +1772,11 @@ class OptionsTab(QWidget):
             self.check_temporal_features.setChecked(vmaf.get('enable_temporal_features', False))
             self.check_psnr_enabled.setChecked(vmaf.get('psnr_enabled', True))
             self.check_ssim_enabled.setChecked(vmaf.get('ssim_enabled', True))
+            extra_metrics = vmaf.get('extra_metrics', [])
+            for name, check in self.check_extra_metrics.items():
+                check.setChecked(name in extra_metrics)
+            self.check_segment_parallel.setChecked(vmaf.get('segment_parallel', False))
+            self.spin_segment_count.setValue(vmaf.get('segment_count', 0))
             
         except Exception as e:
             logger.error(f"Error loading analysis settings: {e}")
@@ -1557,11 +1812,32 @@ class OptionsTab(QWidget):
             self.slider_white_threshold.setValue(bookend.get('white_threshold', 200))
             self.spin_frame_sampling.setValue(bookend.get('frame_sampling_rate', 5))
             self.spin_frame_offset.setValue(bookend.get('frame_offset', 3))
+            self.check_offset_estimation.setChecked(bookend.get('offset_estimation', True))
+            self.spin_offset_search.setValue(bookend.get('offset_search_frames', 30))
+            self.check_frame_mapping.setChecked(bookend.get('frame_mapping', True))
+            self.check_multi_loop.setChecked(bookend.get('multi_loop_analysis', False))
             
             # Load boolean settings
             self.check_adaptive_brightness.setChecked(bookend.get('adaptive_brightness', True))
             self.check_motion_compensation.setChecked(bookend.get('motion_compensation', False))
+            self.spin_motion_workers.setValue(bookend.get('motion_workers', 0))
             self.check_fallback_full_video.setChecked(bookend.get('fallback_to_full_video', True))
+            self.combo_stats_backend.setCurrentText(bookend.get('stats_backend', 'ffmpeg'))
+            self.check_packet_prefilter.setChecked(bookend.get('packet_prefilter', True))
+            self.check_keyframe_coarse_scan.setChecked(bookend.get('keyframe_coarse_scan', True))
+            self.check_edge_refinement.setChecked(bookend.get('edge_refinement', True))
+            self.check_virtual_alignment.setChecked(bookend.get('virtual_alignment', True))
+            self.check_archive_capture.setChecked(bookend.get('archive_aligned_capture', False))
+            profile_index = self.combo_intermediate_profile.findData(
+                bookend.get('intermediate_profile', DEFAULT_INTERMEDIATE_PROFILE))
+            if profile_index >= 0:
+                self.combo_intermediate_profile.setCurrentIndex(profile_index)
+            self.check_profile_cache.setChecked(bookend.get('profile_cache', True))
+            self.spin_profile_cache_size.setValue(bookend.get('profile_cache_max_mb', 256))
+            self.spin_detection_workers.setValue(bookend.get('detection_workers', 0))
+            self.spin_encode_workers.setValue(bookend.get('encode_workers', 0))
+            self.check_live_detection.setChecked(bookend.get('live_detection', True))
+            self.check_ring_capture.setChecked(bookend.get('ring_capture', False))
             
             logger.info("Bookend settings loaded successfully")
         except Exception as e:
@@ -1637,6 +1913,9 @@ class OptionsTab(QWidget):
             if 'force_format' in capture_settings:
                 self.chk_force_format.setChecked(capture_settings['force_format'])
 
+            self.combo_input_source.setCurrentText(capture_settings.get('input_source', 'decklink'))
+            self.txt_input_spec.setText(capture_settings.get('input_spec', ''))
+
             # Try to detect formats automatically if empty
             if self.combo_format_code.count() == 0:
                 logger.info("No formats loaded, attempting to detect formats")
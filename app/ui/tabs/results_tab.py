@@ -5,6 +5,7 @@ import platform
 import shutil
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime
 from enum import Enum, auto
@@ -22,6 +23,8 @@ from PyQt5.QtWidgets import (QApplication, QCheckBox, QComboBox, QFileDialog,
                              QProgressBar, QPushButton, QSpinBox, QTableWidget,
                              QTabWidget, QTextEdit, QVBoxLayout, QWidget, QProgressDialog)
 
+from app.ffmpeg_progress import ProgressReader, with_progress
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -356,44 +359,42 @@ class AnalysisWorker(QObject):
                 # Execute ffmpeg command
                 self.log.emit(f"Executing: {' '.join(ffmpeg_cmd)}")
                 
-                # Start process
+                # Total frames for the percentage, read once up front
+                cap = cv2.VideoCapture(self.distorted_path)
+                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                cap.release()
+
+                # Start process, with structured progress on stdout
                 process = subprocess.Popen(
-                    ffmpeg_cmd,
+                    with_progress(ffmpeg_cmd),
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     universal_newlines=True,
                     text=True
                 )
-                
-                # Process output to track progress
-                for line in iter(process.stderr.readline, ""):
+
+                # The log lines are passed on from their own thread so stdout never stalls
+                def forward_log():
+                    for line in process.stderr:
+                        self.log.emit(line.strip())
+                log_thread = threading.Thread(target=forward_log, daemon=True)
+                log_thread.start()
+
+                def report(event):
+                    self.progress.emit(int(event.percent or 0))
+
+                progress_reader = ProgressReader(total_frames, report)
+                for line in process.stdout:
                     if not self.running:
                         process.terminate()
                         self.error.emit("Analysis cancelled")
                         return
-                    
-                    # Try to parse progress information
-                    if "frame=" in line:
-                        try:
-                            # Extract frame number
-                            frame_part = line.split("frame=")[1].split()[0].strip()
-                            frame_num = int(frame_part)
-                            
-                            # Estimate total frames
-                            cap = cv2.VideoCapture(self.distorted_path)
-                            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                            cap.release()
-                            
-                            # Calculate progress
-                            progress = min(100, int((frame_num / total_frames) * 100))
-                            self.progress.emit(progress)
-                        except:
-                            pass
-                    
-                    self.log.emit(line.strip())
-                
+                    progress_reader.feed(line)
+
                 # Wait for process to complete
                 process.wait()
+                log_thread.join()
+                self.log.emit(f"FFmpeg throughput: {progress_reader.summary()}")
                 
                 if process.returncode != 0:
                     self.error.emit(f"FFmpeg VMAF analysis failed with return code {process.returncode}")
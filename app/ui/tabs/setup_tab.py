@@ -289,7 +289,7 @@ class SetupTab(QWidget):
 
         # Create analysis thread
         from app.reference_analyzer import ReferenceAnalysisThread
-        self.reference_thread = ReferenceAnalysisThread(file_path)
+        self.reference_thread = ReferenceAnalysisThread(file_path, getattr(self.parent, 'options_manager', None))
         self.reference_thread.progress_update.connect(self.log_to_setup)
         self.reference_thread.error_occurred.connect(self.handle_reference_error)
         self.reference_thread.analysis_complete.connect(self.handle_reference_analyzed)
@@ -30,6 +30,23 @@ def get_project_paths():
     }
 
 
+def user_cache_dir(*parts):
+    """
+    Per-user cache directory of the application, outside the source tree
+
+    %LOCALAPPDATA%\\ChromaPQA\\cache on Windows (next to the logs in %APPDATA%
+    when LOCALAPPDATA is not set), $XDG_CACHE_HOME/ChromaPQA or
+    ~/.cache/ChromaPQA elsewhere.
+    """
+    if platform.system() == 'Windows':
+        base = os.getenv('LOCALAPPDATA') or os.getenv('APPDATA') or os.path.expanduser("~")
+        root = os.path.join(base, 'ChromaPQA', 'cache')
+    else:
+        base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache")
+        root = os.path.join(base, 'ChromaPQA')
+    return os.path.join(root, *parts)
+
+
 def get_ffmpeg_path():
     """
     Get path to ffmpeg executables
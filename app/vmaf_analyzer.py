@@ -5,16 +5,53 @@ import platform
 import subprocess
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from .alignment_descriptor import make_alignment_descriptor, seeked_descriptor, segment_descriptor
+from .cpu_scheduler import get_scheduler
+from .ffmpeg_progress import ProgressReader, with_progress
+from .metric_engine import (libvmaf_feature_option, metric_filtergraph, metric_scores, METRICS, OPTIONAL_METRICS,
+                            stats_filter)
+from .segment_vmaf import input_seek_args, merge_stats_files, merge_vmaf_logs, plan_vmaf_segments
 # Now using the improved utility functions
-from .utils import get_ffmpeg_path
+from .utils import get_ffmpeg_path, get_subprocess_startupinfo
+from .vmaf_log import read_vmaf_log
 
 logger = logging.getLogger(__name__)
 
+
+def pooled_vmaf_score(json_path):
+    """Mean VMAF score from a libvmaf JSON log, from the pooled metrics or else the frames"""
+    score = read_vmaf_log(json_path).mean("vmaf")
+    if score is None:
+        raise ValueError(f"No VMAF scores in {json_path}")
+    return score
+
+
+def aggregate_loop_scores(scores):
+    """
+    Summarise per-loop scores
+
+    Returns:
+        Dict with count, mean, min, max, spread (standard deviation between
+        loops) and range (max - min)
+    """
+    count = len(scores)
+    mean = sum(scores) / count
+    return {
+        'count': count,
+        'mean': mean,
+        'min': min(scores),
+        'max': max(scores),
+        'spread': (sum((score - mean) ** 2 for score in scores) / count) ** 0.5,
+        'range': max(scores) - min(scores)
+    }
+
+
 class VMAFAnalyzer(QObject):
     """VMAF analyzer for measuring video quality with signals for UI integration"""
     analysis_progress = pyqtSignal(int)  # 0-100%
@@ -28,8 +65,9 @@ class VMAFAnalyzer(QObject):
         self.test_name = None
         self._process_lock = threading.Lock()
         self._current_process = None
+        self._loop_processes = []  # Concurrent per-loop VMAF processes
         self._terminate_requested = False
-        self.threads = 4  # Default number of threads for VMAF analysis
+        self.threads = 0  # Total libvmaf threads (0 = chosen by the CPU scheduler)
         # Default values for advanced options
         self.pool_method = "mean"  # Options: mean, min, harmonic_mean
         self.enable_motion_score = False
@@ -37,6 +75,9 @@ class VMAFAnalyzer(QObject):
         self.feature_subsample = 1
         self.psnr_enabled = True
         self.ssim_enabled = True
+        self.extra_metrics = []  # Further metric_engine metrics computed in the same run
+        self.segment_parallel = False  # Score long comparisons as concurrent frame ranges
+        self.segment_count = 0  # Segments in segment-parallel mode (0 = chosen by the CPU scheduler)
 
 
 
@@ -51,8 +92,8 @@ class VMAFAnalyzer(QObject):
             # Get VMAF settings
             vmaf_settings = options_manager.get_setting("vmaf")
             
-            # Set threads from settings (default to 4 if not found)
-            self.threads = vmaf_settings.get("threads", 4)
+            # Set threads from settings (0 = chosen by the CPU scheduler)
+            self.threads = vmaf_settings.get("threads", 0)
             
             # Set feature subsample (default to 1 if not found)
             self.feature_subsample = vmaf_settings.get("feature_subsample", 1)
@@ -63,6 +104,9 @@ class VMAFAnalyzer(QObject):
             self.enable_temporal_features = vmaf_settings.get("enable_temporal_features", False)
             self.psnr_enabled = vmaf_settings.get("psnr_enabled", True)
             self.ssim_enabled = vmaf_settings.get("ssim_enabled", True)
+            self.extra_metrics = [name for name in vmaf_settings.get("extra_metrics", []) if name in OPTIONAL_METRICS]
+            self.segment_parallel = vmaf_settings.get("segment_parallel", False)
+            self.segment_count = vmaf_settings.get("segment_count", 0)
             
             logger.info(f"VMAF options set from manager: threads={self.threads}, "
                     f"feature_subsample={self.feature_subsample}, pool={self.pool_method}")
@@ -84,8 +128,8 @@ class VMAFAnalyzer(QObject):
             # Get VMAF settings
             vmaf_settings = options_manager.get_setting("vmaf")
             
-            # Set threads from settings (default to 4 if not found)
-            self.threads = vmaf_settings.get("threads", 4)
+            # Set threads from settings (0 = chosen by the CPU scheduler)
+            self.threads = vmaf_settings.get("threads", 0)
             
             # Set feature subsample (default to 1 if not found)
             self.feature_subsample = vmaf_settings.get("feature_subsample", 1)
@@ -96,6 +140,9 @@ class VMAFAnalyzer(QObject):
             self.enable_temporal_features = vmaf_settings.get("enable_temporal_features", False)
             self.psnr_enabled = vmaf_settings.get("psnr_enabled", True)
             self.ssim_enabled = vmaf_settings.get("ssim_enabled", True)
+            self.extra_metrics = [name for name in vmaf_settings.get("extra_metrics", []) if name in OPTIONAL_METRICS]
+            self.segment_parallel = vmaf_settings.get("segment_parallel", False)
+            self.segment_count = vmaf_settings.get("segment_count", 0)
             
             logger.info(f"VMAF options set from manager: threads={self.threads}, "
                     f"feature_subsample={self.feature_subsample}, pool={self.pool_method}")
@@ -120,7 +167,8 @@ class VMAFAnalyzer(QObject):
         
     def set_advanced_options(self, pool_method="mean", enable_motion_score=False, 
                             enable_temporal_features=False, feature_subsample=1,
-                            psnr_enabled=True, ssim_enabled=True):
+                            psnr_enabled=True, ssim_enabled=True, extra_metrics=None,
+                            segment_parallel=False, segment_count=0):
         """Set advanced VMAF analysis options for fine-tuning"""
         self.pool_method = pool_method
         self.enable_motion_score = enable_motion_score
@@ -128,17 +176,28 @@ class VMAFAnalyzer(QObject):
         self.feature_subsample = feature_subsample
         self.psnr_enabled = psnr_enabled
         self.ssim_enabled = ssim_enabled
+        self.extra_metrics = [name for name in (extra_metrics or []) if name in OPTIONAL_METRICS]
+        self.segment_parallel = segment_parallel
+        self.segment_count = segment_count
         
         logger.info(f"Set advanced VMAF options: pool={pool_method}, "
                     f"motion_score={enable_motion_score}, "
                     f"temporal={enable_temporal_features}, "
                     f"feature_subsample={feature_subsample}, "
                     f"psnr_enabled={psnr_enabled}, "
-                    f"ssim_enabled={ssim_enabled}")
+                    f"ssim_enabled={ssim_enabled}, "
+                    f"extra_metrics={self.extra_metrics}, "
+                    f"segment_parallel={segment_parallel} ({segment_count or 'auto'} segments)")
 
     def terminate_analysis(self):
         """Terminate running analysis"""
         self._terminate_requested = True
+        for process in list(self._loop_processes):
+            try:
+                if process.poll() is None:
+                    process.kill()
+            except Exception as e:
+                logger.error(f"Error terminating VMAF loop process: {e}")
         if self._current_process:
             try:
                 logger.info("Terminating VMAF analysis process")
@@ -239,17 +298,29 @@ class VMAFAnalyzer(QObject):
             logger.error(traceback.format_exc())
             return None
 
-    def analyze_videos(self, reference_path, distorted_path, model="vmaf_v0.6.1", duration=None):
-        """Run VMAF analysis with the correct command format and properly escaped paths"""
-        
-        import psutil
-        cpu_count = psutil.cpu_count(logical=True)
-        print(f"System has {cpu_count} logical CPUs")
-        print(f"Current CPU usage: {psutil.cpu_percent(interval=0.1)}%")
-        
+    def analyze_videos(self, reference_path, distorted_path, model="vmaf_v0.6.1", duration=None, alignment=None,
+                       loops=None):
+        """
+        Run VMAF analysis with the correct command format and properly escaped paths
+
+        With an alignment descriptor the original files are compared directly:
+        the descriptor is applied as trim/setpts/fps filters in the same
+        filtergraph, so no aligned copies have to be encoded first.
+
+        PSNR, SSIM and any extra metrics are computed in the same FFmpeg run:
+        both inputs are decoded once and split between the metric filters (see
+        metric_engine), so they add little to the time VMAF takes on its own.
+
+        With loops (one alignment descriptor per captured loop, from multi-loop
+        bookend alignment) every loop is scored concurrently and the results
+        carry per-loop scores plus their aggregate; PSNR/SSIM and the detailed
+        per-frame results come from the selected loop.
+        """
+
         print("VMAF ANALYZER STARTING - DIRECT CONSOLE OUTPUT")
         with self._process_lock:  # Use lock to prevent duplicate processing
             original_dir = os.getcwd()
+            lease_id = None
             try:
                 self._terminate_requested = False
                 self.status_update.emit(f"Analyzing videos with model: {model}")
@@ -311,7 +382,7 @@ class VMAFAnalyzer(QObject):
                 ssim_path = os.path.join(test_dir, ssim_filename)
 
                 # Get video metadata to estimate progress
-                self.get_video_metadata(reference_path, ffprobe_exe)
+                ref_meta = self.get_video_metadata(reference_path, ffprobe_exe)
                 dist_meta = self.get_video_metadata(distorted_path, ffprobe_exe)
                 
                 # Estimate total frames for progress tracking
@@ -322,6 +393,11 @@ class VMAFAnalyzer(QObject):
                     elif dist_meta.get('frame_rate', 0) > 0 and dist_meta.get('duration', 0) > 0:
                         total_frames = int(dist_meta.get('frame_rate') * dist_meta.get('duration'))
                 
+                if alignment:
+                    total_frames = alignment['frame_count']
+                    logger.info(f"Virtual alignment: comparing {total_frames} frames from captured frame " +
+                            f"{alignment['captured_start_frame']}")
+
                 logger.info(f"Estimated total frames: {total_frames}")
 
                 # Make sure model has .json extension if not already
@@ -369,13 +445,25 @@ class VMAFAnalyzer(QObject):
                     dist_rel_path = distorted_path
                     json_rel_path = json_path
                 
+                # Choose the processes and libvmaf threads from the free cores and whatever else is running
+                scheduler = get_scheduler()
+                segment_plan = None
+                if loops and len(loops) > 1:
+                    schedule = scheduler.plan("vmaf", max_jobs=len(loops), threads=self.threads)
+                else:
+                    if self.segment_parallel:
+                        # Long single comparisons can be split into frame ranges scored concurrently
+                        segment_plan = self._plan_segment_run(alignment, reference_path, distorted_path, ref_meta,
+                                                              dist_meta)
+                    schedule = segment_plan[2] if segment_plan else scheduler.plan("vmaf", threads=self.threads)
+
                 # Set up VMAF options with advanced parameters
                 vmaf_options = [
                     f"log_path={json_rel_path}",
                     "log_fmt=json",
                     # Use the exact format from your working command
                     f"model=version={model}" if not any(sep in model for sep in ["/", "\\"]) else f"model=path={model}",
-                    f"n_threads={self.threads if hasattr(self, 'threads') else 4}",
+                    f"n_threads={schedule['threads_per_job']}",
                     f"n_subsample={self.feature_subsample}"
 ]
                 
@@ -402,19 +490,40 @@ class VMAFAnalyzer(QObject):
                         vmaf_options.append("feature=name=motion:enable=1")                   
                     
                 
+                # Extra metrics computed by libvmaf's own feature extractors
+                feature_option = libvmaf_feature_option(self.extra_metrics)
+                if feature_option:
+                    vmaf_options.append(feature_option)
+
                 # Build the filter option
                 vmaf_filter = f"libvmaf={':'.join(vmaf_options)}"
                 # Log the actual filter string for debugging
                 logger.info(f"VMAF filter: {vmaf_filter}")
+
+                # PSNR and SSIM filters share the decoded frames with libvmaf
+                stats_paths = {}
+                if self.psnr_enabled:
+                    stats_paths['psnr'] = psnr_path
+                if self.ssim_enabled:
+                    stats_paths['ssim'] = ssim_path
+                stats_filters = []
+                for name, stats_path in stats_paths.items():
+                    if platform.system() == 'Windows':
+                        stats_path = os.path.relpath(stats_path, base_dir).replace('\\', '/')
+                    stats_filters.append(stats_filter(name, stats_path))
                 
+                # Seek the capture to the aligned content rather than decoding and trimming what precedes it
+                seeked_alignment, captured_seek_frame = seeked_descriptor(alignment)
+
                 # Use optimized VMAF command with relative paths and quoted filter
                 optimized_cmd = [
                     ffmpeg_exe,
                     "-hide_banner",
                     "-loglevel", "info",  # Use info level to see progress but not too verbose
+                    *input_seek_args(captured_seek_frame, (alignment or {}).get('captured_fps')),
                     "-i", dist_rel_path,
                     "-i", ref_rel_path,
-                    "-lavfi", vmaf_filter,
+                    "-lavfi", metric_filtergraph(seeked_alignment, vmaf_filter, stats_filters),
                     "-f", "null", "-"
                 ]
 
@@ -437,159 +546,156 @@ class VMAFAnalyzer(QObject):
                         "AV_LOG_FORCE_NOCOLOR": "1"
                     })
 
-                # Emit initial progress
-                self.analysis_progress.emit(0)
-                self.status_update.emit("Starting VMAF analysis...")
+                # Log paths of the loops scored next to the selected one
+                loop_jobs = None
+                if loops and len(loops) > 1:
+                    loop_jobs = []
+                    for loop in loops:
+                        loop_json = json_path if loop.get('selected') else json_path.replace(
+                            "_vmaf.json", f"_loop{loop['loop']}_vmaf.json")
+                        loop_log = loop_json
+                        if platform.system() == 'Windows':
+                            loop_log = os.path.relpath(loop_json, base_dir).replace('\\', '/')
+                        loop_jobs.append(dict(loop, json_path=loop_json, log_path=loop_log))
+                    if not any(job.get('selected') for job in loop_jobs):
+                        loop_jobs[0].update(selected=True, json_path=json_path, log_path=json_rel_path)
 
-                try:
-                    # Start the process
-                    self._current_process = subprocess.Popen(
-                        optimized_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        bufsize=1,
-                        startupinfo=startupinfo,
-                        creationflags=creationflags,
-                        env=env
-                    )
-
-                    # Monitor progress in real-time
-                    stderr_lines = []
-                    last_progress_time = time.time()
-                    frame_count = 0
+                lease_id = scheduler.acquire("vmaf", schedule['jobs'] * schedule['threads_per_job'])
+                scoring_start = time.time()
+
+                loop_scores = None
+                frame_count = 0
+                if loop_jobs:
+                    # Every loop is scored concurrently; the selected one also provides the detailed results
+                    loop_scores = self._score_loops(ffmpeg_exe, dist_rel_path, ref_rel_path, vmaf_options, loop_jobs,
+                                                    stats_filters, schedule)
+                    if loop_scores is None:
+                        return None
+                elif segment_plan:
+                    if not self._score_segments(ffmpeg_exe, dist_rel_path, ref_rel_path, vmaf_options, *segment_plan,
+                                                json_path, stats_paths,
+                                                base_dir if platform.system() == 'Windows' else None):
+                        return None
+                else:
+                    # Emit initial progress
+                    self.analysis_progress.emit(0)
+                    self.status_update.emit("Starting VMAF analysis...")
+
+                    try:
+                        # Start the process, with structured progress on stdout
+                        self._current_process = subprocess.Popen(
+                            with_progress(optimized_cmd),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            text=True,
+                            bufsize=1,
+                            startupinfo=startupinfo,
+                            creationflags=creationflags,
+                            env=env
+                        )
+
+                        # stderr is only kept for errors and the score line
+                        process = self._current_process
+                        stderr_lines = []
+                        stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr),
+                                                         daemon=True)
+                        stderr_thread.start()
+
+                        def report(event):
+                            progress = min(95, int(event.percent or 0))
+                            self.analysis_progress.emit(progress)
+                            self.status_update.emit(f"Processing {event.describe()}")
+
+                        progress_reader = ProgressReader(total_frames, report)
+                        for line in process.stdout:
+                            if self._terminate_requested:
+                                logger.info("VMAF analysis termination requested")
+                                break
+                            progress_reader.feed(line)
+
+                        # Wait for process to complete
+                        returncode = self._current_process.wait(timeout=10)
+                        stderr_thread.join(timeout=5)
+                        error = ''.join(stderr_lines)
+                        for line in stderr_lines:
+                            if "VMAF score" in line:
+                                logger.info(line.strip())
+
+                        # Process completed
+                        throughput = progress_reader.summary()
+                        if throughput:
+                            frame_count = throughput['frames']
+                        logger.info(f"VMAF process completed with return code: {returncode}, throughput: {throughput}")
+                        self._current_process = None
                     
-                    # Read stderr line by line to capture progress
-                    for line in iter(self._current_process.stderr.readline, ''):
                         if self._terminate_requested:
-                            logger.info("VMAF analysis termination requested")
-                            break
-                            
-                        stderr_lines.append(line)
+                            error_msg = "VMAF analysis was terminated by user"
+                            logger.warning(error_msg)
+                            self.error_occurred.emit(error_msg)
+                            return None
                         
-                        # Log progress line if it contains useful information
-                        if "frame=" in line or "speed=" in line or "VMAF score" in line:
-                            logger.info(f"VMAF progress: {line.strip()}")
-                        
-                        # Extract frame count for progress reporting
-                        if "frame=" in line:
-                            try:
-                                frame_info = line.split("frame=")[1].split()[0].strip()
-                                if frame_info.isdigit():
-                                    frame_count = int(frame_info)
-                                    
-                                    # Calculate progress percentage
-                                    if total_frames > 0:
-                                        progress = min(95, int((frame_count / total_frames) * 100))
-                                        
-                                        # Only update UI every 0.5 seconds to avoid overwhelming it
-                                        current_time = time.time()
-                                        if current_time - last_progress_time > 0.5:
-                                            self.analysis_progress.emit(progress)
-                                            last_progress_time = current_time
-                                            
-                                            # Also update status text with frame info
-                                            self.status_update.emit(f"Processing frame {frame_count}/{total_frames} ({progress}%)")
-                            except Exception as e:
-                                logger.debug(f"Error parsing frame progress: {str(e)}")
-                        
-                        # Check if process is still running
-                        if self._current_process.poll() is not None:
-                            logger.info("VMAF process completed")
-                            break
-                    
-                    # Get any remaining output
-                    remaining_stderr = self._current_process.stderr.read()
-                    if remaining_stderr:
-                        stderr_lines.append(remaining_stderr)
-                    
-                    # Wait for process to complete
-                    returncode = self._current_process.wait(timeout=10)
-                    error = ''.join(stderr_lines)
+                        if returncode != 0:
+                            error_msg = f"VMAF analysis failed with return code {returncode}: {error}"
+                            logger.error(error_msg)
+                            self.error_occurred.emit(error_msg)
+                            return None
                     
-                    # Process completed
-                    logger.info(f"VMAF process completed with return code: {returncode}")
-                    self._current_process = None
-                    
-                    if self._terminate_requested:
-                        error_msg = "VMAF analysis was terminated by user"
-                        logger.warning(error_msg)
-                        self.error_occurred.emit(error_msg)
-                        return None
-                        
-                    if returncode != 0:
-                        error_msg = f"VMAF analysis failed with return code {returncode}: {error}"
+                    except subprocess.TimeoutExpired:
+                        error_msg = "VMAF analysis timed out"
                         logger.error(error_msg)
                         self.error_occurred.emit(error_msg)
-                        return None
                     
-                except subprocess.TimeoutExpired:
-                    error_msg = "VMAF analysis timed out"
-                    logger.error(error_msg)
-                    self.error_occurred.emit(error_msg)
-                    
-                    # Clean up the process
-                    if self._current_process:
-                        try:
-                            self._current_process.kill()
-                            self._current_process.wait(timeout=5)
-                        except:
-                            pass
-                        self._current_process = None
-                    return None
+                        # Clean up the process
+                        if self._current_process:
+                            try:
+                                self._current_process.kill()
+                                self._current_process.wait(timeout=5)
+                            except:
+                                pass
+                            self._current_process = None
+                        return None
                 
-                except Exception as e:
-                    error_msg = f"Error running VMAF analysis: {str(e)}"
-                    logger.error(error_msg)
-                    self.error_occurred.emit(error_msg)
+                    except Exception as e:
+                        error_msg = f"Error running VMAF analysis: {str(e)}"
+                        logger.error(error_msg)
+                        self.error_occurred.emit(error_msg)
                     
-                    # Clean up the process
-                    if self._current_process:
-                        try:
-                            self._current_process.kill()
-                            self._current_process.wait(timeout=5)
-                        except:
-                            pass
-                        self._current_process = None
-                    return None
+                        # Clean up the process
+                        if self._current_process:
+                            try:
+                                self._current_process.kill()
+                                self._current_process.wait(timeout=5)
+                            except:
+                                pass
+                            self._current_process = None
+                        return None
                 
-                finally:
-                    # Ensure process is cleaned up
-                    if self._current_process:
-                        try:
-                            if self._current_process.poll() is None:
-                                self._current_process.terminate()
-                                time.sleep(0.5)
+                    finally:
+                        # Ensure process is cleaned up
+                        if self._current_process:
+                            try:
                                 if self._current_process.poll() is None:
-                                    self._current_process.kill()
-                        except:
-                            pass
-                        self._current_process = None
-
-                # Now run PSNR and SSIM analyses if enabled
-                if self.psnr_enabled or self.ssim_enabled:
-                    self.status_update.emit("VMAF completed, running PSNR/SSIM analysis...")
-                    
-                    # Use the same relative path approach for PSNR/SSIM
-                    if platform.system() == 'Windows':
-                        psnr_rel_path = os.path.relpath(psnr_path, base_dir).replace('\\', '/')
-                        ssim_rel_path = os.path.relpath(ssim_path, base_dir).replace('\\', '/')
-                    else:
-                        psnr_rel_path = psnr_path
-                        ssim_rel_path = ssim_path
-                    
-                    psnr_ssim_success = self._run_psnr_ssim_analysis(
-                        ffmpeg_exe, 
-                        dist_rel_path, 
-                        ref_rel_path, 
-                        psnr_rel_path if self.psnr_enabled else None, 
-                        ssim_rel_path if self.ssim_enabled else None
-                    )
-                    
-                    if not psnr_ssim_success:
-                        logger.warning("PSNR/SSIM analysis failed, but continuing with VMAF results")
+                                    self._current_process.terminate()
+                                    time.sleep(0.5)
+                                    if self._current_process.poll() is None:
+                                        self._current_process.kill()
+                            except:
+                                pass
+                            self._current_process = None
+
+                # The measured speed tunes later plans and is kept with the results
+                elapsed = time.time() - scoring_start
+                if loop_scores:
+                    scored_frames = sum(loop['frames'] for loop in loop_scores['loops'])
+                elif segment_plan:
+                    scored_frames = segment_plan[0]['frame_count']
                 else:
-                    logger.info("Skipping PSNR/SSIM analysis as they are disabled")
+                    scored_frames = frame_count or total_frames
+                scheduler.record("vmaf", schedule['threads_per_job'], scored_frames, elapsed, schedule['jobs'])
+                scheduling = dict(schedule, frames=scored_frames, seconds=round(elapsed, 2),
+                                  fps=round(scored_frames / elapsed, 2) if elapsed > 0 else None)
+                logger.info(f"Scored {scored_frames} frames in {elapsed:.2f}s ({scheduling['fps']} fps) with " +
+                        f"{schedule['jobs']} x {schedule['threads_per_job']} threads")
 
                 # Return to original directory before parsing results
                 os.chdir(original_dir)
@@ -598,7 +704,8 @@ class VMAFAnalyzer(QObject):
                 return self._parse_vmaf_results(json_path, 
                                                psnr_path if self.psnr_enabled else None, 
                                                ssim_path if self.ssim_enabled else None, 
-                                               distorted_path, reference_path)
+                                               distorted_path, reference_path, alignment=alignment,
+                                               loop_scores=loop_scores, scheduling=scheduling)
 
             except Exception as e:
                 error_msg = f"Error in VMAF analysis: {str(e)}"
@@ -608,6 +715,9 @@ class VMAFAnalyzer(QObject):
                 logger.error(traceback.format_exc())
                 return None
             finally:
+                if lease_id is not None:
+                    get_scheduler().release(lease_id)
+
                 # Always restore original directory
                 try:
                     if original_dir != os.getcwd():
@@ -625,7 +735,8 @@ class VMAFAnalyzer(QObject):
 
 
 
-    def _parse_vmaf_results(self, json_path, psnr_path, ssim_path, distorted_path, reference_path):
+    def _parse_vmaf_results(self, json_path, psnr_path, ssim_path, distorted_path, reference_path, alignment=None,
+                            loop_scores=None, scheduling=None):
         """Parse VMAF results from the output files"""
         try:
             # Check if output files exist
@@ -637,104 +748,32 @@ class VMAFAnalyzer(QObject):
 
             # Parse VMAF results from JSON
             try:
-                with open(json_path, 'r') as f:
-                    vmaf_data = json.load(f)
-
-                # Extract VMAF score
-                vmaf_score = None
-                psnr_score = None
-                ssim_score = None
-
-                if "pooled_metrics" in vmaf_data:
-                    # New format
-                    try:
-                        pool = vmaf_data["pooled_metrics"]
-                        if "vmaf" in pool:
-                            vmaf_score = pool["vmaf"]["mean"]
-                        if "psnr" in pool:
-                            psnr_score = pool["psnr"]["mean"]
-                        if "psnr_y" in pool:  # Sometimes it's labeled as psnr_y
-                            psnr_score = pool["psnr_y"]["mean"]
-                        if "ssim" in pool:
-                            ssim_score = pool["ssim"]["mean"]
-                        if "ssim_y" in pool:  # Sometimes it's labeled as ssim_y
-                            ssim_score = pool["ssim_y"]["mean"]
-                    except Exception as e:
-                        logger.error(f"Error parsing VMAF metrics from pooled_metrics: {str(e)}")
-
-                # Fallback to frames if pooled metrics don't exist
-                elif "frames" in vmaf_data:
-                    # Extract scores from frames
-                    frames = vmaf_data["frames"]
-                    if frames:
-                        vmaf_values = []
-                        psnr_values = []
-                        ssim_values = []
-
-                        for frame in frames:
-                            if "metrics" in frame:
-                                metrics = frame["metrics"]
-                                if "vmaf" in metrics:
-                                    vmaf_values.append(metrics["vmaf"])
-                                if "psnr" in metrics or "psnr_y" in metrics:
-                                    psnr_values.append(metrics.get("psnr", metrics.get("psnr_y", 0)))
-                                if "ssim" in metrics or "ssim_y" in metrics:
-                                    ssim_values.append(metrics.get("ssim", metrics.get("ssim_y", 0)))
-
-                        # Calculate averages
-                        if vmaf_values:
-                            vmaf_score = sum(vmaf_values) / len(vmaf_values)
-                        if psnr_values:
-                            psnr_score = sum(psnr_values) / len(psnr_values)
-                        if ssim_values:
-                            ssim_score = sum(ssim_values) / len(ssim_values)
-
-                # Try to get PSNR from separate file if not found in VMAF results
-                if (psnr_score is None or psnr_score == 0) and os.path.exists(psnr_path):
-                    try:
-                        with open(psnr_path, 'r') as f:
-                            psnr_lines = f.readlines()
-                            # Look for average PSNR line
-                            psnr_avg_line = None
-                            for line in psnr_lines:
-                                if "average" in line.lower() and "psnr" in line.lower():
-                                    psnr_avg_line = line
-                                    break
-                            
-                            # Try to extract the PSNR value
-                            if psnr_avg_line:
-                                import re
-                                match = re.search(r'(\d+\.\d+)', psnr_avg_line)
-                                if match:
-                                    psnr_score = float(match.group(1))
-                    except Exception as e:
-                        logger.warning(f"Error parsing PSNR from file: {str(e)}")
-
-                # Try to get SSIM from separate file if not found in VMAF results
-                if (ssim_score is None or ssim_score == 0) and os.path.exists(ssim_path):
-                    try:
-                        with open(ssim_path, 'r') as f:
-                            ssim_lines = f.readlines()
-                            # Look for average SSIM line
-                            ssim_avg_line = None
-                            for line in ssim_lines:
-                                if "average" in line.lower() and "ssim" in line.lower():
-                                    ssim_avg_line = line
-                                    break
-                            
-                            # Try to extract the SSIM value
-                            if ssim_avg_line:
-                                import re
-                                match = re.search(r'(\d+\.\d+)', ssim_avg_line)
-                                if match:
-                                    ssim_score = float(match.group(1))
-                    except Exception as e:
-                        logger.warning(f"Error parsing SSIM from file: {str(e)}")
+                # Per-frame metrics are streamed into float32 columns rather than a dict per frame
+                vmaf_log = read_vmaf_log(json_path, alignment['frame_count'] if alignment else 0)
+                vmaf_data = vmaf_log.as_raw_results()
+
+                # libvmaf's pooled scores, or scores pooled from the frames when the log has none
+                pool = vmaf_data["pooled_metrics"]
+                vmaf_score = pool.get("vmaf", {}).get("mean")
+                psnr_score = (pool.get("psnr_y") or pool.get("psnr") or {}).get("mean")  # Sometimes labeled psnr_y
+                ssim_score = (pool.get("ssim_y") or pool.get("ssim") or {}).get("mean")
+
+                # Pooled scores of everything computed in the metric engine run; PSNR and SSIM
+                # come from the filters' per-frame stats files
+                stats_paths = {name: path for name, path in (('psnr', psnr_path), ('ssim', ssim_path))
+                               if path and os.path.exists(path)}
+                scores = metric_scores(json_path, stats_paths, self.extra_metrics, vmaf_log)
+                if psnr_score is None or psnr_score == 0:
+                    psnr_score = scores.get('psnr')
+                if ssim_score is None or ssim_score == 0:
+                    ssim_score = scores.get('ssim')
 
                 # Log results
                 logger.info(f"VMAF Score: {vmaf_score}")
                 logger.info(f"PSNR Score: {psnr_score}")
                 logger.info(f"SSIM Score: {ssim_score}")
+                for name in self.extra_metrics:
+                    logger.info(f"{METRICS[name]['label']} Score: {scores.get(name)}")
 
                 # Store raw results for potential detailed analysis
                 raw_results = vmaf_data
@@ -827,8 +866,8 @@ class VMAFAnalyzer(QObject):
                 distorted_filename = os.path.basename(distorted_path) if distorted_path else ""
                 
                 # Create PSNR and SSIM status text
-                psnr_status = psnr_filename if os.path.exists(psnr_path) else "Not Available"
-                ssim_status = ssim_filename if os.path.exists(ssim_path) else "Not Available"
+                psnr_status = psnr_filename if psnr_path and os.path.exists(psnr_path) else "Not Available"
+                ssim_status = ssim_filename if ssim_path and os.path.exists(ssim_path) else "Not Available"
                 
                 # Extract model information from raw results or use a default value
                 model_info = "unknown"
@@ -855,6 +894,12 @@ class VMAFAnalyzer(QObject):
                     if frame_count == 0 and fps > 0 and duration > 0:
                         frame_count = int(fps * duration)
 
+                # With virtual alignment only the aligned span of the capture was compared
+                if alignment:
+                    frame_count = alignment['frame_count']
+                    fps = alignment.get('reference_fps') or fps
+                    duration = frame_count / fps if fps else duration
+
                 # Return results with consistent path format and additional metadata
                 results = {
                     'vmaf_score': vmaf_score,
@@ -928,12 +973,21 @@ class VMAFAnalyzer(QObject):
                     'raw_results': raw_results,
                     'model': model_info,
                     'width': width,
-                    'height': height
+                    'height': height,
+                    'alignment': alignment,
+                    'capture_health': alignment.get('capture_health') if alignment else None,
+                    'loop_scores': loop_scores,
+                    'metric_scores': scores,
+                    'scheduling': scheduling
                 }
 
                 # Set progress to 100%
                 self.analysis_progress.emit(100)
                 self.status_update.emit(f"VMAF analysis complete! Score: {vmaf_score:.2f}")
+                if loop_scores:
+                    aggregate = loop_scores['aggregate']
+                    self.status_update.emit(f"{aggregate['count']} loops: mean {aggregate['mean']:.2f}, " +
+                            f"min {aggregate['min']:.2f}, spread {aggregate['spread']:.2f}")
 
                 # Handle file cleanup properly
                 if 'distorted_path' in results:
@@ -993,130 +1047,240 @@ class VMAFAnalyzer(QObject):
 
 
 
-    def _run_psnr_ssim_analysis(self, ffmpeg_exe, distorted_path, reference_path, psnr_path, ssim_path):
-        """Run PSNR and SSIM analysis separately using absolute paths"""
-        try:
-            # Set up startupinfo to suppress dialog windows
-            startupinfo = None
-            creationflags = 0
-            env = os.environ.copy()
-
-            # Add environment variables to suppress FFmpeg dialogs
-            env.update({
-                "FFMPEG_HIDE_BANNER": "1",
-                "AV_LOG_FORCE_NOCOLOR": "1",
-                "SDL_VIDEODRIVER": "dummy",
-                "SDL_AUDIODRIVER": "dummy"
-            })
-
-            if platform.system() == 'Windows':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = 0  # SW_HIDE
-                creationflags = subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0x08000000
-            
-            # Calculate feature subsample parameter for PSNR/SSIM
-            subsample_param = f":max_samples={self.feature_subsample}" if self.feature_subsample > 1 else ""
-            
-            results_ok = [False, False]  # [psnr_ok, ssim_ok]
-            
-            # Run PSNR analysis if path is provided
-            if psnr_path:
-                logger.info("Running PSNR analysis...")
-                self.status_update.emit("Running PSNR analysis...")
-                psnr_cmd = [
-                    ffmpeg_exe,
-                    "-hide_banner",
-                    "-i", distorted_path,
-                    "-i", reference_path,
-                    "-lavfi", f"psnr=stats_file={psnr_path}{subsample_param}",
-                    "-f", "null", "-"
-                ]
-
-                logger.info(f"PSNR command: {' '.join(psnr_cmd)}")
-                psnr_result = subprocess.run(
-                    psnr_cmd,
-                    check=False, 
-                    capture_output=True, 
-                    startupinfo=startupinfo,
-                    creationflags=creationflags,
-                    env=env,
-                    timeout=120  # 2 minute timeout
-                )
-                
-                if psnr_result.returncode != 0:
-                    logger.warning(f"PSNR analysis failed: {psnr_result.stderr}")
-                else:
-                    logger.info("PSNR analysis completed successfully")
-                    results_ok[0] = True
-
-            # Run SSIM analysis if path is provided
-            if ssim_path:
-                logger.info("Running SSIM analysis...")
-                self.status_update.emit("Running SSIM analysis...")
-                ssim_cmd = [
-                    ffmpeg_exe,
-                    "-hide_banner",
-                    "-i", distorted_path,
-                    "-i", reference_path,
-                    "-lavfi", f"ssim=stats_file={ssim_path}{subsample_param}",
-                    "-f", "null", "-"
-                ]
-
-                logger.info(f"SSIM command: {' '.join(ssim_cmd)}")
-                ssim_result = subprocess.run(
-                    ssim_cmd,
-                    check=False, 
-                    capture_output=True,
-                    startupinfo=startupinfo,
-                    creationflags=creationflags,
-                    env=env,
-                    timeout=120  # 2 minute timeout
-                )
-                
-                if ssim_result.returncode != 0:
-                    logger.warning(f"SSIM analysis failed: {ssim_result.stderr}")
-                else:
-                    logger.info("SSIM analysis completed successfully")
-                    results_ok[1] = True
-
-            # Consider the operation successful if at least one metric was calculated
-            # or if neither was requested
-            return (results_ok[0] or not psnr_path) and (results_ok[1] or not ssim_path)
-            
-        except subprocess.TimeoutExpired:
-            logger.warning(f"PSNR/SSIM analysis timed out")
-            return False
-        except Exception as e:
-            logger.warning(f"Error running PSNR/SSIM analysis: {str(e)}")
-            return False
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    def _run_metric_processes(self, jobs, workers, status):
+        """
+        Run FFmpeg metric processes concurrently and report their combined progress
 
+        Args:
+            jobs: Dicts with name (for messages), cmd and frames (frames the process compares)
+            workers: Processes run at once
+            status: Describes the jobs in the status text, e.g. "over 3 loops"
 
+        Raises:
+            RuntimeError if a process fails
+        """
+        total_frames = sum(job['frames'] for job in jobs) or 1
+        frames_done = {}
+        progress_lock = threading.Lock()
+        last_progress = [0.0]
 
+        def report(index, frame):
+            with progress_lock:
+                frames_done[index] = frame
+                now = time.time()
+                if now - last_progress[0] > 0.5:
+                    last_progress[0] = now
+                    done = sum(frames_done.values())
+                    progress = min(95, int(done / total_frames * 100))
+                    self.analysis_progress.emit(progress)
+                    self.status_update.emit(f"Processing frame {done}/{total_frames} {status} ({progress}%)")
 
+        def run(index, job):
+            logger.info(f"VMAF {job['name']} command: {' '.join(job['cmd'])}")
+            startupinfo, creationflags, env = get_subprocess_startupinfo()
+            process = subprocess.Popen(with_progress(job['cmd']), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       text=True, bufsize=1, startupinfo=startupinfo, creationflags=creationflags,
+                                       env=env)
+            self._loop_processes.append(process)
+            stderr_lines = []
+            stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+            stderr_thread.start()
+            try:
+                # The combined progress is throttled in report(), so every block is passed on
+                reader = ProgressReader(job['frames'], lambda event: report(index, event.frame), interval=0)
+                reader.read(process.stdout)
+                returncode = process.wait()
+                stderr_thread.join()
+                logger.info(f"VMAF {job['name']} throughput: {reader.summary()}")
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                self._loop_processes.remove(process)
+
+            if returncode != 0:
+                raise RuntimeError(f"VMAF {job['name']} failed with return code {returncode}: " +
+                                   "".join(stderr_lines[-20:]))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run, range(len(jobs)), jobs))
+
+    def _score_loops(self, ffmpeg_exe, distorted_path, reference_path, vmaf_options, loop_jobs, stats_filters=None,
+                     schedule=None):
+        """
+        Score every captured loop in its own concurrent VMAF process
+
+        The schedule (from the CPU scheduler) sets how many loops run at once
+        and the libvmaf threads of each. Each loop writes its own JSON log; the
+        PSNR/SSIM stats_filters run in the selected loop's process.
+
+        Returns:
+            Dict with loops (loop, start_time, frames, vmaf, json_path, selected)
+            and aggregate, or None on failure (the error is emitted)
+        """
+        schedule = schedule or get_scheduler().plan("vmaf", max_jobs=len(loop_jobs), threads=self.threads)
+        workers = schedule['jobs']
+        threads_per_loop = schedule['threads_per_job']
+
+        processes = []
+        for job in loop_jobs:
+            options = [option for option in vmaf_options if not option.startswith(("log_path=", "n_threads="))]
+            options = [f"log_path={job['log_path']}", f"n_threads={threads_per_loop}"] + options
+            # Each loop seeks straight to its own start frame
+            loop_alignment, captured_seek_frame = seeked_descriptor(job['alignment'])
+            cmd = [
+                ffmpeg_exe, "-hide_banner", "-loglevel", "info",
+                *input_seek_args(captured_seek_frame, job['alignment'].get('captured_fps')),
+                "-i", distorted_path,
+                "-i", reference_path,
+                "-lavfi", metric_filtergraph(loop_alignment, f"libvmaf={':'.join(options)}",
+                                             stats_filters if job.get('selected') else None),
+                "-f", "null", "-"
+            ]
+            processes.append({'name': f"loop {job['loop']}", 'cmd': cmd, 'frames': job['alignment']['frame_count']})
 
+        self.analysis_progress.emit(0)
+        self.status_update.emit(f"Scoring {len(loop_jobs)} loops with {workers} parallel VMAF processes...")
+        start = time.time()
 
+        try:
+            self._run_metric_processes(processes, workers, f"over {len(loop_jobs)} loops")
+            scores = []
+            for job in loop_jobs:
+                scores.append({
+                    'loop': job['loop'],
+                    'start_time': job.get('start_time'),
+                    'frames': job['alignment']['frame_count'],
+                    'vmaf': pooled_vmaf_score(job['json_path']),
+                    'json_path': job['json_path'],
+                    'selected': bool(job.get('selected'))
+                })
+        except Exception as e:
+            if self._terminate_requested:
+                error_msg = "VMAF analysis was terminated by user"
+                logger.warning(error_msg)
+            else:
+                error_msg = f"Error scoring loops: {str(e)}"
+                logger.error(error_msg)
+            self.error_occurred.emit(error_msg)
+            return None
 
+        aggregate = aggregate_loop_scores([score['vmaf'] for score in scores])
+        logger.info(f"Scored {len(scores)} loops in {time.time() - start:.2f}s: " +
+                ", ".join(f"loop {score['loop']} {score['vmaf']:.2f}" for score in scores) +
+                f" (mean {aggregate['mean']:.2f}, min {aggregate['min']:.2f}, spread {aggregate['spread']:.2f})")
+        return {'loops': scores, 'aggregate': aggregate}
+
+    def _plan_segment_run(self, alignment, reference_path, distorted_path, ref_meta, dist_meta):
+        """
+        Alignment descriptor and frame ranges for a segment-parallel run
+
+        Returns:
+            (descriptor, segments, schedule), or None when the comparison has to run as one process
+        """
+        if self.feature_subsample > 1:
+            logger.info("Segment-parallel VMAF needs every frame scored, running one process")
+            return None
 
+        descriptor = alignment
+        if not descriptor:
+            # Already aligned files: compare them from their first frames over the shorter one
+            frame_count = min((ref_meta or {}).get('nb_frames', 0), (dist_meta or {}).get('nb_frames', 0))
+            if frame_count <= 0:
+                logger.info("Frame counts unknown, running VMAF as one process")
+                return None
+            descriptor = make_alignment_descriptor(reference_path, distorted_path, 0.0, frame_count,
+                                                   dist_meta.get('frame_rate'), ref_meta.get('frame_rate'))
 
+        captured_fps = descriptor.get('captured_fps')
+        reference_fps = descriptor.get('reference_fps')
+        if not captured_fps or not reference_fps or abs(captured_fps - reference_fps) > 0.001:
+            logger.info("Frame rate conversion cannot be split frame-exactly, running VMAF as one process")
+            return None
 
+        max_segments = len(plan_vmaf_segments(descriptor['frame_count'], descriptor['frame_count']))
+        schedule = get_scheduler().plan("vmaf", max_jobs=max_segments, threads=self.threads, jobs=self.segment_count)
+        if schedule['jobs'] < 2:
+            logger.info("One VMAF process fits the free cores, running the comparison unsplit")
+            return None
+        return descriptor, plan_vmaf_segments(descriptor['frame_count'], schedule['jobs']), schedule
+
+    def _score_segments(self, ffmpeg_exe, distorted_path, reference_path, vmaf_options, descriptor, segments,
+                        schedule, json_path, stats_paths, base_dir=None):
+        """
+        Score a comparison as frame ranges in concurrent VMAF processes and merge the logs
+
+        Each segment seeks both inputs to its first frame pair, so no process
+        decodes frames it does not score. The per-frame JSON logs and PSNR/SSIM
+        stats files are merged into the files a single run would have written,
+        with the pooled metrics recomputed over all frames.
+
+        Args:
+            descriptor, segments, schedule: From _plan_segment_run
+            json_path: Merged JSON log
+            stats_paths: Dict of filter metric name -> merged stats file
+            base_dir: Directory FFmpeg runs in when it is given relative paths (Windows)
+
+        Returns:
+            True on success, False on failure (the error is emitted)
+        """
+        threads_per_segment = schedule['threads_per_job']
+
+        def ffmpeg_path(path):
+            return os.path.relpath(path, base_dir).replace('\\', '/') if base_dir else path
+
+        jobs = []
+        segment_logs = []
+        segment_stats = {name: [] for name in stats_paths}
+        for i, segment in enumerate(segments):
+            part, captured_seek, reference_seek = segment_descriptor(
+                descriptor, segment['run_start'], segment['run_end'] - segment['run_start'])
+
+            segment_log = json_path.replace("_vmaf.json", f"_seg{i:03d}_vmaf.json")
+            segment_logs.append(segment_log)
+            options = [option for option in vmaf_options if not option.startswith(("log_path=", "n_threads="))]
+            options = [f"log_path={ffmpeg_path(segment_log)}", f"n_threads={threads_per_segment}"] + options
+
+            filters = []
+            for name, stats_path in stats_paths.items():
+                segment_stats_path = os.path.splitext(stats_path)[0] + f"_seg{i:03d}.txt"
+                segment_stats[name].append(segment_stats_path)
+                filters.append(stats_filter(name, ffmpeg_path(segment_stats_path)))
+
+            cmd = [ffmpeg_exe, "-hide_banner", "-loglevel", "info",
+                   *input_seek_args(captured_seek, descriptor['captured_fps']), "-i", distorted_path,
+                   *input_seek_args(reference_seek, descriptor['reference_fps']), "-i", reference_path,
+                   "-lavfi", metric_filtergraph(part, f"libvmaf={':'.join(options)}", filters),
+                   "-f", "null", "-"]
+            jobs.append({'name': f"segment {i + 1}", 'cmd': cmd, 'frames': part['frame_count']})
+
+        self.analysis_progress.emit(0)
+        self.status_update.emit(f"Scoring {descriptor['frame_count']} frames in {len(segments)} parallel segments...")
+        start = time.time()
 
+        try:
+            self._run_metric_processes(jobs, len(jobs), f"in {len(segments)} segments")
+            merge_vmaf_logs(segment_logs, segments, json_path)
+            for name, stats_path in stats_paths.items():
+                merge_stats_files(segment_stats[name], segments, stats_path)
+            logger.info(f"Scored {descriptor['frame_count']} frames in {len(segments)} segments " +
+                    f"in {time.time() - start:.2f}s")
+            return True
 
+        except Exception as e:
+            if self._terminate_requested:
+                error_msg = "VMAF analysis was terminated by user"
+                logger.warning(error_msg)
+            else:
+                error_msg = f"Error in segment-parallel VMAF: {str(e)}"
+                logger.error(error_msg)
+            self.error_occurred.emit(error_msg)
+            return False
 
+        finally:
+            for path in segment_logs + [path for paths in segment_stats.values() for path in paths]:
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove VMAF segment file {path}: {e}")
@@ -0,0 +1,256 @@
+import json
+import logging
+from collections.abc import Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Characters read from a log at a time
+READ_BLOCK = 1 << 16
+
+# Frames the columns hold before they first grow
+INITIAL_CAPACITY = 4096
+
+_decoder = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Buffered reader decoding one JSON value at a time from a text file"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(READ_BLOCK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self, skip=" \t\r\n,:"):
+        """Next character that is not in skip, or None at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in skip:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in libvmaf log")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the JSON value at the current position"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number running to the end of the buffer may continue in the next block
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_vmaf_frames(json_path, info=None):
+    """
+    Yield the per-frame entries of a libvmaf JSON log one at a time
+
+    Only one frame is decoded at a time, so memory does not grow with the
+    length of the log.
+
+    Args:
+        json_path: libvmaf JSON log
+        info: Optional dict receiving the other top-level entries (version,
+            fps, pooled_metrics, aggregate_metrics) as they are read; the
+            ones after the frames are there once the iteration has finished
+
+    Yields:
+        Dicts with frameNum and metrics
+    """
+    if info is None:
+        info = {}
+    with open(json_path, 'r') as f:
+        stream = _JsonStream(f)
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.decode()
+            if key != "frames":
+                info[key] = stream.decode()
+                continue
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield stream.decode()
+            stream.expect("]")
+
+
+def pool_values(values):
+    """
+    libvmaf's pooled statistics of one metric, computed vectorized
+
+    Missing (NaN) and infinite values, such as the PSNR of identical frames,
+    are left out.
+
+    Returns:
+        Dict with min, max, mean and harmonic_mean, or None without values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    return {
+        'min': round(float(values.min()), 6),
+        'max': round(float(values.max()), 6),
+        'mean': round(float(values.mean()), 6),
+        # libvmaf's harmonic mean is taken over score + 1, so scores of 0 stay finite
+        'harmonic_mean': round(float(len(values) / np.sum(1.0 / (values + 1.0)) - 1.0), 6)
+    }
+
+
+def _grow(array, capacity, fill):
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class VmafFrames(Sequence):
+    """
+    Per-frame view of a VmafLog shaped like the frames list of the JSON log
+
+    Frames are built as dicts only when they are accessed, so code written for
+    the parsed JSON keeps working without holding a dict per frame.
+    """
+
+    def __init__(self, log):
+        self.log = log
+
+    def __len__(self):
+        return len(self.log)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        metrics = {}
+        for name, column in self.log.columns.items():
+            value = column[index]
+            if not np.isnan(value):
+                metrics[name] = float(value)
+        return {'frameNum': int(self.log.frame_numbers[index]), 'metrics': metrics}
+
+
+class VmafLog:
+    """
+    Per-frame metrics of a libvmaf log held as float32 NumPy columns
+
+    A 100,000 frame log with a dozen metrics takes about 5 MB this way,
+    against hundreds of MB as parsed JSON.
+    """
+
+    def __init__(self, frame_numbers, columns, info=None):
+        info = info or {}
+        self.frame_numbers = frame_numbers
+        self.columns = columns  # metric name -> float32 array, NaN where a frame has no value
+        self.version = info.get('version')
+        self.fps = info.get('fps')
+        self.logged_pooled_metrics = info.get('pooled_metrics') or {}
+        self.aggregate_metrics = info.get('aggregate_metrics') or {}
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    @property
+    def metric_names(self):
+        return list(self.columns)
+
+    @property
+    def frames(self):
+        return VmafFrames(self)
+
+    def pooled_metrics(self):
+        """
+        Pooled statistics of every metric
+
+        libvmaf's own pooled values are kept where the log has them, as they
+        were computed from the unrounded scores; the rest are pooled from the
+        columns.
+        """
+        pooled = {}
+        for name, column in self.columns.items():
+            if name in self.logged_pooled_metrics:
+                pooled[name] = self.logged_pooled_metrics[name]
+            else:
+                values = pool_values(column)
+                if values:
+                    pooled[name] = values
+        return pooled
+
+    def mean(self, name):
+        """Mean of one metric, or None when the log does not have it"""
+        if name in self.logged_pooled_metrics:
+            return float(self.logged_pooled_metrics[name]['mean'])
+        pooled = pool_values(self.columns[name]) if name in self.columns else None
+        return pooled['mean'] if pooled else None
+
+    def as_raw_results(self):
+        """Dict laid out like the parsed JSON log, with frames as a VmafFrames view and the columns added"""
+        return {
+            'version': self.version,
+            'fps': self.fps,
+            'frames': self.frames,
+            'pooled_metrics': self.pooled_metrics(),
+            'aggregate_metrics': self.aggregate_metrics,
+            'frame_numbers': self.frame_numbers,
+            'columns': self.columns
+        }
+
+
+def read_vmaf_log(json_path, expected_frames=0):
+    """
+    Read a libvmaf JSON log into float32 columns without parsing it whole
+
+    Args:
+        json_path: libvmaf JSON log
+        expected_frames: Frames the log is expected to hold, to size the columns up front
+
+    Returns:
+        VmafLog
+    """
+    info = {}
+    capacity = max(expected_frames, INITIAL_CAPACITY)
+    frame_numbers = np.empty(capacity, dtype=np.int32)
+    columns = {}
+    count = 0
+
+    for frame in iter_vmaf_frames(json_path, info):
+        if count == capacity:
+            capacity *= 2
+            frame_numbers = _grow(frame_numbers, capacity, 0)
+            columns = {name: _grow(column, capacity, np.nan) for name, column in columns.items()}
+
+        frame_numbers[count] = frame.get('frameNum', count)
+        for name, value in frame.get('metrics', {}).items():
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = np.full(capacity, np.nan, dtype=np.float32)
+            column[count] = value
+        count += 1
+
+    # Copies, so the unused capacity is freed
+    return VmafLog(frame_numbers[:count].copy(), {name: column[:count].copy() for name, column in columns.items()},
+                   info)
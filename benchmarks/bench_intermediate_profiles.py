@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Intermediate codec profile benchmark
+
+Encodes the same clips with every intermediate profile used for aligned
+files and records encode time, throughput, file size, whether the decoded
+frames are bit-exact with the source, and the VMAF delta: the score of the
+intermediate against its source, minus the score of the source against
+itself.
+
+Usage:
+    python benchmarks/bench_intermediate_profiles.py clip1.mp4 [clip2.mp4 ...] [--frames 600]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.intermediate_codecs import INTERMEDIATE_PROFILES, intermediate_output_args, intermediate_path
+
+
+def encode(ffmpeg, source, output, profile_name, frames):
+    """Encode source with a profile and return the wall-clock time, or None on failure"""
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", source]
+    if frames:
+        cmd.extend(["-frames:v", str(frames)])
+    cmd.extend(intermediate_output_args(profile_name, audio=False))
+    cmd.append(output)
+
+    start = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"  {profile_name}: encode failed: {result.stderr.strip()}")
+        return None
+    return elapsed
+
+
+def frame_hashes(ffmpeg, video, frames):
+    """Per-frame MD5 hashes of the decoded video"""
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", video]
+    if frames:
+        cmd.extend(["-frames:v", str(frames)])
+    cmd.extend(["-map", "0:v:0", "-f", "framemd5", "-"])
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return [line.rsplit(",", 1)[-1].strip() for line in result.stdout.splitlines()
+            if line and not line.startswith("#")]
+
+
+def vmaf_score(ffmpeg, distorted, reference, frames, threads):
+    """Pooled VMAF of distorted against reference, or None if libvmaf is unavailable"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as log:
+        log_path = log.name
+    try:
+        # Renumber both inputs on one timebase so frames pair by index whatever the container
+        trim = f"trim=end_frame={frames}," if frames else ""
+        graph = (f"[0:v]{trim}settb=AVTB,setpts=N[dist];[1:v]{trim}settb=AVTB,setpts=N[ref];"
+                 f"[dist][ref]libvmaf=log_path={log_path.replace(os.sep, '/')}:log_fmt=json:n_threads={threads}")
+        result = subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-i", distorted, "-i", reference,
+                                 "-lavfi", graph, "-f", "null", "-"], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        with open(log_path) as f:
+            return json.load(f)["pooled_metrics"]["vmaf"]["mean"]
+    finally:
+        os.remove(log_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intermediate codec profiles")
+    parser.add_argument("videos", nargs="+", help="Source clips to encode")
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="FFmpeg executable")
+    parser.add_argument("--frames", type=int, default=0, help="Only encode the first N frames (0 = all)")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 4, help="libvmaf threads")
+    parser.add_argument("--keep", action="store_true", help="Keep the encoded intermediates")
+    args = parser.parse_args()
+
+    header = f"{'file':<28} {'profile':<14} {'time(s)':>8} {'fps':>8} {'size':>10} {'exact':>6} {'vmaf':>8} {'delta':>7}"
+    print(header)
+    print("-" * len(header))
+
+    work_dir = tempfile.mkdtemp(prefix="intermediates_")
+    for source in args.videos:
+        name = os.path.basename(source)
+        source_hashes = frame_hashes(args.ffmpeg, source, args.frames)
+        baseline = vmaf_score(args.ffmpeg, source, source, args.frames, args.threads)
+
+        for profile_name in INTERMEDIATE_PROFILES:
+            output = intermediate_path(work_dir, f"{os.path.splitext(name)[0]}_{profile_name}", profile_name)
+            elapsed = encode(args.ffmpeg, source, output, profile_name, args.frames)
+            if elapsed is None:
+                continue
+
+            size_mb = os.path.getsize(output) / (1024 * 1024)
+            exact = frame_hashes(args.ffmpeg, output, args.frames) == source_hashes
+            score = vmaf_score(args.ffmpeg, output, source, args.frames, args.threads)
+            vmaf_text = f"{score:>8.3f}" if score is not None else f"{'n/a':>8}"
+            delta_text = f"{score - baseline:>+7.3f}" if score is not None and baseline is not None else f"{'n/a':>7}"
+
+            print(f"{name:<28} {profile_name:<14} {elapsed:>8.2f} {len(source_hashes) / elapsed:>8.0f} "
+                  f"{size_mb:>8.1f}MB {'yes' if exact else 'no':>6} {vmaf_text} {delta_text}")
+
+            if not args.keep:
+                os.remove(output)
+
+    if not args.keep:
+        os.rmdir(work_dir)
+    else:
+        print(f"Intermediates kept in {work_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import numpy as np
+
+from app.alignment_descriptor import (alignment_filter_chains, apply_frame_mapping, make_alignment_descriptor,
+                                      seeked_descriptor, segment_descriptor)
+from app.segment_vmaf import input_seek_args
+
+WIDTH, HEIGHT = 64, 48
+
+
+def descriptor(start_time=0.5, frame_count=20, captured_fps=30.0, reference_fps=30.0):
+    return make_alignment_descriptor("ref.mp4", "cap.mp4", start_time, frame_count, captured_fps, reference_fps)
+
+
+class TestMakeAlignmentDescriptor(unittest.TestCase):
+    def test_start_frame_is_the_nearest_frame(self):
+        self.assertEqual(descriptor(start_time=10 / 30)['captured_start_frame'], 10)
+        self.assertEqual(descriptor(start_time=10.4 / 30)['captured_start_frame'], 10)
+        self.assertEqual(descriptor(start_time=10.6 / 30)['captured_start_frame'], 11)
+
+    def test_halfway_start_goes_to_the_earlier_frame(self):
+        self.assertEqual(descriptor(start_time=10.5 / 30)['captured_start_frame'], 10)
+
+    def test_negative_start_is_clamped(self):
+        result = descriptor(start_time=-0.2)
+        self.assertEqual(result['captured_start_time'], 0.0)
+        self.assertEqual(result['captured_start_frame'], 0)
+
+
+class TestApplyFrameMapping(unittest.TestCase):
+    def test_mapping_replaces_the_frame_count(self):
+        result = apply_frame_mapping(descriptor(), [[0, 9], [11, 19]], [[0, 9], [10, 18]], 19)
+        self.assertEqual(result['frame_count'], 19)
+        self.assertEqual(result['frame_mapping']['reference_ranges'], [[0, 9], [11, 19]])
+        self.assertEqual(result['captured_start_frame'], 15)
+
+    def test_shift_moves_the_start_frame_and_time(self):
+        result = apply_frame_mapping(descriptor(), [[0, 19]], [[0, 19]], 20, captured_shift=-3)
+        self.assertEqual(result['captured_start_frame'], 12)
+        self.assertAlmostEqual(result['captured_start_time'], 12 / 30)
+
+    def test_shift_does_not_go_before_the_first_frame(self):
+        result = apply_frame_mapping(descriptor(start_time=0.0), [[0, 19]], [[0, 19]], 20, captured_shift=-3)
+        self.assertEqual(result['captured_start_frame'], 0)
+
+
+class TestAlignmentFilterChains(unittest.TestCase):
+    def test_same_frame_rate(self):
+        captured, reference = alignment_filter_chains(descriptor())
+        self.assertEqual(captured, "trim=start_frame=15,setpts=PTS-STARTPTS,trim=end_frame=20,settb=1/30,setpts=N")
+        self.assertEqual(reference, "trim=end_frame=20,settb=1/30,setpts=N")
+
+    def test_capture_is_converted_to_the_reference_rate(self):
+        captured, reference = alignment_filter_chains(descriptor(captured_fps=60.0, reference_fps=30000 / 1001))
+        self.assertIn(f"fps=fps={30000 / 1001}", captured)
+        self.assertTrue(captured.endswith("settb=1001/30000,setpts=N"))
+        self.assertTrue(reference.endswith("settb=1001/30000,setpts=N"))
+
+    def test_frame_mapping_selects_the_pairs(self):
+        mapped = apply_frame_mapping(descriptor(), [[0, 9], [11, 19]], [[0, 9], [10, 18]], 19)
+        captured, reference = alignment_filter_chains(mapped)
+        self.assertIn("select='between(n,0,9)+between(n,10,18)',trim=end_frame=19", captured)
+        self.assertTrue(reference.startswith("select='between(n,0,9)+between(n,11,19)',trim=end_frame=19"))
+
+
+class TestSeekedDescriptor(unittest.TestCase):
+    def test_start_moves_to_the_input_seek(self):
+        part, seek_frame = seeked_descriptor(descriptor())
+        self.assertEqual(seek_frame, 15)
+        self.assertEqual(part['captured_start_frame'], 0)
+        self.assertEqual(part['captured_start_time'], 0.0)
+        self.assertEqual(part['frame_count'], 20)
+
+    def test_nothing_to_seek(self):
+        original = descriptor(start_time=0.0)
+        self.assertEqual(seeked_descriptor(original), (original, 0))
+        self.assertEqual(seeked_descriptor(None), (None, 0))
+
+    def test_unknown_capture_rate_is_not_seeked(self):
+        original = descriptor(captured_fps=None)
+        self.assertEqual(seeked_descriptor(original), (original, 0))
+
+
+class TestSegmentDescriptor(unittest.TestCase):
+    def test_part_of_a_mapping(self):
+        mapped = apply_frame_mapping(descriptor(), [[0, 9], [11, 19]], [[0, 9], [10, 18]], 19)
+        part, captured_seek, reference_seek = segment_descriptor(mapped, 8, 5)
+        # Pairs 8-12 are reference frames 8, 9, 11, 12, 13 and captured frames 8-12
+        self.assertEqual(part['frame_count'], 5)
+        self.assertEqual(part['frame_mapping']['reference_ranges'], [[0, 1], [3, 5]])
+        self.assertEqual(part['frame_mapping']['captured_ranges'], [[0, 1], [2, 4]])
+        self.assertEqual(reference_seek, 8)
+        self.assertEqual(captured_seek, 15 + 8)
+
+    def test_part_is_clamped_to_the_frame_count(self):
+        part, captured_seek, reference_seek = segment_descriptor(descriptor(), 15, 10)
+        self.assertEqual(part['frame_count'], 5)
+        self.assertEqual((captured_seek, reference_seek), (30, 15))
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg")
+class TestFilterChainFrames(unittest.TestCase):
+    """The chains run through FFmpeg pass exactly the aligned source frames"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.source = os.path.join(cls.temp_dir, "source.mkv")
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+                        "-i", f"testsrc2=size={WIDTH}x{HEIGHT}:rate=30:duration=3",
+                        "-c:v", "ffv1", cls.source], check=True)
+        cls.source_frames = cls.decode("null")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    @classmethod
+    def decode(cls, chain, seek_args=()):
+        result = subprocess.run(["ffmpeg", "-v", "error", *seek_args, "-i", cls.source, "-vf", chain,
+                                 "-fps_mode", "passthrough", "-f", "rawvideo", "-pix_fmt", "gray", "-"],
+                                capture_output=True, check=True)
+        return np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, WIDTH * HEIGHT)
+
+    def assert_source_frames(self, frames, indices):
+        self.assertEqual(len(frames), len(indices))
+        for frame, index in zip(frames, indices):
+            self.assertTrue(np.array_equal(frame, self.source_frames[index]), f"expected source frame {index}")
+
+    def test_captured_chain(self):
+        captured, reference = alignment_filter_chains(descriptor())
+        self.assert_source_frames(self.decode(captured), range(15, 35))
+        self.assert_source_frames(self.decode(reference), range(20))
+
+    def test_mapped_chains(self):
+        # Reference frame 10 was dropped and captured frame 5 repeats its predecessor
+        mapped = apply_frame_mapping(descriptor(), [[0, 9], [11, 19]], [[0, 4], [6, 19]], 19)
+        captured, reference = alignment_filter_chains(mapped)
+        self.assert_source_frames(self.decode(captured), [*range(15, 20), *range(21, 35)])
+        self.assert_source_frames(self.decode(reference), [*range(10), *range(11, 20)])
+
+    def test_seeked_input_gives_the_same_frames(self):
+        part, seek_frame = seeked_descriptor(descriptor())
+        captured, _ = alignment_filter_chains(part)
+        self.assert_source_frames(self.decode(captured, input_seek_args(seek_frame, 30.0)), range(15, 35))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import unittest
+
+import numpy as np
+
+from app.bookend_classifier import bookends_match_loops, classify_bookends, find_runs
+from app.luma_profile import luma_plane_stats
+
+
+def classify_bookends_per_frame(stats, fps, thresholds, std_dev_threshold, min_white_frames, initial_sample_rate,
+                                white_ratio=None):
+    """
+    The per-frame loops classify_bookends replaced, kept as the reference it must match
+
+    white_ratio(frame_idx, threshold) overrides the profile's white ratio, as the
+    scanner before the luma profile measured it against the region threshold.
+    """
+    frame_count = len(stats)
+    brightness, std_devs, white_ratios = stats[:, 0], stats[:, 1], stats[:, 2]
+    if white_ratio is None:
+        white_ratio = lambda frame_idx, threshold: white_ratios[frame_idx]
+
+    regions = []
+    for threshold_idx, threshold in enumerate(thresholds):
+        current = None
+        for frame_idx in range(0, frame_count, initial_sample_rate):
+            is_white = brightness[frame_idx] > threshold
+            if threshold_idx >= 2:
+                is_white = is_white and std_devs[frame_idx] < std_dev_threshold
+            if is_white:
+                if current is None:
+                    current = [max(0, frame_idx - initial_sample_rate), None]
+            elif current is not None:
+                current[1] = min(frame_count - 1, frame_idx + initial_sample_rate)
+                regions.append((max(0, current[0] - initial_sample_rate),
+                                min(frame_count - 1, current[1] + initial_sample_rate), threshold))
+                current = None
+        if current is not None:
+            current[1] = min(frame_count - 1, frame_idx + initial_sample_rate)
+            regions.append((max(0, current[0] - initial_sample_rate),
+                            min(frame_count - 1, current[1] + initial_sample_rate), threshold))
+
+    if not regions:
+        regions = [(0, frame_count - 1, thresholds[-1])]
+    if len(regions) > 1:
+        regions.sort()
+        merged = []
+        start, end, threshold = regions[0]
+        for next_start, next_end, next_threshold in regions[1:]:
+            if next_start <= end:
+                end = max(end, next_end)
+                threshold = min(threshold, next_threshold)
+            else:
+                merged.append((start, end, threshold))
+                start, end, threshold = next_start, next_end, next_threshold
+        merged.append((start, end, threshold))
+        regions = merged
+
+    bookends = []
+    for start, end, threshold in regions:
+        if end - start < min_white_frames:
+            continue
+        run_start = None
+        for frame_idx in range(start, end + 2):
+            is_white = False
+            if frame_idx <= end:
+                mean, std = brightness[frame_idx], std_devs[frame_idx]
+                if std < std_dev_threshold * 1.2:
+                    is_white = mean > threshold * 0.95
+                else:
+                    is_white = mean > threshold or (mean > threshold * 0.9 and white_ratio(frame_idx, threshold) > 0.7)
+            if is_white and run_start is None:
+                run_start = frame_idx
+            elif not is_white and run_start is not None:
+                if frame_idx - run_start >= min_white_frames:
+                    bookends.append((run_start, frame_idx - 1))
+                run_start = None
+    return sorted(bookends)
+
+
+def random_profile(rng, frame_count, white_runs):
+    stats = np.empty((frame_count, 3), dtype=np.float32)
+    stats[:, 0] = rng.uniform(20, 200, frame_count)
+    stats[:, 1] = rng.uniform(5, 60, frame_count)
+    stats[:, 2] = rng.uniform(0, 0.5, frame_count)
+    for _ in range(white_runs):
+        start = rng.integers(0, frame_count)
+        end = min(frame_count, start + rng.integers(1, 40))
+        stats[start:end, 0] = rng.uniform(215, 255, end - start)
+        stats[start:end, 1] = rng.uniform(0, 20, end - start)
+        stats[start:end, 2] = rng.uniform(0.5, 1, end - start)
+    return stats
+
+
+def random_frames(rng, frame_count, white_runs, pixels=256):
+    """
+    Gray frames of content, white frames and mostly white textured frames
+
+    White pixels are all above 230 and other pixels at most 190, so counting
+    pixels above LUMA_WHITE_LEVEL or above any of the test thresholds agrees.
+    """
+    frames = rng.integers(20, 191, (frame_count, pixels)).astype(np.uint8)
+    for _ in range(white_runs):
+        start = int(rng.integers(0, frame_count))
+        end = min(frame_count, start + int(rng.integers(1, 40)))
+        for frame_idx in range(start, end):
+            if rng.random() < 0.5:
+                frames[frame_idx] = rng.integers(236, 256, pixels)
+            else:
+                white = rng.random(pixels) < rng.uniform(0.6, 0.9)
+                frames[frame_idx] = np.where(white, 255, rng.integers(0, 121, pixels))
+    return frames
+
+
+class TestFindRuns(unittest.TestCase):
+    def test_runs_of_one_row(self):
+        rows, starts, ends = find_runs([True, True, False, True, False, False, True])
+        self.assertEqual(rows.tolist(), [0, 0, 0])
+        self.assertEqual(starts.tolist(), [0, 3, 6])
+        self.assertEqual(ends.tolist(), [1, 3, 6])
+
+    def test_runs_do_not_continue_into_the_next_row(self):
+        rows, starts, ends = find_runs([[False, True, True], [True, True, False]])
+        self.assertEqual(rows.tolist(), [0, 1])
+        self.assertEqual(starts.tolist(), [1, 0])
+        self.assertEqual(ends.tolist(), [2, 1])
+
+    def test_empty_mask(self):
+        rows, starts, ends = find_runs([False, False])
+        self.assertEqual(len(rows), 0)
+
+
+class TestClassifyBookends(unittest.TestCase):
+    thresholds = [230.0, 220.0, 210.0]
+
+    def check_against_per_frame_loop(self, stats, fps=30.0, min_white_frames=3, initial_sample_rate=5):
+        expected = classify_bookends_per_frame(stats, fps, self.thresholds, 10.0, min_white_frames,
+                                               initial_sample_rate)
+        bookends = classify_bookends(stats, fps, self.thresholds, 10.0, min_white_frames, initial_sample_rate)
+        self.assertEqual([(b['start_frame'], b['end_frame']) for b in bookends], expected)
+        for bookend in bookends:
+            self.assertEqual(bookend['frame_count'], bookend['end_frame'] - bookend['start_frame'] + 1)
+            self.assertAlmostEqual(bookend['start_time'], bookend['start_frame'] / fps)
+
+    def test_matches_per_frame_loop_on_random_profiles(self):
+        rng = np.random.default_rng(7)
+        for _ in range(200):
+            frame_count = int(rng.integers(1, 600))
+            stats = random_profile(rng, frame_count, int(rng.integers(0, 12)))
+            with self.subTest(frame_count=frame_count):
+                self.check_against_per_frame_loop(stats, initial_sample_rate=int(rng.integers(1, 8)))
+
+    def test_matches_per_frame_loop_on_mostly_white_profile(self):
+        rng = np.random.default_rng(11)
+        stats = random_profile(rng, 400, 60)
+        self.check_against_per_frame_loop(stats)
+
+    def test_matches_pixel_scanner_when_white_levels_agree(self):
+        # The scanner before the luma profile counted pixels above the region
+        # threshold; the profile counts them above LUMA_WHITE_LEVEL
+        rng = np.random.default_rng(13)
+        for _ in range(50):
+            frames = random_frames(rng, int(rng.integers(1, 300)), int(rng.integers(0, 8)))
+            stats = luma_plane_stats(frames)
+            expected = classify_bookends_per_frame(
+                stats, 30.0, self.thresholds, 10.0, 3, 5,
+                white_ratio=lambda frame_idx, threshold: np.sum(frames[frame_idx] > threshold) / frames.shape[1])
+            bookends = classify_bookends(stats, 30.0, self.thresholds, 10.0, 3, 5)
+            with self.subTest(frame_count=len(frames)):
+                self.assertEqual([(b['start_frame'], b['end_frame']) for b in bookends], expected)
+
+    def test_single_bookend(self):
+        stats = np.zeros((120, 3), dtype=np.float32)
+        stats[:, 0] = 40
+        stats[:, 1] = 30
+        stats[30:45] = (250, 2, 1)
+        bookends = classify_bookends(stats, 30.0, self.thresholds, 10.0, 3, 5)
+        self.assertEqual(len(bookends), 1)
+        self.assertEqual((bookends[0]['start_frame'], bookends[0]['end_frame']), (30, 44))
+        self.assertEqual(bookends[0]['frame_count'], 15)
+
+    def test_no_frames(self):
+        self.assertEqual(classify_bookends(np.empty((0, 3)), 30.0, self.thresholds, 10.0, 3, 5), [])
+
+
+class TestBookendsMatchLoops(unittest.TestCase):
+    @staticmethod
+    def bookends(*starts, length=6):
+        return [{'start_frame': start, 'end_frame': start + length - 1} for start in starts]
+
+    def test_evenly_spaced_bookends(self):
+        self.assertTrue(bookends_match_loops(self.bookends(100, 1100, 2100), 3000, loop_frames=994))
+        self.assertTrue(bookends_match_loops(self.bookends(100, 1100, 2100), 3000))
+
+    def test_missing_bookend_between_loops(self):
+        self.assertFalse(bookends_match_loops(self.bookends(100, 2100), 3000, loop_frames=994))
+        self.assertFalse(bookends_match_loops(self.bookends(100, 1100, 3100), 4000))
+
+    def test_missing_bookend_before_or_after(self):
+        self.assertFalse(bookends_match_loops(self.bookends(1600, 2600), 3000, loop_frames=994))
+        self.assertFalse(bookends_match_loops(self.bookends(100, 1100), 3500))
+
+    def test_needs_two_bookends(self):
+        self.assertFalse(bookends_match_loops(self.bookends(100), 3000, loop_frames=994))
+
+
+if __name__ == '__main__':
+    unittest.main()
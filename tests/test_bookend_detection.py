@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.bookend_alignment import BookendAligner
+from app.luma_profile import LumaProfile
+
+FPS = 30.0
+FRAME_COUNT = 3600
+BOOKEND_STARTS = [300, 1500, 2700]
+BOOKEND_FRAMES = 6
+LOOP_DURATION = (1200 - BOOKEND_FRAMES) / FPS
+
+
+def capture_stats():
+    """Dark, textured content with a short white bookend before every loop"""
+    stats = np.empty((FRAME_COUNT, 3), dtype=np.float32)
+    stats[:] = (60.0, 30.0, 0.05)
+    for start in BOOKEND_STARTS:
+        stats[start:start + BOOKEND_FRAMES] = (250.0, 2.0, 1.0)
+    return stats
+
+
+def windows_profile(stats, windows):
+    """Sparse profile holding only the given (start, end) frame windows"""
+    frames = np.concatenate([np.arange(start, end + 1) for start, end in windows])
+    return LumaProfile(frames, stats[frames], FPS, FRAME_COUNT)
+
+
+class TestSparseBookendDetection(unittest.TestCase):
+    def setUp(self):
+        self.stats = capture_stats()
+        self.aligner = BookendAligner()
+        self.aligner.profile_cache = False
+        self.aligner.edge_refinement = False
+        self.aligner.packet_prefilter = False
+
+        keyframes = np.arange(0, FRAME_COUNT, int(FPS))
+        video_info = {'frame_rate': FPS, 'duration': FRAME_COUNT / FPS, 'frame_count': FRAME_COUNT}
+        self.full_scan = mock.Mock(return_value=LumaProfile(np.arange(FRAME_COUNT), self.stats, FPS, FRAME_COUNT))
+        for name, value in (
+                ('_get_video_info', mock.Mock(return_value=video_info)),
+                ('_keyframe_profile', mock.Mock(return_value=LumaProfile(keyframes, self.stats[keyframes], FPS,
+                                                                         FRAME_COUNT))),
+                ('_scan_full_profile', self.full_scan)):
+            patcher = mock.patch.object(self.aligner, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def detect(self, sparse_windows, loop_duration=LOOP_DURATION):
+        sparse = windows_profile(self.stats, sparse_windows)
+        with mock.patch.object(self.aligner, '_scan_keyframe_profile', return_value=sparse):
+            return self.aligner._detect_white_bookends("capture.mp4", loop_duration)
+
+    def test_sparse_scan_with_every_bookend_is_used(self):
+        bookends = self.detect([(start - 30, start + 30) for start in BOOKEND_STARTS])
+        self.assertEqual([b['start_frame'] for b in bookends], BOOKEND_STARTS)
+        self.full_scan.assert_not_called()
+
+    def test_missed_bookend_falls_back_to_full_scan(self):
+        # The middle bookend lies between the sampled windows
+        bookends = self.detect([(270, 330), (2670, 2730)])
+        self.full_scan.assert_called_once()
+        self.assertEqual([b['start_frame'] for b in bookends], BOOKEND_STARTS)
+
+    def test_missed_bookend_found_without_loop_duration(self):
+        # The last bookend is missing, leaving two loops of content after the last one found
+        bookends = self.detect([(270, 330), (1470, 1530)], loop_duration=None)
+        self.full_scan.assert_called_once()
+        self.assertEqual([b['start_frame'] for b in bookends], BOOKEND_STARTS)
+
+    def test_thresholds_come_from_the_representative_sample(self):
+        # Windows around bookends are mostly white and push the strictest threshold past any luma level
+        sparse = windows_profile(self.stats, [(start - 2, start + 8) for start in BOOKEND_STARTS])
+        biased, _ = self.aligner._bookend_thresholds(sparse)
+        sampled, _ = self.aligner._bookend_thresholds(sparse, sample=self.aligner._keyframe_profile("capture.mp4", FPS))
+        self.assertGreater(biased[0], 255)
+        self.assertLess(sampled[0], 250)
+
+
+if __name__ == '__main__':
+    unittest.main()
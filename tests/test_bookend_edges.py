@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.bookend_alignment import BookendAligner
+from app.bookend_edges import BookendEdgeRefiner, FrameSeekIndex
+from app.luma_profile import LumaProfile
+
+FPS = 30.0
+GOP = 30
+
+
+def content_stats(frame_count, bookends):
+    """Dark, textured frames with white bookends at the given (start, end) frames"""
+    stats = np.empty((frame_count, 3), dtype=np.float32)
+    stats[:] = (60.0, 30.0, 0.05)
+    for start, end in bookends:
+        stats[start:end + 1] = (250.0, 2.0, 1.0)
+    return stats
+
+
+def fake_scan(stats):
+    """Stand-in for scan_luma_profile_ffmpeg decoding frames from a stats array"""
+    def scan(video_path, fps, ffmpeg_path="ffmpeg", start_frame=0, max_frames=None, seek_time=None, **kwargs):
+        frames = np.arange(start_frame, min(len(stats), start_frame + max_frames))
+        return LumaProfile(frames, stats[frames], fps)
+    return scan
+
+
+def keyframe_profile(stats):
+    keyframes = np.arange(0, len(stats), GOP)
+    return LumaProfile(keyframes, stats[keyframes], FPS, len(stats))
+
+
+class TestBookendEdgeRefiner(unittest.TestCase):
+    def refine(self, frame_count, bookends):
+        stats = content_stats(frame_count, bookends)
+        coarse = keyframe_profile(stats)
+        seek_index = FrameSeekIndex.constant_rate(FPS, frame_count, coarse.frame_indices)
+        refiner = BookendEdgeRefiner("capture.mp4", FPS, seek_index, threshold=200.0, std_dev_threshold=20.0)
+        with mock.patch('app.bookend_edges.scan_luma_profile_ffmpeg', side_effect=fake_scan(stats)):
+            found = refiner.refine(coarse, min_white_frames=3)
+        return refiner, [(b['start_frame'], b['end_frame']) for b in found]
+
+    def test_bookend_on_a_keyframe_is_refined_to_its_edges(self):
+        refiner, found = self.refine(300, [(55, 60), (238, 243)])
+        self.assertEqual(found, [(55, 60), (238, 243)])
+        # Each edge is found by decoding the one GOP that brackets it
+        self.assertEqual(refiner.probes, 4)
+        self.assertEqual(refiner.decoded_frames, 4 * GOP)
+
+    def test_bookend_between_keyframes_is_not_found(self):
+        _, found = self.refine(300, [(55, 60), (140, 145), (238, 243)])
+        self.assertEqual(found, [(55, 60), (238, 243)])
+
+    def test_bracket_over_several_gops_is_narrowed_first(self):
+        stats = content_stats(600, [(410, 420)])
+        coarse = LumaProfile(np.array([0, 420, 599]), stats[[0, 420, 599]], FPS, 600)
+        seek_index = FrameSeekIndex.constant_rate(FPS, 600, np.arange(0, 600, GOP))
+        refiner = BookendEdgeRefiner("capture.mp4", FPS, seek_index, threshold=200.0, std_dev_threshold=20.0)
+        with mock.patch('app.bookend_edges.scan_luma_profile_ffmpeg', side_effect=fake_scan(stats)):
+            found = refiner.refine(coarse, min_white_frames=3)
+        self.assertEqual([(b['start_frame'], b['end_frame']) for b in found], [(410, 420)])
+        self.assertLess(refiner.decoded_frames, 600)
+
+
+class TestEdgeRefinementFallback(unittest.TestCase):
+    frame_count = 3600
+    loop_duration = (1200 - 6) / FPS
+
+    def detect(self, bookends):
+        stats = content_stats(self.frame_count, bookends)
+        aligner = BookendAligner()
+        aligner.profile_cache = False
+        aligner.packet_prefilter = False
+        aligner.keyframe_coarse_scan = True
+        aligner.edge_refinement = True
+
+        video_info = {'frame_rate': FPS, 'duration': self.frame_count / FPS, 'frame_count': self.frame_count}
+        full_scan = mock.Mock(return_value=LumaProfile(np.arange(self.frame_count), stats, FPS))
+        with mock.patch.object(aligner, '_get_video_info', return_value=video_info), \
+                mock.patch.object(aligner, '_keyframe_profile', return_value=keyframe_profile(stats)), \
+                mock.patch.object(aligner, '_scan_keyframe_profile', return_value=None), \
+                mock.patch.object(aligner, '_scan_full_profile', full_scan), \
+                mock.patch('app.bookend_alignment.read_packet_table', return_value=None), \
+                mock.patch('app.bookend_edges.scan_luma_profile_ffmpeg', side_effect=fake_scan(stats)):
+            found = aligner._detect_white_bookends("capture.mp4", self.loop_duration)
+        return full_scan, [(b['start_frame'], b['end_frame']) for b in found]
+
+    def test_refined_bookends_are_used(self):
+        full_scan, found = self.detect([(298, 303), (1498, 1503), (2698, 2703)])
+        self.assertEqual(found, [(298, 303), (1498, 1503), (2698, 2703)])
+        full_scan.assert_not_called()
+
+    def test_bookend_between_keyframes_falls_back_to_full_scan(self):
+        full_scan, found = self.detect([(298, 303), (1510, 1515), (2698, 2703)])
+        full_scan.assert_called_once()
+        self.assertEqual(found, [(298, 303), (1510, 1515), (2698, 2703)])
+
+
+if __name__ == '__main__':
+    unittest.main()
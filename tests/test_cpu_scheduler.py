@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+from app.cpu_scheduler import DEFAULT_THREAD_CAPS, CpuScheduler
+
+
+class TestCpuScheduler(unittest.TestCase):
+    def setUp(self):
+        self.load = 0.0  # percent
+        patcher = mock.patch('app.cpu_scheduler.psutil.cpu_percent', side_effect=lambda interval=None: self.load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = CpuScheduler(cores=16)
+
+    def test_idle_machine_is_split_at_the_thread_cap(self):
+        plan = self.scheduler.plan("vmaf", max_jobs=4)
+        self.assertEqual(plan['jobs'], 2)
+        self.assertEqual(plan['threads_per_job'], 8)
+        self.assertEqual(plan['thread_cap'], DEFAULT_THREAD_CAPS['vmaf'])
+
+    def test_jobs_are_limited_to_the_parts_of_the_work(self):
+        plan = self.scheduler.plan("vmaf", max_jobs=1)
+        self.assertEqual(plan['jobs'], 1)
+        self.assertEqual(plan['threads_per_job'], 16)
+
+    def test_leased_threads_are_not_planned_again(self):
+        with self.scheduler.lease("encode", 12):
+            plan = self.scheduler.plan("vmaf", max_jobs=4)
+        self.assertEqual(plan['leased'], 12)
+        self.assertEqual(plan['available'], 4)
+        self.assertEqual((plan['jobs'], plan['threads_per_job']), (1, 4))
+        self.assertEqual(self.scheduler.leased_threads(), 0)
+
+    def test_load_from_other_programs_is_planned_around(self):
+        self.load = 75.0
+        plan = self.scheduler.plan("vmaf", max_jobs=4)
+        self.assertEqual(plan['available'], 4)
+        self.assertEqual(plan['load'], 75.0)
+
+    def test_leases_and_load_are_not_counted_twice(self):
+        # The leased job is part of the measured load
+        self.load = 50.0
+        with self.scheduler.lease("encode", 6):
+            self.assertEqual(self.scheduler.plan("vmaf")['available'], 8)
+
+    def test_at_least_one_thread_on_a_busy_machine(self):
+        self.load = 100.0
+        plan = self.scheduler.plan("vmaf", max_jobs=4)
+        self.assertEqual((plan['jobs'], plan['threads_per_job']), (1, 1))
+
+    def test_configured_threads_and_jobs_win(self):
+        self.load = 100.0
+        plan = self.scheduler.plan("vmaf", max_jobs=8, threads=12, jobs=3)
+        self.assertEqual((plan['jobs'], plan['threads_per_job']), (3, 4))
+
+    def test_lease_is_released_when_the_work_fails(self):
+        with self.assertRaises(RuntimeError):
+            with self.scheduler.lease("vmaf", 4):
+                raise RuntimeError("ffmpeg failed")
+        self.assertEqual(self.scheduler.leased_threads(), 0)
+
+
+class TestThroughputTuning(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('app.cpu_scheduler.psutil.cpu_percent', return_value=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = CpuScheduler(cores=16)
+
+    def test_poor_scaling_lowers_the_cap(self):
+        self.scheduler.record("vmaf", 4, frames=1000, seconds=10)   # 25 fps per thread
+        self.scheduler.record("vmaf", 8, frames=1100, seconds=10)   # 13.75 fps per thread
+        self.assertEqual(self.scheduler.thread_cap("vmaf"), 4)
+        plan = self.scheduler.plan("vmaf", max_jobs=8)
+        self.assertEqual((plan['jobs'], plan['threads_per_job']), (4, 4))
+
+    def test_good_scaling_keeps_the_default_cap(self):
+        self.scheduler.record("vmaf", 2, frames=400, seconds=10)
+        self.scheduler.record("vmaf", 4, frames=780, seconds=10)
+        self.assertEqual(self.scheduler.thread_cap("vmaf"), DEFAULT_THREAD_CAPS['vmaf'])
+
+    def test_good_scaling_beyond_the_default_raises_the_cap(self):
+        self.scheduler.record("vmaf", 8, frames=800, seconds=10)
+        self.scheduler.record("vmaf", 12, frames=1150, seconds=10)
+        self.assertEqual(self.scheduler.thread_cap("vmaf"), 12)
+
+    def test_throughput_is_per_process_and_smoothed(self):
+        self.assertEqual(self.scheduler.record("encode", 4, frames=600, seconds=10, jobs=2), 30.0)
+        self.scheduler.record("encode", 4, frames=500, seconds=10)
+        self.assertEqual(self.scheduler._throughput["encode"][4], 40.0)
+
+    def test_unusable_measurements_are_ignored(self):
+        self.assertIsNone(self.scheduler.record("vmaf", 4, frames=0, seconds=10))
+        self.assertIsNone(self.scheduler.record("vmaf", 4, frames=100, seconds=0))
+        self.assertEqual(self.scheduler.thread_cap("vmaf"), DEFAULT_THREAD_CAPS['vmaf'])
+
+
+if __name__ == '__main__':
+    unittest.main()
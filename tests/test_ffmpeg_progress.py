@@ -0,0 +1,133 @@
+import io
+import shutil
+import subprocess
+import unittest
+from unittest import mock
+
+from app.ffmpeg_progress import ProgressReader, is_progress_line, progress_args, with_progress
+
+
+def progress_block(frame, fps=30.0, out_time_us=None, speed="1.5x", drop=0, dup=0, end=False):
+    if out_time_us is None:
+        out_time_us = frame * 33333
+    return [
+        f"frame={frame}\n", f"fps={fps}\n", "bitrate=N/A\n", "total_size=N/A\n",
+        f"out_time_us={out_time_us}\n", f"out_time_ms={out_time_us}\n", "out_time=00:00:01.000000\n",
+        f"dup_frames={dup}\n", f"drop_frames={drop}\n", f"speed={speed}\n",
+        f"progress={'end' if end else 'continue'}\n"
+    ]
+
+
+class TestProgressLines(unittest.TestCase):
+    def test_progress_keys(self):
+        self.assertTrue(is_progress_line("frame=120\n"))
+        self.assertTrue(is_progress_line("  progress=end"))
+        self.assertTrue(is_progress_line("speed=N/A"))
+
+    def test_log_lines(self):
+        self.assertFalse(is_progress_line("[libvmaf @ 0x55] VMAF score: 97.12\n"))
+        self.assertFalse(is_progress_line("Stream #0:0: Video: h264"))
+        self.assertFalse(is_progress_line("framerate=30"))
+        self.assertFalse(is_progress_line(""))
+
+    def test_with_progress_follows_the_executable(self):
+        cmd = with_progress(["/opt/ffmpeg", "-i", "in.mp4", "-f", "null", "-"], pipe=2)
+        self.assertEqual(cmd, ["/opt/ffmpeg", *progress_args(2), "-i", "in.mp4", "-f", "null", "-"])
+        self.assertEqual(progress_args(2), ["-nostats", "-progress", "pipe:2"])
+
+
+class TestProgressReader(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('app.ffmpeg_progress.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def feed(self, reader, lines):
+        events = [reader.feed(line) for line in lines]
+        return [event for event in events if event is not None]
+
+    def test_block_becomes_one_event(self):
+        reader = ProgressReader(total_frames=300, interval=0)
+        self.now += 2.0
+        events = self.feed(reader, progress_block(60, drop=2, dup=1))
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual((event.frame, event.fps, event.speed), (60, 30.0, 1.5))
+        self.assertEqual((event.dropped, event.duplicated), (2, 1))
+        self.assertAlmostEqual(event.out_time, 60 * 0.033333)
+        self.assertEqual(event.percent, 20.0)
+        self.assertAlmostEqual(event.elapsed, 2.0)
+        self.assertFalse(event.finished)
+
+    def test_log_lines_in_between_are_ignored(self):
+        reader = ProgressReader(interval=0)
+        lines = progress_block(10)
+        lines.insert(3, "[libvmaf @ 0x55] frame=999 is a log line\n")
+        lines.insert(0, "Press [q] to stop\n")
+        events = self.feed(reader, lines)
+        self.assertEqual(events[0].frame, 10)
+
+    def test_not_available_values(self):
+        reader = ProgressReader(interval=0)
+        event = self.feed(reader, progress_block(0, speed="N/A", out_time_us=-9223372036854775807))[0]
+        self.assertIsNone(event.speed)
+        self.assertIsNone(event.out_time)
+        self.assertIsNone(event.percent)
+
+    def test_eta_from_the_smoothed_rate(self):
+        reader = ProgressReader(total_frames=1000, interval=0)
+        self.assertIsNone(self.feed(reader, progress_block(0))[0].eta)
+        self.now += 1.0
+        self.assertAlmostEqual(self.feed(reader, progress_block(100))[0].eta, 9.0)
+        # A slower block moves the rate only part of the way
+        self.now += 1.0
+        event = self.feed(reader, progress_block(150))[0]
+        self.assertAlmostEqual(event.eta, 850 / 85.0)
+
+    def test_events_are_throttled_but_the_end_is_delivered(self):
+        delivered = []
+        reader = ProgressReader(total_frames=100, callback=delivered.append, interval=0.5)
+        self.now += 1.0
+        self.feed(reader, progress_block(10))
+        self.now += 0.1
+        self.feed(reader, progress_block(20))
+        self.now += 0.1
+        self.feed(reader, progress_block(100, end=True))
+        self.assertEqual([event.frame for event in delivered], [10, 100])
+        self.assertTrue(delivered[-1].finished)
+        self.assertEqual(delivered[-1].eta, 0.0)
+        self.assertEqual(reader.latest.frame, 100)
+
+    def test_read_returns_the_latest_event_and_summary(self):
+        reader = ProgressReader(total_frames=90)
+        self.now += 3.0
+        stream = io.StringIO("".join(progress_block(45) + progress_block(90, end=True)))
+        self.assertEqual(reader.read(stream).frame, 90)
+        self.assertEqual(reader.summary(), {'frames': 90, 'seconds': 3.0, 'fps': 30.0, 'speed': 1.5,
+                                            'dropped': 0, 'duplicated': 0})
+
+    def test_describe(self):
+        reader = ProgressReader(total_frames=1486, interval=0)
+        self.feed(reader, progress_block(0))
+        self.now += 1.0
+        event = self.feed(reader, progress_block(300, fps=45.1))[0]
+        self.assertEqual(event.describe(), "frame 300/1486 (20%), 45.1 fps, 1.50x, ETA 4s")
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg")
+class TestFfmpegProgress(unittest.TestCase):
+    def test_progress_on_stderr_with_log_lines(self):
+        cmd = with_progress(["ffmpeg", "-hide_banner", "-loglevel", "info", "-f", "lavfi",
+                             "-i", "testsrc2=size=64x48:rate=30:duration=2", "-f", "null", "-"], pipe=2)
+        reader = ProgressReader(total_frames=60, interval=0)
+        with subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True) as process:
+            event = reader.read(process.stderr)
+        self.assertEqual(process.returncode, 0)
+        self.assertTrue(event.finished)
+        self.assertEqual(event.frame, 60)
+        self.assertEqual(event.percent, 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
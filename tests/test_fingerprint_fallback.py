@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+
+from app.bookend_alignment import BookendAligner
+
+VIDEO_INFO = {'frame_rate': 30.0, 'duration': 20.0, 'frame_count': 600}
+
+
+class TestFingerprintFallback(unittest.TestCase):
+    def setUp(self):
+        self.aligner = BookendAligner()
+        self.errors = []
+        self.aligner.error_occurred.connect(self.errors.append)
+
+    def test_quiet_failure_is_not_reported(self):
+        self.assertIsNone(self.aligner.align_fingerprint_videos("missing_ref.mp4", "missing_cap.mp4", quiet=True))
+        self.assertEqual(self.errors, [])
+
+    def test_failure_is_reported(self):
+        self.assertIsNone(self.aligner.align_fingerprint_videos("missing_ref.mp4", "missing_cap.mp4"))
+        self.assertEqual(len(self.errors), 1)
+
+    def test_bookend_fallback_tries_fingerprint_quietly(self):
+        fallback_bookends = [{'start_frame': 0, 'end_frame': 5, 'start_time': 0.0, 'end_time': 5 / 30.0,
+                              'is_fallback': True},
+                             {'start_frame': 595, 'end_frame': 599, 'start_time': 595 / 30.0, 'end_time': 20.0,
+                              'is_fallback': True}]
+        fingerprint = mock.Mock(return_value=None)
+        with mock.patch('os.path.exists', return_value=True), \
+                mock.patch('app.bookend_alignment.validate_video_file', return_value=True), \
+                mock.patch.object(self.aligner, '_get_video_info', return_value=VIDEO_INFO), \
+                mock.patch.object(self.aligner, '_detect_white_bookends', return_value=fallback_bookends), \
+                mock.patch.object(self.aligner, 'align_fingerprint_videos', fingerprint), \
+                mock.patch.object(self.aligner, '_create_alignment_descriptor', return_value=None):
+            self.aligner.align_bookend_videos("ref.mp4", "cap.mp4")
+        fingerprint.assert_called_once_with("ref.mp4", "cap.mp4", quiet=True)
+
+    def test_exact_start_is_not_padded(self):
+        with mock.patch.object(self.aligner, '_get_video_info', return_value=VIDEO_INFO):
+            padded = self.aligner._create_alignment_descriptor("ref.mp4", "cap.mp4", 3.0, frame_offset=0)
+            exact = self.aligner._create_alignment_descriptor("ref.mp4", "cap.mp4", 3.0, frame_offset=0,
+                                                              start_padding=0)
+        self.assertEqual(exact['captured_start_frame'], 90)
+        self.assertEqual(padded['captured_start_frame'], 96)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from app.frame_mapping import THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, frame_ranges, map_frames, mapping_ranges
+
+
+def random_thumbnails(rng, count):
+    """Normalised thumbnails like scan_thumbnails returns"""
+    thumbnails = rng.normal(size=(count, THUMBNAIL_WIDTH * THUMBNAIL_HEIGHT)).astype(np.float32)
+    thumbnails -= thumbnails.mean(axis=1, keepdims=True)
+    thumbnails /= thumbnails.std(axis=1, keepdims=True)
+    return thumbnails
+
+
+class TestMapFrames(unittest.TestCase):
+    def setUp(self):
+        self.reference = random_thumbnails(np.random.default_rng(5), 80)
+
+    def test_clean_capture(self):
+        lead = 3
+        captured = np.concatenate((random_thumbnails(np.random.default_rng(6), lead), self.reference))
+        result = map_frames(self.reference, captured, lead=lead, band=10)
+
+        self.assertEqual(result['mapping'].tolist(), list(range(lead, lead + 80)))
+        self.assertTrue(result['matched'].all())
+        self.assertEqual(result['events'], [])
+        self.assertAlmostEqual(result['mean_distance'], 0.0, places=4)
+
+    def test_drop_and_duplicate(self):
+        # Reference frame 20 never reaches the capture, reference frame 50 is shown twice
+        rows = [*range(20), *range(21, 51), 50, *range(51, 80)]
+        captured = self.reference[rows]
+        result = map_frames(self.reference, captured, band=10)
+
+        self.assertEqual(result['dropped_frames'], 1)
+        self.assertEqual(result['duplicated_frames'], 1)
+        # Without motion between them, an event can be placed on either side of the lost or repeated frame
+        drop, duplicate = result['events']
+        self.assertEqual(drop['type'], 'drop')
+        self.assertIn(drop['reference_frame'], (20, 21))
+        self.assertEqual(duplicate['type'], 'duplicate')
+        self.assertIn(duplicate['reference_frame'], (50, 51))
+
+        # Every other reference frame is paired with its own captured frame
+        for i in set(range(80)) - {20, 21, 50, 51}:
+            self.assertEqual(rows[result['mapping'][i]], i)
+
+        ranges = mapping_ranges(result)
+        self.assertEqual(ranges['pair_count'], 79)
+        self.assertEqual(ranges['captured_offset'], 0)
+
+    def test_empty_input(self):
+        self.assertIsNone(map_frames(self.reference[:0], self.reference))
+
+
+class TestFrameRanges(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(frame_ranges([0, 1, 2, 5, 7, 8]), [[0, 2], [5, 5], [7, 8]])
+        self.assertEqual(frame_ranges([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
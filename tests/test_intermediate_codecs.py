@@ -0,0 +1,55 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from app.intermediate_codecs import (DEFAULT_INTERMEDIATE_PROFILE, INTERMEDIATE_PROFILES, intermediate_output_args,
+                                     intermediate_path, intermediate_profile)
+
+
+class TestIntermediateProfiles(unittest.TestCase):
+    def test_unknown_profile_falls_back_to_the_default(self):
+        with self.assertLogs('app.intermediate_codecs', level='WARNING'):
+            profile = intermediate_profile("prores")
+        self.assertIs(profile, INTERMEDIATE_PROFILES[DEFAULT_INTERMEDIATE_PROFILE])
+
+    def test_path_uses_the_profile_container(self):
+        self.assertEqual(intermediate_path("out", "aligned", "ffv1"), os.path.join("out", "aligned.mkv"))
+        self.assertEqual(intermediate_path("out", "aligned", "x264_lossless"), os.path.join("out", "aligned.mp4"))
+
+    def test_audio_can_be_left_out(self):
+        self.assertEqual(intermediate_output_args("ffv1", audio=False)[-1], "-an")
+        self.assertIn("-c:a", intermediate_output_args("ffv1"))
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg")
+class TestLosslessProfiles(unittest.TestCase):
+    """Lossless profiles decode to exactly the pixels that were encoded"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def decode(self, path):
+        return subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "yuv420p", "-"],
+                              capture_output=True, check=True).stdout
+
+    def test_round_trip_is_bit_exact(self):
+        source = ["-f", "lavfi", "-i", "testsrc2=size=64x48:rate=30:duration=1,format=yuv420p"]
+        expected = subprocess.run(["ffmpeg", "-v", "error", *source, "-f", "rawvideo", "-"],
+                                  capture_output=True, check=True).stdout
+        for name, profile in INTERMEDIATE_PROFILES.items():
+            if not profile["lossless"]:
+                continue
+            with self.subTest(profile=name):
+                path = intermediate_path(self.temp_dir, name, name)
+                subprocess.run(["ffmpeg", "-v", "error", "-y", *source,
+                                *intermediate_output_args(name, audio=False), path], check=True)
+                self.assertEqual(self.decode(path), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
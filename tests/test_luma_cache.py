@@ -0,0 +1,102 @@
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.luma_cache import LumaProfileCache, sidecar_path
+from app.luma_profile import LumaProfile
+
+FRAME_COUNT = 20000
+
+
+class TestLumaProfileCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.temp_dir, "cache", "luma_cache_index.json")
+
+        # Random statistics barely compress, so every sidecar has about the same size
+        rng = np.random.default_rng(3)
+        self.profile = LumaProfile(np.arange(FRAME_COUNT), rng.uniform(0, 255, (FRAME_COUNT, 3)), 30.0)
+
+        self.videos = []
+        for i in range(4):
+            path = os.path.join(self.temp_dir, f"video_{i}.mp4")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(1024))
+            self.videos.append(path)
+
+        # A strictly increasing clock, so last use never ties
+        clock = itertools.count(1000.0)
+        patcher = mock.patch('app.luma_cache.time.time', side_effect=lambda: next(clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_cache(self, sidecars):
+        """Cache whose quota holds the given number of sidecars"""
+        probe = LumaProfileCache(index_path=os.path.join(self.temp_dir, "probe.json"))
+        probe.store(self.videos[0], "full", self.profile)
+        sidecar_size = os.path.getsize(sidecar_path(self.videos[0]))
+        probe.invalidate(self.videos[0])
+        return LumaProfileCache(max_size_mb=sidecars * sidecar_size * 1.1 / (1024 * 1024), index_path=self.index_path)
+
+    def test_round_trip(self):
+        cache = LumaProfileCache(index_path=self.index_path)
+        self.assertTrue(cache.store(self.videos[0], "full", self.profile, {"backend": "ffmpeg"}))
+
+        profile = cache.load(self.videos[0], "full", {"backend": "ffmpeg"})
+        np.testing.assert_array_equal(profile.stats, self.profile.stats)
+        self.assertEqual(profile.frame_count, FRAME_COUNT)
+        self.assertIsNone(cache.load(self.videos[0], "full", {"backend": "opencv"}))
+        self.assertIsNone(cache.load(self.videos[0], "keyframe_windows", {"backend": "ffmpeg"}))
+
+    def test_rewritten_video_misses(self):
+        cache = LumaProfileCache(index_path=self.index_path)
+        cache.store(self.videos[0], "full", self.profile)
+        with open(self.videos[0], 'ab') as f:
+            f.write(b"more")
+        self.assertIsNone(cache.load(self.videos[0], "full"))
+
+    def test_least_recently_used_sidecar_is_evicted(self):
+        cache = self.make_cache(2)
+        cache.store(self.videos[0], "full", self.profile)
+        cache.store(self.videos[1], "full", self.profile)
+        # Using the first video makes the second the least recently used
+        self.assertIsNotNone(cache.load(self.videos[0], "full"))
+        cache.store(self.videos[2], "full", self.profile)
+
+        self.assertTrue(os.path.exists(sidecar_path(self.videos[0])))
+        self.assertFalse(os.path.exists(sidecar_path(self.videos[1])))
+        self.assertTrue(os.path.exists(sidecar_path(self.videos[2])))
+        self.assertEqual(set(cache._read_index()), {sidecar_path(self.videos[0]), sidecar_path(self.videos[2])})
+
+    def test_new_sidecar_is_kept_over_the_quota(self):
+        cache = self.make_cache(0.5)
+        cache.store(self.videos[0], "full", self.profile)
+        cache.store(self.videos[1], "full", self.profile)
+
+        self.assertFalse(os.path.exists(sidecar_path(self.videos[0])))
+        self.assertTrue(os.path.exists(sidecar_path(self.videos[1])))
+
+    def test_deleted_sidecars_are_dropped_from_the_index(self):
+        cache = self.make_cache(3)
+        cache.store(self.videos[0], "full", self.profile)
+        os.remove(sidecar_path(self.videos[0]))
+        cache.store(self.videos[1], "full", self.profile)
+        self.assertEqual(set(cache._read_index()), {sidecar_path(self.videos[1])})
+
+    def test_disabled_cache_does_nothing(self):
+        cache = LumaProfileCache(index_path=self.index_path, enabled=False)
+        self.assertFalse(cache.store(self.videos[0], "full", self.profile))
+        self.assertFalse(os.path.exists(sidecar_path(self.videos[0])))
+        self.assertIsNone(cache.load(self.videos[0], "full"))
+
+
+if __name__ == '__main__':
+    unittest.main()
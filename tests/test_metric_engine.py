@@ -0,0 +1,125 @@
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from app.alignment_descriptor import alignment_filter_chains, alignment_filtergraph, make_alignment_descriptor
+from app.metric_engine import (libvmaf_feature_option, metric_filtergraph, metric_scores, read_stats_file,
+                               stats_filter)
+
+WIDTH, HEIGHT = 64, 48
+
+
+def descriptor(start_time=0.5, frame_count=20):
+    return make_alignment_descriptor("ref.mp4", "cap.mp4", start_time, frame_count, 30.0, 30.0)
+
+
+class TestLibvmafFeatureOption(unittest.TestCase):
+    def test_features_share_one_option(self):
+        self.assertEqual(libvmaf_feature_option(["cambi", "float_ssim"]), "feature='name=cambi|name=float_ssim'")
+
+    def test_filter_and_unknown_metrics_are_left_out(self):
+        self.assertEqual(libvmaf_feature_option(["psnr", "ms_ssim", "butteraugli"]), "feature='name=float_ms_ssim'")
+        self.assertIsNone(libvmaf_feature_option(["psnr", "ssim"]))
+
+
+class TestMetricFiltergraph(unittest.TestCase):
+    def test_libvmaf_alone_is_the_plain_alignment_graph(self):
+        self.assertEqual(metric_filtergraph(None, "libvmaf"), "libvmaf")
+        self.assertEqual(metric_filtergraph(descriptor(), "libvmaf", distorted_input=1, reference_input=0),
+                         alignment_filtergraph(descriptor(), "libvmaf", 1, 0))
+
+    def test_each_metric_gets_its_own_split(self):
+        graph = metric_filtergraph(None, "libvmaf", [stats_filter("psnr", "psnr.log"),
+                                                     stats_filter("ssim", "ssim.log")])
+        self.assertEqual(graph.split(";"), [
+            "[0:v]split=3[dist0][dist1][dist2]",
+            "[1:v]split=3[ref0][ref1][ref2]",
+            "[dist0][ref0]libvmaf",
+            "[dist1][ref1]psnr=stats_file=psnr.log",
+            "[dist2][ref2]ssim=stats_file=ssim.log"
+        ])
+
+    def test_inputs_are_aligned_once_before_the_split(self):
+        captured_chain, reference_chain = alignment_filter_chains(descriptor())
+        graph = metric_filtergraph(descriptor(), "libvmaf", [stats_filter("psnr", "psnr.log")],
+                                   distorted_input=1, reference_input=0)
+        self.assertEqual(graph.split(";")[:2], [
+            f"[1:v]{captured_chain},split=2[dist0][dist1]",
+            f"[0:v]{reference_chain},split=2[ref0][ref1]"
+        ])
+        self.assertEqual(graph.count("trim=start_frame"), 1)
+
+
+class TestStatsFiles(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, lines):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def test_psnr_column(self):
+        path = self.write("psnr.log", ["n:1 mse_avg:0.52 mse_y:0.40 psnr_avg:50.97 psnr_y:52.10",
+                                       "n:2 mse_avg:0.00 mse_y:0.00 psnr_avg:inf psnr_y:inf"])
+        self.assertEqual(read_stats_file(path, "psnr_avg"), [50.97, math.inf])
+
+    def test_ssim_column(self):
+        path = self.write("ssim.log", ["n:1 Y:0.990 U:0.995 V:0.996 All:0.992 (20.97)"])
+        self.assertEqual(read_stats_file(path, "All"), [0.992])
+
+    def test_identical_frames_do_not_swamp_the_mean(self):
+        psnr_path = self.write("psnr.log", ["n:1 psnr_avg:40.0", "n:2 psnr_avg:inf", "n:3 psnr_avg:50.0"])
+        with self.assertLogs('app.metric_engine', level='WARNING'):
+            scores = metric_scores(os.path.join(self.temp_dir, "missing.json"), {"psnr": psnr_path})
+        self.assertEqual(scores["psnr"], 45.0)
+
+    def test_unreadable_stats_file_scores_none(self):
+        with self.assertLogs('app.metric_engine', level='WARNING'):
+            scores = metric_scores(os.path.join(self.temp_dir, "missing.json"),
+                                   {"ssim": os.path.join(self.temp_dir, "missing.log")})
+        self.assertIsNone(scores["ssim"])
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg")
+class TestMetricEngineRun(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_graph(self, alignment, frames):
+        # The capture shows the reference frames 15 frames late; frame levels encode the frame number
+        capture = f"color=c=black:size={WIDTH}x{HEIGHT}:rate=30:duration=2,geq=lum=(N-15)*4+16:cb=128:cr=128"
+        reference = f"color=c=black:size={WIDTH}x{HEIGHT}:rate=30:duration=2,geq=lum=N*4+16:cb=128:cr=128"
+        graph = metric_filtergraph(alignment, "libvmaf=log_path=vmaf.json:log_fmt=json",
+                                   [stats_filter("psnr", "psnr.log"), stats_filter("ssim", "ssim.log")])
+        subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", capture, "-f", "lavfi", "-i", reference,
+                        "-lavfi", graph, "-f", "null", "-"], cwd=self.temp_dir, check=True)
+        paths = {name: os.path.join(self.temp_dir, f"{name}.log") for name in ("psnr", "ssim")}
+        for path in paths.values():
+            self.assertEqual(len(read_stats_file(path, "n")), frames)
+        return metric_scores(os.path.join(self.temp_dir, "vmaf.json"), paths)
+
+    def test_every_metric_sees_the_aligned_frames(self):
+        scores = self.run_graph(descriptor(start_time=0.5, frame_count=20), 20)
+        self.assertEqual(scores["psnr"], math.inf)
+        self.assertEqual(scores["ssim"], 1.0)
+        self.assertIsNotNone(scores["vmaf"])
+
+    def test_unaligned_inputs_differ(self):
+        scores = self.run_graph(None, 60)
+        self.assertLess(scores["psnr"], 30.0)
+        self.assertLess(scores["ssim"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
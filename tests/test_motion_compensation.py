@@ -0,0 +1,68 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.bookend_alignment import BookendAligner
+
+WIDTH, HEIGHT, FPS = 96, 64, 30.0
+
+
+def decode_frames(path):
+    """All frames of a video as (frames, pixels) planar YUV 4:2:0 rows"""
+    result = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "yuv420p", "-"],
+                            capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, WIDTH * HEIGHT * 3 // 2)
+
+
+@unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "needs ffmpeg and ffprobe")
+class TestSegmentedMotionCompensation(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "source.mp4")
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+                        "-i", f"testsrc2=size={WIDTH}x{HEIGHT}:rate={FPS:g}:duration=8",
+                        "-c:v", "libx264", "-qp", "0", "-g", "30", self.source], check=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def compensate(self, workers, start_time, duration):
+        # Each run gets its own copy, as the output name is derived from the input
+        directory = tempfile.mkdtemp(dir=self.temp_dir)
+        video_path = shutil.copy(self.source, directory)
+        aligner = BookendAligner()
+        aligner.motion_workers = workers
+        with mock.patch.object(BookendAligner, '_get_video_info', return_value={'frame_rate': FPS}):
+            output_path = aligner._apply_motion_compensation(video_path, start_time, duration)
+        self.assertIsNotNone(output_path)
+        return decode_frames(output_path)
+
+    def check_matches_single_process(self, start_time, duration, workers=3):
+        single = self.compensate(1, start_time, duration)
+        segmented = self.compensate(workers, start_time, duration)
+        self.assertEqual(len(segmented), len(single))
+        for frame_idx in range(len(single)):
+            with self.subTest(frame=frame_idx):
+                self.assertTrue(np.array_equal(segmented[frame_idx], single[frame_idx]))
+
+    def test_segments_match_single_process(self):
+        # 120 frames in two segments of 60
+        self.check_matches_single_process(0.5, 4.0)
+
+    def test_segments_from_start_off_the_frame_grid(self):
+        # Starts and ends between frames, rounding down and then up; the first run has three segments
+        self.check_matches_single_process(0.51, 6.1)
+        self.check_matches_single_process(0.52, 4.02, workers=4)
+
+    def test_first_frame_is_the_section_start(self):
+        segmented = self.compensate(3, 0.5, 4.0)
+        self.assertTrue(np.array_equal(segmented[0], decode_frames(self.source)[15]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from app.bookend_alignment import CONTENT_START_PADDING, BookendAligner
+
+VIDEO_INFO = {'frame_rate': 30.0, 'duration': 20.0, 'frame_count': 600}
+
+
+class TestContentStartTiming(unittest.TestCase):
+    def setUp(self):
+        self.aligner = BookendAligner()
+        self.aligner.offset_min_confidence = 0.3
+
+    def descriptor(self, timing):
+        with mock.patch.object(self.aligner, '_get_video_info', return_value=VIDEO_INFO):
+            return self.aligner._create_alignment_descriptor(
+                "ref.mp4", "cap.mp4", timing['start_time'],
+                frame_offset=timing['frame_offset'], start_padding=timing['start_padding'])
+
+    def test_trusted_estimate_replaces_padding_and_configured_offset(self):
+        estimate = {'confidence': 0.9, 'frame_offset': -2, 'start_time': 100 / 30.0}
+        timing = self.aligner._content_start_timing(3.0, estimate)
+        self.assertEqual(timing['source'], 'estimated')
+        self.assertEqual(timing['reported_offset'], -2)
+        # The estimated start is used as is, whatever the configured offset
+        with mock.patch.object(self.aligner, '_configured_frame_offset', return_value=6):
+            self.assertEqual(self.descriptor(timing)['captured_start_frame'], 100)
+
+    def test_low_confidence_uses_the_configured_fallback(self):
+        estimate = {'confidence': 0.1, 'frame_offset': -2, 'start_time': 100 / 30.0}
+        with mock.patch.object(self.aligner, '_configured_frame_offset', return_value=3):
+            timing = self.aligner._content_start_timing(3.0, estimate)
+        self.assertEqual(timing['source'], 'configured')
+        self.assertEqual(timing['start_padding'], CONTENT_START_PADDING)
+        self.assertEqual(timing['frame_offset'], 3)
+        # 3.0s + 0.2s padding = frame 96, moved 3 frames earlier
+        self.assertEqual(self.descriptor(timing)['captured_start_frame'], 93)
+
+    def test_no_estimate_uses_the_configured_fallback(self):
+        with mock.patch.object(self.aligner, '_configured_frame_offset', return_value=6):
+            timing = self.aligner._content_start_timing(3.0, None)
+        self.assertEqual(timing['source'], 'configured')
+        self.assertEqual(timing['reported_offset'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from app.packet_index import PacketTable, candidate_windows, find_small_packet_runs
+
+
+def packet_table(sizes):
+    frame_count = len(sizes)
+    return PacketTable(np.arange(frame_count) / 30.0, sizes, np.arange(frame_count) % 30 == 0)
+
+
+class TestFindSmallPacketRuns(unittest.TestCase):
+    def test_runs_of_small_packets(self):
+        sizes = np.full(100, 20000)
+        sizes[0:4] = 50      # Run at the start
+        sizes[40:42] = 50    # Too short
+        sizes[60:70] = 50
+        sizes[97:] = 50      # Run at the end
+        self.assertEqual(find_small_packet_runs(packet_table(sizes), min_run=3), [(0, 3), (60, 69), (97, 99)])
+
+    def test_packets_sorted_into_presentation_order(self):
+        # Decode order with B-frames: the small packets are consecutive only in presentation order
+        pts = np.array([0, 3, 1, 2, 6, 4, 5, 7]) / 30.0
+        sizes = [9000, 9000, 10, 9000, 9000, 10, 10, 9000]
+        table = PacketTable(pts, sizes, np.zeros(8, dtype=bool))
+        self.assertEqual(table.size.tolist(), [9000, 10, 9000, 9000, 10, 10, 9000, 9000])
+        self.assertEqual(find_small_packet_runs(table, min_run=2), [(4, 5)])
+
+    def test_empty_table(self):
+        self.assertEqual(find_small_packet_runs(packet_table([])), [])
+
+
+class TestCandidateWindows(unittest.TestCase):
+    def test_padded_windows_are_merged_and_clamped(self):
+        self.assertEqual(candidate_windows([(50, 60), (2, 5), (66, 70)], 75, 5), [(0, 10), (45, 74)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.cpu_scheduler import CpuScheduler
+from app.intermediate_codecs import INTERMEDIATE_PROFILES, intermediate_output_args
+from app.parallel_encode import encode_frames_parallel
+
+WIDTH, HEIGHT, GOP = 64, 48, 30
+
+
+class ChunkEncodeTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('app.cpu_scheduler.psutil.cpu_percent', return_value=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = CpuScheduler(cores=8)
+        patcher = mock.patch('app.parallel_encode.get_scheduler', return_value=self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestChunkPlanning(ChunkEncodeTest):
+    def setUp(self):
+        super().setUp()
+        self.encoded = []  # (start_frame, frame_count, threads)
+        self.concatenated = []
+        patcher = mock.patch('app.parallel_encode.encode_frames', side_effect=self.fake_encode)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('app.parallel_encode.concat_files', side_effect=self.fake_concat)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_encode(self, video_path, start_frame, frame_count, fps, codec_args, output_path, ffmpeg_path, threads):
+        self.encoded.append((start_frame, frame_count, threads))
+        return frame_count if frame_count is not None else 7
+
+    def fake_concat(self, paths, output_path, ffmpeg_path, durations=None):
+        self.concatenated.append((paths, durations))
+        return True
+
+    def test_chunks_start_on_keyframes(self):
+        frames = encode_frames_parallel("capture.mp4", 10, 100, 30.0, [], "out.mp4", workers=3,
+                                        keyframes=[0, 30, 60, 90], min_chunk_frames=20)
+        self.assertEqual(frames, 100)
+        self.assertEqual(sorted((start, count) for start, count, _ in self.encoded), [(10, 20), (30, 60), (90, 20)])
+        self.assertEqual({threads for _, _, threads in self.encoded}, {2})
+
+        paths, durations = self.concatenated[0]
+        self.assertEqual(len(paths), 3)
+        # Durations follow the chunk order, not the order the encoders finished in
+        self.assertEqual(durations, [20 / 30.0, 60 / 30.0, 20 / 30.0])
+
+    def test_short_range_is_one_encode(self):
+        frames = encode_frames_parallel("capture.mp4", 10, 100, 30.0, [], "out.mp4", workers=4, min_chunk_frames=300)
+        self.assertEqual(frames, 100)
+        self.assertEqual(self.encoded, [(10, 100, 8)])
+        self.assertEqual(self.concatenated, [])
+
+    def test_last_chunk_runs_to_the_end(self):
+        frames = encode_frames_parallel("capture.mp4", 0, 100, 30.0, [], "out.mp4", workers=2, min_chunk_frames=20,
+                                        to_end=True)
+        self.assertEqual([count for _, count, _ in sorted(self.encoded, key=lambda chunk: chunk[0])], [50, None])
+        self.assertEqual(frames, 57)
+
+    def test_short_chunk_fails_the_encode(self):
+        with mock.patch('app.parallel_encode.encode_frames',
+                        side_effect=lambda *args, **kwargs: 49 if args[1] == 0 else args[2]):
+            frames = encode_frames_parallel("capture.mp4", 0, 100, 30.0, [], "out.mp4", workers=2,
+                                            min_chunk_frames=20)
+        self.assertIsNone(frames)
+        self.assertEqual(self.concatenated, [])
+
+    def test_threads_are_leased_while_encoding(self):
+        leased = []
+        with mock.patch('app.parallel_encode.encode_frames',
+                        side_effect=lambda *args, **kwargs: leased.append(self.scheduler.leased_threads()) or args[2]):
+            encode_frames_parallel("capture.mp4", 0, 100, 30.0, [], "out.mp4", workers=2, min_chunk_frames=20)
+        self.assertEqual(leased, [8, 8])
+        self.assertEqual(self.scheduler.leased_threads(), 0)
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg")
+class TestChunkEncode(ChunkEncodeTest):
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "capture.mp4")
+        # Flat frames whose luma level is their frame number, encoded with B-frames
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+                        "-i", f"color=c=black:size={WIDTH}x{HEIGHT}:rate=30:duration=4,geq=lum=N*2+8:cb=128:cr=128",
+                        "-c:v", "libx264", "-g", str(GOP), "-keyint_min", str(GOP), "-sc_threshold", "0",
+                        "-pix_fmt", "yuv420p", self.source], check=True)
+        self.source_frames = self.decode(self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def decode(self, path):
+        """Luma planes of all frames, at a constant frame rate so timestamp gaps show up as repeats"""
+        result = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "yuv420p", "-"],
+                                capture_output=True, check=True)
+        frames = np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, WIDTH * HEIGHT * 3 // 2)
+        return frames[:, :WIDTH * HEIGHT]
+
+    def test_chunks_join_into_the_source_frames(self):
+        for name, profile in INTERMEDIATE_PROFILES.items():
+            with self.subTest(profile=name):
+                output_path = os.path.join(self.temp_dir, f"{name}{profile['extension']}")
+                codec_args = intermediate_output_args(name, audio=False)
+                frames = encode_frames_parallel(self.source, 10, 100, 30.0, codec_args, output_path, workers=3,
+                                                keyframes=[0, 30, 60, 90], min_chunk_frames=20)
+                self.assertEqual(frames, 100)
+                decoded = self.decode(output_path)
+                self.assertEqual([int(round((frame.mean() - 8) / 2)) for frame in decoded], list(range(10, 110)))
+                if profile['lossless']:
+                    self.assertTrue(np.array_equal(decoded, self.source_frames[10:110]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.luma_cache import LumaProfileCache
+from app.luma_profile import LumaProfile
+from app.reference_analyzer import ReferenceAnalyzer
+
+
+def head_profile(white_frame=None, frames=30):
+    stats = np.zeros((frames, 3), dtype=np.float32)
+    stats[:, 0] = 60
+    if white_frame is not None:
+        stats[white_frame] = (250, 2, 1.0)
+    return LumaProfile(np.arange(frames), stats, 30.0)
+
+
+class FakeOptionsManager:
+    def __init__(self, ffmpeg_path, stats_backend="ffmpeg"):
+        self.ffmpeg_path = ffmpeg_path
+        self.stats_backend = stats_backend
+
+    def get_ffmpeg_path(self):
+        return self.ffmpeg_path
+
+    def get_setting(self, section, key=None):
+        return {'stats_backend': self.stats_backend}
+
+
+class TestBookendCheck(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.temp_dir, "reference.mp4")
+        with open(self.video_path, 'wb') as f:
+            f.write(os.urandom(1024))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_analyzer(self, options_manager=None):
+        analyzer = ReferenceAnalyzer(options_manager)
+        analyzer.luma_cache = LumaProfileCache(index_path=os.path.join(self.temp_dir, "index.json"))
+        return analyzer
+
+    def test_uses_configured_ffmpeg(self):
+        analyzer = self.make_analyzer(FakeOptionsManager("/opt/ffmpeg/bin/ffmpeg"))
+        with mock.patch('app.reference_analyzer.scan_luma_profile_ffmpeg', return_value=head_profile(3)) as scan:
+            self.assertTrue(analyzer._check_for_bookends(self.video_path, 30.0))
+        self.assertEqual(scan.call_args.kwargs['ffmpeg_path'], "/opt/ffmpeg/bin/ffmpeg")
+
+    def test_ffmpeg_profile_is_cached(self):
+        analyzer = self.make_analyzer()
+        with mock.patch('app.reference_analyzer.scan_luma_profile_ffmpeg', return_value=head_profile()) as scan:
+            self.assertFalse(analyzer._check_for_bookends(self.video_path, 30.0))
+            self.assertFalse(analyzer._check_for_bookends(self.video_path, 30.0))
+        self.assertEqual(scan.call_count, 1)
+
+    def test_opencv_fallback_is_cached(self):
+        analyzer = self.make_analyzer()
+        with mock.patch('app.reference_analyzer.scan_luma_profile_ffmpeg', return_value=None) as ffmpeg_scan, \
+                mock.patch('app.reference_analyzer.scan_luma_profile_opencv',
+                           return_value=head_profile(0)) as opencv_scan:
+            self.assertTrue(analyzer._check_for_bookends(self.video_path, 30.0))
+            self.assertTrue(analyzer._check_for_bookends(self.video_path, 30.0))
+        self.assertEqual(ffmpeg_scan.call_count, 2)
+        self.assertEqual(opencv_scan.call_count, 1)
+
+    def test_opencv_backend_is_cached(self):
+        analyzer = self.make_analyzer(FakeOptionsManager("ffmpeg", stats_backend="opencv"))
+        with mock.patch('app.reference_analyzer.scan_luma_profile_ffmpeg') as ffmpeg_scan, \
+                mock.patch('app.reference_analyzer.scan_luma_profile_opencv',
+                           return_value=head_profile(5)) as opencv_scan:
+            self.assertTrue(analyzer._check_for_bookends(self.video_path, 30.0))
+            self.assertTrue(analyzer._check_for_bookends(self.video_path, 30.0))
+        ffmpeg_scan.assert_not_called()
+        self.assertEqual(opencv_scan.call_count, 1)
+        self.assertEqual(opencv_scan.call_args.kwargs['max_frames'], 30)
+
+    def test_unreadable_video(self):
+        analyzer = self.make_analyzer()
+        with mock.patch('app.reference_analyzer.scan_luma_profile_ffmpeg', return_value=None), \
+                mock.patch('app.reference_analyzer.scan_luma_profile_opencv', return_value=None):
+            self.assertFalse(analyzer._check_for_bookends(self.video_path, 30.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.reference_cache import ReferencePrepCache, content_fingerprint
+
+VIDEO_INFO = {'frame_rate': 30.0, 'pix_fmt': 'yuv420p'}
+
+
+class TestContentFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_same_content_under_another_name(self):
+        data = os.urandom(100000)
+        self.assertEqual(content_fingerprint(self.write("a.mp4", data)), content_fingerprint(self.write("b.mp4", data)))
+
+    def test_same_size_files_differing_in_one_byte(self):
+        data = bytearray(os.urandom(8 * 1024 * 1024))
+        first = content_fingerprint(self.write("a.mp4", bytes(data)))
+        # Far from the start, middle and end of the file
+        data[5 * 1024 * 1024 + 17] ^= 0xFF
+        self.assertNotEqual(first, content_fingerprint(self.write("b.mp4", bytes(data))))
+
+    def test_rewritten_file_is_hashed_again(self):
+        path = self.write("a.mp4", b"x" * 1000)
+        first = content_fingerprint(path)
+        self.write("a.mp4", b"y" * 1000)
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1000000000))
+        self.assertNotEqual(first, content_fingerprint(path))
+
+
+class TestReferencePrepCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ReferencePrepCache(os.path.join(self.temp_dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def prepared(self, name, size=4096):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+    def test_stored_reference_stays_with_the_test(self):
+        prepared = self.prepared("ref_aligned.mkv")
+        cached_path = self.cache.store("key1", prepared, 600, VIDEO_INFO)
+        self.assertTrue(os.path.exists(prepared))
+        self.assertTrue(os.path.exists(cached_path))
+
+    def test_hit_is_linked_to_the_callers_path(self):
+        self.cache.store("key1", self.prepared("first_aligned.mkv"), 600, VIDEO_INFO)
+        link_path = os.path.join(self.temp_dir, "second_aligned.mkv")
+        cached = self.cache.lookup("key1", link_path=link_path)
+        self.assertEqual(cached['path'], link_path)
+        self.assertEqual(cached['frame_count'], 600)
+        self.assertEqual(cached['video_info']['path'], link_path)
+        with open(link_path, 'rb') as linked, open(os.path.join(self.temp_dir, "first_aligned.mkv"), 'rb') as f:
+            self.assertEqual(linked.read(), f.read())
+
+    def test_eviction_leaves_files_in_use(self):
+        # Room for one entry only
+        self.cache.max_size_gb = 6000 / (1024 ** 3)
+        first = self.prepared("first_aligned.mkv")
+        self.cache.store("key1", first, 600, VIDEO_INFO)
+        in_use = os.path.join(self.temp_dir, "test2_aligned.mkv")
+        self.cache.lookup("key1", link_path=in_use)
+
+        self.cache.store("key2", self.prepared("other_aligned.mkv"), 300, VIDEO_INFO)
+
+        self.assertIsNone(self.cache.lookup("key1"))
+        self.assertIsNotNone(self.cache.lookup("key2"))
+        self.assertEqual(os.path.getsize(first), 4096)
+        self.assertEqual(os.path.getsize(in_use), 4096)
+
+    def test_disabled_cache(self):
+        cache = ReferencePrepCache(os.path.join(self.temp_dir, "off"), enabled=False)
+        self.assertIsNone(cache.store("key1", self.prepared("ref_aligned.mkv"), 600, VIDEO_INFO))
+        self.assertIsNone(cache.lookup("key1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
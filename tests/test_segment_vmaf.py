@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.segment_vmaf import input_seek_args, merge_stats_files, merge_vmaf_logs, plan_vmaf_segments
+
+
+def write_segment_log(path, first_frame, frame_count):
+    """libvmaf log of a segment run whose frame i carries the score of compared frame first_frame + i"""
+    frames = [{'frameNum': i, 'metrics': {'vmaf': float(first_frame + i), 'psnr_y': 40.0}}
+              for i in range(frame_count)]
+    with open(path, 'w') as f:
+        json.dump({'version': '3.0.0', 'frames': frames, 'pooled_metrics': {},
+                   'aggregate_metrics': {'float_ssim': 0.99}}, f)
+
+
+class TestPlanVmafSegments(unittest.TestCase):
+    def test_segments_cover_every_frame_once(self):
+        segments = plan_vmaf_segments(1000, 3, min_segment_frames=100)
+        self.assertEqual(len(segments), 3)
+        self.assertEqual(segments[0]['start'], 0)
+        self.assertEqual(segments[-1]['end'], 1000)
+        for previous, segment in zip(segments, segments[1:]):
+            self.assertEqual(previous['end'], segment['start'])
+
+    def test_overlap_is_clamped_to_the_video(self):
+        segments = plan_vmaf_segments(1000, 3, min_segment_frames=100)
+        self.assertEqual(segments[0]['run_start'], 0)
+        self.assertEqual(segments[-1]['run_end'], 1000)
+        self.assertEqual(segments[1]['run_start'], segments[1]['start'] - 1)
+        self.assertEqual(segments[1]['run_end'], segments[1]['end'] + 1)
+
+    def test_short_videos_are_not_split(self):
+        self.assertEqual(len(plan_vmaf_segments(150, 4, min_segment_frames=120)), 1)
+
+
+class TestMergeSegments(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.segments = plan_vmaf_segments(300, 3, min_segment_frames=50)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def write_segment_logs(self):
+        logs = []
+        for i, segment in enumerate(self.segments):
+            logs.append(self.path(f"segment_{i}.json"))
+            write_segment_log(logs[-1], segment['run_start'], segment['run_end'] - segment['run_start'])
+        return logs
+
+    def test_overlap_frames_are_dropped(self):
+        written = merge_vmaf_logs(self.write_segment_logs(), self.segments, self.path("merged.json"))
+        self.assertEqual(written, 300)
+
+        with open(self.path("merged.json")) as f:
+            merged = json.load(f)
+        # Every compared frame appears once, in order, with continuous frame numbers
+        self.assertEqual([frame['metrics']['vmaf'] for frame in merged['frames']], [float(i) for i in range(300)])
+        self.assertEqual([frame['frameNum'] for frame in merged['frames']], list(range(300)))
+
+    def test_pooled_metrics_cover_the_merged_frames(self):
+        merge_vmaf_logs(self.write_segment_logs(), self.segments, self.path("merged.json"))
+        with open(self.path("merged.json")) as f:
+            merged = json.load(f)
+        self.assertEqual(merged['version'], '3.0.0')
+        self.assertEqual(merged['pooled_metrics']['vmaf']['min'], 0.0)
+        self.assertEqual(merged['pooled_metrics']['vmaf']['max'], 299.0)
+        self.assertAlmostEqual(merged['pooled_metrics']['vmaf']['mean'], 149.5)
+        self.assertEqual(merged['aggregate_metrics'], {'float_ssim': 0.99})
+
+    def test_merge_without_frames_is_valid_json(self):
+        segments = plan_vmaf_segments(0, 3)
+        write_segment_log(self.path("segment_0.json"), 0, 0)
+        written = merge_vmaf_logs([self.path("segment_0.json")], segments, self.path("merged.json"))
+        self.assertEqual(written, 0)
+
+        with open(self.path("merged.json")) as f:
+            merged = json.load(f)
+        self.assertEqual(merged['version'], '3.0.0')
+        self.assertEqual(merged['frames'], [])
+        self.assertEqual(merged['pooled_metrics'], {})
+
+    def test_short_segment_log_is_an_error(self):
+        logs = self.write_segment_logs()
+        segment = self.segments[1]
+        write_segment_log(logs[1], segment['run_start'], segment['end'] - segment['run_start'] - 5)
+        with self.assertRaises(ValueError):
+            merge_vmaf_logs(logs, self.segments, self.path("merged.json"))
+
+    def test_stats_files_are_renumbered(self):
+        stats = []
+        for i, segment in enumerate(self.segments):
+            stats.append(self.path(f"segment_{i}.log"))
+            with open(stats[-1], 'w') as f:
+                for frame in range(segment['run_start'], segment['run_end']):
+                    f.write(f"n:{frame - segment['run_start'] + 1} mse_avg:0.5 frame:{frame}\n")
+
+        written = merge_stats_files(stats, self.segments, self.path("merged.log"))
+        self.assertEqual(written, 300)
+        with open(self.path("merged.log")) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "n:1 mse_avg:0.5 frame:0")
+        self.assertEqual([line.split()[0] for line in lines], [f"n:{i + 1}" for i in range(300)])
+        self.assertEqual([line.split()[-1] for line in lines], [f"frame:{i}" for i in range(300)])
+
+
+class TestInputSeekArgs(unittest.TestCase):
+    def test_seeks_half_a_frame_early(self):
+        self.assertEqual(input_seek_args(30, 30.0), ["-ss", "0.983333"])
+
+    def test_no_seek_for_the_first_frame(self):
+        self.assertEqual(input_seek_args(0, 30.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
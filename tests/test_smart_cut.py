@@ -0,0 +1,111 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.packet_index import PacketTable
+from app.smart_cut import SMART_CUT_ENCODERS, plan_smart_cut, smart_cut_export
+
+WIDTH, HEIGHT, GOP = 64, 48, 30
+
+
+def packet_table(frame_count, gop=GOP):
+    return PacketTable(np.arange(frame_count) / 30.0, np.full(frame_count, 1000), np.arange(frame_count) % gop == 0)
+
+
+class TestPlanSmartCut(unittest.TestCase):
+    def test_head_runs_to_the_first_keyframe(self):
+        plan = plan_smart_cut(packet_table(120), 10, 50)
+        self.assertEqual(plan['head'], (10, 30))
+        self.assertEqual(plan['copy'], (30, 60))
+        self.assertAlmostEqual(plan['copy_start_time'], 1.0)
+        self.assertAlmostEqual(plan['copy_end_time'], 2.0)
+
+    def test_start_on_a_keyframe_needs_no_head(self):
+        plan = plan_smart_cut(packet_table(120), 30, 50)
+        self.assertEqual(plan['head'], (30, 30))
+        self.assertEqual(plan['copy'], (30, 60))
+
+    def test_end_on_a_keyframe_stops_there(self):
+        self.assertEqual(plan_smart_cut(packet_table(120), 10, 60)['copy'], (30, 60))
+
+    def test_copy_runs_to_the_end_after_the_last_keyframe(self):
+        plan = plan_smart_cut(packet_table(120), 70, 110)
+        self.assertEqual(plan['copy'], (90, None))
+        self.assertIsNone(plan['copy_end_time'])
+
+    def test_range_without_a_keyframe(self):
+        self.assertIsNone(plan_smart_cut(packet_table(120), 31, 59))
+
+    def test_keyframes_in_presentation_order(self):
+        # With B-frames packets arrive out of order; frame numbers follow the timestamps
+        table = PacketTable(np.array([0, 3, 1, 2, 6, 4, 5, 7]) / 30.0, np.ones(8),
+                            [True, False, False, False, True, False, False, False])
+        self.assertEqual(plan_smart_cut(table, 1, 8)['copy'], (6, None))
+
+
+class TestSmartCutExportFallback(unittest.TestCase):
+    def test_codec_without_encoder_is_reencoded_whole(self):
+        with mock.patch('app.smart_cut._run_ffmpeg', return_value=True) as run:
+            result = smart_cut_export("capture.avi", 10, 40, 30.0, "rawvideo", "clip.mp4",
+                                      packet_table=packet_table(120))
+        self.assertEqual(result['method'], 'reencode')
+        self.assertEqual((result['reencoded_frames'], result['copied_frames']), (40, 0))
+        cmd = run.call_args.args[0]
+        self.assertEqual(cmd[cmd.index("-frames:v") + 1], "40")
+        self.assertIn(SMART_CUT_ENCODERS["h264"][1], cmd)
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg")
+class TestSmartCutExport(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "capture.mp4")
+        # Flat frames whose luma level is their frame number, encoded with B-frames
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+                        "-i", f"color=c=black:size={WIDTH}x{HEIGHT}:rate=30:duration=4,geq=lum=N*2+8:cb=128:cr=128",
+                        "-c:v", "libx264", "-g", str(GOP), "-keyint_min", str(GOP), "-sc_threshold", "0",
+                        "-pix_fmt", "yuv420p", self.source], check=True)
+        self.source_frames = self.decode(self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def decode(self, path):
+        """Luma planes of all frames, at a constant frame rate so timestamp gaps show up as repeats"""
+        result = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "yuv420p", "-"],
+                                capture_output=True, check=True)
+        frames = np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, WIDTH * HEIGHT * 3 // 2)
+        return frames[:, :WIDTH * HEIGHT]
+
+    def frame_numbers(self, frames):
+        return [int(round((frame.mean() - 8) / 2)) for frame in frames]
+
+    def export(self, start_frame, frame_count):
+        output_path = os.path.join(self.temp_dir, "clip.mp4")
+        result = smart_cut_export(self.source, start_frame, frame_count, 30.0, "h264", output_path,
+                                  packet_table=packet_table(len(self.source_frames)))
+        self.assertEqual(result['method'], 'smart_cut')
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ["capture.mp4", "clip.mp4"])
+        return result, self.decode(output_path)
+
+    def test_export_runs_from_the_start_frame_to_the_next_keyframe(self):
+        result, frames = self.export(10, 40)
+        self.assertEqual((result['reencoded_frames'], result['copied_frames']), (20, 30))
+        self.assertEqual(self.frame_numbers(frames), list(range(10, 60)))
+        # The stream-copied body decodes to exactly the source frames
+        self.assertTrue(np.array_equal(frames[20:], self.source_frames[30:60]))
+
+    def test_export_to_the_end_of_the_capture(self):
+        result, frames = self.export(70, 40)
+        self.assertEqual((result['reencoded_frames'], result['copied_frames']), (20, 30))
+        self.assertEqual(self.frame_numbers(frames), list(range(70, 120)))
+        self.assertTrue(np.array_equal(frames[20:], self.source_frames[90:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
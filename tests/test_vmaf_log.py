@@ -0,0 +1,107 @@
+import json
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app import vmaf_log
+from app.vmaf_log import iter_vmaf_frames, pool_values, read_vmaf_log
+
+
+class TestVmafLog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.temp_dir, "vmaf.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_log(self, frames, pooled_metrics=None, indent=None):
+        log = {
+            'version': '3.0.0',
+            'fps': 29.97,
+            'frames': frames,
+            'pooled_metrics': pooled_metrics or {},
+            'aggregate_metrics': {}
+        }
+        with open(self.log_path, 'w') as f:
+            json.dump(log, f, indent=indent)
+        return log
+
+    def make_frames(self, count):
+        return [{'frameNum': i, 'metrics': {'vmaf': 90.0 + (i % 7) * 0.123456, 'psnr_y': 30.0 + i % 11}}
+                for i in range(count)]
+
+    def test_frames_are_streamed_across_read_blocks(self):
+        log = self.write_log(self.make_frames(500), indent=4)
+        info = {}
+        # Blocks far smaller than a frame, so keys and numbers are split between reads
+        with mock.patch.object(vmaf_log, 'READ_BLOCK', 7):
+            frames = list(iter_vmaf_frames(self.log_path, info))
+        self.assertEqual(frames, log['frames'])
+        self.assertEqual(info['version'], '3.0.0')
+        self.assertEqual(info['fps'], 29.97)
+        self.assertIn('pooled_metrics', info)
+
+    def test_columns_match_the_parsed_log(self):
+        log = self.write_log(self.make_frames(5000))
+        parsed = read_vmaf_log(self.log_path)
+        self.assertEqual(len(parsed), 5000)
+        self.assertEqual(parsed.frame_numbers.tolist(), list(range(5000)))
+        self.assertEqual(parsed.columns['vmaf'].dtype, np.float32)
+        np.testing.assert_allclose(parsed.columns['vmaf'], [f['metrics']['vmaf'] for f in log['frames']],
+                                   rtol=1e-6)
+        self.assertEqual(parsed.frames[-1]['frameNum'], 4999)
+        self.assertAlmostEqual(parsed.frames[3]['metrics']['psnr_y'], 33.0)
+
+    def test_infinite_psnr(self):
+        frames = self.make_frames(4)
+        frames[1]['metrics']['psnr_y'] = math.inf
+        self.write_log(frames)
+
+        parsed = read_vmaf_log(self.log_path)
+        self.assertTrue(np.isinf(parsed.columns['psnr_y'][1]))
+        # Identical frames are left out of the pooled values instead of making them infinite
+        pooled = parsed.pooled_metrics()['psnr_y']
+        self.assertEqual(pooled['max'], 33.0)
+        self.assertAlmostEqual(pooled['mean'], (30.0 + 32.0 + 33.0) / 3, places=5)
+
+    def test_metric_missing_from_some_frames(self):
+        frames = self.make_frames(3)
+        frames[2]['metrics']['float_ssim'] = 0.98
+        self.write_log(frames)
+
+        parsed = read_vmaf_log(self.log_path)
+        self.assertTrue(np.isnan(parsed.columns['float_ssim'][0]))
+        self.assertNotIn('float_ssim', parsed.frames[0]['metrics'])
+        self.assertAlmostEqual(parsed.mean('float_ssim'), 0.98, places=6)
+        self.assertIsNone(parsed.mean('cambi'))
+
+    def test_logged_pooled_metrics_are_kept(self):
+        logged = {'vmaf': {'min': 1.0, 'max': 2.0, 'mean': 1.5, 'harmonic_mean': 1.4}}
+        self.write_log(self.make_frames(10), pooled_metrics=logged)
+        parsed = read_vmaf_log(self.log_path)
+        self.assertEqual(parsed.pooled_metrics()['vmaf'], logged['vmaf'])
+        self.assertEqual(parsed.mean('vmaf'), 1.5)
+        self.assertIn('psnr_y', parsed.pooled_metrics())
+
+
+class TestPoolValues(unittest.TestCase):
+    def test_pooled_statistics(self):
+        pooled = pool_values([1.0, 3.0])
+        self.assertEqual(pooled['min'], 1.0)
+        self.assertEqual(pooled['max'], 3.0)
+        self.assertEqual(pooled['mean'], 2.0)
+        self.assertAlmostEqual(pooled['harmonic_mean'], 2.0 / (1 / 2.0 + 1 / 4.0) - 1.0, places=6)
+
+    def test_non_finite_values_are_left_out(self):
+        self.assertEqual(pool_values([np.inf, 2.0, np.nan])['mean'], 2.0)
+        self.assertIsNone(pool_values([np.inf, np.nan]))
+
+
+if __name__ == '__main__':
+    unittest.main()